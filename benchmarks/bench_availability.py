@@ -0,0 +1,92 @@
+import argparse
+import random
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import temp_database, timed, percentile, BASE_TIME
+from src.classes.availability import AvailabilityHeatmap
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.classes.user import User
+from src.controllers.availability import AvailabilityCtrl
+from src.enums import RecurrenceRule
+
+"""
+Availability heatmaps of large groups (course sections) over a week. Users have a few events a day and a
+weekly series, sections overlap. Compares computing every section in one process with precompute over a
+pool of workers, then times a cached lookup.
+
+    python -m benchmarks.bench_availability --users 5000 --sections 40 --section-size 500 --workers 4
+"""
+
+
+def _seed(db, users: int, per_day: int, days: int) -> list[str]:
+    rng = random.Random(13)
+    history_start = BASE_TIME - timedelta(days=days // 2)
+    user_rows, calendar_rows, event_rows = [], [], []
+    for i in range(users):
+        user_id, calendar_id = str(uuid.uuid4()), str(uuid.uuid4())
+        user_rows.append({"user_id": user_id, "name": f"User {i}", "email": f"user-{i}@example.com",
+                          "hashed_password": "x" * 60, "timezone": "UTC", "deleted": False})
+        calendar_rows.append({"calendar_id": calendar_id, "code": f"C{i:07d}", "name": "Main", "user_id": user_id,
+                              "visibility": "private", "deleted": False, "is_seeded": False,
+                              "max_event_seconds": 3 * 3600, "busy_version": 0})
+        events = [
+            (history_start + timedelta(days=day, hours=rng.randint(7, 20), minutes=rng.choice((0, 15, 30, 45))),
+             timedelta(minutes=rng.choice((30, 60, 90, 180))), RecurrenceRule.NONE)
+            for day in range(days) for _ in range(per_day)
+        ]
+        events += [(history_start + timedelta(days=rng.randint(0, 6), hours=rng.randint(8, 18)), timedelta(hours=1),
+                    RecurrenceRule.WEEKLY) for _ in range(3)]
+        event_rows += [{"event_id": str(uuid.uuid4()), "title": "Busy", "start_time": start, "end_time": start + length,
+                        "calendar_id": calendar_id, "deleted": False, "recurrence_rule": rule, "is_seeded": False}
+                       for start, length, rule in events]
+    db.bulk_insert_mappings(User, user_rows)
+    db.bulk_insert_mappings(Calendar, calendar_rows)
+    db.bulk_insert_mappings(Event, event_rows)
+    db.commit()
+    return [row["user_id"] for row in user_rows]
+
+
+def _clear(db):
+    db.query(AvailabilityHeatmap).delete()
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weekly availability heatmaps of large groups.")
+    parser.add_argument("--users", type=int, default=5000, help="Users in the database")
+    parser.add_argument("--sections", type=int, default=40, help="Groups to compute")
+    parser.add_argument("--section-size", type=int, default=500, help="Users per group")
+    parser.add_argument("--per-day", type=int, default=3, help="One-off events per user and day")
+    parser.add_argument("--days", type=int, default=60, help="Days of history per user")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, session_factory):
+        db = session_factory()
+        user_ids = _seed(db, args.users, args.per_day, args.days)
+        rng = random.Random(17)
+        sections = [rng.sample(user_ids, args.section_size) for _ in range(args.sections)]
+        print(f"{args.users} users, {db.query(Event).count()} events, "
+              f"{args.sections} sections of {args.section_size}")
+
+        def inline():
+            for section in sections:
+                AvailabilityCtrl.heatmap(section, BASE_TIME, db)
+
+        def pooled():
+            AvailabilityCtrl.precompute(sections, BASE_TIME, db, args.workers)
+
+        for name, run in (("one process", inline), (f"{args.workers} workers", pooled)):
+            _clear(db)
+            print(f"{name:12s} {timed(run)[0] * 1000:9.1f} ms for every section")
+
+        samples = [timed(AvailabilityCtrl.heatmap, rng.choice(sections), BASE_TIME, db)[0] for _ in range(args.repeat)]
+        print(f"cached       p50 {percentile(samples, 0.5) * 1000:.1f} ms, p95 {percentile(samples, 0.95) * 1000:.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks.common import temp_database, make_user, make_calendar, bulk_events, timed, BASE_TIME
+from src.classes.event import Event
+from src.controllers.event_index import EventIndexCache
+from src.controllers.events import EventCtrl
+
+"""
+Conflict checks as a calendar grows: the overlap lookup for a random hour, answered by a window query on the
+events (EventCtrl.list_in_window) and by the warm interval index of EventIndexCache. The index pays one
+version query per lookup; its first, cold lookup loads the whole calendar.
+
+    python -m benchmarks.bench_conflicts --history 1000 10000 100000
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conflict check latency as a calendar grows.")
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    spacing = timedelta(hours=6)
+    print(f"{'events':>8} | {'window query ms':>15} | {'cold index ms':>13} | {'warm index ms':>13}")
+    for history in args.history:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            owner = make_user(db)
+            calendar = make_calendar(db, owner.user_id)
+            bulk_events(db, calendar.calendar_id, history, spacing=spacing)
+            db.refresh(calendar)
+            user_id, spans = owner.user_id, {calendar.calendar_id: calendar.max_event_seconds}
+            rng = random.Random(3)
+            cache = EventIndexCache()
+
+            def probe():
+                start = BASE_TIME + timedelta(minutes=rng.randrange(int(history * spacing.total_seconds() / 60)))
+                return start, start + timedelta(hours=1)
+
+            def window_query():
+                found = EventCtrl.list_in_window(spans, *probe(), db)
+                db.expunge_all()
+                return found
+
+            def index_lookup():
+                return cache.overlapping(user_id, *probe(), db)
+
+            window_time, _ = timed(window_query, repeat=args.repeat)
+            cold_time, _ = timed(index_lookup)
+            warm_time, _ = timed(index_lookup, repeat=args.repeat)
+            start, end = probe()
+            assert [c.event_id for c in cache.overlapping(user_id, start, end, db)] == [
+                e.event_id for e in EventCtrl.list_in_window(spans, start, end, db)
+            ]
+            assert db.query(Event).count() == history
+            db.close()
+            print(f"{history:>8} | {window_time * 1000:>15.3f} | {cold_time * 1000:>13.1f} | {warm_time * 1000:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import temp_database, make_user, make_calendar, bulk_events, timed, BASE_TIME
+from src.classes.calendar import Calendar
+from src.controllers.dashboard import DashboardCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.polls import PollCtrl
+from src.core.query_stats import QueryBudget, track_queries
+
+"""
+The dashboard's first load as the number of calendars grows: DashboardCtrl.load_for_user against the requests the
+frontend used to chain (the calendars, then the events of each calendar, then the polls), counted in statements
+and time.
+
+    python -m benchmarks.bench_dashboard --calendars 1 10 50
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard load as the number of calendars grows.")
+    parser.add_argument("--calendars", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--events", type=int, default=500, help="Events per calendar")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    start, end = BASE_TIME, BASE_TIME + timedelta(days=7)
+    print(f"{'calendars':>9} | {'dashboard queries':>17} | {'dashboard ms':>12} | {'chained queries':>15} | {'chained ms':>10}")
+    for count in args.calendars:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            owner = make_user(db)
+            for i in range(count):
+                calendar = make_calendar(db, owner.user_id, name=f"Calendar {i}")
+                bulk_events(db, calendar.calendar_id, args.events)
+            for i in range(10):
+                PollCtrl.create(db, f"Question {i}?", owner.user_id, ["First option", "Second option"])
+            user_id = owner.user_id
+
+            def dashboard():
+                found = DashboardCtrl.load_for_user(user_id, start, end, 100, db)
+                db.expunge_all()
+                return found
+
+            def chained():
+                calendars = db.query(Calendar).filter(Calendar.user_id == user_id).all()
+                events = [
+                    EventCtrl.list_occurrences({calendar.calendar_id: calendar.max_event_seconds}, start, end, db)
+                    for calendar in calendars
+                ]
+                polls = [(poll, list(poll.options)) for poll in PollCtrl.search([], db)]
+                db.expunge_all()
+                return events, polls
+
+            results = []
+            for fn in (dashboard, chained):
+                with track_queries(QueryBudget()) as stats:
+                    fn()
+                elapsed, _ = timed(fn, repeat=args.repeat)
+                results += [stats.count, elapsed * 1000]
+            db.close()
+            print(f"{count:>9} | {results[0]:>17} | {results[1]:>12.2f} | {results[2]:>15} | {results[3]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
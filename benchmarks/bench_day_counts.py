@@ -0,0 +1,66 @@
+import argparse
+from collections import Counter
+from datetime import timedelta, timezone
+
+from benchmarks.common import temp_database, make_user, make_calendar, bulk_events, timed, BASE_TIME
+from src.controllers.day_counts import DayCountCtrl
+from src.controllers.events import EventCtrl
+from src.core.local_days import day_bounds, zone_or_utc
+from src.core.recurrence import naive_utc
+from src.enums import RecurrenceRule
+
+"""
+Per-day counts of a month view as the history of a calendar grows: DayCountCtrl.count (a grouped SUM over
+event_day_counts plus the expanded series) against what a client does today, fetching the month's events and
+counting them itself. The first count also builds the calendar's rows, a rebuild that happens once per
+time zone.
+
+    python -m benchmarks.bench_day_counts --history 1000 10000 100000
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Month view day counts as a calendar grows.")
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--timezone", default="America/New_York")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    zone = zone_or_utc(args.timezone)
+    spacing = timedelta(hours=2)
+    print(f"{'events':>8} | {'build ms':>9} | {'summary ms':>10} | {'fetch all ms':>12}")
+    for history in args.history:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            owner = make_user(db)
+            owner.timezone = args.timezone
+            db.commit()
+            calendar = make_calendar(db, owner.user_id)
+            bulk_events(db, calendar.calendar_id, history, spacing=spacing)
+            bulk_events(db, calendar.calendar_id, 10, spacing=timedelta(hours=7), recurrence_rule=RecurrenceRule.DAILY)
+            db.refresh(calendar)
+            spans = {calendar.calendar_id: calendar.max_event_seconds}
+            # The last month of the history, where a user would look
+            last = (BASE_TIME + spacing * history).date()
+            first = last - timedelta(days=30)
+
+            def fetch_all():
+                start, end = day_bounds(zone, first, last)
+                found = Counter(
+                    naive_utc(item.start_time).replace(tzinfo=timezone.utc).astimezone(zone).date()
+                    for item in EventCtrl.list_occurrences(spans, start, end, db)
+                    if naive_utc(item.start_time) >= start
+                )
+                db.expunge_all()
+                return found
+
+            build_time, _ = timed(DayCountCtrl.count, owner, first, last, db)
+            summary_time, (_, counts) = timed(DayCountCtrl.count, owner, first, last, db, repeat=args.repeat)
+            fetch_time, fetched = timed(fetch_all, repeat=max(1, args.repeat // 10))
+            assert counts == dict(fetched)
+            db.close()
+            print(f"{history:>8} | {build_time * 1000:>9.1f} | {summary_time * 1000:>10.2f} | {fetch_time * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import BASE_TIME, temp_database, make_user, make_calendar, bulk_events
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.sync_clock import next_sync_version
+from src.controllers.notification_dispatcher import NotificationDispatcher
+from src.core.delivery import Delivery, MemoryBackend
+from src.enums import DeliveryStatus, NotificationTypes
+
+"""
+Sending a backlog of due notifications: one row at a time (query the pending ones, send each, save its status)
+against the dispatcher claiming and recording whole batches, with several dispatchers side by side sharing the
+work. The target is 10,000 notifications a minute. Row by row is slow enough to only be run on a smaller backlog.
+
+    python -m benchmarks.bench_dispatcher --due 10000 --row-due 1000 --batch 500 --workers 1 4
+"""
+
+
+def seed(db, count: int) -> None:
+    owner = make_user(db)
+    calendar = make_calendar(db, owner.user_id)
+    bulk_events(db, calendar.calendar_id, count)
+    version = next_sync_version(db.connection())
+    db.bulk_insert_mappings(Notification, [
+        {
+            "notification_id": str(uuid.uuid4()),
+            "event_id": event_id,
+            "type": NotificationTypes.ALERT,
+            "message": f"Reminder {i}",
+            "timestamp": BASE_TIME - timedelta(seconds=i),
+            "delivery_status": DeliveryStatus.PENDING,
+            "deleted": False,
+            "sync_version": version,
+        }
+        for i, (event_id,) in enumerate(db.query(Event.event_id))
+    ])
+    db.commit()
+
+
+def row_by_row(session_factory, backend: MemoryBackend) -> int:
+    db = session_factory()
+    pending = db.query(Notification).filter(
+        Notification.delivery_status == DeliveryStatus.PENDING, Notification.timestamp <= BASE_TIME
+    ).all()
+    for notification in pending:
+        event = db.get(Event, notification.event_id)
+        backend.send([Delivery(notification.notification_id, event.calendar.user_id, event.event_id,
+                               str(notification.type), notification.message, notification.timestamp)])
+        notification.set_delivery_status(DeliveryStatus.COMPLETED)
+        db.commit()
+    db.close()
+    return len(pending)
+
+
+def batched(session_factory, backend: MemoryBackend, batch: int, workers: int) -> int:
+    dispatchers = [
+        NotificationDispatcher(session_factory, backend, batch_size=batch, worker_id=f"bench-{i}")
+        for i in range(workers)
+    ]
+    threads = [threading.Thread(target=d.run_once, args=(BASE_TIME,)) for d in dispatchers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(backend.sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Row by row sending against the batched notification dispatcher.")
+    parser.add_argument("--due", type=int, default=10000)
+    parser.add_argument("--row-due", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    runs = [("row by row", args.row_due, row_by_row)] + [
+        (f"batched x{workers}", args.due, lambda factory, backend, w=workers: batched(factory, backend, args.batch, w))
+        for workers in args.workers
+    ]
+    print(f"{'strategy':>12} | {'sent':>6} | {'seconds':>8} | {'per minute':>10}")
+    for name, due, run in runs:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            seed(db, due)
+            db.close()
+            backend = MemoryBackend()
+            began = time.perf_counter()
+            sent = run(session_factory, backend)
+            elapsed = time.perf_counter() - began
+            # Every notification exactly once, however many dispatchers shared the backlog
+            assert sent == due and len({d.notification_id for d in backend.sent}) == due
+            print(f"{name:>12} | {sent:>6} | {elapsed:>8.2f} | {sent / elapsed * 60:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
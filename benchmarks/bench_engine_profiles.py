@@ -0,0 +1,126 @@
+import argparse
+import threading
+import time
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import temp_database, make_user, make_calendar, bulk_events, percentile, BASE_TIME
+from src.api.calendar import get_calendar_events
+from src.api.polls import list_polls
+from src.controllers.events import EventCtrl
+from src.controllers.polls import PollCtrl
+from src.controllers.votes import VoteCtrl
+from src.database import PROFILES
+
+"""
+Compares the legacy and tuned engine profiles under concurrency.
+Readers hit the calendar events listing and the poll listing, writers create events and cast votes,
+all at the same time, each operation with its own session the way get_db hands them out per request.
+
+    python -m benchmarks.bench_engine_profiles --readers 8 --writers 2 --seconds 5
+"""
+
+
+def _run_profile(profile_name: str, readers: int, writers: int, seconds: float, events: int, polls: int) -> dict:
+    with temp_database(PROFILES[profile_name]) as (engine, session_factory):
+        setup = session_factory()
+        owner = make_user(setup)
+        calendar = make_calendar(setup, owner.user_id)
+        bulk_events(setup, calendar.calendar_id, events)
+        option_ids = []
+        for i in range(polls):
+            new_poll = PollCtrl.create(setup, f"Question {i}", owner.user_id, ["Option A", "Option B"], allow_multi_votes=True)
+            option_ids.extend(o.option_id for o in new_poll.options)
+        calendar_id = calendar.calendar_id
+        # Plain stand-in for the authenticated user, the ORM instance would expire once setup closes
+        current_user = SimpleNamespace(user_id=owner.user_id)
+        setup.close()
+
+        stop = threading.Event()
+        stats = {"read": [], "write": [], "errors": 0}
+        lock = threading.Lock()
+
+        def reader(worker: int):
+            i = worker
+            while not stop.is_set():
+                db = session_factory()
+                started = time.perf_counter()
+                try:
+                    if i % 2:
+                        get_calendar_events(calendar_id, db=db, current_user=current_user)
+                    else:
+                        list_polls(db=db)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        stats["read"].append(elapsed)
+                except OperationalError:
+                    with lock:
+                        stats["errors"] += 1
+                finally:
+                    db.close()
+                i += 1
+
+        def writer(worker: int):
+            i = worker
+            while not stop.is_set():
+                db = session_factory()
+                started = time.perf_counter()
+                try:
+                    if i % 2:
+                        start = BASE_TIME + timedelta(days=365, minutes=i)
+                        EventCtrl.create(db, f"Write {i}", start, start + timedelta(hours=1), "Room", calendar_id)
+                    else:
+                        VoteCtrl.create(db, option_ids[i % len(option_ids)], current_user.user_id)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        stats["write"].append(elapsed)
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        stats["errors"] += 1
+                finally:
+                    db.close()
+                i += 1
+
+        with ThreadPoolExecutor(max_workers=readers + writers) as pool:
+            futures = [pool.submit(reader, n) for n in range(readers)]
+            futures += [pool.submit(writer, n) for n in range(writers)]
+            time.sleep(seconds)
+            stop.set()
+            for future in futures:
+                future.result()
+
+        return {
+            "profile": profile_name,
+            "reads/s": len(stats["read"]) / seconds,
+            "writes/s": len(stats["write"]) / seconds,
+            "read p95 ms": percentile(stats["read"], 0.95) * 1000,
+            "write p95 ms": percentile(stats["write"], 0.95) * 1000,
+            "errors": stats["errors"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the legacy and tuned engine profiles.")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--events", type=int, default=500, help="Events in the calendar being listed")
+    parser.add_argument("--polls", type=int, default=20, help="Polls returned by the poll listing")
+    args = parser.parse_args()
+
+    results = [
+        _run_profile(name, args.readers, args.writers, args.seconds, args.events, args.polls)
+        for name in ("legacy", "tuned")
+    ]
+    columns = list(results[0].keys())
+    print(" | ".join(f"{c:>12}" for c in columns))
+    for row in results:
+        print(" | ".join(f"{row[c]:>12.1f}" if isinstance(row[c], float) else f"{row[c]:>12}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import temp_database, make_user, make_calendar, bulk_events, timed, BASE_TIME
+from src.classes.event import Event
+from src.controllers.events import EventCtrl
+
+"""
+Latency of a month view (five weeks of events) as the calendar's history grows. Compares listing every
+event (what GET /calendar/{id}/events used to do), the overlap predicate on its own (the scan still walks all
+the history before the window) and EventCtrl.list_in_window, whose scan is bounded on both sides.
+
+    python -m benchmarks.bench_event_window --history 1000 10000 100000 300000
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Month view latency as historical events grow.")
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000, 300000])
+    parser.add_argument("--per-day", type=int, default=4, help="Events per day inside the window")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    window_start = BASE_TIME
+    window_end = BASE_TIME + timedelta(weeks=5)
+    spacing = timedelta(hours=24 / args.per_day)
+    in_window = int((window_end - window_start) / spacing)
+
+    print(f"{'history':>8} | {'rows':>6} | {'all ms':>8} | {'overlap ms':>10} | {'window ms':>9}")
+    for history in args.history:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            owner = make_user(db)
+            calendar = make_calendar(db, owner.user_id)
+            calendar_id = calendar.calendar_id
+            bulk_events(db, calendar_id, history, spacing=spacing, start=window_start - spacing * history)
+            bulk_events(db, calendar_id, in_window, spacing=spacing, start=window_start)
+            db.refresh(calendar)
+            spans = {calendar_id: calendar.max_event_seconds}
+            db.close()
+
+            db = session_factory()
+
+            def list_all():
+                result = db.query(Event).filter(Event.calendar_id == calendar_id).all()
+                db.expunge_all()
+                return result
+
+            def overlap_only():
+                result = (
+                    db.query(Event)
+                    .filter(Event.calendar_id == calendar_id, Event.deleted.is_(False),
+                            Event.start_time < window_end, Event.end_time > window_start)
+                    .order_by(Event.start_time)
+                    .all()
+                )
+                db.expunge_all()
+                return result
+
+            def windowed():
+                result = EventCtrl.list_in_window(spans, window_start, window_end, db)
+                db.expunge_all()
+                return result
+
+            all_time, _ = timed(list_all, repeat=max(1, args.repeat // 10))
+            overlap_time, expected = timed(overlap_only, repeat=args.repeat)
+            window_time, rows = timed(windowed, repeat=args.repeat)
+            db.close()
+            assert [e.event_id for e in rows] == [e.event_id for e in expected]
+            print(f"{history:>8} | {len(rows):>6} | {all_time * 1000:>8.1f} | {overlap_time * 1000:>10.2f} | {window_time * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
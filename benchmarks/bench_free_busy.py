@@ -0,0 +1,82 @@
+import argparse
+import random
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import temp_database, timed, percentile, BASE_TIME
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.classes.user import User
+from src.controllers.schedules import ScheduleCtrl
+from src.enums import RecurrenceRule
+
+"""
+Free/busy of a group over a month. Every user has a year of one-off events (a few a day, up to three hours
+long) plus weekly and daily recurring series. The group is looked up against a database holding many more
+users.
+
+    python -m benchmarks.bench_free_busy --users 2000 --group 50 --per-day 3
+"""
+
+
+def _seed(db, users: int, per_day: int, days: int) -> list[str]:
+    rng = random.Random(7)
+    history_start = BASE_TIME - timedelta(days=days // 2)
+    user_rows, calendar_rows, event_rows = [], [], []
+    for i in range(users):
+        user_id, calendar_id = str(uuid.uuid4()), str(uuid.uuid4())
+        user_rows.append({"user_id": user_id, "name": f"User {i}", "email": f"user-{i}@example.com",
+                          "hashed_password": "x" * 60, "timezone": "UTC", "deleted": False})
+        calendar_rows.append({"calendar_id": calendar_id, "code": f"C{i:07d}", "name": "Main", "user_id": user_id,
+                              "visibility": "private", "deleted": False, "is_seeded": False,
+                              "max_event_seconds": 3 * 3600})
+        events = [
+            (history_start + timedelta(days=day, hours=rng.randint(7, 20), minutes=rng.choice((0, 15, 30, 45))),
+             timedelta(minutes=rng.choice((30, 60, 90, 180))), RecurrenceRule.NONE)
+            for day in range(days) for _ in range(per_day)
+        ]
+        events += [(history_start + timedelta(days=rng.randint(0, 6), hours=rng.randint(8, 18)), timedelta(hours=1),
+                    RecurrenceRule.WEEKLY) for _ in range(5)]
+        events += [(history_start + timedelta(hours=rng.randint(6, 22)), timedelta(minutes=30), RecurrenceRule.DAILY)
+                   for _ in range(2)]
+        event_rows += [{"event_id": str(uuid.uuid4()), "title": "Busy", "start_time": start, "end_time": start + length,
+                        "calendar_id": calendar_id, "deleted": False, "recurrence_rule": rule, "is_seeded": False}
+                       for start, length, rule in events]
+    db.bulk_insert_mappings(User, user_rows)
+    db.bulk_insert_mappings(Calendar, calendar_rows)
+    db.bulk_insert_mappings(Event, event_rows)
+    db.commit()
+    return [row["user_id"] for row in user_rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Free/busy of a group of users over a month.")
+    parser.add_argument("--users", type=int, default=2000, help="Users in the database")
+    parser.add_argument("--group", type=int, default=50, help="Users looked up at once")
+    parser.add_argument("--per-day", type=int, default=3, help="One-off events per user and day")
+    parser.add_argument("--days", type=int, default=365, help="Days of history per user")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    month = (BASE_TIME, BASE_TIME + timedelta(days=30))
+
+    with temp_database() as (engine, session_factory):
+        db = session_factory()
+        user_ids = _seed(db, args.users, args.per_day, args.days)
+        print(f"{args.users} users, {db.query(Event).count()} events")
+        rng = random.Random(11)
+
+        def lookup():
+            result = ScheduleCtrl.free_busy(rng.sample(user_ids, args.group), *month, db)
+            db.expunge_all()
+            return result
+
+        samples = [timed(lookup)[0] for _ in range(args.repeat)]
+        result = lookup()
+        print(f"{args.group} users over 30 days, {len(result.combined)} combined blocks, "
+              f"p50 {percentile(samples, 0.5) * 1000:.1f} ms, p95 {percentile(samples, 0.95) * 1000:.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
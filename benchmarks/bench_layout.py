@@ -0,0 +1,43 @@
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks.common import timed, BASE_TIME
+from src.core.layout import assign_lanes
+
+"""
+Lane layout of a week view as the number of events grows: the sweep of assign_lanes against what clients
+used to do, checking every event against every event already placed.
+
+    python -m benchmarks.bench_layout --events 100 1000 5000
+"""
+
+
+def _pairwise(intervals):
+    # Client-side baseline: the first lane no overlapping earlier event took
+    lanes = []
+    for position, (start, end) in enumerate(intervals):
+        taken = {lanes[other] for other in range(position) if intervals[other][1] > start}
+        lanes.append(next(lane for lane in range(len(taken) + 1) if lane not in taken))
+    return lanes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Week view lane layout as events grow.")
+    parser.add_argument("--events", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    print(f"{'events':>7} | {'sweep ms':>9} | {'pairwise ms':>11}")
+    for count in args.events:
+        starts = sorted(BASE_TIME + timedelta(minutes=15 * rng.randrange(7 * 96)) for _ in range(count))
+        intervals = [(start, start + timedelta(minutes=rng.choice((30, 60, 90, 120)))) for start in starts]
+        sweep_time, placed = timed(assign_lanes, intervals, repeat=args.repeat)
+        pairwise_time, lanes = timed(_pairwise, intervals, repeat=1)
+        assert [lane for lane, _ in placed] == lanes
+        print(f"{count:>7} | {sweep_time * 1000:>9.2f} | {pairwise_time * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import random
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import temp_database, timed, percentile, make_user, BASE_TIME
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.classes.study_session_member import StudySessionMember
+from src.constants import SLOT_MINUTES
+from src.controllers.schedules import ScheduleCtrl
+from src.controllers.study_sessions import StudySessionCtrl
+from src.core.intervals import merge_grouped
+from src.core.recurrence import naive_utc
+from src.core.slots import SlotGrid, WorkingHours, rank_slots
+from src.enums import RecurrenceRule
+
+"""
+Meeting slot search for a study session with many members. Every member has a few events a day plus a daily
+series. The ranking is timed on its own, on the bitset grid and against checking every candidate against
+every member's busy blocks, and end to end through StudySessionCtrl.find_slots.
+
+    python -m benchmarks.bench_meeting_slots --members 100 --days 30 --duration 60
+"""
+
+
+def _seed(db, members: int, per_day: int, days: int):
+    rng = random.Random(5)
+    owner = make_user(db, "Owner")
+    session = StudySessionCtrl.create(db, "Bench session", owner.user_id)
+    user_ids = [owner.user_id] + [make_user(db, f"Member {i}").user_id for i in range(members - 1)]
+    db.bulk_insert_mappings(StudySessionMember, [
+        {"member_id": str(uuid.uuid4()), "session_id": session.session_id, "user_id": user_id,
+         "is_admin": False, "deleted": False}
+        for user_id in user_ids[1:]
+    ])
+    calendar_rows, event_rows = [], []
+    for user_id in user_ids:
+        calendar_id = str(uuid.uuid4())
+        calendar_rows.append({"calendar_id": calendar_id, "name": "Main", "user_id": user_id,
+                              "visibility": "private", "deleted": False, "is_seeded": False,
+                              "max_event_seconds": 3 * 3600})
+        events = [
+            (BASE_TIME + timedelta(days=day, hours=rng.randint(0, 10), minutes=rng.choice((0, 15, 30, 45))),
+             timedelta(minutes=rng.choice((30, 60, 90, 180))), RecurrenceRule.NONE)
+            for day in range(days) for _ in range(per_day)
+        ]
+        events.append((BASE_TIME + timedelta(hours=rng.randint(0, 10)), timedelta(minutes=30), RecurrenceRule.DAILY))
+        event_rows += [{"event_id": str(uuid.uuid4()), "title": "Busy", "start_time": start, "end_time": start + length,
+                        "calendar_id": calendar_id, "deleted": False, "recurrence_rule": rule, "is_seeded": False}
+                       for start, length, rule in events]
+    db.bulk_insert_mappings(Calendar, calendar_rows)
+    db.bulk_insert_mappings(Event, event_rows)
+    db.commit()
+    return session, user_ids
+
+
+def _pairwise(user_ids, members, starts, ends, grid, allowed, length, duration, limit):
+    # Baseline: every allowed start against every member's merged busy blocks
+    blocks = [list(zip(s.tolist(), e.tolist())) for s, e in merge_grouped(members, starts, ends, len(user_ids))]
+    scored = []
+    for first in range(grid.size - length + 1):
+        if not allowed[first:first + length].all():
+            continue
+        slot_start = grid.slot_start(first)
+        slot_end = slot_start + duration
+        free = sum(not any(s < slot_end and e > slot_start for s, e in member) for member in blocks)
+        scored.append((-free, first))
+    scored.sort()
+    chosen = []
+    for _, first in scored:
+        if len(chosen) == limit:
+            break
+        if all(abs(first - other) >= length for other in chosen):
+            chosen.append(first)
+    return chosen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Meeting slot search for a large study session.")
+    parser.add_argument("--members", type=int, default=100, help="Users in the session, owner included")
+    parser.add_argument("--per-day", type=int, default=3, help="One-off events per member and day")
+    parser.add_argument("--days", type=int, default=30, help="Length of the search window")
+    parser.add_argument("--duration", type=int, default=60, help="Meeting length in minutes")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    window = (BASE_TIME, BASE_TIME + timedelta(days=args.days))
+    hours = WorkingHours()
+    duration = timedelta(minutes=args.duration)
+    length = -(-args.duration // SLOT_MINUTES)
+
+    with temp_database() as (engine, session_factory):
+        db = session_factory()
+        session, user_ids = _seed(db, args.members, args.per_day, args.days)
+        members, starts, ends = ScheduleCtrl.busy_intervals(user_ids, *window, db)
+        grid = SlotGrid.over(naive_utc(window[0]), naive_utc(window[1]), timedelta(minutes=SLOT_MINUTES))
+        allowed = grid.allowed(hours)
+        print(f"{args.members} members, {len(starts)} busy intervals, {grid.size} slots")
+
+        def bitset():
+            return rank_slots(grid.busy_bits(members, starts, ends, len(user_ids)), allowed, len(user_ids),
+                              length, args.limit)
+
+        def pairwise():
+            return _pairwise(user_ids, members, starts, ends, grid, allowed, length, duration, args.limit)
+
+        def search():
+            result = StudySessionCtrl.find_slots(session, *window, args.duration, hours, args.limit, db)
+            db.expunge_all()
+            return result
+
+        assert [first for first, _ in bitset()] == pairwise()
+        for name, run, repeat in (("bitset grid", bitset, args.repeat), ("pairwise", pairwise, 3),
+                                  ("find_slots", search, args.repeat)):
+            samples = [timed(run)[0] for _ in range(repeat)]
+            print(f"{name:12s} p50 {percentile(samples, 0.5) * 1000:9.1f} ms, "
+                  f"p95 {percentile(samples, 0.95) * 1000:9.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
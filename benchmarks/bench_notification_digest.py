@@ -0,0 +1,82 @@
+import argparse
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import BASE_TIME, temp_database, make_user, make_calendar, bulk_events
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.sync_clock import next_sync_version
+from src.controllers.notification_dispatcher import NotificationDispatcher
+from src.core.delivery import MemoryBackend
+from src.core.query_stats import QueryBudget, track_queries
+from src.enums import DeliveryStatus, NotificationTypes
+
+"""
+A morning of reminders for many students, each with a busy schedule: sending every notification on its own
+against coalescing each student's notifications within a window into one digest. Counted in deliveries handed to
+the backend, statements and time, with the dispatcher passing once a minute over a simulated clock.
+
+    python -m benchmarks.bench_notification_digest --users 500 --per-user 10 --windows 0 300 900
+"""
+
+MORNING = timedelta(hours=4)
+
+
+def seed(db, users: int, per_user: int, seed_value: int = 3) -> None:
+    rng = random.Random(seed_value)
+    for u in range(users):
+        owner = make_user(db, f"Student {u}")
+        calendar = make_calendar(db, owner.user_id)
+        bulk_events(db, calendar.calendar_id, per_user)
+    version = next_sync_version(db.connection())
+    db.bulk_insert_mappings(Notification, [
+        {
+            "notification_id": str(uuid.uuid4()),
+            "event_id": event_id,
+            "type": NotificationTypes.ALERT,
+            "message": f"Reminder {i}",
+            "timestamp": BASE_TIME + timedelta(seconds=rng.uniform(0, MORNING.total_seconds())),
+            "delivery_status": DeliveryStatus.PENDING,
+            "deleted": False,
+            "sync_version": version,
+        }
+        for i, (event_id,) in enumerate(db.query(Event.event_id).join(Calendar))
+    ])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notifications sent one by one against per user digests.")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--per-user", type=int, default=10)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 300, 900])
+    args = parser.parse_args()
+
+    total = args.users * args.per_user
+    print(f"{'window s':>8} | {'deliveries':>10} | {'per user':>8} | {'statements':>10} | {'seconds':>7}")
+    for window in args.windows:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            seed(db, args.users, args.per_user)
+            db.close()
+            backend = MemoryBackend()
+            dispatcher = NotificationDispatcher(session_factory, backend, worker_id="bench", digest_seconds=window)
+            sent = 0
+            began = time.perf_counter()
+            with track_queries(QueryBudget()) as stats:
+                now = BASE_TIME
+                while now <= BASE_TIME + MORNING + timedelta(minutes=1):
+                    sent += dispatcher.run_once(now).sent
+                    now += timedelta(minutes=1)
+            elapsed = time.perf_counter() - began
+            assert sent == total
+            deliveries = len(backend.sent)
+            print(f"{window:>8.0f} | {deliveries:>10} | {deliveries / args.users:>8.1f} | {stats.count:>10} | "
+                  f"{elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
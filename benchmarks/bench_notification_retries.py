@@ -0,0 +1,104 @@
+import argparse
+import logging
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from benchmarks.common import BASE_TIME, temp_database, make_user, make_calendar, bulk_events
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.sync_clock import next_sync_version
+from src.controllers.notification_dispatcher import NotificationDispatcher
+from src.core.delivery import Delivery, MemoryBackend
+from src.core.query_stats import QueryBudget, track_queries
+from src.enums import DeliveryStatus, NotificationTypes
+
+"""
+A provider outage failing a whole backlog at once, next to a history of notifications already sent. Shows what the
+dispatcher's passes cost while every failed notification waits for its retry (the due indexes find nothing without
+scanning the history), how the jitter spreads the retries over time instead of one storm at the same second, and
+the recovery pass once they are due.
+
+    python -m benchmarks.bench_notification_retries --history 10000 100000 --due 5000 --retry 30
+"""
+
+
+class OutageBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.down = True
+
+    def send(self, deliveries: list[Delivery]) -> set[str]:
+        if self.down:
+            raise ConnectionError("provider unavailable")
+        return super().send(deliveries)
+
+
+def seed(db, history: int, due: int) -> None:
+    owner = make_user(db)
+    calendar = make_calendar(db, owner.user_id)
+    bulk_events(db, calendar.calendar_id, history + due)
+    version = next_sync_version(db.connection())
+    db.bulk_insert_mappings(Notification, [
+        {
+            "notification_id": str(uuid.uuid4()),
+            "event_id": event_id,
+            "type": NotificationTypes.ALERT,
+            "message": f"Reminder {i}",
+            "timestamp": BASE_TIME - timedelta(minutes=1 if i < due else 60),
+            "delivery_status": DeliveryStatus.PENDING if i < due else DeliveryStatus.COMPLETED,
+            "deleted": False,
+            "sync_version": version,
+        }
+        for i, (event_id,) in enumerate(db.query(Event.event_id))
+    ])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retries after a provider outage as the notification history grows.")
+    parser.add_argument("--history", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--due", type=int, default=5000)
+    parser.add_argument("--retry", type=float, default=30)
+    args = parser.parse_args()
+    # The outage is the point, not worth a traceback per batch
+    logging.getLogger("src.controllers.notification_dispatcher").setLevel(logging.CRITICAL)
+
+    print(f"{'history':>8} | {'outage ms':>9} | {'idle pass ms':>12} | {'statements':>10} | "
+          f"{'peak retries/s':>14} | {'recovery ms':>11}")
+    for history in args.history:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            seed(db, history, args.due)
+            backend = OutageBackend()
+            dispatcher = NotificationDispatcher(session_factory, backend, worker_id="bench", max_attempts=5,
+                                                retry_seconds=args.retry, retry_max_seconds=args.retry * 8)
+
+            began = time.perf_counter()
+            assert dispatcher.run_once(BASE_TIME).retried == args.due
+            outage = time.perf_counter() - began
+
+            # A pass while the retries wait, every few seconds or on a timer, should cost next to nothing
+            with track_queries(QueryBudget()) as stats:
+                began = time.perf_counter()
+                assert dispatcher.run_once(BASE_TIME + timedelta(seconds=1)).claimed == 0
+                idle = time.perf_counter() - began
+
+            retry_at = [moment for moment, in db.query(Notification.next_attempt_at).filter(
+                Notification.delivery_status == DeliveryStatus.RETRYING
+            )]
+            peak = max(Counter(moment.replace(microsecond=0) for moment in retry_at).values())
+            db.close()
+
+            backend.down = False
+            began = time.perf_counter()
+            assert dispatcher.run_once(BASE_TIME + timedelta(seconds=args.retry)).sent == args.due
+            recovery = time.perf_counter() - began
+            print(f"{history:>8} | {outage * 1000:>9.1f} | {idle * 1000:>12.2f} | {stats.count:>10} | "
+                  f"{peak:>14} | {recovery * 1000:>11.1f}")
+    print(f"Without jitter all {args.due} retries would come due in the same second.")
+
+
+if __name__ == "__main__":
+    main()
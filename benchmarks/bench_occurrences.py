@@ -0,0 +1,82 @@
+import argparse
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import temp_database, timed, make_user, make_calendar, BASE_TIME
+from src.classes.event import Event, widen_event_span
+from src.classes.occurrence import OccurrenceHorizon
+from src.controllers.events import EventCtrl
+from src.controllers.occurrences import OccurrenceCtrl
+from src.enums import RecurrenceRule
+
+"""
+One calendar accumulating recurring series (weekly meetings, monthly bills, yearly birthdays) started over
+the past year.
+At every size the week view (GET /calendar/{id}/events?start=&end=) is timed twice: expanding the series
+on the fly, and as a range scan of event_occurrences after rolling a 90 day horizon, whose cost is printed too.
+
+    python -m benchmarks.bench_occurrences --sizes 10 100 1000 5000
+"""
+
+RULES = (RecurrenceRule.WEEKLY, RecurrenceRule.MONTHLY, RecurrenceRule.YEARLY)
+
+
+def _add_series(db, calendar_id: str, count: int) -> None:
+    db.bulk_insert_mappings(Event, [
+        {
+            "event_id": str(uuid.uuid4()),
+            "title": f"Series {i}",
+            "start_time": BASE_TIME - timedelta(days=i % 365, hours=i % 10),
+            "end_time": BASE_TIME - timedelta(days=i % 365, hours=i % 10) + timedelta(hours=1),
+            "calendar_id": calendar_id,
+            "deleted": False,
+            "recurrence_rule": RULES[i % len(RULES)],
+            "is_seeded": False,
+        }
+        for i in range(count)
+    ])
+    widen_event_span(db.connection(), calendar_id, 3600)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Week view over expanded vs materialized recurring series.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="Recurring series in the calendar")
+    parser.add_argument("--days", type=int, default=90, help="Horizon of the materialized occurrences")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    week = (BASE_TIME + timedelta(days=14), BASE_TIME + timedelta(days=21))
+
+    with temp_database() as (engine, session_factory):
+        db = session_factory()
+        calendar_id = make_calendar(db, make_user(db).user_id).calendar_id
+        spans = {calendar_id: 3600}
+
+        def week_view():
+            result = EventCtrl.list_occurrences(spans, *week, db)
+            db.expunge_all()
+            return result
+
+        print(f"{'series':>8} {'occurrences':>12} {'expanded':>12} {'table':>12} {'roll horizon':>14}")
+        stored = 0
+        for size in args.sizes:
+            _add_series(db, calendar_id, size - stored)
+            stored = size
+
+            db.query(OccurrenceHorizon).delete()
+            db.commit()
+            expanded_time, expanded = timed(week_view, repeat=args.repeat)
+
+            roll_time, _ = timed(lambda: OccurrenceCtrl.roll_horizon(db, now=BASE_TIME, horizon_days=args.days))
+            table_time, materialized = timed(week_view, repeat=args.repeat)
+            assert len(materialized) == len(expanded)
+
+            print(f"{size:>8} {len(expanded):>12} {expanded_time * 1000:>9.2f} ms {table_time * 1000:>9.2f} ms "
+                  f"{roll_time * 1000:>11.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
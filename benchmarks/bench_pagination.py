@@ -0,0 +1,75 @@
+import argparse
+
+from benchmarks.common import temp_database, make_user, make_calendar, bulk_events, timed
+from src.classes.event import Event
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.events import EventCtrl
+
+"""
+Cost of a page of GET /calendar/events at increasing depths, keyset cursor against OFFSET.
+The keyset page seeks straight to its first row, OFFSET reads and throws away every row before it.
+
+    python -m benchmarks.bench_pagination --events 200000 --calendars 3 --depths 0 1000 10000 100000
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyset against OFFSET pagination as pages get deeper.")
+    parser.add_argument("--events", type=int, default=200000, help="Events per calendar")
+    parser.add_argument("--calendars", type=int, default=3)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 10000, 100000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with temp_database() as (engine, session_factory):
+        db = session_factory()
+        owner = make_user(db)
+        for i in range(args.calendars):
+            calendar = make_calendar(db, owner.user_id, name=f"Calendar {i}")
+            bulk_events(db, calendar.calendar_id, args.events)
+        user_id = owner.user_id
+        db.close()
+
+        db = session_factory()
+        spans = CalendarCtrl.event_spans(user_id, db)
+
+        print(f"{'depth':>8} | {'keyset ms':>9} | {'offset ms':>9}")
+        for depth in args.depths:
+            # The key of the row just before the page, what the cursor of the previous page would hold
+            after = None
+            if depth:
+                after = (
+                    db.query(Event.start_time, Event.event_id)
+                    .filter(Event.calendar_id.in_(spans), Event.deleted.is_(False))
+                    .order_by(Event.start_time, Event.event_id)
+                    .offset(depth - 1)
+                    .first()
+                )
+
+            def keyset():
+                result = EventCtrl.list_in_window(spans, None, None, db, after, args.limit)
+                db.expunge_all()
+                return result
+
+            def offset():
+                result = (
+                    db.query(Event)
+                    .filter(Event.calendar_id.in_(spans), Event.deleted.is_(False))
+                    .order_by(Event.start_time, Event.event_id)
+                    .offset(depth)
+                    .limit(args.limit)
+                    .all()
+                )
+                db.expunge_all()
+                return result
+
+            keyset_time, keyset_rows = timed(keyset, repeat=args.repeat)
+            offset_time, offset_rows = timed(offset, repeat=max(1, args.repeat // 10))
+            assert [e.event_id for e in keyset_rows] == [e.event_id for e in offset_rows]
+            print(f"{depth:>8} | {keyset_time * 1000:>9.2f} | {offset_time * 1000:>9.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import time
+import uuid
+
+from benchmarks.common import temp_database, make_user
+from src.api.polls import list_polls
+from src.classes.poll import Poll
+from src.classes.poll_option import PollOption
+from src.classes.vote import Vote
+from src.core.query_stats import QueryBudget, track_queries
+
+"""
+Shows that GET /polls/ issues the same number of queries however many polls there are.
+
+    python -m benchmarks.bench_poll_listing --sizes 10 50 200 1000
+"""
+
+
+def _seed_polls(db, owner_id: str, count: int, options: int, votes_per_option: int) -> None:
+    polls, poll_options, votes = [], [], []
+    for i in range(count):
+        poll_id = str(uuid.uuid4())
+        polls.append({"poll_id": poll_id, "question": f"Question {i}", "owner_id": owner_id,
+                      "deleted": False, "allow_multi_votes": True, "is_closed": False})
+        for j in range(options):
+            option_id = str(uuid.uuid4())
+            poll_options.append({"option_id": option_id, "poll_id": poll_id, "option_text": f"Option {j}",
+                                 "deleted": False, "vote_count": votes_per_option})
+            votes.extend({"vote_id": str(uuid.uuid4()), "poll_option_id": option_id, "poll_id": poll_id, "user_id": owner_id, "deleted": False}
+                         for _ in range(votes_per_option))
+    db.bulk_insert_mappings(Poll, polls)
+    db.bulk_insert_mappings(PollOption, poll_options)
+    db.bulk_insert_mappings(Vote, votes)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query count and latency of the poll listing as polls grow.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--votes", type=int, default=3, help="Votes per option")
+    args = parser.parse_args()
+
+    print(f"{'polls':>8} | {'queries':>8} | {'db ms':>8} | {'total ms':>8}")
+    for size in args.sizes:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            owner = make_user(db)
+            _seed_polls(db, owner.user_id, size, args.options, args.votes)
+            db.close()
+
+            db = session_factory()
+            started = time.perf_counter()
+            with track_queries(QueryBudget()) as stats:
+                result = list_polls(db=db)
+            elapsed = time.perf_counter() - started
+            db.close()
+            assert len(result) == size
+            print(f"{size:>8} | {stats.count:>8} | {stats.duration * 1000:>8.1f} | {elapsed * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
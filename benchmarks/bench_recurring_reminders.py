@@ -0,0 +1,88 @@
+import argparse
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import BASE_TIME, temp_database, make_user, make_calendar, bulk_events
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.sync_clock import next_sync_version
+from src.controllers.notification_dispatcher import NotificationDispatcher
+from src.controllers.occurrences import OccurrenceCtrl
+from src.core.delivery import MemoryBackend
+from src.core.query_stats import QueryBudget, track_queries
+from src.enums import DeliveryStatus, NotificationTypes, RecurrenceRule
+
+"""
+Daily series spread over the day, each with a 15 minute reminder: a reminder row stored up front for every
+occurrence of the year, against the reminder kept as a rule and generated by the dispatcher as each occurrence
+comes within its horizon, expanding the series or reading the occurrences table. Counted in reminder rows
+stored, and in statements and time of the dispatcher passes over a simulated day, once a minute.
+
+    python -m benchmarks.bench_recurring_reminders --series 100 1000 --days 365 --hours 24
+"""
+
+DAY = timedelta(days=1)
+
+
+def seed(db, series: int, days: int, strategy: str) -> None:
+    owner = make_user(db)
+    calendar = make_calendar(db, owner.user_id)
+    bulk_events(db, calendar.calendar_id, series, spacing=DAY / series, recurrence_rule=RecurrenceRule.DAILY,
+                reminder_minutes=None if strategy == "eager" else 15)
+    if strategy == "eager":
+        version = next_sync_version(db.connection())
+        rows = [
+            {
+                "notification_id": str(uuid.uuid4()),
+                "event_id": event_id,
+                "type": NotificationTypes.ALERT,
+                "message": f"Reminder: {title} is starting soon.",
+                "timestamp": start_time + DAY * day - timedelta(minutes=15),
+                "delivery_status": DeliveryStatus.PENDING,
+                "deleted": False,
+                "sync_version": version,
+            }
+            for event_id, title, start_time in db.query(Event.event_id, Event.title, Event.start_time)
+            for day in range(days)
+        ]
+        for offset in range(0, len(rows), 50000):
+            db.bulk_insert_mappings(Notification, rows[offset:offset + 50000])
+    elif strategy == "stored":
+        OccurrenceCtrl.roll_horizon(db, BASE_TIME)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminders of recurring events stored up front against generated.")
+    parser.add_argument("--series", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--days", type=int, default=365, help="Days of reminders stored up front.")
+    parser.add_argument("--hours", type=float, default=24, help="Hours of dispatcher passes.")
+    args = parser.parse_args()
+
+    print(f"{'series':>6} | {'strategy':>8} | {'rows before':>11} | {'rows after':>10} | {'sent':>6} | "
+          f"{'statements':>10} | {'ms per pass':>11}")
+    for series in args.series:
+        for strategy in ("eager", "expand", "stored"):
+            with temp_database() as (engine, session_factory):
+                db = session_factory()
+                seed(db, series, args.days, strategy)
+                before = db.query(Notification).count()
+                dispatcher = NotificationDispatcher(session_factory, MemoryBackend(), worker_id="bench")
+                passes, sent = 0, 0
+                began = time.perf_counter()
+                with track_queries(QueryBudget()) as stats:
+                    now = BASE_TIME
+                    while now < BASE_TIME + timedelta(hours=args.hours):
+                        sent += dispatcher.run_once(now).sent
+                        passes += 1
+                        now += timedelta(minutes=1)
+                elapsed = time.perf_counter() - began
+                after = db.query(Notification).count()
+                db.close()
+                print(f"{series:>6} | {strategy:>8} | {before:>11} | {after:>10} | {sent:>6} | {stats.count:>10} | "
+                      f"{elapsed / passes * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import BASE_TIME, temp_database, make_user, make_calendar, bulk_events
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.sync_clock import next_sync_version
+from src.controllers.notification_dispatcher import NotificationDispatcher
+from src.core.delivery import MemoryBackend
+from src.core.query_stats import QueryBudget, track_queries
+from src.enums import DeliveryStatus, NotificationTypes
+
+"""
+An hour of reminders trickling in, on a simulated clock: polling the notifications table every few seconds
+against the timing wheel, which sweeps once a minute and otherwise only wakes when a reminder is due. Counted in
+statements run and in how late reminders went out.
+
+    python -m benchmarks.bench_reminder_wheel --reminders 10 100 1000 --poll 5 --sweep 60
+"""
+
+HOUR = timedelta(hours=1)
+
+
+def seed(db, count: int, seed_value: int = 7) -> None:
+    owner = make_user(db)
+    calendar = make_calendar(db, owner.user_id)
+    bulk_events(db, calendar.calendar_id, count)
+    rng = random.Random(seed_value)
+    version = next_sync_version(db.connection())
+    db.bulk_insert_mappings(Notification, [
+        {
+            "notification_id": str(uuid.uuid4()),
+            "event_id": event_id,
+            "type": NotificationTypes.ALERT,
+            "message": f"Reminder {i}",
+            "timestamp": BASE_TIME + timedelta(seconds=rng.uniform(0, HOUR.total_seconds())),
+            "delivery_status": DeliveryStatus.PENDING,
+            "deleted": False,
+            "sync_version": version,
+        }
+        for i, (event_id,) in enumerate(db.query(Event.event_id))
+    ])
+    db.commit()
+
+
+def polling(dispatcher: NotificationDispatcher, poll: float) -> list[datetime]:
+    sent_at = []
+    now = BASE_TIME
+    while now <= BASE_TIME + HOUR:
+        before = len(dispatcher.backend.sent)
+        dispatcher.run_once(now)
+        sent_at += [now] * (len(dispatcher.backend.sent) - before)
+        now += timedelta(seconds=poll)
+    return sent_at
+
+
+def wheel(dispatcher: NotificationDispatcher, sweep: float) -> list[datetime]:
+    sent_at = []
+    now, next_sweep = BASE_TIME, BASE_TIME
+    while now <= BASE_TIME + HOUR:
+        before = len(dispatcher.backend.sent)
+        if now >= next_sweep:
+            dispatcher.sweep(now)
+            next_sweep = now + timedelta(seconds=sweep)
+        else:
+            dispatcher.fire(now)
+        sent_at += [now] * (len(dispatcher.backend.sent) - before)
+        due = dispatcher.next_wakeup()
+        now = min(next_sweep, due.replace(tzinfo=BASE_TIME.tzinfo)) if due is not None else next_sweep
+    return sent_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polling for due reminders against the timing wheel.")
+    parser.add_argument("--reminders", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--poll", type=float, default=5)
+    parser.add_argument("--sweep", type=float, default=60)
+    args = parser.parse_args()
+
+    print(f"{'reminders':>9} | {'strategy':>8} | {'statements':>10} | {'mean late s':>11} | {'max late s':>10}")
+    for count in args.reminders:
+        for name, run, every in (("polling", polling, args.poll), ("wheel", wheel, args.sweep)):
+            with temp_database() as (engine, session_factory):
+                db = session_factory()
+                seed(db, count)
+                db.close()
+                dispatcher = NotificationDispatcher(session_factory, MemoryBackend(), interval=args.sweep,
+                                                    horizon=args.sweep * 15, worker_id="bench")
+                with track_queries(QueryBudget()) as stats:
+                    sent_at = run(dispatcher, every)
+                late = [
+                    (at - delivery.due.replace(tzinfo=BASE_TIME.tzinfo)).total_seconds()
+                    for delivery, at in zip(dispatcher.backend.sent, sent_at)
+                ]
+                assert len(late) == count
+                print(f"{count:>9} | {name:>8} | {stats.count:>10} | {sum(late) / count:>11.2f} | {max(late):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import random
+
+from benchmarks.common import temp_database, make_user, make_calendar, bulk_events, timed
+from src.classes.event import Event
+from src.controllers.events import EventCtrl
+from src.controllers.sync import SyncCtrl
+from src.models.event import Event as EventOut
+from src.models.sync import SyncedEvent
+
+"""
+A client refresh after a few edits as the calendar grows: refetching every event of the calendar (what the
+frontend does on each update) against a delta sync from the previous token, in bytes of JSON and time.
+
+    python -m benchmarks.bench_sync --history 1000 10000 50000 --edits 5
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full refetch against delta sync as a calendar grows.")
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--edits", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'events':>8} | {'refetch KB':>10} | {'refetch ms':>10} | {'delta KB':>8} | {'delta ms':>8}")
+    for history in args.history:
+        with temp_database() as (engine, session_factory):
+            db = session_factory()
+            owner = make_user(db)
+            calendar = make_calendar(db, owner.user_id)
+            bulk_events(db, calendar.calendar_id, history)
+            user_id, spans = owner.user_id, {calendar.calendar_id: calendar.max_event_seconds}
+            token = SyncCtrl.changes(user_id, None, db).token
+            db.expunge_all()
+
+            edited = random.Random(5).sample([event_id for event_id, in db.query(Event.event_id)], args.edits)
+            for event in db.query(Event).filter(Event.event_id.in_(edited)):
+                event.title = f"{event.title} (moved)"
+            db.commit()
+
+            def refetch():
+                body = "[" + ",".join(
+                    EventOut.model_validate(e).model_dump_json() for e in EventCtrl.list_in_window(spans, None, None, db)
+                ) + "]"
+                db.expunge_all()
+                return body
+
+            def delta():
+                changes = SyncCtrl.changes(user_id, token, db)
+                body = "[" + ",".join(SyncedEvent.model_validate(e).model_dump_json() for e in changes.events) + "]"
+                db.expunge_all()
+                return body
+
+            refetch_time, full = timed(refetch, repeat=args.repeat)
+            delta_time, changed = timed(delta, repeat=args.repeat)
+            assert changed.count("(moved)") == args.edits
+            db.close()
+            print(f"{history:>8} | {len(full) / 1024:>10.1f} | {refetch_time * 1000:>10.1f} | "
+                  f"{len(changed) / 1024:>8.2f} | {delta_time * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import temp_database, make_user
+from src.classes.user import User
+from src.controllers.polls import PollCtrl
+from src.controllers.vote_buffer import VoteBuffer
+from src.controllers.votes import VoteCtrl
+
+"""
+Votes per second for a whole class voting on the same single choice poll at once:
+every vote through VoteCtrl.create versus the write-behind VoteBuffer, in both durability modes.
+
+    python -m benchmarks.bench_vote_buffer --voters 2000 --threads 16
+"""
+
+
+def _run(mode: str, voters: int, threads: int, flush_ms: int, max_batch: int) -> tuple[float, int]:
+    with temp_database() as (engine, session_factory):
+        db = session_factory()
+        owner = make_user(db)
+        user_ids = [str(uuid.uuid4()) for _ in range(voters)]
+        db.bulk_insert_mappings(User, [
+            {"user_id": user_id, "name": "Student", "email": f"{user_id}@example.com",
+             "hashed_password": "x" * 60, "deleted": False, "is_seeded": False}
+            for user_id in user_ids
+        ])
+        db.commit()
+        poll = PollCtrl.create(db, "Which day works?", owner.user_id, ["Monday", "Tuesday", "Wednesday", "Thursday"])
+        option_ids = [o.option_id for o in poll.options]
+        db.close()
+
+        buffer = None
+        if mode != "direct":
+            buffer = VoteBuffer(session_factory, flush_interval=flush_ms / 1000, max_batch=max_batch,
+                                durable=mode == "buffered-durable")
+            buffer.start()
+
+        def vote(i: int):
+            option_id = option_ids[i % len(option_ids)]
+            if buffer is not None:
+                buffer.submit(option_id, user_ids[i])
+                return
+            session = session_factory()
+            try:
+                VoteCtrl.create(session, option_id, user_ids[i])
+            finally:
+                session.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(vote, range(voters)))
+        acknowledged = time.perf_counter() - started
+        if buffer is not None:
+            buffer.close()
+
+        db = session_factory()
+        stored = sum(o.vote_count for o in PollCtrl.load(poll.poll_id, db).options)
+        db.close()
+        return voters / acknowledged, stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark direct votes against the write-behind vote buffer.")
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    parser.add_argument("--max-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'mode':>18} | {'votes/s':>10} | {'stored':>8}")
+    for mode in ("direct", "buffered", "buffered-durable"):
+        rate, stored = _run(mode, args.voters, args.threads, args.flush_ms, args.max_batch)
+        print(f"{mode:>18} | {rate:>10.0f} | {stored:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import all SQLAlchemy models here to ensure they are registered with the Base
+from src.classes import (  # noqa: E402, F401
+    user, availability, calendar, day_count, event, friend, notification, occurrence, poll, poll_option,
+    seed_log, settings, study_session, study_session_member, sync_clock, task, vote
+)
+from src.base_class import Base  # noqa: E402
+from src.classes.calendar import Calendar  # noqa: E402
+from src.classes.event import Event, bump_busy_version, widen_event_span  # noqa: E402
+from src.classes.sync_clock import next_sync_version  # noqa: E402
+from src.classes.user import User  # noqa: E402
+from src.database import build_engine, TUNED_PROFILE, EngineProfile  # noqa: E402
+
+"""
+Shared helpers for the scripts in benchmarks/. Every benchmark runs against a throw-away SQLite
+file so the numbers are not polluted by whatever is in the development database
+"""
+
+BASE_TIME = datetime(2025, 1, 6, 8, 0, tzinfo=timezone.utc)
+
+
+@contextmanager
+def temp_database(profile: EngineProfile = TUNED_PROFILE):
+    """
+    Yields (engine, session factory) bound to a fresh database file, removed on exit
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile)
+        Base.metadata.create_all(engine)
+        try:
+            yield engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        finally:
+            engine.dispose()
+
+
+def make_user(db, name: str = "Bench User") -> User:
+    # Skips UserCtrl.create on purpose, bcrypt would dominate the setup time
+    new_user = User(name=name, email=f"bench-{uuid.uuid4()}@example.com", hashed_password="x" * 60, timezone="UTC")
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+
+def make_calendar(db, user_id: str, name: str = "Bench Calendar") -> Calendar:
+    new_calendar = Calendar(name=name, user_id=user_id, visibility="private")
+    db.add(new_calendar)
+    db.commit()
+    db.refresh(new_calendar)
+    return new_calendar
+
+
+def bulk_events(db, calendar_id: str, count: int, spacing: timedelta = timedelta(hours=3),
+                start: datetime = BASE_TIME, recurrence_rule: int = 0, reminder_minutes: int | None = None) -> None:
+    """
+    Insert count one hour events spaced by spacing, using a single executemany
+    """
+    version = next_sync_version(db.connection())
+    db.bulk_insert_mappings(Event, [
+        {
+            "event_id": str(uuid.uuid4()),
+            "title": f"Event {i}",
+            "start_time": start + spacing * i,
+            "end_time": start + spacing * i + timedelta(hours=1),
+            "calendar_id": calendar_id,
+            "deleted": False,
+            "recurrence_rule": recurrence_rule,
+            "reminder_minutes": reminder_minutes,
+            "is_seeded": False,
+            "sync_version": version,
+        }
+        for i in range(count)
+    ])
+    # Bulk inserts skip the mapper events that stamp the sync version and keep the calendar's longest event, busy
+    # version and day counts up to date, the day counts are simply rebuilt on their next read
+    widen_event_span(db.connection(), calendar_id, 3600)
+    bump_busy_version(db.connection(), {calendar_id})
+    db.execute(update(Calendar).where(Calendar.calendar_id == calendar_id).values(day_counts_timezone=None))
+    db.commit()
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs) -> tuple[float, object]:
+    """
+    Run fn repeat times and return (mean seconds per call, last result)
+    """
+    result = None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args, **kwargs)
+    return (time.perf_counter() - started) / repeat, result
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
@@ -0,0 +1,66 @@
+import argparse
+import logging
+import signal
+import threading
+
+from sqlalchemy.orm import sessionmaker
+
+# Import all classes that have relationships to ensure SQLAlchemy can resolve them
+from src.classes import (
+    user, availability, calendar, day_count, event, friend, notification, occurrence, poll, poll_option,
+    seed_log, settings, study_session, study_session_member, sync_clock, task, vote
+)
+from src.controllers.notification_dispatcher import NotificationDispatcher
+from src.core.config import (
+    NOTIFICATION_BACKEND, NOTIFICATION_BATCH_SIZE, NOTIFICATION_CLAIM_SECONDS, NOTIFICATION_DIGEST_SECONDS,
+    NOTIFICATION_HORIZON_SECONDS, NOTIFICATION_MAX_ATTEMPTS, NOTIFICATION_POLL_SECONDS, NOTIFICATION_RETRY_MAX_SECONDS,
+    NOTIFICATION_RETRY_SECONDS,
+)
+from src.core.delivery import backend_from_name
+from src.database import engine
+from migrate import ensure_notification_dispatch, ensure_notification_retries, ensure_reminder_rules
+
+
+def dispatch(backend: str, batch_size: int, interval: float, claim_seconds: float, horizon: float,
+             digest_seconds: float, once: bool = False):
+    """
+    Sends due notifications from a process of its own, for deployments not running the dispatcher inside the
+    server (NOTIFICATION_DISPATCHER_ENABLED). Any number of these can run at the same time.
+    """
+    ensure_notification_dispatch()
+    ensure_notification_retries()
+    ensure_reminder_rules()
+    dispatcher = NotificationDispatcher(
+        sessionmaker(bind=engine), backend_from_name(backend),
+        batch_size=batch_size, interval=interval, claim_seconds=claim_seconds, horizon=horizon,
+        max_attempts=NOTIFICATION_MAX_ATTEMPTS, retry_seconds=NOTIFICATION_RETRY_SECONDS,
+        retry_max_seconds=NOTIFICATION_RETRY_MAX_SECONDS, digest_seconds=digest_seconds,
+    )
+    if once:
+        result = dispatcher.run_once()
+        print(f"Sent {result.sent}, retrying {result.retried}, dead lettered {result.dead_lettered}, "
+              f"cancelled {result.cancelled} notification(s).")
+        return
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+    dispatcher.start()
+    stopping.wait()
+    dispatcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send due notifications.")
+    parser.add_argument("--backend", default=NOTIFICATION_BACKEND, help='"log", "memory" or "module:Class".')
+    parser.add_argument("--batch", type=int, default=NOTIFICATION_BATCH_SIZE, help="Notifications claimed at a time.")
+    parser.add_argument("--interval", type=float, default=NOTIFICATION_POLL_SECONDS, help="Seconds between sweeps.")
+    parser.add_argument("--claim", type=float, default=NOTIFICATION_CLAIM_SECONDS, help="Seconds a claim lasts.")
+    parser.add_argument("--horizon", type=float, default=NOTIFICATION_HORIZON_SECONDS,
+                        help="Seconds ahead each sweep loads into the timing wheel.")
+    parser.add_argument("--digest", type=float, default=NOTIFICATION_DIGEST_SECONDS,
+                        help="Seconds ahead a user's notifications are folded into one digest, 0 for none.")
+    parser.add_argument("--once", action="store_true", help="Send what is due now and exit.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    dispatch(args.backend, args.batch, args.interval, args.claim, args.horizon, args.digest, args.once)
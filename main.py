@@ -1,16 +1,84 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from src.api.api_router import api_router
+from src.core.config import (
+    VOTE_BUFFER_ENABLED,
+    VOTE_BUFFER_FLUSH_MS,
+    VOTE_BUFFER_MAX_BATCH,
+    VOTE_BUFFER_DURABLE,
+    VOTE_BUFFER_STATE_TTL,
+    OCCURRENCE_JOB_ENABLED,
+    OCCURRENCE_HORIZON_DAYS,
+    OCCURRENCE_RETENTION_DAYS,
+    OCCURRENCE_REFRESH_MINUTES,
+    NOTIFICATION_DISPATCHER_ENABLED,
+    NOTIFICATION_BACKEND,
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_POLL_SECONDS,
+    NOTIFICATION_CLAIM_SECONDS,
+    NOTIFICATION_HORIZON_SECONDS,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_RETRY_SECONDS,
+    NOTIFICATION_RETRY_MAX_SECONDS,
+    NOTIFICATION_DIGEST_SECONDS,
+)
+from src.core.query_stats import QueryStatsMiddleware
+from src.controllers.vote_buffer import VoteBuffer, start_vote_buffer, stop_vote_buffer
+from src.controllers.occurrence_job import OccurrenceJob, start_occurrence_job, stop_occurrence_job
+from src.controllers.notification_dispatcher import (
+    NotificationDispatcher, start_notification_dispatcher, stop_notification_dispatcher
+)
+from src.core.delivery import backend_from_name
+from src.database import SessionLocal
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 # Import all SQLAlchemy models here to ensure they are registered with the Base
 from src.classes import (
-    user, calendar, event, friend, notification, poll, poll_option, 
-    seed_log, settings, study_session, study_session_member, task, vote
+    user, availability, calendar, day_count, event, friend, notification, occurrence, poll, poll_option, 
+    seed_log, settings, study_session, study_session_member, sync_clock, task, vote
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if VOTE_BUFFER_ENABLED:
+        start_vote_buffer(VoteBuffer(
+            SessionLocal,
+            flush_interval=VOTE_BUFFER_FLUSH_MS / 1000,
+            max_batch=VOTE_BUFFER_MAX_BATCH,
+            durable=VOTE_BUFFER_DURABLE,
+            state_ttl=VOTE_BUFFER_STATE_TTL,
+        ))
+    if OCCURRENCE_JOB_ENABLED:
+        start_occurrence_job(OccurrenceJob(
+            SessionLocal,
+            interval=OCCURRENCE_REFRESH_MINUTES * 60,
+            horizon_days=OCCURRENCE_HORIZON_DAYS,
+            retention_days=OCCURRENCE_RETENTION_DAYS,
+        ))
+    if NOTIFICATION_DISPATCHER_ENABLED:
+        start_notification_dispatcher(NotificationDispatcher(
+            SessionLocal,
+            backend_from_name(NOTIFICATION_BACKEND),
+            batch_size=NOTIFICATION_BATCH_SIZE,
+            interval=NOTIFICATION_POLL_SECONDS,
+            claim_seconds=NOTIFICATION_CLAIM_SECONDS,
+            horizon=NOTIFICATION_HORIZON_SECONDS,
+            max_attempts=NOTIFICATION_MAX_ATTEMPTS,
+            retry_seconds=NOTIFICATION_RETRY_SECONDS,
+            retry_max_seconds=NOTIFICATION_RETRY_MAX_SECONDS,
+            digest_seconds=NOTIFICATION_DIGEST_SECONDS,
+        ))
+    yield
+    # Writes out whatever votes are still buffered before the process goes away
+    stop_vote_buffer()
+    stop_occurrence_job()
+    stop_notification_dispatcher()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Get the frontend origin from an environment variable
 # Default to http://localhost:3000 for local development
@@ -34,6 +102,9 @@ async def generic_exception_handler(request: Request, exc: Exception):
         content={"detail": f"An unexpected error occurred: {exc}"},
     )
 
+# Counts the queries issued by each request and reports them in the Server-Timing header
+app.add_middleware(QueryStatsMiddleware)
+
 app.add_middleware(
     # CORS is needed since the backend and frontend may be in different servers and therefore have different
     # URLS. If the URLs are not in CORS and they differ, the browser is likely going to block that request
@@ -43,6 +114,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Query-Count", "X-DB-Repeated-Queries", "X-Next-Cursor"],
 )
 
 app.include_router(api_router)
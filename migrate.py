@@ -0,0 +1,196 @@
+import argparse
+from sqlalchemy import inspect, text
+
+# Import all classes that have relationships to ensure SQLAlchemy can resolve them
+from src.classes import (
+    user, availability, calendar, day_count, event, friend, notification, occurrence, poll, poll_option,
+    seed_log, settings, study_session, study_session_member, sync_clock, task, vote
+)
+from src.classes.availability import AvailabilityHeatmap
+from src.classes.calendar import Calendar
+from src.classes.day_count import EventDayCount
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.occurrence import Occurrence, OccurrenceHorizon
+from src.classes.poll import Poll
+from src.classes.sync_clock import SyncClock
+from src.database import engine
+from reconcile_votes import ensure_vote_columns
+
+"""
+Brings a database created by an older version of the app up to the current schema. New databases get
+everything from Base.metadata.create_all, this only adds what create_all can't add to existing tables.
+Every step checks before it changes anything, running the script twice is harmless.
+
+    python migrate.py
+"""
+
+
+def _create_indexes(connection, table) -> None:
+    # The missing indexes of a table over columns it has by now, the steps adding the other columns create the rest
+    columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for index in table.indexes:
+        if {column.name for column in index.columns} <= columns:
+            index.create(connection, checkfirst=True)
+
+
+def ensure_event_window():
+    """
+    Time window listings need calendars.max_event_seconds (backfilled from the events already stored)
+    and the timeline indexes on events
+    """
+    calendar_columns = {column["name"] for column in inspect(engine).get_columns("calendars")}
+    with engine.begin() as connection:
+        if "max_event_seconds" not in calendar_columns:
+            print("Adding calendars.max_event_seconds...")
+            connection.execute(text("ALTER TABLE calendars ADD COLUMN max_event_seconds INTEGER NOT NULL DEFAULT 0"))
+            connection.execute(text(
+                "UPDATE calendars SET max_event_seconds = COALESCE(("
+                "SELECT CAST(MAX(julianday(end_time) - julianday(start_time)) * 86400 AS INTEGER) + 1 "
+                "FROM events WHERE events.calendar_id = calendars.calendar_id), 0)"
+            ))
+        # Superseded by ix_events_calendar_timeline, which adds event_id for cursor pagination
+        connection.execute(text("DROP INDEX IF EXISTS ix_events_calendar_window"))
+        # The first version of ix_events_recurring also held deleted, rebuild it without
+        recurring = [i for i in inspect(connection).get_indexes("events") if i["name"] == "ix_events_recurring"]
+        if recurring and "deleted" in recurring[0]["column_names"]:
+            connection.execute(text("DROP INDEX ix_events_recurring"))
+        _create_indexes(connection, Event.__table__)
+
+
+def ensure_occurrence_tables():
+    """
+    Materialized occurrences of recurring events. The tables start empty, the occurrence job (or
+    roll_occurrences.py) fills them
+    """
+    for table in (Occurrence.__table__, OccurrenceHorizon.__table__):
+        table.create(engine, checkfirst=True)
+
+
+def ensure_availability_cache():
+    """
+    Availability heatmaps are cached by calendars.busy_version. Existing calendars start at 0 like new ones,
+    the cache table starts empty
+    """
+    calendar_columns = {column["name"] for column in inspect(engine).get_columns("calendars")}
+    with engine.begin() as connection:
+        if "busy_version" not in calendar_columns:
+            print("Adding calendars.busy_version...")
+            connection.execute(text("ALTER TABLE calendars ADD COLUMN busy_version INTEGER NOT NULL DEFAULT 0"))
+    AvailabilityHeatmap.__table__.create(engine, checkfirst=True)
+
+
+def ensure_day_counts():
+    """
+    Per-day event counts are built the first time a calendar's month is asked for, existing calendars start
+    without a time zone so that happens on their first read
+    """
+    calendar_columns = {column["name"] for column in inspect(engine).get_columns("calendars")}
+    with engine.begin() as connection:
+        if "day_counts_timezone" not in calendar_columns:
+            print("Adding calendars.day_counts_timezone...")
+            connection.execute(text("ALTER TABLE calendars ADD COLUMN day_counts_timezone VARCHAR"))
+    EventDayCount.__table__.create(engine, checkfirst=True)
+
+
+def ensure_sync_versions():
+    """
+    Delta sync stamps calendars, events and notifications with the sync_version of their last change. Existing
+    rows start at 0, which a client only gets from a full sync
+    """
+    SyncClock.__table__.create(engine, checkfirst=True)
+    for table in (Calendar.__table__, Event.__table__, Notification.__table__):
+        columns = {column["name"] for column in inspect(engine).get_columns(table.name)}
+        with engine.begin() as connection:
+            if "updated_at" not in columns:
+                print(f"Adding {table.name}.updated_at...")
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN updated_at TIMESTAMP"))
+            if "sync_version" not in columns:
+                print(f"Adding {table.name}.sync_version...")
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN sync_version INTEGER NOT NULL DEFAULT 0"))
+            _create_indexes(connection, table)
+
+
+def ensure_notification_dispatch():
+    """
+    The notification dispatcher claims notifications (claimed_by, claimed_until, the SENDING status) through
+    ix_notifications_due
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("notifications")}
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.execute(text("ALTER TYPE deliverystatus ADD VALUE IF NOT EXISTS 'SENDING'"))
+        if "claimed_by" not in columns:
+            print("Adding notifications.claimed_by...")
+            connection.execute(text("ALTER TABLE notifications ADD COLUMN claimed_by VARCHAR"))
+        if "claimed_until" not in columns:
+            print("Adding notifications.claimed_until...")
+            connection.execute(text("ALTER TABLE notifications ADD COLUMN claimed_until TIMESTAMP"))
+        _create_indexes(connection, Notification.__table__)
+
+
+def ensure_notification_retries():
+    """
+    Failed deliveries are retried (attempts, next_attempt_at, the RETRYING status, ix_notifications_retry) and
+    dead lettered (the DEAD_LETTER status)
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("notifications")}
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            for status in ("RETRYING", "DEAD_LETTER"):
+                connection.execute(text(f"ALTER TYPE deliverystatus ADD VALUE IF NOT EXISTS '{status}'"))
+        if "attempts" not in columns:
+            print("Adding notifications.attempts...")
+            connection.execute(text("ALTER TABLE notifications ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"))
+        if "next_attempt_at" not in columns:
+            print("Adding notifications.next_attempt_at...")
+            connection.execute(text("ALTER TABLE notifications ADD COLUMN next_attempt_at TIMESTAMP"))
+        _create_indexes(connection, Notification.__table__)
+
+
+def ensure_reminder_rules():
+    """
+    Recurring events keep their reminder as a rule (events.reminder_minutes) and the dispatcher generates one
+    notification per upcoming occurrence (notifications.occurrence_start, ix_notifications_occurrence). Existing
+    events start without a rule and keep the reminder rows they have
+    """
+    event_columns = {column["name"] for column in inspect(engine).get_columns("events")}
+    notification_columns = {column["name"] for column in inspect(engine).get_columns("notifications")}
+    with engine.begin() as connection:
+        if "reminder_minutes" not in event_columns:
+            print("Adding events.reminder_minutes...")
+            connection.execute(text("ALTER TABLE events ADD COLUMN reminder_minutes INTEGER"))
+        if "occurrence_start" not in notification_columns:
+            print("Adding notifications.occurrence_start...")
+            connection.execute(text("ALTER TABLE notifications ADD COLUMN occurrence_start TIMESTAMP"))
+        _create_indexes(connection, Notification.__table__)
+
+
+def ensure_poll_timeline():
+    """
+    GET /polls/ pages through polls by (created_at, poll_id) over ix_polls_timeline. Existing polls get the time of
+    the migration, so they come first and keep their poll_id order among themselves
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("polls")}
+    with engine.begin() as connection:
+        if "created_at" not in columns:
+            print("Adding polls.created_at...")
+            connection.execute(text("ALTER TABLE polls ADD COLUMN created_at TIMESTAMP"))
+            connection.execute(text("UPDATE polls SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"))
+        _create_indexes(connection, Poll.__table__)
+
+
+STEPS = [
+    ensure_vote_columns, ensure_event_window, ensure_occurrence_tables, ensure_availability_cache, ensure_day_counts,
+    ensure_sync_versions, ensure_notification_dispatch, ensure_notification_retries, ensure_reminder_rules,
+    ensure_poll_timeline,
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade an existing database to the current schema.")
+    parser.parse_args()
+
+    for step in STEPS:
+        step()
+    print("Database schema is up to date.")
@@ -0,0 +1,43 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import sessionmaker
+
+# Import all classes that have relationships to ensure SQLAlchemy can resolve them
+from src.classes import (
+    user, availability, calendar, day_count, event, friend, notification, occurrence, poll, poll_option,
+    seed_log, settings, study_session, study_session_member, sync_clock, task, vote
+)
+from src.controllers.availability import AvailabilityCtrl, week_of
+from src.controllers.study_sessions import StudySessionCtrl
+from src.core.config import AVAILABILITY_WORKERS
+from src.database import engine
+from migrate import ensure_availability_cache
+
+
+def precompute(weeks: int, workers: int):
+    """
+    Fills the availability heatmap cache of every study session for the current week and the next ones,
+    meant to run from cron ahead of the requests. Heatmaps of weeks already over are dropped.
+    """
+    ensure_availability_cache()
+    session = sessionmaker(bind=engine)()
+    try:
+        groups = list(StudySessionCtrl.all_member_ids(session).values())
+        this_week = week_of(datetime.now(timezone.utc))
+        pruned = AvailabilityCtrl.prune(this_week, session)
+        computed = sum(
+            AvailabilityCtrl.precompute(groups, this_week + timedelta(weeks=week), session, workers)
+            for week in range(weeks)
+        )
+    finally:
+        session.close()
+    print(f"Computed {computed} heatmap(s) for {len(groups)} study session(s), dropped {pruned} old one(s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the weekly availability heatmaps of study sessions.")
+    parser.add_argument("--weeks", type=int, default=2, help="Weeks to compute, starting with the current one.")
+    parser.add_argument("--workers", type=int, default=AVAILABILITY_WORKERS, help="Worker processes, 0 for one per CPU.")
+    args = parser.parse_args()
+
+    precompute(args.weeks, args.workers)
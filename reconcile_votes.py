@@ -0,0 +1,66 @@
+import argparse
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import sessionmaker
+
+# Import all classes that have relationships to ensure SQLAlchemy can resolve them
+from src.classes import (
+    user, availability, calendar, day_count, event, friend, notification, occurrence, poll, poll_option,
+    seed_log, settings, study_session, study_session_member, sync_clock, task, vote
+)
+from src.classes.vote import Vote
+from src.controllers.polls import PollCtrl
+from src.database import engine
+
+
+def ensure_vote_columns():
+    """
+    Databases created before the vote counters and the single choice index existed need the columns
+    added (and backfilled) before they can be repaired
+    """
+    option_columns = {column["name"] for column in inspect(engine).get_columns("poll_options")}
+    vote_columns = {column["name"] for column in inspect(engine).get_columns("votes")}
+    with engine.begin() as connection:
+        if "vote_count" not in option_columns:
+            print("Adding poll_options.vote_count...")
+            connection.execute(text("ALTER TABLE poll_options ADD COLUMN vote_count INTEGER NOT NULL DEFAULT 0"))
+        if "poll_id" not in vote_columns:
+            print("Adding votes.poll_id...")
+            connection.execute(text("ALTER TABLE votes ADD COLUMN poll_id VARCHAR REFERENCES polls(poll_id)"))
+            connection.execute(text(
+                "UPDATE votes SET poll_id = "
+                "(SELECT poll_id FROM poll_options WHERE poll_options.option_id = votes.poll_option_id)"
+            ))
+        if "single_choice" not in vote_columns:
+            print("Adding votes.single_choice...")
+            connection.execute(text("ALTER TABLE votes ADD COLUMN single_choice BOOLEAN NOT NULL DEFAULT 0"))
+            # Double votes that slipped in before the unique index existed still count, but only the
+            # earliest one per user is flagged so the index can be built
+            connection.execute(text(
+                "UPDATE votes SET single_choice = 1 WHERE rowid IN ("
+                "SELECT MIN(votes.rowid) FROM votes JOIN polls ON polls.poll_id = votes.poll_id "
+                "WHERE polls.allow_multi_votes = 0 AND votes.deleted = 0 "
+                "GROUP BY votes.poll_id, votes.user_id)"
+            ))
+        for index in Vote.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def reconcile(poll_ids: list[str] | None = None):
+    """
+    Rebuilds the per-option vote counters from the votes table.
+    """
+    ensure_vote_columns()
+    session = sessionmaker(bind=engine)()
+    try:
+        repaired = PollCtrl.reconcile_vote_counts(session, poll_ids)
+    finally:
+        session.close()
+    print(f"Repaired the vote counter of {repaired} poll option(s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute poll option vote counters from the votes table.")
+    parser.add_argument("--poll", action="append", dest="poll_ids", help="Only repair this poll, can be repeated.")
+    args = parser.parse_args()
+
+    reconcile(poll_ids=args.poll_ids)
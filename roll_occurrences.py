@@ -0,0 +1,41 @@
+import argparse
+from sqlalchemy.orm import sessionmaker
+
+# Import all classes that have relationships to ensure SQLAlchemy can resolve them
+from src.classes import (
+    user, availability, calendar, day_count, event, friend, notification, occurrence, poll, poll_option,
+    seed_log, settings, study_session, study_session_member, sync_clock, task, vote
+)
+from src.controllers.occurrences import OccurrenceCtrl
+from src.core.config import OCCURRENCE_HORIZON_DAYS, OCCURRENCE_RETENTION_DAYS
+from src.database import engine
+from migrate import ensure_occurrence_tables
+
+
+def roll(horizon_days: int, retention_days: int, rebuild: bool = False):
+    """
+    Rolls the event_occurrences horizon forward, for deployments running it from cron instead of the
+    in-process job (OCCURRENCE_JOB_ENABLED).
+    """
+    ensure_occurrence_tables()
+    session = sessionmaker(bind=engine)()
+    try:
+        if rebuild:
+            horizon = OccurrenceCtrl.load_horizon(session)
+            if horizon is not None:
+                session.delete(horizon)
+                session.flush()
+        inserted = OccurrenceCtrl.roll_horizon(session, horizon_days=horizon_days, retention_days=retention_days)
+    finally:
+        session.close()
+    print(f"Stored {inserted} new occurrence(s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize the occurrences of recurring events ahead of time.")
+    parser.add_argument("--days", type=int, default=OCCURRENCE_HORIZON_DAYS, help="How many days ahead to keep.")
+    parser.add_argument("--retention", type=int, default=OCCURRENCE_RETENTION_DAYS, help="How many days back to keep.")
+    parser.add_argument("--rebuild", action="store_true", help="Throw the table away and expand every series again.")
+    args = parser.parse_args()
+
+    roll(args.days, args.retention, args.rebuild)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from src.api import authorization, calendar, settings, polls
+from src.api import authorization, calendar, dashboard, settings, polls, schedules, sessions
 
 """
 Container for all routing capabilities of the backend's API.
@@ -12,3 +12,6 @@ api_router.include_router(authorization.router, prefix="/auth", tags=["auth"])
 api_router.include_router(calendar.router, prefix="/calendar", tags=["calendar"])
 api_router.include_router(settings.router, prefix="/settings", tags=["settings"])
 api_router.include_router(polls.router, prefix="/polls", tags=["polls"])
+api_router.include_router(schedules.router, prefix="/schedules", tags=["schedules"])
+api_router.include_router(sessions.router, prefix="/sessions", tags=["sessions"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from src.models.user import User, UserCreate, Token
-from src.database import get_db
+from src.database import get_db, get_async_db
 from src.classes.user import User as DBUser
 from src.controllers.users import UserCtrl
 from src.core.security import verify_password, create_access_token
@@ -21,7 +23,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 def get_user(db: Session, email: str):
     return db.query(DBUser).filter(DBUser.email == email).first()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -34,7 +36,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user(db, email=email)
+    user = await UserCtrl.load_by_email_async(email, db)
     if user is None:
         raise credentials_exception
     return user
@@ -48,9 +50,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     return UserCtrl.create(db=db, name=user.name, email=user.email, password=user.password, timezone=user.timezone)
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = get_user(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await UserCtrl.load_by_email_async(form_data.username, db)
+    # bcrypt is deliberately slow, keep it off the event loop
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
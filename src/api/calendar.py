@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import or_
+from datetime import date, datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from src.models.event import Event, EventCreate, EventUpdate
+from typing import List, Optional
+from src.models.event import DayCount, DayCounts, Event, EventCreate, EventUpdate, EventConflict, EventLayout, EventWithConflicts
 from src.models.notification import Notification, NotificationCreate
 from src.models.calendar import Calendar
-from src.database import get_db
+from src.models.sync import SyncChanges, SyncedEvent
+from src.database import get_db, get_async_db
 from src.classes.event import Event as DBEvent
-from src.classes.notification import Notification as DBNotification
 from src.classes.calendar import Calendar as DBCalendar
 from src.classes.user import User as DBUser
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.day_counts import DayCountCtrl
+from src.controllers.events import EventCtrl, EventOccurrence
+from src.controllers.notifications import NotificationCtrl
+from src.controllers.sync import SyncCtrl
 from src.api.authorization import get_current_user
+from src.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, split_page
+from src.constants import DEFAULT_PAGE_SIZE, PAGE_SIZE
 
 router = APIRouter()
 
@@ -21,106 +29,211 @@ def get_user_calendars(db: Session = Depends(get_db), current_user: DBUser = Dep
     """
     return db.query(DBCalendar).filter(DBCalendar.user_id == current_user.user_id).all()
 
-@router.post("/{calendar_id}/events", response_model=Event)
-async def create_event(calendar_id: str, event: EventCreate, db: Session = Depends(get_db), current_user: DBUser = Depends(get_current_user)):
+@router.get("/sync", response_model=SyncChanges)
+def sync_calendars(
+        token: Optional[str] = None,
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    The calendars, events and notifications of the current user created, changed or soft deleted since the sync
+    token of a previous call. Without a token every live row is returned. Either way the response carries the
+    token for the next call, so a client in sync only downloads what changed.
+    """
+    changes = SyncCtrl.changes(current_user.user_id, token, db)
+    return SyncChanges(
+        token=changes.token,
+        calendars=[Calendar.model_validate(calendar) for calendar in changes.calendars],
+        events=[SyncedEvent.model_validate(event) for event in changes.events],
+        notifications=[Notification.model_validate(notification) for notification in changes.notifications],
+    )
+
+@router.post("/{calendar_id}/events", response_model=EventWithConflicts)
+async def create_event(calendar_id: str, event: EventCreate, db: AsyncSession = Depends(get_async_db), current_user: DBUser = Depends(get_current_user)):
+    """
+    Create an event. The response lists the other events of the user's calendars it overlaps, the event is
+    created either way.
+    """
     # Verify the calendar belongs to the current user
-    calendar = db.query(DBCalendar).filter(DBCalendar.calendar_id == calendar_id, DBCalendar.user_id == current_user.user_id).first()
+    calendar = await CalendarCtrl.load_owned_async(calendar_id, current_user.user_id, db)
     if not calendar:
         raise HTTPException(status_code=404, detail="Calendar not found or you do not have permission to create events in it.")
 
-    db_event = DBEvent(**event.model_dump(), calendar_id=calendar_id)
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
-    return db_event
+    db_event = await EventCtrl.create_async(
+        db,
+        title=event.title,
+        start_time=event.start_time,
+        end_time=event.end_time,
+        location=event.location,
+        calendar_id=calendar_id,
+        recurrence_rule=event.recurrence_rule,
+    )
+    return _with_conflicts(db_event, await EventCtrl.conflicts_async(db_event, current_user.user_id, db))
 
 @router.get("/{calendar_id}/events", response_model=List[Event])
-def get_calendar_events(calendar_id: str, db: Session = Depends(get_db), current_user: DBUser = Depends(get_current_user)):
+def get_calendar_events(
+        calendar_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
     """
-    Retrieve all events for a specific calendar owned by the currently authenticated user.
+    Retrieve the events of a calendar owned by the currently authenticated user, ordered by start time.
+    With start and/or end only the events overlapping that window are returned, with both recurring
+    events are expanded into their occurrences in the window.
     """
     # First, verify the calendar belongs to the current user
-    calendar = db.query(DBCalendar).filter(DBCalendar.calendar_id == calendar_id, DBCalendar.user_id == current_user.user_id).first()
+    calendar = CalendarCtrl.load_owned(calendar_id, current_user.user_id, db)
     if not calendar:
         raise HTTPException(status_code=404, detail="Calendar not found or you do not have permission to view it.")
-    
-    return db.query(DBEvent).filter(DBEvent.calendar_id == calendar_id).all()
+
+    spans = {calendar.calendar_id: calendar.max_event_seconds}
+    if start is not None and end is not None:
+        return EventCtrl.list_occurrences(spans, start, end, db)
+    return EventCtrl.list_in_window(spans, start, end, db)
 
 #dev testinggggggggggg
 @router.get("/events", response_model=List[Event])
-def get_user_events(db: Session = Depends(get_db), current_user: DBUser = Depends(get_current_user)):
+def get_user_events(
+        response: Response,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=PAGE_SIZE[0], le=PAGE_SIZE[1]),
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
     """
-    Retrieve all events across all calendars owned by the currently authenticated user.
+    Retrieve one page of the events across all calendars owned by the currently authenticated user, ordered
+    by start time. With start and/or end only the events overlapping that window are returned, with both
+    recurring events are expanded into their occurrences in the window.
+    When there are more, the X-Next-Cursor header holds the cursor of the next page.
     """
-    return (
-        db
-        .query(DBEvent)
-        .join(DBCalendar)
-        .filter(DBCalendar.user_id == current_user.user_id, DBEvent.deleted == False)
-        .all()
-    )
+    after = _event_cursor(cursor)
+    spans = CalendarCtrl.event_spans(current_user.user_id, db)
+    if start is not None and end is not None:
+        found = EventCtrl.list_occurrences(spans, start, end, db, after, limit + 1)
+    else:
+        found = EventCtrl.list_in_window(spans, start, end, db, after, limit + 1)
+    events, next_cursor = split_page(found, limit, _event_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return events
 
 
 @router.get("/events/public", response_model=List[Event])
-def get_public_events(db: Session = Depends(get_db)):
+def get_public_events(
+        response: Response,
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=PAGE_SIZE[0], le=PAGE_SIZE[1]),
+        db: Session = Depends(get_db)):
     """
-    Retrieve events from public/shared calendars for unauthenticated access (dev/testing).
+    Retrieve events from public/shared calendars for unauthenticated access (dev/testing), one page at a time.
     """
-    return (
-        db
-        .query(DBEvent)
-        .join(DBCalendar)
-        .filter(or_(DBCalendar.visibility == 'public', DBCalendar.shared == True), DBEvent.deleted == False, DBCalendar.deleted == False)
-        .all()
-    )
+    events, next_cursor = split_page(EventCtrl.list_public(db, _event_cursor(cursor), limit + 1), limit, _event_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return events
+
+
+def _event_cursor(cursor: Optional[str]) -> Optional[tuple[datetime, str]]:
+    return decode_cursor(cursor, datetime.fromisoformat, str) if cursor else None
+
+
+def _event_key(event: DBEvent | EventOccurrence) -> tuple[datetime, str]:
+    return event.start_time, event.event_id
+
+@router.get("/events/layout", response_model=List[EventLayout])
+def get_user_events_layout(
+        start: datetime,
+        end: datetime,
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    The events of every calendar of the current user between start and end, recurring ones expanded, each
+    with its lane (column) and the number of lanes of its group of overlapping events, for a day or week view.
+    """
+    return _laid_out(EventCtrl.list_laid_out(CalendarCtrl.event_spans(current_user.user_id, db), start, end, db))
+
+
+@router.get("/events/day-counts", response_model=DayCounts)
+def get_user_event_day_counts(
+        start: date,
+        end: date,
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    How many events of the current user's calendars start on each day from start to end (both included), days
+    being those of the user's time zone. Recurring events count once per occurrence. Meant for month views, which
+    only need a badge per day.
+    """
+    zone_name, counts = DayCountCtrl.count(current_user, start, end, db)
+    return DayCounts(timezone=zone_name, days=[DayCount(day=day, count=count) for day, count in counts.items()])
+
+
+@router.get("/{calendar_id}/events/layout", response_model=List[EventLayout])
+def get_calendar_events_layout(
+        calendar_id: str,
+        start: datetime,
+        end: datetime,
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    Like GET /calendar/events/layout for a single calendar owned by the current user.
+    """
+    calendar = CalendarCtrl.load_owned(calendar_id, current_user.user_id, db)
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendar not found or you do not have permission to view it.")
+    return _laid_out(EventCtrl.list_laid_out({calendar.calendar_id: calendar.max_event_seconds}, start, end, db))
+
+
+def _laid_out(found: list) -> List[EventLayout]:
+    return [
+        EventLayout(**Event.model_validate(item).model_dump(), lane=lane, lanes=lanes)
+        for item, lane, lanes in found
+    ]
 
 @router.get("/{calendar_id}/events/{event_id}", response_model=Event)
-async def get_event(calendar_id: str, event_id: str, db: Session = Depends(get_db), current_user: DBUser = Depends(get_current_user)):
-    db_event = db.query(DBEvent).join(DBCalendar).filter(
-        DBEvent.event_id == event_id,
-        DBCalendar.calendar_id == calendar_id,
-        DBCalendar.user_id == current_user.user_id
-    ).first()
+async def get_event(calendar_id: str, event_id: str, db: AsyncSession = Depends(get_async_db), current_user: DBUser = Depends(get_current_user)):
+    db_event = await EventCtrl.load_owned_async(event_id, calendar_id, current_user.user_id, db)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     return db_event
 
-@router.put("/{calendar_id}/events/{event_id}", response_model=Event)
-async def update_event(calendar_id: str, event_id: str, event: EventUpdate, db: Session = Depends(get_db), current_user: DBUser = Depends(get_current_user)):
-    db_event = db.query(DBEvent).join(DBCalendar).filter(
-        DBEvent.event_id == event_id,
-        DBCalendar.calendar_id == calendar_id,
-        DBCalendar.user_id == current_user.user_id
-    ).first()
+@router.put("/{calendar_id}/events/{event_id}", response_model=EventWithConflicts)
+async def update_event(calendar_id: str, event_id: str, event: EventUpdate, db: AsyncSession = Depends(get_async_db), current_user: DBUser = Depends(get_current_user)):
+    """
+    Update an event. Like on creation, the response lists the other events it now overlaps.
+    """
+    db_event = await EventCtrl.load_owned_async(event_id, calendar_id, current_user.user_id, db)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
     for key, value in event.model_dump(exclude_unset=True).items():
         setattr(db_event, key, value)
         
-    db.commit()
-    db.refresh(db_event)
-    return db_event
+    await EventCtrl.save_async(db_event, db)
+    return _with_conflicts(db_event, await EventCtrl.conflicts_async(db_event, current_user.user_id, db))
+
+
+def _with_conflicts(db_event: DBEvent, conflicts: list) -> EventWithConflicts:
+    found = EventWithConflicts.model_validate(db_event)
+    found.conflicts = [EventConflict.model_validate(conflict) for conflict in conflicts]
+    return found
 
 @router.post("/{calendar_id}/events/{event_id}/notifications", response_model=Notification)
 async def add_notification_to_event(
         calendar_id: str,
         event_id: str,
         notification: NotificationCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: DBUser = Depends(get_current_user)):
-    db_event = (db
-                .query(DBEvent)
-                .join(DBCalendar)
-                .filter(
-        DBEvent.event_id == event_id,
-        DBCalendar.user_id == current_user.user_id,
-        DBEvent.calendar_id == calendar_id).first())
+    db_event = await EventCtrl.load_owned_async(event_id, calendar_id, current_user.user_id, db)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    db_notification = DBNotification(**notification.model_dump(), event_id=event_id)
-    db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
-    return db_notification
+    return await NotificationCtrl.create_async(
+        db,
+        event_id=event_id,
+        notification_type=notification.type,
+        message=notification.message,
+        timestamp=notification.timestamp,
+    )
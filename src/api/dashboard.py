@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from src.database import get_db
+from src.classes.user import User as DBUser
+from src.controllers.dashboard import DashboardCtrl
+from src.models.dashboard import Dashboard
+from src.models.event import Event
+from src.models.poll import PollOut
+from src.api.authorization import get_current_user
+from src.constants import DASHBOARD_DAYS, DASHBOARD_ITEMS, DEFAULT_DASHBOARD_DAYS, DEFAULT_DASHBOARD_ITEMS
+
+router = APIRouter()
+
+
+@router.get("/", response_model=Dashboard)
+def get_dashboard(
+        start: Optional[datetime] = None,
+        days: int = Query(DEFAULT_DASHBOARD_DAYS, ge=DASHBOARD_DAYS[0], le=DASHBOARD_DAYS[1]),
+        limit: int = Query(DEFAULT_DASHBOARD_ITEMS, ge=DASHBOARD_ITEMS[0], le=DASHBOARD_ITEMS[1]),
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    Everything the dashboard needs in one response: the current user's calendars, their events in the days
+    from start (now by default, recurring events expanded), open polls with their tallies and pending
+    notifications. The number of queries does not depend on how many calendars the user has.
+    """
+    start = start or datetime.now(timezone.utc)
+    end = start + timedelta(days=days)
+    found = DashboardCtrl.load_for_user(current_user.user_id, start, end, limit, db)
+    return Dashboard(
+        start=start,
+        end=end,
+        calendars=found.calendars,
+        events=[Event.model_validate(item) for item in found.events],
+        polls=[PollOut.from_poll(poll) for poll in found.polls],
+        notifications=found.notifications,
+    )
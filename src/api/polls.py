@@ -1,34 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import AsyncIterator, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.database import get_db
-from src.classes.poll import Poll
-from src.classes.poll_option import PollOption
-from src.classes.vote import Vote
+from src.database import get_db, get_async_db
 from src.controllers.polls import PollCtrl
+from src.models.poll import PollOut
 from src.controllers.votes import VoteCtrl
+from src.controllers.vote_buffer import get_vote_buffer
 from src.api.authorization import get_current_user
+from src.core.broadcast import SubscriberLagged, Subscription, poll_broadcaster, sse_frame
+from src.core.config import POLL_STREAM_KEEPALIVE
+from src.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, split_page
+from src.constants import DEFAULT_PAGE_SIZE, PAGE_SIZE, POLL_STREAM_MAX_IDS
 
 
 router = APIRouter()
 
 
-class PollOptionOut(BaseModel):
-    option_id: str
-    option_text: str
-    votes: int
-
-
-class PollOut(BaseModel):
-    poll_id: str
-    question: str
-    is_closed: bool
-    allow_multi_votes: bool
-    options: List[PollOptionOut]
-
-
 class PollCreate(BaseModel):
     question: str
     options: List[str]
@@ -36,28 +28,29 @@ class PollCreate(BaseModel):
 
 
 @router.get("/", response_model=List[PollOut])
-def list_polls(db: Session = Depends(get_db)):
-    polls = db.query(Poll).filter(Poll.deleted.is_(False)).all()
-    out = []
-    for p in polls:
-        opts = []
-        for o in p.options:
-            vote_count = db.query(Vote).filter(Vote.poll_option_id == o.option_id, Vote.deleted.is_(False)).count()
-            opts.append(PollOptionOut(option_id=o.option_id, option_text=o.option_text, votes=vote_count))
-        out.append(PollOut(poll_id=p.poll_id, question=p.question, is_closed=p.is_closed, allow_multi_votes=p.allow_multi_votes, options=opts))
-    return out
+def list_polls(
+        response: Response,
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=PAGE_SIZE[0], le=PAGE_SIZE[1]),
+        db: Session = Depends(get_db)):
+    """
+    One page of polls. When there are more, the X-Next-Cursor header holds the cursor of the next page
+    """
+    after = decode_cursor(cursor, datetime.fromisoformat, str) if cursor else None
+    # One query for the polls and one for all of their options, the tallies live on the options
+    polls, next_cursor = split_page(
+        PollCtrl.list_with_options(db, after, limit + 1), limit, lambda p: (p.created_at, p.poll_id)
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [PollOut.from_poll(p) for p in polls]
 
 
 @router.post("/", response_model=PollOut)
 def create_poll(payload: PollCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
     # create poll using controller
     new_poll = PollCtrl.create(db=db, question=payload.question, owner_id=current_user.user_id, options=payload.options, allow_multi_votes=payload.allow_multi_votes)
-    # build response
-    opts = []
-    for o in new_poll.options:
-        vote_count = db.query(Vote).filter(Vote.poll_option_id == o.option_id, Vote.deleted.is_(False)).count()
-        opts.append(PollOptionOut(option_id=o.option_id, option_text=o.option_text, votes=vote_count))
-    return PollOut(poll_id=new_poll.poll_id, question=new_poll.question, is_closed=new_poll.is_closed, allow_multi_votes=new_poll.allow_multi_votes, options=opts)
+    return PollOut.from_poll(new_poll)
 
 
 class VotePayload(BaseModel):
@@ -67,9 +60,75 @@ class VotePayload(BaseModel):
 @router.post("/{poll_id}/vote")
 def vote_on_poll(poll_id: str, payload: VotePayload, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
     try:
+        vote_buffer = get_vote_buffer()
+        if vote_buffer is not None:
+            return {"vote_id": vote_buffer.submit(payload.poll_option_id, current_user.user_id)}
         vote = VoteCtrl.create(db=db, poll_option_id=payload.poll_option_id, user_id=current_user.user_id)
         return {"vote_id": vote.vote_id}
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+
+
+@router.get("/stream")
+async def stream_polls_results(
+        ids: str = Query(..., description="Comma separated ids of the polls to follow"),
+        db: AsyncSession = Depends(get_async_db, scope="function")):
+    """
+    Live results of several polls multiplexed on one Server-Sent Events stream, so a page showing many polls
+    holds a single connection. The events are those of /polls/{poll_id}/stream, every payload carries its poll_id.
+    At most POLL_STREAM_MAX_IDS polls so the URL fits, clients following more split them over several streams.
+    Polls that don't exist are left out, 404 if none of them does
+    """
+    poll_ids = list(dict.fromkeys(poll_id for poll_id in ids.split(",") if poll_id))
+    if not poll_ids or len(poll_ids) > POLL_STREAM_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Between 1 and {POLL_STREAM_MAX_IDS} poll ids are required"
+        )
+    return await _open_stream(poll_ids, db)
+
+
+@router.get("/{poll_id}/stream")
+async def stream_poll_results(poll_id: str, db: AsyncSession = Depends(get_async_db, scope="function")):
+    """
+    Live results of a poll as Server-Sent Events. The first event is a "snapshot" with every tally, then a
+    "tally" event carries the new count of each option whose votes changed and "closed" tells the poll was closed.
+    Every viewer of a poll shares the one frame published per change, nobody polls GET /polls/ for updates
+    """
+    return await _open_stream([poll_id], db)
+
+
+async def _open_stream(poll_ids: list[str], db: AsyncSession) -> StreamingResponse:
+    # Subscribe before reading the snapshots so a vote landing in between isn't missed
+    subscription = poll_broadcaster.subscribe(*poll_ids)
+    try:
+        snapshots = await PollCtrl.get_results_many_async(poll_ids, db)
+    except BaseException:
+        subscription.close()
+        raise
+    if not snapshots:
+        subscription.close()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
+    # The session is closed once this returns (function scoped dependency), an open stream must not pin a pooled
+    # connection, so the events below only ever read from the subscription
+    return StreamingResponse(
+        _poll_events([snapshots[poll_id] for poll_id in poll_ids if poll_id in snapshots], subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _poll_events(snapshots: list[dict], subscription: Subscription) -> AsyncIterator[str]:
+    try:
+        # retry: how long EventSource waits before reconnecting when the stream ends
+        yield "retry: 2000\n" + "".join(sse_frame("snapshot", snapshot) for snapshot in snapshots)
+        while True:
+            frame = await subscription.next_frame(timeout=POLL_STREAM_KEEPALIVE)
+            # A comment line keeps proxies from closing an idle connection
+            yield frame if frame is not None else ": keep-alive\n\n"
+    except SubscriberLagged:
+        # Too far behind: end the stream, the client reconnects and starts over from fresh snapshots
+        return
+    finally:
+        subscription.close()
@@ -0,0 +1,63 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+
+from src.database import get_db
+from src.classes.user import User as DBUser
+from src.controllers.friends import FriendsCtrl
+from src.controllers.schedules import ScheduleCtrl, FreeBusy as FreeBusyResult
+from src.models.schedule import BusyBlock, FreeAt, FreeBusy
+from src.api.authorization import get_current_user
+from src.constants import FREE_BUSY_USERS
+
+router = APIRouter()
+
+
+@router.get("/free-busy", response_model=FreeBusy)
+def get_free_busy(
+        start: datetime,
+        end: datetime,
+        user_ids: List[str] = Query(default=[], max_length=FREE_BUSY_USERS[1]),
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    When the given users are busy between start and end, each of them and all of them together. Recurring
+    events count with every occurrence in the window. Only the times are shared, not what the events are.
+    Without user_ids the current user is looked up; anybody else must be an active friend.
+    """
+    user_ids = user_ids or [current_user.user_id]
+    _check_friends(user_ids, current_user, db)
+    return _free_busy_out(ScheduleCtrl.free_busy(user_ids, start, end, db))
+
+
+@router.get("/free-at", response_model=FreeAt)
+def get_free_at(
+        at: datetime,
+        user_id: str | None = None,
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    Whether a user (the current one by default, otherwise an active friend) has no event at the given moment.
+    """
+    user_id = user_id or current_user.user_id
+    _check_friends([user_id], current_user, db)
+    return FreeAt(user_id=user_id, at=at, free=ScheduleCtrl.is_free(user_id, at, db))
+
+
+def _check_friends(user_ids: List[str], current_user: DBUser, db: Session) -> None:
+    others = set(user_ids) - {current_user.user_id}
+    if others and FriendsCtrl.active_friend_ids(current_user.user_id, list(others), db) != others:
+        raise HTTPException(status_code=403, detail="You can only see the free/busy time of your friends.")
+
+
+def _free_busy_out(result: FreeBusyResult) -> FreeBusy:
+    def blocks(found: list[tuple[datetime, datetime]]) -> List[BusyBlock]:
+        return [BusyBlock(start=block_start, end=block_end) for block_start, block_end in found]
+
+    return FreeBusy(
+        start=result.start,
+        end=result.end,
+        users={user_id: blocks(found) for user_id, found in result.users.items()},
+        combined=blocks(result.combined),
+    )
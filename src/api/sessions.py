@@ -0,0 +1,68 @@
+from datetime import datetime, time
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from src.database import get_db
+from src.classes.user import User as DBUser
+from src.controllers.availability import AvailabilityCtrl
+from src.controllers.study_sessions import StudySessionCtrl
+from src.core.slots import WorkingHours
+from src.models.study_session import AvailabilityHeatmap, MeetingSlot
+from src.api.authorization import get_current_user
+from src.constants import MEETING_MINUTES, SLOT_MINUTES, SLOT_SUGGESTIONS
+
+router = APIRouter()
+
+
+@router.get("/{session_id}/slots", response_model=List[MeetingSlot])
+def find_meeting_slots(
+        session_id: str,
+        start: datetime,
+        end: datetime,
+        duration: int = Query(ge=MEETING_MINUTES[0], le=MEETING_MINUTES[1]),
+        day_start: time = time(9),
+        day_end: time = time(17),
+        weekdays_only: bool = True,
+        timezone: str | None = None,
+        limit: int = Query(default=5, ge=SLOT_SUGGESTIONS[0], le=SLOT_SUGGESTIONS[1]),
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    The best times between start and end for a meeting of duration minutes, ranked by how many members of
+    the study session are free for all of it. Meetings stay within day_start and day_end, local times of
+    the given time zone (the current user's by default). Only members of the session can search it.
+    """
+    session, _ = _member_session(session_id, current_user, db)
+    hours = WorkingHours(day_start=day_start, day_end=day_end, weekdays_only=weekdays_only,
+                         timezone=timezone or current_user.timezone or "UTC")
+    return [
+        MeetingSlot(start=slot.start, end=slot.end, attendance=len(slot.available),
+                    available=slot.available, unavailable=slot.unavailable)
+        for slot in StudySessionCtrl.find_slots(session, start, end, duration, hours, limit, db)
+    ]
+
+
+@router.get("/{session_id}/availability", response_model=AvailabilityHeatmap)
+def get_availability(
+        session_id: str,
+        week: datetime,
+        db: Session = Depends(get_db),
+        current_user: DBUser = Depends(get_current_user)):
+    """
+    How many members of the study session are free in every slot of the week holding the given moment,
+    starting Monday 00:00 UTC. Served from the heatmap cache until one of the members' calendars changes.
+    """
+    _, member_ids = _member_session(session_id, current_user, db)
+    heatmap = AvailabilityCtrl.heatmap(member_ids, week, db)
+    return AvailabilityHeatmap(week_start=heatmap.week_start, slot_minutes=SLOT_MINUTES,
+                               member_count=heatmap.member_count, free=heatmap.free.tolist())
+
+
+def _member_session(session_id: str, current_user: DBUser, db: Session):
+    # Sessions the user is not part of look the same as missing ones
+    session = StudySessionCtrl.load(session_id, db)
+    member_ids = StudySessionCtrl.member_ids(session, db) if session is not None else []
+    if current_user.user_id not in member_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Study session not found")
+    return session, member_ids
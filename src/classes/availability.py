@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Integer, LargeBinary
+
+from src.base_class import Base
+
+
+class AvailabilityHeatmap(Base):
+    """
+    How many users of a group are busy in every slot of a week, computed by AvailabilityCtrl. cache_key covers
+    the users, their calendars and the calendars' busy_version: once any of those changes the row is never
+    looked up again, precompute_availability.py prunes it when its week is over
+    """
+    __tablename__ = 'availability_heatmaps'
+    cache_key = Column(String, primary_key=True)
+    week_start = Column(DateTime(timezone=True), nullable=False, index=True)
+    member_count = Column(Integer, nullable=False)
+    # One little-endian uint32 per slot
+    busy_counts = Column(LargeBinary, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
@@ -57,6 +57,17 @@ class Calendar(Base):
     description = Column(String, nullable=True)
     permissions = relationship("CalendarPermission", back_populates="calendar", cascade="all, delete-orphan")
     is_seeded = Column(Boolean, default=False, nullable=False)
+    # Length of the longest event ever put in the calendar, kept by the Event listeners. Bounds how far before
+    # a time window an overlapping event can start, so window queries never scan the whole history
+    max_event_seconds = Column(Integer, default=0, server_default="0", nullable=False)
+    # Bumped by the Event listeners whenever an event of the calendar is added, moved or removed, so cached
+    # availability (availability_heatmaps) can tell it is stale without looking at the events
+    busy_version = Column(Integer, default=0, server_default="0", nullable=False)
+    # Time zone of the rows of this calendar in event_day_counts, NULL until they are first built
+    day_counts_timezone = Column(String, nullable=True)
+    # Set by the validation listeners on every change, delta sync returns the rows above the client's version
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    sync_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     # For indexing [faster searches and filtering] we will use user_id and code as unique constraints
     __table_args__ = (
@@ -91,7 +102,9 @@ class ExternalCalendar(Base):
 @event.listens_for(Calendar, 'before_update')
 def validate_calendar(mapper, connection, target):
     from src.validators.calendar import CalendarValidator
+    from src.classes.sync_clock import stamp
     CalendarValidator().validate(target)
+    stamp(connection, target)
 
 @event.listens_for(ExternalCalendar, 'before_insert')
 @event.listens_for(ExternalCalendar, 'before_update')
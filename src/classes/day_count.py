@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Date, ForeignKey, Integer
+
+from src.base_class import Base
+
+
+class EventDayCount(Base):
+    """
+    How many live one-off events of a calendar start on each local day, in the calendar's
+    day_counts_timezone. Kept up to date by the Event listeners once DayCountCtrl has built it for a calendar;
+    recurring events are counted when the summary is read
+    """
+    __tablename__ = 'event_day_counts'
+    calendar_id = Column(String, ForeignKey('calendars.calendar_id', ondelete='CASCADE'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
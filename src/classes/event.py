@@ -1,9 +1,18 @@
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, event, Integer
+import math
+from datetime import timezone
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Index, event, Integer, inspect, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import relationship
 from src.base_class import Base, default_uuid
 from src.enums import RecurrenceRule
 
 
+# Columns that change when an event makes its calendar busy
+BUSY_FIELDS = ('start_time', 'end_time', 'recurrence_rule', 'calendar_id', 'deleted')
+# Columns that decide which day count of which calendar a one-off event adds to
+DAY_COUNT_FIELDS = ('start_time', 'recurrence_rule', 'calendar_id', 'deleted')
+
+
 class Event(Base):
     __tablename__ = 'events'
     event_id = Column(String, primary_key=True, default=default_uuid)
@@ -15,10 +24,34 @@ class Event(Base):
     deleted = Column(Boolean, default=False, nullable=False)
     recurrence_rule = Column(Integer, default=0)
     is_seeded = Column(Boolean, default=False, nullable=False)
+    # Minutes before each occurrence its reminder goes out, None for no reminder. A one-off event gets its
+    # reminder row when it is created, a recurring one only ever has the reminders of its next occurrences,
+    # generated as they come within the dispatcher's horizon (NotificationCtrl.generate_reminders)
+    reminder_minutes = Column(Integer, nullable=True)
+    # Set by the validation listeners on every change, delta sync returns the rows above the client's version
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    sync_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     calendar = relationship("Calendar", back_populates="events")
     notifications = relationship("Notification", back_populates="event", cascade="all, delete-orphan")
 
+    # Time window listings: equality on the first two columns, range scan on start_time, rows come out sorted.
+    # event_id breaks start_time ties so pages can resume from a (start_time, event_id) cursor.
+    # ix_events_timeline does the same for listings spanning every calendar
+    __table_args__ = (
+        Index('ix_events_calendar_timeline', 'calendar_id', 'deleted', 'start_time', 'event_id'),
+        Index('ix_events_timeline', 'deleted', 'start_time', 'event_id'),
+        # Delta sync: what changed in a calendar since a version
+        Index('ix_events_calendar_sync', 'calendar_id', 'sync_version'),
+        # Recurring events can have occurrences in any window, they are looked up separately. deleted is left
+        # out so a query filtering it with IS NOT can only seek this index, not ix_events_calendar_timeline
+        Index(
+            'ix_events_recurring', 'calendar_id', 'start_time',
+            sqlite_where=text('recurrence_rule != 0'),
+            postgresql_where=text('recurrence_rule != 0'),
+        ),
+    )
+
     @property
     def is_recurrent(self):
         # Here's where we would check for additional rules once we add them
@@ -29,4 +62,140 @@ class Event(Base):
 @event.listens_for(Event, 'before_update')
 def validate_event(mapper, connection, target):
     from src.validators.event import EventValidator
+    from src.classes.sync_clock import stamp
     EventValidator().validate(target)
+    stamp(connection, target)
+
+
+def widen_event_span(connection, calendar_id: str, seconds: int) -> None:
+    """
+    Raise the max_event_seconds of a calendar to seconds if it is lower. Writes bypassing the ORM
+    (bulk inserts) have to call this themselves
+    """
+    from src.classes.calendar import Calendar
+    calendars = Calendar.__table__
+    connection.execute(
+        update(calendars)
+        .where(calendars.c.calendar_id == calendar_id, calendars.c.max_event_seconds < seconds)
+        .values(max_event_seconds=seconds)
+    )
+
+
+def bump_busy_version(connection, calendar_ids: set[str]) -> None:
+    """
+    Mark the busy time of calendars as changed. Writes bypassing the ORM (bulk inserts) have to call this
+    themselves
+    """
+    from src.classes.calendar import Calendar
+    calendars = Calendar.__table__
+    connection.execute(
+        update(calendars)
+        .where(calendars.c.calendar_id.in_(calendar_ids))
+        .values(busy_version=calendars.c.busy_version + 1)
+    )
+
+
+@event.listens_for(Event, 'after_insert')
+@event.listens_for(Event, 'after_delete')
+def track_busy_time(mapper, connection, target):
+    if target.calendar_id is not None:
+        bump_busy_version(connection, {target.calendar_id})
+
+
+@event.listens_for(Event, 'after_update')
+def track_busy_change(mapper, connection, target):
+    # Renaming an event or moving its location leaves the busy time alone, skip the statement
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in BUSY_FIELDS):
+        return
+    # Moving an event to another calendar changes both
+    calendar_ids = {target.calendar_id, *state.attrs.calendar_id.history.deleted} - {None}
+    if calendar_ids:
+        bump_busy_version(connection, calendar_ids)
+
+
+def shift_day_count(connection, calendar_id: str, start_time, delta: int) -> None:
+    """
+    Add delta to the event_day_counts row of the day start_time falls on, if the calendar's counts were built.
+    Writes bypassing the ORM (bulk inserts) have to call this themselves
+    """
+    from src.classes.calendar import Calendar
+    from src.classes.day_count import EventDayCount
+    from src.core.local_days import zone_or_utc
+    from src.core.recurrence import naive_utc
+    calendars = Calendar.__table__
+    zone_name = connection.execute(
+        select(calendars.c.day_counts_timezone).where(calendars.c.calendar_id == calendar_id)
+    ).scalar()
+    if zone_name is None:
+        return
+    day = naive_utc(start_time).replace(tzinfo=timezone.utc).astimezone(zone_or_utc(zone_name)).date()
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    counts = EventDayCount.__table__
+    connection.execute(
+        insert(counts)
+        .values(calendar_id=calendar_id, day=day, count=delta)
+        .on_conflict_do_update(index_elements=[counts.c.calendar_id, counts.c.day], set_={"count": counts.c.count + delta})
+    )
+
+
+def _counted(calendar_id, start_time, recurrence_rule, deleted) -> bool:
+    return calendar_id is not None and start_time is not None and not recurrence_rule and not deleted
+
+
+def _previous(state, name: str):
+    # Value of the attribute before the pending change, as flushed by the previous unit of work
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None
+    return getattr(state.obj(), name)
+
+
+def _load_previous(target, value, oldvalue, initiator):
+    pass
+
+
+# Assigning one of these loads the value it replaces first (even on an expired object), so the update listener
+# knows which day to take the event off
+for _name in DAY_COUNT_FIELDS:
+    event.listen(getattr(Event, _name), 'set', _load_previous, active_history=True)
+
+
+@event.listens_for(Event, 'after_insert')
+def count_inserted(mapper, connection, target):
+    if _counted(target.calendar_id, target.start_time, target.recurrence_rule, target.deleted):
+        shift_day_count(connection, target.calendar_id, target.start_time, 1)
+
+
+@event.listens_for(Event, 'after_delete')
+def count_deleted(mapper, connection, target):
+    # The values in the database, not edits pending on the deleted object
+    start_time, recurrence_rule, calendar_id, deleted = (_previous(inspect(target), name) for name in DAY_COUNT_FIELDS)
+    if _counted(calendar_id, start_time, recurrence_rule, deleted):
+        shift_day_count(connection, calendar_id, start_time, -1)
+
+
+@event.listens_for(Event, 'after_update')
+def count_updated(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in DAY_COUNT_FIELDS):
+        return
+    start_time, recurrence_rule, calendar_id, deleted = (_previous(state, name) for name in DAY_COUNT_FIELDS)
+    if _counted(calendar_id, start_time, recurrence_rule, deleted):
+        shift_day_count(connection, calendar_id, start_time, -1)
+    if _counted(target.calendar_id, target.start_time, target.recurrence_rule, target.deleted):
+        shift_day_count(connection, target.calendar_id, target.start_time, 1)
+
+
+@event.listens_for(Event, 'after_insert')
+@event.listens_for(Event, 'after_update')
+def track_event_span(mapper, connection, target):
+    if target.calendar_id is None:
+        return
+    # Soft deleting or renaming an event leaves the span alone, skip the statement
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ('start_time', 'end_time', 'calendar_id')):
+        return
+    widen_event_span(connection, target.calendar_id, math.ceil((target.end_time - target.start_time).total_seconds()))
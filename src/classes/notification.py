@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, event, ForeignKey, Enum
+from sqlalchemy import Column, String, DateTime, Boolean, event, ForeignKey, Enum, Index, Integer
 from sqlalchemy.orm import relationship
 from src.base_class import Base, default_uuid
 from datetime import datetime, timezone
@@ -15,9 +15,31 @@ class Notification(Base):
     timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     delivery_status = Column(Enum(DeliveryStatus), default=DeliveryStatus.PENDING, nullable=False)
     deleted = Column(Boolean, default=False, nullable=False)
+    # Dispatcher worker holding the notification while it is SENDING, and until when. A worker that dies leaves
+    # the claim to expire, then another worker takes the notification over
+    claimed_by = Column(String, nullable=True)
+    claimed_until = Column(DateTime(timezone=True), nullable=True)
+    # Delivery attempts so far, counted when claimed, and when the next one is due while RETRYING
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    # The occurrence a reminder generated from a recurring event's reminder_minutes is for, None otherwise
+    occurrence_start = Column(DateTime(timezone=True), nullable=True)
+    # Set by the validation listeners on every change, delta sync returns the rows above the client's version
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    sync_version = Column(Integer, default=0, server_default="0", nullable=False, index=True)
 
     event = relationship("Event", back_populates="notifications")
 
+    # The dispatcher's claim: equality on the status, range scan on the due time, oldest first. Retries are due
+    # at their next attempt instead
+    __table_args__ = (
+        Index('ix_notifications_due', 'delivery_status', 'timestamp'),
+        Index('ix_notifications_retry', 'delivery_status', 'next_attempt_at'),
+        # One generated reminder per occurrence, whoever generates it first. Other notifications have no
+        # occurrence_start and never collide
+        Index('ix_notifications_occurrence', 'event_id', 'occurrence_start', unique=True),
+    )
+
     def set_delivery_status(self, status: DeliveryStatus):
         self.delivery_status = status
 
@@ -42,4 +64,6 @@ class Notification(Base):
 @event.listens_for(Notification, 'before_update')
 def validate_notification(mapper, connection, target):
     from src.validators.notification import NotificationValidator
+    from src.classes.sync_clock import stamp
     NotificationValidator().validate(target)
+    stamp(connection, target)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.orm import relationship
+
+from src.base_class import Base
+
+
+class Occurrence(Base):
+    """
+    A materialized occurrence of a recurring event, only kept for the window of the OccurrenceHorizon
+    """
+    __tablename__ = 'event_occurrences'
+    event_id = Column(String, ForeignKey('events.event_id', ondelete='CASCADE'), primary_key=True)
+    start_time = Column(DateTime(timezone=True), primary_key=True)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+    # Copied from the event so the occurrences of a calendar are one index range
+    calendar_id = Column(String, ForeignKey('calendars.calendar_id'), nullable=False)
+
+    event = relationship("Event")
+
+    __table_args__ = (
+        Index('ix_event_occurrences_calendar', 'calendar_id', 'start_time', 'event_id'),
+    )
+
+
+class OccurrenceHorizon(Base):
+    """
+    Single row: event_occurrences holds every occurrence overlapping [valid_from, valid_until)
+    """
+    __tablename__ = 'occurrence_horizon'
+    horizon_id = Column(Integer, primary_key=True, default=1)
+    valid_from = Column(DateTime(timezone=True), nullable=False)
+    valid_until = Column(DateTime(timezone=True), nullable=False)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, event
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index, event
 from sqlalchemy.orm import relationship
 
 from src.base_class import Base, default_uuid
@@ -13,9 +14,15 @@ class Poll(Base):
     deleted = Column(Boolean, default=False, nullable=False)
     allow_multi_votes = Column(Boolean, default=False)
     is_closed = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
 
     owner = relationship("User")
 
+    __table_args__ = (
+        # Serves the GET /polls/ listing, oldest first with poll_id breaking ties for the cursor
+        Index('ix_polls_timeline', 'deleted', 'created_at', 'poll_id'),
+    )
+
 
 @event.listens_for(Poll, 'before_insert')
 @event.listens_for(Poll, 'before_update')
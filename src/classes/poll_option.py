@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, event
+from sqlalchemy import Column, String, Boolean, ForeignKey, Integer, event
 from sqlalchemy.orm import relationship
 
 from src.base_class import Base, default_uuid
@@ -10,6 +10,9 @@ class PollOption(Base):
     poll_id = Column(String, ForeignKey('polls.poll_id'), nullable=False)
     option_text = Column(String, nullable=False)
     deleted = Column(Boolean, default=False, nullable=False)
+    # Live (non deleted) votes for this option. Maintained by VoteCtrl with atomic increments,
+    # PollCtrl.reconcile_vote_counts rebuilds it from the votes table if it ever drifts
+    vote_count = Column(Integer, default=0, server_default="0", nullable=False)
 
     poll = relationship("Poll", back_populates="options")
     votes = relationship("Vote", back_populates="selected_option", cascade="all, delete-orphan")
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import object_session
+
+from src.base_class import Base
+
+
+class SyncClock(Base):
+    """
+    Single row: the last sync_version handed out. Every transaction writing calendars, events or notifications
+    takes the next version, and the row stays locked until it commits, so versions become visible in the order
+    they were taken and a client that has seen version n has seen every row stamped n or lower
+    """
+    __tablename__ = 'sync_clock'
+    clock_id = Column(Integer, primary_key=True, default=1)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def next_sync_version(connection) -> int:
+    """
+    The sync_version of the current transaction, taken from the clock on its first write. Writes bypassing the
+    ORM (bulk inserts, set based updates) have to stamp their rows with it themselves
+    """
+    transaction = connection.get_transaction()
+    taken = connection.info.get("sync_version")
+    if taken is not None and taken[0] is transaction:
+        return taken[1]
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    clock = SyncClock.__table__
+    version = connection.execute(
+        insert(clock)
+        .values(clock_id=1, version=1)
+        .on_conflict_do_update(index_elements=[clock.c.clock_id], set_={"version": clock.c.version + 1})
+        .returning(clock.c.version)
+    ).scalar_one()
+    connection.info["sync_version"] = (transaction, version)
+    return version
+
+
+def stamp(connection, target) -> None:
+    """
+    Mark a row as changed for delta sync, called by the before_insert/before_update listeners of its class
+    """
+    session = object_session(target)
+    # An update flushing no column change leaves the row as clients last saw it
+    if inspect(target).has_identity and session is not None and not session.is_modified(target, include_collections=False):
+        return
+    target.sync_version = next_sync_version(connection)
+    target.updated_at = datetime.now(timezone.utc)
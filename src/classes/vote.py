@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, event
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Index, event, text
 from sqlalchemy.orm import relationship
 
 from src.base_class import Base, default_uuid
@@ -9,9 +9,23 @@ class Vote(Base):
     __tablename__ = 'votes'
     vote_id = Column(String, primary_key=True, default=default_uuid)
     poll_option_id = Column(String, ForeignKey('poll_options.option_id'), nullable=False)
+    # Copied from the option so the single choice rule below can be expressed as a plain unique index
+    poll_id = Column(String, ForeignKey('polls.poll_id'), nullable=False)
     user_id = Column(String, ForeignKey('users.user_id'), nullable=False)
     timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     deleted = Column(Boolean, default=False, nullable=False)
+    # Whether the poll only allowed one vote per user when this vote was cast
+    single_choice = Column(Boolean, default=False, nullable=False)
+
+    # One live vote per user on single choice polls. Enforced by the database so two concurrent requests
+    # (a double click) can't both get in between the check and the insert
+    __table_args__ = (
+        Index(
+            'uq_votes_single_choice', 'poll_id', 'user_id', unique=True,
+            sqlite_where=text('single_choice = 1 AND deleted = 0'),
+            postgresql_where=text('single_choice AND NOT deleted'),
+        ),
+    )
 
     selected_option = relationship("PollOption", back_populates="votes")
     voter = relationship("User", back_populates="votes")
@@ -13,3 +13,37 @@ REMINDERS_PER_EVENT = (0, 5)
 SESSION_ATENDEES_LENGTH = (1, 100)
 POLL_OPTION_TEXT_LENGTH = (5, 100)
 POLL_QUESTION_LENGTH = (1, 255)
+PAGE_SIZE = (1, 500)
+DEFAULT_PAGE_SIZE = 100
+# Polls followed by one GET /polls/stream. Their ids travel in the URL, about 37 characters each: 100 of them
+# stay well under the 16KB request line and headers servers like h11 accept
+POLL_STREAM_MAX_IDS = 100
+# Most SELECTs combined into one UNION ALL, SQLite refuses compound selects of more than 500
+UNION_MAX_ARMS = 250
+# Expanding at least this many recurring events at once goes through the vectorized path
+RECURRENCE_BATCH_SIZE = 256
+# Free/busy lookups: how many users at once and how long a window
+FREE_BUSY_USERS = (1, 100)
+FREE_BUSY_MAX_DAYS = 92
+# Meeting slot search: grid resolution, meeting length in minutes and how many slots come back
+SLOT_MINUTES = 15
+MEETING_MINUTES = (15, 480)
+SLOT_SUGGESTIONS = (1, 20)
+# A recurring event is checked for conflicts over its occurrences in this many days from its start
+CONFLICT_LOOKAHEAD_DAYS = 90
+# The interval index keeps recurring events expanded over the days queried and this many after them, over at
+# most INDEX_MAX_SPAN_DAYS; a query outside that span expands every series again
+INDEX_HORIZON_DAYS = 92
+INDEX_MAX_SPAN_DAYS = 732
+# Longest window laid out into lanes at once, a month view with the days around it
+LAYOUT_MAX_DAYS = 42
+# Longest range of days counted at once for a month view, a year
+DAY_COUNT_MAX_DAYS = 366
+# Dashboard: how many days of upcoming events and how many items of each list it returns
+DASHBOARD_DAYS = (1, 31)
+DASHBOARD_ITEMS = (1, 100)
+DEFAULT_DASHBOARD_DAYS = 7
+DEFAULT_DASHBOARD_ITEMS = 20
+# Minutes before each occurrence an event's reminder goes out
+REMINDER_MINUTES = (0, 10080)
+DEFAULT_REMINDER_MINUTES = 15
@@ -0,0 +1,243 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import repeat
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.classes.availability import AvailabilityHeatmap
+from src.classes.calendar import Calendar
+from src.constants import SLOT_MINUTES
+from src.controllers.schedules import ScheduleCtrl
+from src.core.config import AVAILABILITY_WORKERS
+from src.core.recurrence import naive_utc
+from src.core.slots import SlotGrid
+from src.interfaces import PersistentController
+
+# A week of SLOT_MINUTES slots, and the bytes of one user's bitmap of it
+WEEK_SLOTS = 7 * 24 * 60 // SLOT_MINUTES
+ROW_BYTES = -(-WEEK_SLOTS // 8)
+# Users whose bitmaps one worker task builds, each task is one busy_intervals query
+USER_CHUNK = 256
+
+
+@dataclass(frozen=True)
+class Heatmap:
+    """
+    How many of member_count users are busy in each SLOT_MINUTES slot of the week starting at week_start
+    (a Monday, naive UTC)
+    """
+    week_start: datetime
+    member_count: int
+    busy: np.ndarray
+
+    @property
+    def free(self) -> np.ndarray:
+        return self.member_count - self.busy
+
+
+def week_of(moment: datetime) -> datetime:
+    """
+    Monday 00:00 UTC of the week holding moment, naive
+    """
+    day = naive_utc(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday())
+
+
+class AvailabilityCtrl(PersistentController):
+    """
+    Weekly availability heatmaps of groups of users, cached in availability_heatmaps. A heatmap is keyed by
+    its users, their live calendars and the busy_version of those calendars, so as long as none of their
+    events changes the stored heatmap is returned without reading a single event. precompute fills the cache
+    for many groups at once: every user's week becomes a bitmap in shared memory, built and aggregated by a
+    pool of worker processes
+    """
+
+    @staticmethod
+    def cache_keys(groups: list[list[str]], week_start: datetime, storage: Session) -> list[str]:
+        """
+        Cache key of the heatmap of each group, the calendars of all the groups are read in one query
+        :param groups: Users of each group
+        :param week_start: Monday of the week
+        :param storage: The database session
+        :return: one key per group
+        """
+        users = list({user_id for group in groups for user_id in group})
+        versions: dict[str, list[str]] = {user_id: [] for user_id in users}
+        for calendar_id, user_id, version in storage.query(
+            Calendar.calendar_id, Calendar.user_id, Calendar.busy_version
+        ).filter(Calendar.user_id.in_(users), Calendar.deleted.is_(False)):
+            versions[user_id].append(f"{calendar_id}:{version}")
+
+        keys = []
+        for group in groups:
+            digest = hashlib.sha256(f"{SLOT_MINUTES}|{week_of(week_start).isoformat()}".encode())
+            for user_id in sorted(set(group)):
+                digest.update(f"|{user_id}={','.join(sorted(versions[user_id]))}".encode())
+            keys.append(digest.hexdigest())
+        return keys
+
+    @staticmethod
+    def heatmap(user_ids: list[str], week_start: datetime, storage: Session) -> Heatmap:
+        """
+        Heatmap of a group, from the cache when none of its calendars changed since it was computed,
+        otherwise computed in this process and stored
+        :param user_ids: The users of the group
+        :param week_start: Any moment of the week, it starts on the Monday before
+        :param storage: The database session
+        :return: the heatmap
+        """
+        week_start = week_of(week_start)
+        user_ids = list(dict.fromkeys(user_ids))
+        key = AvailabilityCtrl.cache_keys([user_ids], week_start, storage)[0]
+        cached = AvailabilityCtrl.load(key, storage)
+        if cached is not None:
+            return _decode(cached)
+
+        members, starts, ends = ScheduleCtrl.busy_intervals(user_ids, week_start, week_start + timedelta(days=7), storage)
+        busy = _week_grid(week_start).busy_matrix(members, starts, ends, len(user_ids)).sum(axis=0)
+        found = Heatmap(week_start=week_start, member_count=len(user_ids), busy=busy)
+        AvailabilityCtrl._store({key: found}, storage)
+        storage.commit()
+        return found
+
+    @staticmethod
+    def precompute(groups: list[list[str]], week_start: datetime, storage: Session, workers: int = AVAILABILITY_WORKERS) -> int:
+        """
+        Compute and store the heatmaps of every group that is not cached yet. Users shared by several groups
+        are only read once. The worker processes open their own connections to the database of storage,
+        which therefore can't be an in-memory one
+        :param groups: Users of each group
+        :param week_start: Any moment of the week, it starts on the Monday before
+        :param storage: The database session
+        :param workers: Worker processes, 0 for one per CPU
+        :return: how many heatmaps were computed
+        """
+        week_start = week_of(week_start)
+        groups = [list(dict.fromkeys(group)) for group in groups]
+        keys = AvailabilityCtrl.cache_keys(groups, week_start, storage)
+        cached = {key for key, in storage.query(AvailabilityHeatmap.cache_key).filter(AvailabilityHeatmap.cache_key.in_(keys))}
+        missing = {key: group for key, group in zip(keys, groups) if key not in cached}
+        if not missing:
+            return 0
+
+        users = list(dict.fromkeys(user_id for group in missing.values() for user_id in group))
+        row_of = {user_id: row for row, user_id in enumerate(users)}
+        database_url = storage.get_bind().url.render_as_string(hide_password=False)
+        # One bitmap row per user, written by the workers in place and read back by the aggregation
+        bitmaps = shared_memory.SharedMemory(create=True, size=max(1, len(users) * ROW_BYTES))
+        try:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                     initargs=(database_url,)) as pool:
+                firsts = range(0, len(users), USER_CHUNK)
+                list(pool.map(_fill_rows, repeat(bitmaps.name), repeat(len(users)), firsts,
+                              [users[first:first + USER_CHUNK] for first in firsts], repeat(week_start)))
+                counts = pool.map(_count_busy, repeat(bitmaps.name), repeat(len(users)),
+                                  [np.array([row_of[user_id] for user_id in group], dtype=np.int64) for group in missing.values()])
+                found = {
+                    key: Heatmap(week_start=week_start, member_count=len(group), busy=busy)
+                    for (key, group), busy in zip(missing.items(), counts)
+                }
+        finally:
+            bitmaps.close()
+            bitmaps.unlink()
+        AvailabilityCtrl._store(found, storage)
+        storage.commit()
+        return len(found)
+
+    @staticmethod
+    def prune(before: datetime, storage: Session) -> int:
+        """
+        Drop the heatmaps of the weeks starting before the given moment
+        :return: how many were dropped
+        """
+        result = storage.execute(delete(AvailabilityHeatmap).where(AvailabilityHeatmap.week_start < naive_utc(before)))
+        storage.commit()
+        return result.rowcount
+
+    @staticmethod
+    def _store(found: dict[str, Heatmap], storage: Session) -> None:
+        # Another process may have stored the same heatmap meanwhile
+        insert = postgresql.insert if storage.get_bind().dialect.name == "postgresql" else sqlite.insert
+        computed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        if found:
+            storage.execute(insert(AvailabilityHeatmap.__table__).on_conflict_do_nothing(), [
+                {"cache_key": key, "week_start": heatmap.week_start, "member_count": heatmap.member_count,
+                 "busy_counts": heatmap.busy.astype("<u4").tobytes(), "computed_at": computed_at}
+                for key, heatmap in found.items()
+            ])
+
+    @staticmethod
+    def save(record: AvailabilityHeatmap, storage: Session) -> bool:
+        storage.add(record)
+        storage.commit()
+        return True
+
+    @staticmethod
+    def load(identifier: str, storage: Session) -> AvailabilityHeatmap | None:
+        return storage.get(AvailabilityHeatmap, identifier)
+
+    @staticmethod
+    def search(criteria: list[Any], storage: Session) -> list[AvailabilityHeatmap]:
+        return storage.query(AvailabilityHeatmap).filter(*criteria).all()
+
+    @staticmethod
+    def safe_delete(record: AvailabilityHeatmap, storage: Session) -> bool:
+        # A cache entry, nothing to keep around
+        return AvailabilityCtrl.permanent_delete(record, storage)
+
+    @staticmethod
+    def permanent_delete(record: AvailabilityHeatmap, storage: Session) -> bool:
+        storage.delete(record)
+        storage.commit()
+        return True
+
+
+def _week_grid(week_start: datetime) -> SlotGrid:
+    return SlotGrid(start=week_start, step=timedelta(minutes=SLOT_MINUTES), size=WEEK_SLOTS)
+
+
+def _decode(row: AvailabilityHeatmap) -> Heatmap:
+    busy = np.frombuffer(row.busy_counts, dtype="<u4").astype(np.int64)
+    return Heatmap(week_start=naive_utc(row.week_start), member_count=row.member_count, busy=busy)
+
+
+# Worker process side of precompute. Every worker opens its own engine, connections can't cross processes
+_worker_sessions: sessionmaker | None = None
+
+
+def _init_worker(database_url: str) -> None:
+    global _worker_sessions
+    from src.database import build_engine
+    _worker_sessions = sessionmaker(bind=build_engine(database_url))
+
+
+def _attach(name: str, rows: int) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray((rows, ROW_BYTES), dtype=np.uint8, buffer=block.buf)
+
+
+def _fill_rows(name: str, rows: int, first: int, user_ids: list[str], week_start: datetime) -> None:
+    with _worker_sessions() as session:
+        members, starts, ends = ScheduleCtrl.busy_intervals(user_ids, week_start, week_start + timedelta(days=7), session)
+    busy = _week_grid(week_start).busy_matrix(members, starts, ends, len(user_ids))
+    block, bitmaps = _attach(name, rows)
+    bitmaps[first:first + len(user_ids)] = np.packbits(busy, axis=1, bitorder="little")
+    # The view has to go before the block can be closed
+    del bitmaps
+    block.close()
+
+
+def _count_busy(name: str, rows: int, group: np.ndarray) -> np.ndarray:
+    block, bitmaps = _attach(name, rows)
+    busy = np.unpackbits(bitmaps[group], axis=1, count=WEEK_SLOTS, bitorder="little").sum(axis=0, dtype=np.int64)
+    del bitmaps
+    block.close()
+    return busy
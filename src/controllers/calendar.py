@@ -1,4 +1,5 @@
 from typing import Any
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from src.classes.event import Event
@@ -45,6 +46,20 @@ class CalendarCtrl(PersistentController):
         db.refresh(new_calendar)
         return new_calendar
 
+    @staticmethod
+    def event_spans(user_id: str, storage: Session) -> dict[str, int]:
+        """
+        The live calendars of a user with the length of their longest event, what EventCtrl.list_in_window expects
+        :param user_id: The owner of the calendars
+        :param storage: The database session
+        :return: calendar_id -> max_event_seconds
+        """
+        return dict(
+            storage.query(Calendar.calendar_id, Calendar.max_event_seconds).filter(
+                Calendar.user_id == user_id, Calendar.deleted.is_(False)
+            ).all()
+        )
+
     @staticmethod
     def save(record: Calendar, storage: Session) -> bool:
         storage.add(record)
@@ -56,6 +71,25 @@ class CalendarCtrl(PersistentController):
     def load(identifier: str, storage: Session) -> Calendar | None:
         return storage.query(Calendar).filter(Calendar.calendar_id == identifier, Calendar.deleted.is_(False)).first()
 
+    @staticmethod
+    def load_owned(identifier: str, user_id: str, storage: Session) -> Calendar | None:
+        """
+        Load a calendar only if it belongs to the given user
+        :param identifier: The calendar to find
+        :param user_id: The user that must own the calendar
+        :param storage: The database session
+        :return: the calendar, or None if it does not exist or belongs to somebody else
+        """
+        return (
+            storage.query(Calendar)
+            .filter(Calendar.calendar_id == identifier, Calendar.user_id == user_id, Calendar.deleted.is_(False))
+            .first()
+        )
+
+    @staticmethod
+    async def load_owned_async(identifier: str, user_id: str, storage: AsyncSession) -> Calendar | None:
+        return await storage.run_sync(lambda session: CalendarCtrl.load_owned(identifier, user_id, session))
+
     @staticmethod
     def search(criteria: list[Any], storage: Session) -> list[Calendar]:
         return storage.query(Calendar).filter(*criteria, Calendar.deleted.is_(False)).all()
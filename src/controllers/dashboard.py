@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy.orm import Session, selectinload
+
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.poll import Poll
+from src.controllers.events import EventCtrl, EventOccurrence
+from src.enums import DeliveryStatus
+
+
+@dataclass(frozen=True)
+class Dashboard:
+    """
+    Everything the dashboard shows on load
+    """
+    calendars: list[Calendar]
+    events: list[Event | EventOccurrence]
+    polls: list[Poll]
+    notifications: list[Notification]
+
+
+class DashboardCtrl:
+    """
+    Read-only aggregate of the first screen of a user. Every part is one or two set based queries over all the
+    user's calendars at once, so the number of statements stays the same however many calendars the user has
+    """
+
+    @staticmethod
+    def load_for_user(user_id: str, start: datetime, end: datetime, limit: int, storage: Session) -> Dashboard:
+        """
+        The dashboard of a user
+        :param user_id: The user
+        :param start: Beginning of the window of upcoming events
+        :param end: End of the window of upcoming events
+        :param limit: At most this many upcoming events, open polls and pending notifications
+        :param storage: The database session
+        :return: live calendars, events overlapping the window (recurring ones expanded), open polls with their
+                 options and pending notifications of the user's events, soonest first
+        """
+        calendars = (
+            storage.query(Calendar)
+            .filter(Calendar.user_id == user_id, Calendar.deleted.is_(False))
+            .order_by(Calendar.name, Calendar.calendar_id)
+            .all()
+        )
+        spans = {calendar.calendar_id: calendar.max_event_seconds for calendar in calendars}
+        events = EventCtrl.list_occurrences(spans, start, end, storage, limit=limit) if spans else []
+        # The options of every poll come in a single second query
+        polls = (
+            storage.query(Poll)
+            .options(selectinload(Poll.options))
+            .filter(Poll.deleted.is_(False), Poll.is_closed.is_(False))
+            .order_by(Poll.created_at, Poll.poll_id)
+            .limit(limit)
+            .all()
+        )
+        notifications = (
+            storage.query(Notification)
+            .join(Event, Event.event_id == Notification.event_id)
+            .filter(
+                Event.calendar_id.in_(list(spans)),
+                Notification.deleted.is_(False),
+                Notification.delivery_status == DeliveryStatus.PENDING,
+            )
+            .order_by(Notification.timestamp, Notification.notification_id)
+            .limit(limit)
+            .all()
+        ) if spans else []
+        return Dashboard(calendars=calendars, events=events, polls=polls, notifications=notifications)
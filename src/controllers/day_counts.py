@@ -0,0 +1,187 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import Date, cast, delete, func, literal_column, select, union_all, update
+from sqlalchemy.orm import Session
+
+from src.classes.calendar import Calendar
+from src.classes.day_count import EventDayCount
+from src.classes.event import Event
+from src.classes.occurrence import Occurrence
+from src.classes.user import User
+from src.constants import DAY_COUNT_MAX_DAYS
+from src.controllers.events import EventCtrl
+from src.controllers.occurrences import OccurrenceCtrl
+from src.controllers.settings import SettingsCtrl
+from src.core.local_days import day_bounds, local_days, offset_spans, zone_or_utc
+from src.core.recurrence import expand_many, naive_utc
+from src.enums import RecurrenceRule
+from src.interfaces import PersistentController
+
+
+class DayCountCtrl(PersistentController):
+    """
+    How many events start on each local day, for the badges of a month view.
+    One-off events are counted ahead of time in event_day_counts, per calendar and local day of the time zone
+    stored on the calendar. The Event listeners keep those rows current on every write, so reading a month is one
+    grouped SUM however many events the calendars hold. The rows are rebuilt with grouped queries when the owner's
+    time zone is not the one they were built in. Recurring events never end and are counted at read time, from
+    event_occurrences inside its horizon and by expanding the series otherwise
+    """
+
+    @staticmethod
+    def timezone_of(user: User, storage: Session) -> str:
+        """
+        The time zone days are counted in: the one of the user's settings, else the one of the user, else UTC
+        """
+        settings = SettingsCtrl.load_for_user(user.user_id, storage)
+        return str(zone_or_utc(settings.timezone if settings else user.timezone))
+
+    @staticmethod
+    def count(user: User, first: date, last: date, storage: Session) -> tuple[str, dict[date, int]]:
+        """
+        Events of the calendars of a user starting on each local day from first to last, both included.
+        Recurring events count once per occurrence
+        :param user: The owner of the calendars
+        :param first: First day
+        :param last: Last day
+        :param storage: The database session
+        :return: the time zone used and day -> count of the days with at least one event
+        """
+        if last < first:
+            raise ValueError("The last day can't be before the first one.")
+        if (last - first).days >= DAY_COUNT_MAX_DAYS:
+            raise ValueError(f"Can't count more than {DAY_COUNT_MAX_DAYS} days at once.")
+        zone_name = DayCountCtrl.timezone_of(user, storage)
+        calendar_ids = list(storage.scalars(select(Calendar.calendar_id).where(
+            Calendar.user_id == user.user_id, Calendar.deleted.is_(False)
+        )))
+        if not calendar_ids:
+            return zone_name, {}
+        # rebuild commits, in a session of its own so the caller's is left alone
+        with Session(storage.get_bind()) as own:
+            DayCountCtrl.rebuild(calendar_ids, zone_name, own)
+
+        found: Counter[date] = Counter()
+        for day, count in storage.query(EventDayCount.day, func.sum(EventDayCount.count)).filter(
+            EventDayCount.calendar_id.in_(calendar_ids), EventDayCount.day.between(first, last)
+        ).group_by(EventDayCount.day):
+            found[_as_date(day)] += int(count)
+        found.update(DayCountCtrl._count_series(calendar_ids, ZoneInfo(zone_name), first, last, storage))
+        return zone_name, {day: count for day, count in sorted(found.items()) if count > 0}
+
+    @staticmethod
+    def rebuild(calendar_ids: list[str], zone_name: str, storage: Session) -> int:
+        """
+        Recount the one-off events of the calendars whose event_day_counts are missing or in another time zone.
+        Commits the session
+        :param calendar_ids: The calendars to check
+        :param zone_name: The time zone the counts must be in
+        :param storage: The database session
+        :return: how many calendars were rebuilt
+        """
+        stale = list(storage.scalars(select(Calendar.calendar_id).where(
+            Calendar.calendar_id.in_(calendar_ids),
+            Calendar.day_counts_timezone.is_distinct_from(zone_name),
+        )))
+        if not stale:
+            return 0
+        one_off = [
+            Event.calendar_id.in_(stale),
+            Event.deleted.is_not(True),
+            func.coalesce(Event.recurrence_rule, RecurrenceRule.NONE) == RecurrenceRule.NONE,
+        ]
+        earliest, latest = storage.query(func.min(Event.start_time), func.max(Event.start_time)).filter(*one_off).one()
+        rows = Counter()
+        if earliest is not None:
+            spans = offset_spans(ZoneInfo(zone_name), naive_utc(earliest), naive_utc(latest) + timedelta(microseconds=1))
+            for calendar_id, day, count in _grouped_by_day(Event, one_off, spans, storage):
+                rows[(calendar_id, _as_date(day))] += count
+
+        storage.execute(delete(EventDayCount).where(EventDayCount.calendar_id.in_(stale)))
+        if rows:
+            storage.execute(EventDayCount.__table__.insert(), [
+                {"calendar_id": calendar_id, "day": day, "count": count} for (calendar_id, day), count in rows.items()
+            ])
+        # From here on the Event listeners keep the rows of these calendars current
+        storage.execute(update(Calendar).where(Calendar.calendar_id.in_(stale)).values(day_counts_timezone=zone_name))
+        storage.commit()
+        return len(stale)
+
+    @staticmethod
+    def _count_series(calendar_ids: list[str], zone: ZoneInfo, first: date, last: date, storage: Session) -> Counter:
+        start, end = day_bounds(zone, first, last)
+        spans = offset_spans(zone, start, end)
+        if OccurrenceCtrl.covers(OccurrenceCtrl.load_horizon(storage), start, end):
+            found = Counter()
+            for _, day, count in _grouped_by_day(Occurrence, [Occurrence.calendar_id.in_(calendar_ids)], spans, storage):
+                found[_as_date(day)] += count
+            return found
+
+        series = EventCtrl.list_series(calendar_ids, end, storage)
+        if not series:
+            return Counter()
+        _, starts, _ = expand_many(
+            [e.start_time for e in series], [e.end_time for e in series], [e.recurrence_rule for e in series], start, end
+        )
+        # expand_many also returns the occurrences still running at start, only the ones starting inside count
+        starts = starts[starts >= np.datetime64(start, "us")]
+        days, counts = np.unique(local_days(starts, spans), return_counts=True)
+        return Counter(dict(zip(days.tolist(), counts.tolist())))
+
+    @staticmethod
+    def save(record: EventDayCount, storage: Session) -> bool:
+        storage.add(record)
+        storage.commit()
+        return True
+
+    @staticmethod
+    def load(identifier: tuple[str, date], storage: Session) -> EventDayCount | None:
+        return storage.get(EventDayCount, identifier)
+
+    @staticmethod
+    def search(criteria: list[Any], storage: Session) -> list[EventDayCount]:
+        return storage.query(EventDayCount).filter(*criteria).all()
+
+    @staticmethod
+    def safe_delete(record: EventDayCount, storage: Session) -> bool:
+        # Derived from the events, rebuilt whenever needed
+        return DayCountCtrl.permanent_delete(record, storage)
+
+    @staticmethod
+    def permanent_delete(record: EventDayCount, storage: Session) -> bool:
+        storage.delete(record)
+        storage.commit()
+        return True
+
+
+def _grouped_by_day(table, criteria: list, spans: list[tuple[datetime, datetime, int]], storage: Session) -> list[tuple]:
+    """
+    (calendar_id, local day, count) of the rows of table starting in the spans, one GROUP BY per span of constant
+    offset glued by UNION ALL, so the database does the counting without knowing anything about time zones
+    """
+    dialect = storage.get_bind().dialect.name
+    parts = []
+    for span_start, span_end, minutes in spans:
+        day = _local_date(table.start_time, minutes, dialect).label("day")
+        parts.append(
+            select(table.calendar_id, day, func.count().label("count"))
+            .where(*criteria, table.start_time >= span_start, table.start_time < span_end)
+            .group_by(table.calendar_id, day)
+        )
+    return storage.execute(union_all(*parts)).all()
+
+
+def _local_date(column, minutes: int, dialect: str):
+    if dialect == "postgresql":
+        return cast(func.timezone("UTC", column) + timedelta(minutes=minutes), Date)
+    # SQLite stores the naive UTC time as text, its date() applies the modifier before truncating
+    return func.date(column, literal_column(f"'{minutes:+d} minutes'"))
+
+
+def _as_date(value: date | str) -> date:
+    # SQLite hands back computed dates as text
+    return date.fromisoformat(value) if isinstance(value, str) else value
@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.core.config import EVENT_INDEX_MAX_CALENDARS
+from src.core.interval_index import IntervalIndex
+
+
+@dataclass(frozen=True)
+class Conflict:
+    """
+    An event, or one occurrence of a recurring event, overlapping the time asked about. Times are naive UTC
+    """
+    event_id: str
+    calendar_id: str
+    start_time: datetime
+    end_time: datetime
+
+
+class EventIndexCache:
+    """
+    Warm IntervalIndex of the most recently used calendars, evicted least recently used first.
+    Every index remembers the busy_version of its calendar. A lookup compares it with the version in the
+    database (one query for all the calendars asked about) and rebuilds the stale ones, so writes from
+    another process are never missed. Writes through EventCtrl call written, which applies the change in
+    place when the version moved by exactly that write and drops the index otherwise
+    """
+    def __init__(self, max_calendars: int = 500):
+        self.max_calendars = max_calendars
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[str, IntervalIndex] = OrderedDict()
+
+    def overlapping(self, user_id: str, start: datetime, end: datetime, storage: Session) -> list[Conflict]:
+        """
+        Events of the live calendars of a user overlapping [start, end)
+        :param user_id: The user whose calendars are searched
+        :param start: Beginning of the window
+        :param end: End of the window
+        :param storage: The database session
+        :return: the events, ordered by start
+        """
+        indexes = self._warm(user_id, storage)
+        with self._lock:
+            found = [
+                Conflict(event_id, calendar_id, event_start, event_end)
+                for calendar_id, index in indexes.items()
+                for event_id, event_start, event_end in index.overlapping(start, end)
+            ]
+        return sorted(found, key=lambda conflict: (conflict.start_time, conflict.event_id))
+
+    def is_busy(self, user_id: str, at: datetime, storage: Session) -> bool:
+        """
+        Whether any event of the live calendars of a user covers the given moment
+        """
+        indexes = self._warm(user_id, storage)
+        with self._lock:
+            return any(index.is_busy(at) for index in indexes.values())
+
+    def written(self, event_id: str, calendar_ids: set[str], record: Event | None, storage: Session) -> None:
+        """
+        Apply a committed write to the cached indexes of the calendars it touched
+        :param event_id: The event written
+        :param calendar_ids: Calendars the event was in before and after the write
+        :param record: The event as written, None once permanently deleted
+        :param storage: The database session
+        """
+        with self._lock:
+            cached = [calendar_id for calendar_id in calendar_ids if calendar_id in self._indexes]
+        if not cached:
+            return
+        versions = dict(storage.query(Calendar.calendar_id, Calendar.busy_version).filter(Calendar.calendar_id.in_(cached)))
+        with self._lock:
+            for calendar_id in cached:
+                index = self._indexes.get(calendar_id)
+                if index is None:
+                    continue
+                # Anything but this one write in between (another process, a rolled back flush) and the
+                # index can't be trusted anymore
+                if versions.get(calendar_id) != index.version + 1:
+                    del self._indexes[calendar_id]
+                    continue
+                index.discard(event_id)
+                if record is not None and record.calendar_id == calendar_id and not record.deleted:
+                    index.add(event_id, record.start_time, record.end_time, record.recurrence_rule)
+                index.version += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def _warm(self, user_id: str, storage: Session) -> dict[str, IntervalIndex]:
+        versions = dict(storage.query(Calendar.calendar_id, Calendar.busy_version).filter(
+            Calendar.user_id == user_id, Calendar.deleted.is_(False)
+        ))
+        with self._lock:
+            found = {
+                calendar_id: self._indexes[calendar_id]
+                for calendar_id, version in versions.items()
+                if calendar_id in self._indexes and self._indexes[calendar_id].version == version
+            }
+        stale = [calendar_id for calendar_id in versions if calendar_id not in found]
+        if stale:
+            built = {calendar_id: IntervalIndex(versions[calendar_id]) for calendar_id in stale}
+            for calendar_id, event_id, start, end, rule in storage.query(
+                Event.calendar_id, Event.event_id, Event.start_time, Event.end_time, Event.recurrence_rule
+            ).filter(Event.calendar_id.in_(stale), Event.deleted.is_(False)):
+                built[calendar_id].add(event_id, start, end, rule)
+            found.update(built)
+        with self._lock:
+            for calendar_id, index in found.items():
+                self._indexes[calendar_id] = index
+                self._indexes.move_to_end(calendar_id)
+            while len(self._indexes) > self.max_calendars:
+                self._indexes.popitem(last=False)
+        return found
+
+
+event_indexes = EventIndexCache(EVENT_INDEX_MAX_CALENDARS)
@@ -1,11 +1,47 @@
-from datetime import datetime, timedelta
-from typing import Any
-from sqlalchemy.orm import Session
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Iterator
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, inspect, literal_column, or_, select, tuple_, union_all
+from sqlalchemy.orm import Session, aliased
 
+from src.classes.calendar import Calendar
 from src.classes.event import Event
 from src.classes.notification import Notification
+from src.constants import (
+    CONFLICT_LOOKAHEAD_DAYS, DEFAULT_REMINDER_MINUTES, LAYOUT_MAX_DAYS, RECURRENCE_BATCH_SIZE, UNION_MAX_ARMS
+)
+from src.controllers.event_index import Conflict, event_indexes
+from src.controllers.notifications import NotificationCtrl
+from src.controllers.occurrences import OccurrenceCtrl
+from src.core.config import NOTIFICATION_HORIZON_SECONDS
+from src.core.layout import assign_lanes
+from src.core.recurrence import expand_many, naive_utc, occurrences
 from src.interfaces import PersistentController
-from src.enums import NotificationTypes
+from src.enums import NotificationTypes, RecurrenceRule
+
+# Changing any of these moves the occurrences of a recurring event
+OCCURRENCE_FIELDS = ('start_time', 'end_time', 'recurrence_rule', 'calendar_id', 'deleted')
+
+
+@dataclass(frozen=True)
+class EventOccurrence:
+    """
+    One occurrence of a recurring event: the event with the times of that occurrence, everything else is read
+    from the event itself
+    """
+    event: Event
+    start_time: datetime
+    end_time: datetime
+
+    @property
+    def series_start(self) -> datetime:
+        return self.event.start_time
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.event, name)
 
 
 class EventCtrl(PersistentController):
@@ -18,6 +54,7 @@ class EventCtrl(PersistentController):
         location: str,
         calendar_id: str,
         recurrence_rule: int = 0,
+        reminder_minutes: int | None = DEFAULT_REMINDER_MINUTES,
     ) -> Event:
         """
         Factory to create an Event
@@ -28,6 +65,7 @@ class EventCtrl(PersistentController):
         :param location: The location of the event
         :param calendar_id: The ID of the calendar this event belongs to
         :param recurrence_rule: The recurrence rule for the event
+        :param reminder_minutes: Minutes before the event (each occurrence) its reminder goes out, None for none
         :return: a new Event object
         """
         new_event = Event(
@@ -37,29 +75,339 @@ class EventCtrl(PersistentController):
             location=location,
             calendar_id=calendar_id,
             recurrence_rule=recurrence_rule,
+            reminder_minutes=reminder_minutes,
         )
         db.add(new_event)
         db.flush()  # Flush to get the event_id
 
-        # Create a default notification 15 minutes before the event
-        notification_time = start_time - timedelta(minutes=15)
-        default_notification = Notification(
-            event_id=new_event.event_id,
-            type=NotificationTypes.ALERT,
-            message=f"Reminder: {title} is starting soon.",
-            timestamp=notification_time,
-        )
-        db.add(default_notification)
+        if recurrence_rule:
+            OccurrenceCtrl.materialize(new_event, db)
+            # Reminders of the occurrences coming up now, the dispatcher generates the later ones as they come
+            EventCtrl._generate_reminders(new_event, db)
+        elif reminder_minutes is not None:
+            # Create a default notification reminder_minutes before the event
+            EventCtrl._add_reminder(new_event, db)
 
         db.commit()
         db.refresh(new_event)
+        event_indexes.written(new_event.event_id, {calendar_id}, new_event, db)
         return new_event
 
+    @staticmethod
+    async def create_async(
+        db: AsyncSession,
+        title: str,
+        start_time: datetime,
+        end_time: datetime,
+        location: str,
+        calendar_id: str,
+        recurrence_rule: int = 0,
+        reminder_minutes: int | None = DEFAULT_REMINDER_MINUTES,
+    ) -> Event:
+        """
+        Async variant of create, runs the same unit of work through the async session
+        """
+        return await db.run_sync(
+            lambda session: EventCtrl.create(
+                session, title, start_time, end_time, location, calendar_id, recurrence_rule, reminder_minutes
+            )
+        )
+
+    @staticmethod
+    def conflicts(record: Event, user_id: str, storage: Session) -> list[Conflict]:
+        """
+        Other events of the user's calendars overlapping an event, answered from the warm interval indexes
+        of event_indexes. A recurring event is checked over its occurrences in the first
+        CONFLICT_LOOKAHEAD_DAYS of the series
+        :param record: The event to check, it may not be stored yet
+        :param user_id: The user whose calendars are searched
+        :param storage: The database session
+        :return: the conflicting events or occurrences, ordered by start
+        """
+        start, end = naive_utc(record.start_time), naive_utc(record.end_time)
+        horizon = start + timedelta(days=CONFLICT_LOOKAHEAD_DAYS) if record.recurrence_rule else end
+        found = event_indexes.overlapping(user_id, start, horizon, storage)
+        if record.recurrence_rule:
+            # Only what overlaps an actual occurrence, not the whole lookahead
+            windows = list(occurrences(start, end, record.recurrence_rule, start, horizon))
+            found = [
+                conflict for conflict in found
+                if any(conflict.start_time < window_end and conflict.end_time > window_start
+                       for window_start, window_end in windows)
+            ]
+        return [conflict for conflict in found if conflict.event_id != record.event_id]
+
+    @staticmethod
+    async def conflicts_async(record: Event, user_id: str, storage: AsyncSession) -> list[Conflict]:
+        return await storage.run_sync(lambda session: EventCtrl.conflicts(record, user_id, session))
+
+    @staticmethod
+    def list_in_window(
+        calendar_spans: dict[str, int],
+        start: datetime | None,
+        end: datetime | None,
+        storage: Session,
+        after: tuple[datetime, str] | None = None,
+        limit: int | None = None,
+        one_off_only: bool = False,
+    ) -> list[Event]:
+        """
+        Live events of the given calendars overlapping [start, end), ordered by (start_time, event_id). Either
+        bound may be None to leave that side open. An overlapping event starts at most the calendar's longest
+        event before start, which caps the index range scan so old history is never read.
+        Recurring events are matched on their first occurrence, see list_occurrences for the expanded series
+        :param calendar_spans: calendar_id -> max_event_seconds of each calendar to search
+        :param start: Beginning of the window
+        :param end: End of the window
+        :param storage: The database session
+        :param after: Only events sorting after this (start_time, event_id), the key of the previous page's last row
+        :param limit: At most this many events
+        :param one_off_only: Leave recurring events out
+        :return: the events
+        """
+        if not calendar_spans:
+            return []
+        start, end = _as_utc(start), _as_utc(end)
+        if start is not None and end is not None and end <= start:
+            raise ValueError("The end of the window must be after its start.")
+
+        after_key = (_as_utc(after[0]), after[1]) if after is not None else None
+
+        def criteria(calendar_ids: list[str], span: int) -> list:
+            found = [Event.calendar_id.in_(calendar_ids), Event.deleted.is_(False)]
+            if one_off_only:
+                found.append(func.coalesce(Event.recurrence_rule, RecurrenceRule.NONE) == RecurrenceRule.NONE)
+            if end is not None:
+                found.append(Event.start_time < end)
+            earliest = None
+            if start is not None:
+                found.append(Event.end_time > start)
+                earliest = start - timedelta(seconds=span)
+            if after_key is not None:
+                found.append(tuple_(Event.start_time, Event.event_id) > tuple_(*after_key))
+                # Only one lower bound on start_time can drive the index seek, keep the tighter one
+                if earliest is not None and _naive(after_key[0]) >= _naive(earliest):
+                    earliest = None
+            if earliest is not None:
+                found.append(Event.start_time >= earliest)
+            return found
+
+        order = (Event.start_time, Event.event_id)
+        if limit is None or len(calendar_spans) == 1:
+            query = storage.query(Event).filter(*criteria(list(calendar_spans), max(calendar_spans.values())))
+            return query.order_by(*order).limit(limit).all()
+
+        # One index seek per calendar, each stopping after limit rows, merged by the outer ORDER BY. A single
+        # query over all the calendars would have to sort every remaining row of the window to find the first few.
+        # SQLite caps the arms of a compound select, more calendars than UNION_MAX_ARMS take one query per chunk
+        calendars = list(calendar_spans.items())
+        chunks = []
+        for offset in range(0, len(calendars), UNION_MAX_ARMS):
+            pages = union_all(*[
+                select(Event).where(*criteria([calendar_id], span)).order_by(*order).limit(limit).subquery().select()
+                for calendar_id, span in calendars[offset:offset + UNION_MAX_ARMS]
+            ]).subquery()
+            merged = aliased(Event, pages)
+            chunks.append(list(storage.scalars(select(merged).order_by(merged.start_time, merged.event_id).limit(limit))))
+        if len(chunks) == 1:
+            return chunks[0]
+        return list(islice(heapq.merge(*chunks, key=_occurrence_key), limit))
+
+    @staticmethod
+    def list_series(calendar_ids: list[str], before: datetime, storage: Session) -> list[Event]:
+        """
+        Live recurring events of the given calendars whose series started before a point in time. Series never
+        end, any of them may have occurrences after that point
+        :param calendar_ids: The calendars to search
+        :param before: Only series starting before this
+        :param storage: The database session
+        :return: the recurring events
+        """
+        return (
+            storage.query(Event)
+            .filter(
+                Event.calendar_id.in_(calendar_ids),
+                # IS NOT can't drive an index seek: without statistics SQLite would otherwise find
+                # ix_events_calendar_timeline just as good as the partial index and pick either one
+                Event.deleted.is_not(True),
+                # Spelled out literally so SQLite can match the WHERE of the partial ix_events_recurring index
+                Event.recurrence_rule != literal_column(str(int(RecurrenceRule.NONE))),
+                Event.start_time < _as_utc(before),
+            )
+            .all()
+        )
+
+    @staticmethod
+    def list_occurrences(
+        calendar_spans: dict[str, int],
+        start: datetime,
+        end: datetime,
+        storage: Session,
+        after: tuple[datetime, str] | None = None,
+        limit: int | None = None,
+    ) -> list[Event | EventOccurrence]:
+        """
+        Like list_in_window, with recurring events expanded into their occurrences overlapping [start, end).
+        One-off events come from the window query. Inside the horizon of event_occurrences the occurrences are a
+        range scan of that table, otherwise the series come from list_series and are expanded here. Paging through a few series merges
+        lazy per-series generators and stops after limit occurrences; a whole window over many series goes
+        through the vectorized expand_many
+        :param calendar_spans: calendar_id -> max_event_seconds of each calendar to search
+        :param start: Beginning of the window
+        :param end: End of the window
+        :param storage: The database session
+        :param after: Only occurrences sorting after this (start_time, event_id), the key of the previous page's last row
+        :param limit: At most this many occurrences
+        :return: events and occurrences ordered by (start_time, event_id)
+        """
+        one_offs = EventCtrl.list_in_window(calendar_spans, start, end, storage, after, limit, one_off_only=True)
+        if calendar_spans and OccurrenceCtrl.covers(OccurrenceCtrl.load_horizon(storage), start, end):
+            materialized = [
+                EventOccurrence(*row) for row in OccurrenceCtrl.list_in_window(calendar_spans, start, end, storage, after, limit)
+            ]
+            return list(islice(heapq.merge(one_offs, materialized, key=_occurrence_key), limit))
+
+        series = EventCtrl.list_series(list(calendar_spans), end, storage) if calendar_spans else []
+        if not series:
+            return one_offs
+
+        after_key = (_naive(_as_utc(after[0])), after[1]) if after is not None else None
+
+        def is_after(item) -> bool:
+            return after_key is None or (_naive(item.start_time), item.event_id) > after_key
+
+        if limit is None and len(series) >= RECURRENCE_BATCH_SIZE:
+            index, starts, ends = expand_many(
+                [e.start_time for e in series], [e.end_time for e in series], [e.recurrence_rule for e in series], start, end
+            )
+            expanded = [
+                EventOccurrence(series[i], occurrence_start, occurrence_end)
+                for i, occurrence_start, occurrence_end in zip(index.tolist(), starts.tolist(), ends.tolist())
+            ]
+            return sorted(one_offs + [o for o in expanded if is_after(o)], key=_occurrence_key)
+
+        # Nothing before the cursor can be on this page, the generators start there
+        window_start = max(_naive(_as_utc(start)), after_key[0]) if after_key else start
+        streams = [_occurrences_of(event, window_start, end) for event in series]
+        merged = filter(is_after, heapq.merge(one_offs, *streams, key=_occurrence_key))
+        return list(islice(merged, limit))
+
+    @staticmethod
+    def list_laid_out(
+        calendar_spans: dict[str, int], start: datetime, end: datetime, storage: Session
+    ) -> list[tuple[Event | EventOccurrence, int, int]]:
+        """
+        list_occurrences with the column each event takes in a day or week view, see assign_lanes
+        :param calendar_spans: calendar_id -> max_event_seconds of each calendar to search
+        :param start: Beginning of the window
+        :param end: End of the window
+        :param storage: The database session
+        :return: (event or occurrence, lane, lane count) ordered by (start_time, event_id)
+        """
+        if _as_utc(end) - _as_utc(start) > timedelta(days=LAYOUT_MAX_DAYS):
+            raise ValueError(f"The window can't be longer than {LAYOUT_MAX_DAYS} days.")
+        found = EventCtrl.list_occurrences(calendar_spans, start, end, storage)
+        lanes = assign_lanes([(_naive(_as_utc(item.start_time)), _naive(_as_utc(item.end_time))) for item in found])
+        return [(item, lane, count) for item, (lane, count) in zip(found, lanes)]
+
+    @staticmethod
+    def list_public(storage: Session, after: tuple[datetime, str] | None = None, limit: int | None = None) -> list[Event]:
+        """
+        Live events of public or shared calendars, ordered by (start_time, event_id)
+        :param storage: The database session
+        :param after: Only events sorting after this (start_time, event_id), the key of the previous page's last row
+        :param limit: At most this many events
+        :return: the events
+        """
+        query = (
+            storage.query(Event)
+            .join(Calendar)
+            .filter(
+                or_(Calendar.visibility == 'public', Calendar.shared.is_(True)),
+                Event.deleted.is_(False),
+                Calendar.deleted.is_(False),
+            )
+        )
+        if after is not None:
+            query = query.filter(tuple_(Event.start_time, Event.event_id) > tuple_(_as_utc(after[0]), after[1]))
+        return query.order_by(Event.start_time, Event.event_id).limit(limit).all()
+
+    @staticmethod
+    def load_owned(event_id: str, calendar_id: str, user_id: str, storage: Session) -> Event | None:
+        """
+        Load an event only if it lives in the given calendar and that calendar belongs to the given user
+        :param event_id: The event to find
+        :param calendar_id: The calendar the event must belong to
+        :param user_id: The user that must own the calendar
+        :param storage: The database session
+        :return: the event, or None if it does not exist or is not owned by the user
+        """
+        return (
+            storage.query(Event)
+            .join(Calendar)
+            .filter(
+                Event.event_id == event_id,
+                Event.calendar_id == calendar_id,
+                Calendar.user_id == user_id,
+                Event.deleted.is_(False),
+            )
+            .first()
+        )
+
+    @staticmethod
+    async def load_owned_async(event_id: str, calendar_id: str, user_id: str, storage: AsyncSession) -> Event | None:
+        return await storage.run_sync(lambda session: EventCtrl.load_owned(event_id, calendar_id, user_id, session))
+
+    @staticmethod
+    async def save_async(record: Event, storage: AsyncSession) -> bool:
+        return await storage.run_sync(lambda session: EventCtrl.save(record, session))
+
     @staticmethod
     def save(record: Event, storage: Session) -> bool:
+        state = inspect(record)
+        moved = state.transient or state.pending or any(
+            state.attrs[name].history.has_changes() for name in OCCURRENCE_FIELDS
+        )
+        calendar_ids = {record.calendar_id, *state.attrs.calendar_id.history.deleted} - {None}
+        # Reminders keep their distance to the start of the event
+        started = state.attrs.start_time.history
+        shift = (
+            naive_utc(started.added[0]) - naive_utc(started.deleted[0])
+            if started.added and started.deleted and started.added[0] and started.deleted[0] else None
+        )
+        # The reminders generated for the occurrences of a series are made again from what it is now
+        regenerate = moved or state.attrs.reminder_minutes.history.has_changes()
+        # So is the reminder of a one-off event, when it becomes a series, stops being one or changes its lead
+        rule, minutes = state.attrs.recurrence_rule.history, state.attrs.reminder_minutes.history
+        was_recurring = rule.deleted[0] if rule.deleted else record.recurrence_rule
+        was_minutes = minutes.deleted[0] if minutes.deleted else record.reminder_minutes
+        redo_one_off = not (state.transient or state.pending) and (rule.has_changes() or minutes.has_changes())
         storage.add(record)
+        if shift:
+            NotificationCtrl.shift_pending(record.event_id, shift, storage)
+        if regenerate and not (state.transient or state.pending):
+            NotificationCtrl.withdraw_generated(record.event_id, storage)
+        if redo_one_off:
+            # shift_pending already moved it along with the event
+            withdrawn = not was_recurring and was_minutes is not None and NotificationCtrl.withdraw_reminder(
+                record.event_id, naive_utc(record.start_time) - timedelta(minutes=was_minutes), storage
+            )
+            one_off = not record.recurrence_rule and record.reminder_minutes is not None and not record.deleted
+            # A reminder already sent isn't sent again, and one the event didn't have is only added ahead of time
+            had_none = was_recurring or was_minutes is None
+            upcoming = one_off and EventCtrl._reminder_due(record) > naive_utc(datetime.now(timezone.utc))
+            if one_off and (withdrawn or (had_none and upcoming)):
+                EventCtrl._add_reminder(record, storage)
+        if moved:
+            storage.flush()
+            OccurrenceCtrl.materialize(record, storage)
+        if regenerate and record.recurrence_rule and not record.deleted:
+            storage.flush()
+            EventCtrl._generate_reminders(record, storage)
         storage.commit()
         storage.refresh(record)
+        if moved:
+            event_indexes.written(record.event_id, calendar_ids, record, storage)
         return True
 
     @staticmethod
@@ -72,12 +420,64 @@ class EventCtrl(PersistentController):
 
     @staticmethod
     def safe_delete(record: Event, storage: Session) -> bool:
+        event_id, calendar_id = record.event_id, record.calendar_id
         record.deleted = True
+        OccurrenceCtrl.forget(event_id, storage)
         storage.commit()
+        event_indexes.written(event_id, {calendar_id}, None, storage)
         return True
 
     @staticmethod
     def permanent_delete(record: Event, storage: Session) -> bool:
+        event_id, calendar_id = record.event_id, record.calendar_id
+        OccurrenceCtrl.forget(event_id, storage)
         storage.delete(record)
         storage.commit()
+        event_indexes.written(event_id, {calendar_id}, None, storage)
         return True
+
+
+    @staticmethod
+    def _reminder_due(record: Event) -> datetime:
+        return naive_utc(record.start_time) - timedelta(minutes=record.reminder_minutes)
+
+    @staticmethod
+    def _add_reminder(record: Event, storage: Session) -> None:
+        # The one reminder of a one-off event, reminder_minutes before it
+        storage.add(Notification(
+            event_id=record.event_id,
+            type=NotificationTypes.ALERT,
+            message=f"Reminder: {record.title} is starting soon.",
+            timestamp=EventCtrl._reminder_due(record),
+        ))
+
+    @staticmethod
+    def _generate_reminders(record: Event, storage: Session) -> None:
+        # What the dispatcher's next sweep would generate for the event, so the reminders due before it aren't late
+        now = datetime.now(timezone.utc)
+        NotificationCtrl.generate_reminders(
+            now, now + timedelta(seconds=NOTIFICATION_HORIZON_SECONDS), storage, [record.event_id]
+        )
+
+
+def _as_utc(moment: datetime | None) -> datetime | None:
+    # Times are stored as UTC wall clock, naive values are taken to be UTC already
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc)
+
+
+def _naive(moment: datetime) -> datetime:
+    # UTC values compared with each other whether or not they carry a tzinfo
+    return moment.replace(tzinfo=None)
+
+
+def _occurrences_of(event: Event, window_start: datetime, window_end: datetime) -> Iterator[EventOccurrence]:
+    for occurrence_start, occurrence_end in occurrences(
+        event.start_time, event.end_time, event.recurrence_rule, window_start, window_end
+    ):
+        yield EventOccurrence(event, occurrence_start, occurrence_end)
+
+
+def _occurrence_key(item: Event | EventOccurrence) -> tuple[datetime, str]:
+    return _naive(_as_utc(item.start_time)), item.event_id
@@ -1,4 +1,5 @@
 from typing import Any
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
 from src.classes.friend import Friend
@@ -35,6 +36,25 @@ class FriendsCtrl(PersistentController):
         db.refresh(new_friendship)
         return new_friendship
 
+    @staticmethod
+    def active_friend_ids(user_id: str, among: list[str], storage: Session) -> set[str]:
+        """
+        Which of the given users are active friends of a user, whichever side of the friendship they are on
+        :param user_id: The user whose friends are looked up
+        :param among: The users to check
+        :param storage: The database session
+        :return: the ids of the users in among that are friends with user_id
+        """
+        rows = storage.query(Friend.left_id, Friend.right_id).filter(
+            Friend.deleted.is_(False),
+            Friend.status == FriendStatus.ACTIVE,
+            or_(
+                and_(Friend.left_id == user_id, Friend.right_id.in_(among)),
+                and_(Friend.right_id == user_id, Friend.left_id.in_(among)),
+            ),
+        )
+        return {right_id if left_id == user_id else left_id for left_id, right_id in rows}
+
     @staticmethod
     def save(record: Friend, storage: Session) -> bool:
         storage.add(record)
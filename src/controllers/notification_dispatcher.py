@@ -0,0 +1,319 @@
+import logging
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+
+from src.base_class import default_uuid
+from src.classes.notification import Notification
+from src.controllers.notifications import NotificationCtrl
+from src.core.delivery import NotificationBackend, coalesce, retry_delay
+from src.core.recurrence import naive_utc
+from src.core.timing_wheel import TimingWheel
+from src.enums import DeliveryStatus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DispatchResult:
+    sent: int = 0
+    # Failed and scheduled to be sent again
+    retried: int = 0
+    # Failed on their last attempt
+    dead_lettered: int = 0
+    cancelled: int = 0
+
+    @property
+    def claimed(self) -> int:
+        return self.sent + self.retried + self.dead_lettered + self.cancelled
+
+    def add(self, other: "DispatchResult") -> None:
+        self.sent += other.sent
+        self.retried += other.retried
+        self.dead_lettered += other.dead_lettered
+        self.cancelled += other.cancelled
+
+
+class NotificationDispatcher:
+    """
+    Sends due notifications. A sweep claims batches of due notifications (NotificationCtrl.claim_due, one
+    UPDATE per batch through ix_notifications_due), hands each batch to the backend and records what was sent
+    and what failed with one UPDATE per outcome. Claims are leases: several dispatchers, in this process or
+    others, can run side by side without sending anything twice, and the notifications of one that dies are
+    taken over once its claims expire.
+    Between sweeps, every interval, the dispatcher doesn't poll: each sweep loads the notifications due within
+    the horizon into a TimingWheel, and the thread sleeps until the next one is due and claims exactly the ones
+    whose timer fired. Notifications written in this process reach the wheel when their transaction commits
+    (reminders_written), ones written by other processes with the next sweep.
+    A failed delivery is retried after an exponential backoff with jitter (retry_delay), through the same
+    claim and the same wheel, until max_attempts have failed; then it is dead lettered.
+    Recurring events store their reminder as a rule (Event.reminder_minutes): every pass first generates the
+    reminders of the occurrences coming within the horizon, so a series never has more rows than that.
+    With a digest window, whoever has something due also gets what falls due for them within the window, all
+    of it coalesced into one digest per user: one delivery instead of one per notification
+    """
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        backend: NotificationBackend,
+        batch_size: int = 500,
+        interval: float = 60,
+        claim_seconds: float = 300,
+        worker_id: str | None = None,
+        horizon: float = 900,
+        max_attempts: int = 5,
+        retry_seconds: float = 30,
+        retry_max_seconds: float = 3600,
+        digest_seconds: float = 0,
+    ):
+        if horizon <= interval:
+            raise ValueError("The horizon must be longer than the interval between sweeps.")
+        self._session_factory = session_factory
+        self.backend = backend
+        self.batch_size = batch_size
+        self.interval = interval
+        self.horizon = timedelta(seconds=horizon)
+        self.lease = timedelta(seconds=claim_seconds)
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.digest_window = timedelta(seconds=digest_seconds) if digest_seconds else None
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{default_uuid()[:8]}"
+
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._wheel_lock = threading.Lock()
+        self._wheel: TimingWheel | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self, now: datetime | None = None) -> DispatchResult:
+        """
+        Send everything due now, batch after batch until a batch comes back short
+        :param now: The current time, defaults to the clock
+        :return: how many notifications were sent, failed and were cancelled
+        """
+        result = DispatchResult()
+        self.generate(now or datetime.now(timezone.utc))
+        while not self._stopping.is_set():
+            batch = self.dispatch_batch(now or datetime.now(timezone.utc))
+            result.add(batch)
+            if batch.claimed < self.batch_size:
+                break
+        return result
+
+    def generate(self, now: datetime) -> int:
+        """
+        Add the reminders of recurring events falling due within the horizon (NotificationCtrl.generate_reminders),
+        before anything is claimed or loaded into the wheel
+        :return: how many were added
+        """
+        db = self._session_factory()
+        try:
+            added = NotificationCtrl.generate_reminders(now, now + self.horizon, db)
+            db.commit()
+            return added
+        except IntegrityError:
+            # Another dispatcher generated some of the same ones meanwhile, the next pass adds the rest
+            db.rollback()
+            return 0
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to generate reminders")
+            return 0
+        finally:
+            db.close()
+
+    def sweep(self, now: datetime | None = None) -> DispatchResult:
+        """
+        Send everything due now (run_once) and load what falls due within the horizon into the wheel
+        :param now: The current time, defaults to the clock
+        :return: what the sweep sent
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._wheel_lock:
+            # Up before the load, so nothing committed meanwhile slips between the two
+            if self._wheel is None:
+                self._wheel = TimingWheel(int(self.horizon.total_seconds()), naive_utc(now))
+        result = self.run_once(now)
+        db = self._session_factory()
+        try:
+            upcoming = NotificationCtrl.list_upcoming(now, now + self.horizon, db)
+        except Exception:
+            logger.exception("Failed to load upcoming notifications")
+            upcoming = []
+        finally:
+            db.close()
+        with self._wheel_lock:
+            for notification_id, due in upcoming:
+                self._wheel.schedule(notification_id, due)
+        # Timers that went off during the sweep, mostly already sent by it and then claimed by nobody
+        result.add(self.fire(now))
+        return result
+
+    def fire(self, now: datetime | None = None) -> DispatchResult:
+        """
+        Send the notifications whose timer in the wheel went off by now
+        :param now: The current time, defaults to the clock
+        :return: what was sent
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._wheel_lock:
+            fired = self._wheel.advance(now) if self._wheel is not None else []
+        result = DispatchResult()
+        for first in range(0, len(fired), self.batch_size):
+            result.add(self.dispatch_batch(now, fired[first:first + self.batch_size]))
+        return result
+
+    def next_wakeup(self) -> datetime | None:
+        """
+        When the soonest notification in the wheel is due, naive UTC
+        """
+        with self._wheel_lock:
+            return self._wheel.next_due() if self._wheel is not None else None
+
+    def reminders_written(self, written: dict[str, datetime | None]) -> None:
+        """
+        Put committed notification changes on the wheel
+        :param written: notification_id -> when it is due, None when it is no longer pending
+        """
+        with self._wheel_lock:
+            if self._wheel is None:
+                return
+            for notification_id, due in written.items():
+                if due is None:
+                    self._wheel.cancel(notification_id)
+                else:
+                    self._wheel.schedule(notification_id, due)
+        # The thread might be sleeping past the new one
+        self._wake.set()
+
+    def dispatch_batch(self, now: datetime, notification_ids: list[str] | None = None) -> DispatchResult:
+        """
+        Claim, send and record one batch, of any due notifications or of the given ones
+        """
+        db = self._session_factory()
+        try:
+            deliveries, orphaned = NotificationCtrl.claim_due(
+                self.worker_id, now, self.batch_size, self.lease, db, notification_ids, self.digest_window
+            )
+            if not deliveries and not orphaned:
+                return DispatchResult()
+            outgoing = coalesce(deliveries) if self.digest_window else deliveries
+            try:
+                failed = self.backend.send(outgoing) if outgoing else set()
+            except Exception:
+                logger.exception("Notification backend failed a batch of %d", len(outgoing))
+                failed = {delivery.notification_id for delivery in outgoing}
+            # A digest that failed fails every notification in it
+            failed = {i for d in outgoing if d.notification_id in failed for i in d.notification_ids}
+            sent = [d.notification_id for d in deliveries if d.notification_id not in failed]
+            dead = [d.notification_id for d in deliveries if d.notification_id in failed and d.attempt >= self.max_attempts]
+            retries = {
+                d.notification_id: naive_utc(now) + retry_delay(d.attempt, self.retry_seconds, self.retry_max_seconds)
+                for d in deliveries
+                if d.notification_id in failed and d.attempt < self.max_attempts
+            }
+            NotificationCtrl.record_outcomes(self.worker_id, {
+                DeliveryStatus.COMPLETED: sent,
+                DeliveryStatus.DEAD_LETTER: dead,
+                # Their event was deleted after they were created, there is nothing to remind of
+                DeliveryStatus.CANCELLED: orphaned,
+            }, now, db, retries)
+            # Retries come back through the same claim, on the wheel when they are due before the next sweep. The
+            # rest is done with, digests took some along before their timers went off
+            self.reminders_written({**dict.fromkeys(sent + dead + orphaned), **retries})
+            return DispatchResult(sent=len(sent), retried=len(retries), dead_lettered=len(dead), cancelled=len(orphaned))
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to dispatch notifications")
+            return DispatchResult()
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        next_sweep = datetime.now(timezone.utc)
+        while not self._stopping.is_set():
+            self._wake.clear()
+            now = datetime.now(timezone.utc)
+            if now >= next_sweep:
+                self.sweep(now)
+                next_sweep = now + timedelta(seconds=self.interval)
+            else:
+                self.fire(now)
+            wakeup = next_sweep
+            due = self.next_wakeup()
+            if due is not None:
+                wakeup = min(wakeup, due.replace(tzinfo=timezone.utc))
+            self._wake.wait(max(0.0, (wakeup - datetime.now(timezone.utc)).total_seconds()))
+
+
+_dispatcher: NotificationDispatcher | None = None
+
+
+def _remember(target: Notification, due: datetime | None) -> None:
+    # Kept on the session until its transaction commits, nothing to do without a dispatcher running here
+    session = object_session(target)
+    if _dispatcher is not None and session is not None:
+        session.info.setdefault("reminders_written", {})[target.notification_id] = due
+
+
+@event.listens_for(Notification, 'after_insert')
+@event.listens_for(Notification, 'after_update')
+def _reminder_written(mapper, connection, target):
+    due = None
+    if not target.deleted and target.delivery_status == DeliveryStatus.PENDING:
+        due = target.timestamp
+    elif not target.deleted and target.delivery_status == DeliveryStatus.RETRYING:
+        due = target.next_attempt_at
+    _remember(target, naive_utc(due) if due is not None else None)
+
+
+@event.listens_for(Notification, 'after_delete')
+def _reminder_deleted(mapper, connection, target):
+    _remember(target, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _reminders_committed(session):
+    written = session.info.pop("reminders_written", None)
+    if written and _dispatcher is not None:
+        _dispatcher.reminders_written(written)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reminders_rolled_back(session):
+    session.info.pop("reminders_written", None)
+
+
+def start_notification_dispatcher(dispatcher: NotificationDispatcher) -> None:
+    global _dispatcher
+    _dispatcher = dispatcher
+    dispatcher.start()
+
+
+def stop_notification_dispatcher() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.close()
+        _dispatcher = None
@@ -1,10 +1,19 @@
 from typing import Any
+from sqlalchemy import and_, bindparam, func, literal_column, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from src.classes.calendar import Calendar
+from src.classes.event import Event
 from src.classes.notification import Notification
+from src.classes.occurrence import Occurrence
+from src.classes.sync_clock import next_sync_version
+from src.controllers.occurrences import SERIES_CHUNK, OccurrenceCtrl
+from src.core.delivery import Delivery
+from src.core.recurrence import expand_many, naive_utc
 from src.interfaces import PersistentController
-from src.enums import NotificationTypes
+from src.enums import DeliveryStatus, NotificationTypes, RecurrenceRule
 
 
 class NotificationCtrl(PersistentController):
@@ -27,6 +36,330 @@ class NotificationCtrl(PersistentController):
         db.refresh(new_notification)
         return new_notification
 
+    @staticmethod
+    async def create_async(
+        db: AsyncSession,
+        event_id: str,
+        notification_type: NotificationTypes,
+        message: str,
+        timestamp: datetime,
+    ) -> Notification:
+        return await db.run_sync(
+            lambda session: NotificationCtrl.create(session, event_id, notification_type, message, timestamp)
+        )
+
+    @staticmethod
+    def claim_due(
+        worker_id: str,
+        now: datetime,
+        limit: int,
+        lease: timedelta,
+        storage: Session,
+        notification_ids: list[str] | None = None,
+        coalesce: timedelta | None = None,
+    ) -> tuple[list[Delivery], list[str]]:
+        """
+        Claim the oldest due notifications for a dispatcher worker in one set based UPDATE, and commit. Due means
+        PENDING with a timestamp that passed, RETRYING with a next attempt that passed, or SENDING under a claim
+        that expired. The UPDATE checks that again on every row it changes (and on PostgreSQL skips rows another
+        worker is claiming), so two workers never get the same notification. Every claim counts as an attempt
+        :param worker_id: The claiming worker
+        :param now: The current time
+        :param limit: At most this many notifications
+        :param lease: How long the claim holds, the worker must record the outcome before it runs out
+        :param storage: The database session
+        :param notification_ids: Only claim among these, the ones whose timer fired
+        :param coalesce: Also claim the pending notifications falling due this soon of the users something was
+            claimed for, to go out in the same digest (in the same UPDATE, through ix_notifications_due)
+        :return: the deliveries to make, ordered by due time, and the notifications claimed whose event is gone
+        """
+        now = naive_utc(now)
+        due = or_(
+            and_(Notification.delivery_status == DeliveryStatus.PENDING, Notification.timestamp <= now),
+            and_(Notification.delivery_status == DeliveryStatus.RETRYING, Notification.next_attempt_at <= now),
+            and_(Notification.delivery_status == DeliveryStatus.SENDING, Notification.claimed_until < now),
+        )
+        candidates = (
+            select(Notification.notification_id)
+            .where(due, Notification.deleted.is_(False))
+            .order_by(Notification.timestamp)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if notification_ids is not None:
+            candidates = candidates.where(Notification.notification_id.in_(notification_ids))
+        # Still unclaimed by anybody else when the row is written. Unlike due this can't be answered from
+        # ix_notifications_due, so the rows are found by primary key
+        unclaimed = or_(
+            Notification.delivery_status.in_([DeliveryStatus.PENDING, DeliveryStatus.RETRYING]),
+            Notification.claimed_until < now,
+        )
+        targets = Notification.notification_id.in_(candidates.scalar_subquery())
+        if coalesce:
+            due_now = candidates.cte("due_now")
+            owners = (
+                select(Calendar.user_id)
+                .join(Event, Event.calendar_id == Calendar.calendar_id)
+                .join(Notification, Notification.event_id == Event.event_id)
+                .where(Notification.notification_id.in_(select(due_now.c.notification_id)))
+            )
+            upcoming = (
+                select(Notification.notification_id)
+                .join(Event, Event.event_id == Notification.event_id)
+                .join(Calendar, Calendar.calendar_id == Event.calendar_id)
+                .where(
+                    Notification.delivery_status == DeliveryStatus.PENDING,
+                    Notification.timestamp > now,
+                    Notification.timestamp <= now + coalesce,
+                    Notification.deleted.is_(False),
+                    Event.deleted.is_(False),
+                    Calendar.user_id.in_(owners),
+                )
+                .with_for_update(skip_locked=True, of=Notification)
+            )
+            targets = or_(
+                Notification.notification_id.in_(select(due_now.c.notification_id)),
+                Notification.notification_id.in_(upcoming),
+            )
+        rows = _claim(worker_id, now, lease, targets, unclaimed, storage)
+        storage.commit()
+        deliveries, orphaned = [], []
+        for row in sorted(rows, key=lambda row: (naive_utc(row.timestamp), row.notification_id)):
+            if row.deleted or row.user_id is None:
+                orphaned.append(row.notification_id)
+                continue
+            deliveries.append(Delivery(
+                notification_id=row.notification_id, user_id=row.user_id, event_id=row.event_id,
+                type=str(row.type), message=row.message, due=naive_utc(row.timestamp), attempt=row.attempts,
+            ))
+        return deliveries, orphaned
+
+    @staticmethod
+    def list_upcoming(start: datetime, end: datetime, storage: Session) -> list[tuple[str, datetime]]:
+        """
+        Notifications falling due in (start, end], pending ones by their timestamp and retries by their next
+        attempt: range scans of ix_notifications_due and ix_notifications_retry
+        :return: (notification_id, when it is due) of each, times naive UTC
+        """
+        start, end = naive_utc(start), naive_utc(end)
+        pending = and_(
+            Notification.delivery_status == DeliveryStatus.PENDING,
+            Notification.timestamp > start, Notification.timestamp <= end,
+        )
+        retrying = and_(
+            Notification.delivery_status == DeliveryStatus.RETRYING,
+            Notification.next_attempt_at > start, Notification.next_attempt_at <= end,
+        )
+        return [
+            (notification_id, naive_utc(next_attempt_at or timestamp))
+            for notification_id, timestamp, next_attempt_at in storage.query(
+                Notification.notification_id, Notification.timestamp, Notification.next_attempt_at
+            ).filter(or_(pending, retrying), Notification.deleted.is_(False))
+        ]
+
+    @staticmethod
+    def shift_pending(event_id: str, shift: timedelta, storage: Session) -> None:
+        """
+        Move the pending notifications of an event by shift, when the event moved. Generated reminders are left
+        to withdraw_generated, they belong to occurrences that may not exist anymore. Doesn't commit
+        """
+        for notification in storage.query(Notification).filter(
+            Notification.event_id == event_id,
+            Notification.delivery_status == DeliveryStatus.PENDING,
+            Notification.deleted.is_(False),
+            Notification.occurrence_start.is_(None),
+        ):
+            notification.timestamp = naive_utc(notification.timestamp) + shift
+
+    @staticmethod
+    def generate_reminders(start: datetime, end: datetime, storage: Session, event_ids: list[str] | None = None) -> int:
+        """
+        Add the reminders of recurring events that are due by end, for their occurrences starting after start:
+        one per occurrence, reminder_minutes before it. Reminders generated before are skipped, so a series
+        only ever has rows for the occurrences that came within reach, however long it runs. Occurrences are
+        read from the occurrences table when its horizon covers them, otherwise the series are expanded.
+        Doesn't commit, two writers generating the same reminder collide on ix_notifications_occurrence
+        :param start: Only occurrences starting after this, nothing is generated for one already underway
+        :param end: Only reminders due by this
+        :param storage: The database session
+        :param event_ids: Only these events, every recurring event by default
+        :return: how many reminders were added
+        """
+        start, end = naive_utc(start), naive_utc(end)
+        recurring = [
+            Event.deleted.is_not(True),
+            Event.recurrence_rule != literal_column(str(int(RecurrenceRule.NONE))),
+            Event.calendar_id.is_not(None),
+            Event.reminder_minutes.is_not(None),
+        ]
+        if event_ids is not None:
+            recurring.append(Event.event_id.in_(event_ids))
+        # Occurrences whose reminder is due by end start at most the longest lead after it
+        lead = storage.scalar(select(func.max(Event.reminder_minutes)).where(*recurring))
+        if lead is None:
+            return 0
+        until = end + timedelta(minutes=lead)
+
+        if OccurrenceCtrl.covers(OccurrenceCtrl.load_horizon(storage), start, until):
+            found = [
+                (event_id, title, minutes, naive_utc(occurrence_start))
+                for event_id, title, minutes, occurrence_start in storage.execute(
+                    select(Event.event_id, Event.title, Event.reminder_minutes, Occurrence.start_time)
+                    .join(Occurrence, Occurrence.event_id == Event.event_id)
+                    .where(*recurring, Occurrence.start_time > start, Occurrence.start_time <= until)
+                )
+            ]
+        else:
+            series = storage.execute(
+                select(Event.event_id, Event.title, Event.reminder_minutes, Event.start_time, Event.recurrence_rule)
+                .where(*recurring, Event.start_time <= until)
+            ).all()
+            found = []
+            for offset in range(0, len(series), SERIES_CHUNK):
+                chunk = series[offset:offset + SERIES_CHUNK]
+                # Only the starts matter: without their length, occurrences that began long before the window
+                # and still last don't come out at all
+                index, starts, _ = expand_many(
+                    [row.start_time for row in chunk],
+                    [row.start_time for row in chunk],
+                    [row.recurrence_rule for row in chunk],
+                    start,
+                    until + timedelta(microseconds=1),
+                )
+                found += [
+                    (chunk[i].event_id, chunk[i].title, chunk[i].reminder_minutes, occurrence_start)
+                    for i, occurrence_start in zip(index.tolist(), starts.tolist())
+                ]
+        found = [
+            (event_id, title, occurrence_start - timedelta(minutes=minutes), occurrence_start)
+            for event_id, title, minutes, occurrence_start in found
+            if start < occurrence_start <= until and occurrence_start - timedelta(minutes=minutes) <= end
+        ]
+        if not found:
+            return 0
+
+        # Through ix_notifications_occurrence, whatever its status: a sent reminder isn't generated again
+        wanted = sorted({event_id for event_id, *_ in found})
+        generated = set()
+        for offset in range(0, len(wanted), SERIES_CHUNK):
+            generated.update(
+                (event_id, naive_utc(occurrence_start))
+                for event_id, occurrence_start in storage.execute(
+                    select(Notification.event_id, Notification.occurrence_start).where(
+                        Notification.event_id.in_(wanted[offset:offset + SERIES_CHUNK]),
+                        Notification.occurrence_start > start,
+                        Notification.occurrence_start <= until,
+                    )
+                )
+            )
+        added = [
+            Notification(
+                event_id=event_id,
+                type=NotificationTypes.ALERT,
+                message=f"Reminder: {title} is starting soon.",
+                timestamp=due,
+                occurrence_start=occurrence_start,
+            )
+            for event_id, title, due, occurrence_start in found
+            if (event_id, occurrence_start) not in generated
+        ]
+        # Through the ORM like any other write: stamped for delta sync and handed to the dispatcher's wheel
+        storage.add_all(added)
+        return len(added)
+
+    @staticmethod
+    def withdraw_generated(event_id: str, storage: Session) -> None:
+        """
+        Delete the pending reminders generated for the occurrences of an event, when its occurrences or its
+        reminder_minutes changed, so generate_reminders can add the ones it has now. They are soft deleted and
+        let go of their occurrence, delta sync still gets to see them go. Doesn't commit
+        """
+        for notification in storage.query(Notification).filter(
+            Notification.event_id == event_id,
+            Notification.delivery_status == DeliveryStatus.PENDING,
+            Notification.deleted.is_(False),
+            Notification.occurrence_start.is_not(None),
+        ):
+            notification.deleted = True
+            notification.occurrence_start = None
+
+    @staticmethod
+    def withdraw_reminder(event_id: str, due: datetime, storage: Session) -> bool:
+        """
+        Delete the pending reminder a one-off event got when it was created, when it became a series or its
+        reminder_minutes changed. It is told apart from the notifications added by hand by its due time.
+        Goes by the timestamps in the session, so a reminder shift_pending just moved is found at its new time.
+        Doesn't commit
+        :param event_id: The event
+        :param due: When the reminder is due, naive UTC
+        :param storage: The database session
+        :return: whether there was one
+        """
+        withdrawn = False
+        for notification in storage.query(Notification).filter(
+            Notification.event_id == event_id,
+            Notification.type == NotificationTypes.ALERT,
+            Notification.delivery_status == DeliveryStatus.PENDING,
+            Notification.deleted.is_(False),
+            Notification.occurrence_start.is_(None),
+        ):
+            if not notification.deleted and naive_utc(notification.timestamp) == due:
+                notification.deleted = True
+                withdrawn = True
+        return withdrawn
+
+    @staticmethod
+    def record_outcomes(
+        worker_id: str,
+        outcomes: dict[DeliveryStatus, list[str]],
+        now: datetime,
+        storage: Session,
+        retries: dict[str, datetime] | None = None,
+    ) -> int:
+        """
+        Store how a worker's claimed notifications ended, one UPDATE per status, and commit. Only notifications
+        the worker still holds are touched: a claim that expired meanwhile belongs to whoever took it over
+        :param worker_id: The worker that claimed them
+        :param outcomes: Final status -> notification_id of the notifications that ended that way
+        :param now: The current time
+        :param storage: The database session
+        :param retries: notification_id -> next attempt of the ones to send again, one executemany UPDATE
+        :return: how many notifications were updated
+        """
+        held = and_(Notification.delivery_status == DeliveryStatus.SENDING, Notification.claimed_by == worker_id)
+        updated = 0
+        if retries:
+            updated += storage.execute(
+                update(Notification.__table__)
+                .where(Notification.notification_id == bindparam("retried_id"), held)
+                .values(
+                    delivery_status=DeliveryStatus.RETRYING,
+                    next_attempt_at=bindparam("retry_at"),
+                    claimed_by=None,
+                    claimed_until=None,
+                    sync_version=next_sync_version(storage.connection()),
+                    updated_at=naive_utc(now),
+                ),
+                [{"retried_id": notification_id, "retry_at": naive_utc(at)} for notification_id, at in retries.items()],
+            ).rowcount
+        for status, notification_ids in outcomes.items():
+            if not notification_ids:
+                continue
+            updated += storage.execute(
+                update(Notification)
+                .where(Notification.notification_id.in_(notification_ids), held)
+                .values(
+                    delivery_status=status,
+                    claimed_by=None,
+                    claimed_until=None,
+                    sync_version=next_sync_version(storage.connection()),
+                    updated_at=naive_utc(now),
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        storage.commit()
+        return updated
+
     @staticmethod
     def save(record: Notification, storage: Session) -> bool:
         storage.add(record)
@@ -53,3 +386,33 @@ class NotificationCtrl(PersistentController):
         storage.delete(record)
         storage.commit()
         return True
+
+
+def _claim(worker_id: str, now: datetime, lease: timedelta, targets, unclaimed, storage: Session) -> list:
+    # Claims the targets still unclaimed when written, then reads what is needed to deliver them
+    claimed = list(storage.scalars(
+        update(Notification)
+        .where(targets, unclaimed)
+        .values(
+            delivery_status=DeliveryStatus.SENDING,
+            claimed_by=worker_id,
+            claimed_until=now + lease,
+            attempts=Notification.attempts + 1,
+            next_attempt_at=None,
+            sync_version=next_sync_version(storage.connection()),
+            updated_at=now,
+        )
+        .returning(Notification.notification_id)
+        .execution_options(synchronize_session=False)
+    ))
+    if not claimed:
+        return []
+    return list(storage.execute(
+        select(
+            Notification.notification_id, Notification.event_id, Notification.type, Notification.message,
+            Notification.timestamp, Notification.attempts, Calendar.user_id, Event.deleted,
+        )
+        .join(Event, Event.event_id == Notification.event_id)
+        .outerjoin(Calendar, Calendar.calendar_id == Event.calendar_id)
+        .where(Notification.notification_id.in_(claimed))
+    ))
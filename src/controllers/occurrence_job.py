@@ -0,0 +1,81 @@
+import logging
+import threading
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from src.controllers.occurrences import OccurrenceCtrl
+
+logger = logging.getLogger(__name__)
+
+
+class OccurrenceJob:
+    """
+    Background thread rolling the event_occurrences horizon forward. It runs once when started, so a fresh
+    database gets its table filled, then every interval seconds. The horizon moves by whole days, most runs
+    only prune and find nothing to add
+    """
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = 3600,
+        horizon_days: int = 90,
+        retention_days: int = 7,
+    ):
+        self._session_factory = session_factory
+        self.interval = interval
+        self.horizon_days = horizon_days
+        self.retention_days = retention_days
+
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="occurrence-job", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self) -> int:
+        """
+        Roll the horizon now
+        :return: the number of occurrences inserted
+        """
+        db = self._session_factory()
+        try:
+            return OccurrenceCtrl.roll_horizon(db, horizon_days=self.horizon_days, retention_days=self.retention_days)
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to roll the occurrence horizon")
+            return 0
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while True:
+            self.run_once()
+            if self._stopping.wait(self.interval):
+                return
+
+
+_occurrence_job: OccurrenceJob | None = None
+
+
+def start_occurrence_job(job: OccurrenceJob) -> None:
+    global _occurrence_job
+    _occurrence_job = job
+    job.start()
+
+
+def stop_occurrence_job() -> None:
+    global _occurrence_job
+    if _occurrence_job is not None:
+        _occurrence_job.close()
+        _occurrence_job = None
@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import numpy as np
+from sqlalchemy import delete, literal_column, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.classes.event import Event
+from src.classes.occurrence import Occurrence, OccurrenceHorizon
+from src.core.config import OCCURRENCE_HORIZON_DAYS, OCCURRENCE_RETENTION_DAYS
+from src.core.recurrence import expand_many, naive_utc, occurrences
+from src.enums import RecurrenceRule
+from src.interfaces import PersistentController
+
+# Series expanded per expand_many call while rolling the horizon, bounds the memory of one step
+SERIES_CHUNK = 1000
+
+
+class OccurrenceCtrl(PersistentController):
+    """
+    event_occurrences holds every occurrence of the live recurring events overlapping the window stored in
+    occurrence_horizon. roll_horizon moves that window forward, materialize keeps a single event in step when
+    EventCtrl writes it. Times are stored as naive UTC, like the events they come from
+    """
+    @staticmethod
+    def load_horizon(storage: Session) -> OccurrenceHorizon | None:
+        return storage.get(OccurrenceHorizon, 1)
+
+    @staticmethod
+    def covers(horizon: OccurrenceHorizon | None, start: datetime, end: datetime) -> bool:
+        """
+        Whether every occurrence overlapping [start, end) is in the table
+        """
+        if horizon is None:
+            return False
+        return (
+            naive_utc(start) >= naive_utc(horizon.valid_from)
+            and naive_utc(end) <= naive_utc(horizon.valid_until)
+        )
+
+    @staticmethod
+    def materialize(event: Event, storage: Session) -> int:
+        """
+        Replace the stored occurrences of an event with the ones it has now inside the horizon. Does not commit,
+        it is part of the caller's unit of work
+        :param event: The event that was created, moved, changed rule or deleted
+        :param storage: The database session
+        :return: the number of occurrences stored
+        """
+        OccurrenceCtrl.forget(event.event_id, storage)
+        if event.deleted or event.calendar_id is None or not event.recurrence_rule:
+            return 0
+        horizon = OccurrenceCtrl.load_horizon(storage)
+        if horizon is None:
+            return 0
+        rows = [
+            {"event_id": event.event_id, "calendar_id": event.calendar_id, "start_time": start, "end_time": end}
+            for start, end in occurrences(
+                naive_utc(event.start_time),
+                naive_utc(event.end_time),
+                event.recurrence_rule,
+                naive_utc(horizon.valid_from),
+                naive_utc(horizon.valid_until),
+            )
+        ]
+        OccurrenceCtrl._insert(rows, storage)
+        return len(rows)
+
+    @staticmethod
+    def forget(event_id: str, storage: Session) -> None:
+        """
+        Drop the stored occurrences of an event, without committing
+        """
+        storage.execute(delete(Occurrence).where(Occurrence.event_id == event_id))
+
+    @staticmethod
+    def roll_horizon(
+        storage: Session,
+        now: datetime | None = None,
+        horizon_days: int = OCCURRENCE_HORIZON_DAYS,
+        retention_days: int = OCCURRENCE_RETENTION_DAYS,
+    ) -> int:
+        """
+        Move the horizon to [midnight retention_days ago, midnight horizon_days + 1 days ahead): occurrences that
+        ended before it are pruned and only the days added at its end are expanded. A missing or stale horizon
+        (the job did not run for longer than the retention) rebuilds the whole table. Commits
+        :param storage: The database session
+        :param now: The current time, defaults to the clock
+        :param horizon_days: How far ahead occurrences are kept
+        :param retention_days: How far back occurrences are kept
+        :return: the number of occurrences inserted
+        """
+        today = naive_utc(now or datetime.now(timezone.utc)).replace(hour=0, minute=0, second=0, microsecond=0)
+        valid_from = today - timedelta(days=retention_days)
+        valid_until = today + timedelta(days=horizon_days + 1)
+
+        horizon = OccurrenceCtrl.load_horizon(storage)
+        extending = (
+            horizon is not None
+            and naive_utc(horizon.valid_until) >= valid_from
+            and naive_utc(horizon.valid_from) <= valid_from
+        )
+        # The delete takes the write lock before the series are read, no event can be written in between
+        if extending:
+            storage.execute(delete(Occurrence).where(Occurrence.end_time <= valid_from))
+            fill_from = naive_utc(horizon.valid_until)
+            valid_until = max(valid_until, fill_from)
+        else:
+            storage.execute(delete(Occurrence))
+            fill_from = valid_from
+
+        inserted = 0
+        if fill_from < valid_until:
+            inserted = OccurrenceCtrl._expand_into(fill_from, valid_until, extending, storage)
+
+        storage.merge(OccurrenceHorizon(horizon_id=1, valid_from=valid_from, valid_until=valid_until))
+        storage.commit()
+        return inserted
+
+    @staticmethod
+    def list_in_window(
+        calendar_spans: dict[str, int],
+        start: datetime,
+        end: datetime,
+        storage: Session,
+        after: tuple[datetime, str] | None = None,
+        limit: int | None = None,
+    ) -> list[tuple[Event, datetime, datetime]]:
+        """
+        Stored occurrences of the given calendars overlapping [start, end), ordered by (start_time, event_id), as
+        (event, start_time, end_time). Only complete when the horizon covers the window, see covers
+        :param calendar_spans: calendar_id -> max_event_seconds of each calendar to search
+        :param start: Beginning of the window
+        :param end: End of the window
+        :param storage: The database session
+        :param after: Only occurrences sorting after this (start_time, event_id)
+        :param limit: At most this many occurrences
+        :return: the occurrences with their event
+        """
+        if not calendar_spans:
+            return []
+        start, end = naive_utc(start), naive_utc(end)
+        # An occurrence lasts as long as its event, the calendar's longest event bounds the range scan
+        earliest = start - timedelta(seconds=max(calendar_spans.values()))
+        criteria = [
+            Occurrence.calendar_id.in_(list(calendar_spans)),
+            Occurrence.start_time < end,
+            Occurrence.end_time > start,
+        ]
+        if after is not None:
+            after_start = naive_utc(after[0])
+            criteria.append(tuple_(Occurrence.start_time, Occurrence.event_id) > tuple_(after_start, after[1]))
+            earliest = max(earliest, after_start)
+        criteria.append(Occurrence.start_time >= earliest)
+        # The event is loaded once per series however many of its occurrences are in the window
+        return (
+            storage.query(Event, Occurrence.start_time, Occurrence.end_time)
+            .join(Occurrence, Occurrence.event_id == Event.event_id)
+            .filter(*criteria)
+            .order_by(Occurrence.start_time, Occurrence.event_id)
+            .limit(limit)
+            .all()
+        )
+
+    @staticmethod
+    def save(record: Occurrence, storage: Session) -> bool:
+        storage.add(record)
+        storage.commit()
+        return True
+
+    @staticmethod
+    def load(identifier: tuple[str, datetime], storage: Session) -> Occurrence | None:
+        return storage.get(Occurrence, identifier)
+
+    @staticmethod
+    def search(criteria: list[Any], storage: Session) -> list[Occurrence]:
+        return storage.query(Occurrence).filter(*criteria).all()
+
+    @staticmethod
+    def safe_delete(record: Occurrence, storage: Session) -> bool:
+        # Occurrences are derived data, there is nothing to keep around
+        return OccurrenceCtrl.permanent_delete(record, storage)
+
+    @staticmethod
+    def permanent_delete(record: Occurrence, storage: Session) -> bool:
+        storage.delete(record)
+        storage.commit()
+        return True
+
+    @staticmethod
+    def _expand_into(fill_from: datetime, fill_until: datetime, extending: bool, storage: Session) -> int:
+        # Occurrences starting before fill_from are already stored when the horizon is only being extended
+        series = storage.execute(
+            select(Event.event_id, Event.calendar_id, Event.start_time, Event.end_time, Event.recurrence_rule)
+            .where(
+                # Same shape as EventCtrl.list_series, a scan of the partial ix_events_recurring index
+                Event.deleted.is_not(True),
+                Event.recurrence_rule != literal_column(str(int(RecurrenceRule.NONE))),
+                Event.calendar_id.is_not(None),
+                Event.start_time < fill_until,
+            )
+        ).all()
+
+        inserted = 0
+        for offset in range(0, len(series), SERIES_CHUNK):
+            chunk = series[offset:offset + SERIES_CHUNK]
+            index, starts, ends = expand_many(
+                [row.start_time for row in chunk],
+                [row.end_time for row in chunk],
+                [row.recurrence_rule for row in chunk],
+                fill_from,
+                fill_until,
+            )
+            if extending:
+                keep = starts >= np.datetime64(fill_from, "us")
+                index, starts, ends = index[keep], starts[keep], ends[keep]
+            rows = [
+                {"event_id": chunk[i].event_id, "calendar_id": chunk[i].calendar_id, "start_time": start, "end_time": end}
+                for i, start, end in zip(index.tolist(), starts.tolist(), ends.tolist())
+            ]
+            OccurrenceCtrl._insert(rows, storage)
+            inserted += len(rows)
+        return inserted
+
+    @staticmethod
+    def _insert(rows: list[dict], storage: Session) -> None:
+        # An event written while the horizon was rolled may already have some of these rows
+        insert = postgresql.insert if storage.get_bind().dialect.name == "postgresql" else sqlite.insert
+        if rows:
+            # Core executemany, batched into multi-row INSERTs by the dialect
+            storage.execute(insert(Occurrence.__table__).on_conflict_do_nothing(), rows)
@@ -1,10 +1,14 @@
+from datetime import datetime, timezone
 from typing import Any
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, func, select, tuple_, update
 
 from src.classes.poll import Poll
 from src.classes.poll_option import PollOption
 from src.classes.vote import Vote
+from src.core.broadcast import poll_broadcaster
+from src.controllers.vote_buffer import get_vote_buffer
 from src.interfaces import PersistentController
 
 
@@ -36,25 +40,93 @@ class PollCtrl(PersistentController):
     def get_most_voted_option(poll: Poll, db: Session) -> PollOption | None:
         return (
             db.query(PollOption)
-            .join(Vote)
-            .filter(PollOption.poll_id == poll.poll_id)
-            .group_by(PollOption.option_id)
-            .order_by(func.count(Vote.vote_id).desc())
+            .filter(PollOption.poll_id == poll.poll_id, PollOption.vote_count > 0)
+            .order_by(PollOption.vote_count.desc())
             .first()
         )
 
+    @staticmethod
+    def list_with_options(
+            db: Session, after: tuple[datetime, str] | None = None, limit: int | None = None) -> list[Poll]:
+        """
+        Live polls in creation order with their options eagerly loaded, two queries no matter how many polls there are
+        :param db: The database session
+        :param after: Only polls sorting after this (created_at, poll_id), the key of the previous page's last poll
+        :param limit: At most this many polls
+        :return: the polls
+        """
+        query = db.query(Poll).options(selectinload(Poll.options)).filter(Poll.deleted.is_(False))
+        if after is not None:
+            # created_at is stored as UTC wall clock, like the event times
+            created_at = after[0] if after[0].tzinfo is None else after[0].astimezone(timezone.utc)
+            query = query.filter(tuple_(Poll.created_at, Poll.poll_id) > tuple_(created_at, after[1]))
+        return query.order_by(Poll.created_at, Poll.poll_id).limit(limit).all()
+
+    @staticmethod
+    def get_results(poll_id: str, db: Session) -> dict[str, Any] | None:
+        """
+        Current tallies of a poll in one query, the snapshot live result subscribers start from
+        :param poll_id: The poll
+        :param db: The database session
+        :return: poll_id, is_closed and option id -> vote count, None if the poll doesn't exist
+        """
+        return PollCtrl.get_results_many([poll_id], db).get(poll_id)
+
+    @staticmethod
+    def get_results_many(poll_ids: list[str], db: Session) -> dict[str, dict[str, Any]]:
+        """
+        Current tallies of several polls in one query
+        :param poll_ids: The polls
+        :param db: The database session
+        :return: poll id -> snapshot as returned by get_results, polls that don't exist are left out
+        """
+        rows = db.execute(
+            select(Poll.poll_id, Poll.is_closed, PollOption.option_id, PollOption.vote_count)
+            .outerjoin(PollOption, and_(PollOption.poll_id == Poll.poll_id, PollOption.deleted.is_(False)))
+            .where(Poll.poll_id.in_(poll_ids), Poll.deleted.is_(False))
+        ).all()
+        results: dict[str, dict[str, Any]] = {}
+        for row in rows:
+            snapshot = results.setdefault(row.poll_id, {"poll_id": row.poll_id, "is_closed": row.is_closed, "options": {}})
+            if row.option_id is not None:
+                snapshot["options"][row.option_id] = row.vote_count
+        return results
+
+    @staticmethod
+    async def get_results_many_async(poll_ids: list[str], db: AsyncSession) -> dict[str, dict[str, Any]]:
+        return await db.run_sync(lambda session: PollCtrl.get_results_many(poll_ids, session))
+
+    @staticmethod
+    def reconcile_vote_counts(db: Session, poll_ids: list[str] | None = None) -> int:
+        """
+        Recompute the vote_count of poll options from the votes table, fixing any drift
+        :param db: The database session
+        :param poll_ids: Only repair the options of these polls, all options if None
+        :return: the number of options whose counter was wrong
+        """
+        actual = (
+            select(func.count(Vote.vote_id))
+            .where(Vote.poll_option_id == PollOption.option_id, Vote.deleted.is_(False))
+            .scalar_subquery()
+        )
+        statement = update(PollOption).where(PollOption.vote_count != actual).values(vote_count=actual)
+        if poll_ids is not None:
+            statement = statement.where(PollOption.poll_id.in_(poll_ids))
+        repaired = db.execute(statement.execution_options(synchronize_session=False)).rowcount
+        db.commit()
+        return repaired
+
     @staticmethod
     def get_votes(poll: Poll, db: Session) -> list[type[Vote]]:
-        return db.query(Vote).join(PollOption).filter(PollOption.poll_id == poll.poll_id).all()
+        return db.query(Vote).filter(Vote.poll_id == poll.poll_id).all()
 
     @staticmethod
     def user_has_voted(poll: Poll, user_id: str, db: Session) -> bool:
         return (
-            db.query(Vote)
-            .join(PollOption)
-            .filter(PollOption.poll_id == poll.poll_id, Vote.user_id == user_id)
-            .count()
-            > 0
+            db.query(Vote.vote_id)
+            .filter(Vote.poll_id == poll.poll_id, Vote.user_id == user_id, Vote.deleted.is_(False))
+            .first()
+            is not None
         )
 
     @staticmethod
@@ -67,8 +139,11 @@ class PollCtrl(PersistentController):
 
     @staticmethod
     def close_poll(poll: Poll, db: Session) -> None:
+        poll_id = poll.poll_id
         poll.is_closed = True
         db.commit()
+        PollCtrl._invalidate_buffered_state(poll_id)
+        poll_broadcaster.publish(poll_id, "closed", {"poll_id": poll_id, "is_closed": True})
 
     @staticmethod
     def save(record: Poll, storage: Session) -> bool:
@@ -89,10 +164,20 @@ class PollCtrl(PersistentController):
     def safe_delete(record: Poll, storage: Session) -> bool:
         record.deleted = True
         storage.commit()
+        PollCtrl._invalidate_buffered_state(record.poll_id)
         return True
 
     @staticmethod
     def permanent_delete(record: Poll, storage: Session) -> bool:
+        poll_id = record.poll_id
         storage.delete(record)
         storage.commit()
+        PollCtrl._invalidate_buffered_state(poll_id)
         return True
+
+    @staticmethod
+    def _invalidate_buffered_state(poll_id: str) -> None:
+        # The vote buffer would otherwise keep accepting votes from its cached copy of the poll until it goes stale
+        vote_buffer = get_vote_buffer()
+        if vote_buffer is not None:
+            vote_buffer.invalidate(poll_id)
@@ -1,30 +1,120 @@
-from typing import Any
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 
-from src.interfaces import PersistentController
+import numpy as np
+from sqlalchemy import Integer, func, literal, literal_column, select, union_all
+from sqlalchemy.orm import Session
 
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.constants import FREE_BUSY_MAX_DAYS
+from src.controllers.event_index import event_indexes
+from src.core.intervals import merge_grouped, merge_intervals
+from src.core.recurrence import expand_many, naive_utc
+from src.enums import RecurrenceRule
 
-class ScheduleCtrl(PersistentController):
-    @staticmethod
-    def save(record: Any, storage: Any) -> bool:
-        # @TODO implement method
-        pass
 
-    @staticmethod
-    def load(identifier: Any, storage: Any) -> Any:
-        # @TODO implement method
-        pass
+@dataclass(frozen=True)
+class FreeBusy:
+    """
+    Busy blocks inside [start, end): disjoint, ordered, clipped to the window. Times are naive UTC
+    """
+    start: datetime
+    end: datetime
+    users: dict[str, list[tuple[datetime, datetime]]]
+    combined: list[tuple[datetime, datetime]]
 
+
+class ScheduleCtrl:
     @staticmethod
-    def search(criteria: list[Any], storage: Any) -> list[Any]:
-        # @TODO implement method
-        pass
+    def busy_intervals(
+        user_ids: list[str], start: datetime, end: datetime, storage: Session
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Every event occurrence of the given users overlapping [start, end), clipped to the window. One-off
+        events and recurring series come back from a single UNION ALL and are expanded together by expand_many
+        :param user_ids: The users whose calendars are read
+        :param start: Beginning of the window
+        :param end: End of the window
+        :param storage: The database session
+        :return: (index of the user in user_ids, start, end) arrays, times as naive UTC datetime64[us]
+        """
+        start, end = naive_utc(start), naive_utc(end)
+        if end <= start:
+            raise ValueError("The end of the window must be after its start.")
+        if end - start > timedelta(days=FREE_BUSY_MAX_DAYS):
+            raise ValueError(f"The window can't be longer than {FREE_BUSY_MAX_DAYS} days.")
+
+        users = {user_id: index for index, user_id in enumerate(user_ids)}
+        calendars = storage.query(Calendar.calendar_id, Calendar.user_id, Calendar.max_event_seconds).filter(
+            Calendar.user_id.in_(list(users)), Calendar.deleted.is_(False)
+        ).all()
+        if not calendars:
+            empty = np.array([], dtype="datetime64[us]")
+            return np.array([], dtype=np.int64), empty, empty
+        owners = {calendar_id: users[user_id] for calendar_id, user_id, _ in calendars}
+        # No event of these calendars is longer than this, it bounds how far back an overlapping one can start
+        earliest = start - timedelta(seconds=max(span for _, _, span in calendars))
+
+        one_offs = select(Event.calendar_id, Event.start_time, Event.end_time, literal(0, Integer)).where(
+            Event.calendar_id.in_(list(owners)),
+            Event.deleted.is_(False),
+            func.coalesce(Event.recurrence_rule, RecurrenceRule.NONE) == RecurrenceRule.NONE,
+            Event.start_time < end,
+            Event.end_time > start,
+            Event.start_time >= earliest,
+        )
+        # Always the series, never event_occurrences: expanding a few hundred series is cheaper than decoding
+        # every one of their occurrences in the window. Same shape as EventCtrl.list_series, it seeks the
+        # partial ix_events_recurring index
+        recurring = select(Event.calendar_id, Event.start_time, Event.end_time, Event.recurrence_rule).where(
+            Event.calendar_id.in_(list(owners)),
+            Event.deleted.is_not(True),
+            Event.recurrence_rule != literal_column(str(int(RecurrenceRule.NONE))),
+            Event.start_time < end,
+        )
+        rows = storage.execute(union_all(one_offs, recurring)).all()
+
+        index, starts, ends = expand_many(
+            [row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows], start, end
+        )
+        calendar_owner = np.array([owners[row[0]] for row in rows], dtype=np.int64)
+        start64, end64 = np.datetime64(start, "us"), np.datetime64(end, "us")
+        return calendar_owner[index], np.maximum(starts, start64), np.minimum(ends, end64)
 
     @staticmethod
-    def safe_delete(record: Any, storage: Any) -> bool:
-        # @TODO implement method
-        pass
+    def free_busy(user_ids: list[str], start: datetime, end: datetime, storage: Session) -> FreeBusy:
+        """
+        Busy blocks of each user and of all of them together over a window: the occurrences from
+        busy_intervals merged with a sort and sweep
+        :param user_ids: The users to look up
+        :param start: Beginning of the window
+        :param end: End of the window
+        :param storage: The database session
+        :return: the busy blocks
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        owners, starts, ends = ScheduleCtrl.busy_intervals(user_ids, start, end, storage)
+        per_user = merge_grouped(owners, starts, ends, len(user_ids))
+        return FreeBusy(
+            start=naive_utc(start),
+            end=naive_utc(end),
+            users={user_id: _blocks(*blocks) for user_id, blocks in zip(user_ids, per_user)},
+            combined=_blocks(*merge_intervals(starts, ends)),
+        )
 
     @staticmethod
-    def permanent_delete(record: Any, storage: Any) -> bool:
-        # @TODO implement method
-        pass
+    def is_free(user_id: str, at: datetime, storage: Session) -> bool:
+        """
+        Whether no event of the user covers a moment, answered from the warm interval indexes of the user's
+        calendars (see src.controllers.event_index) rather than a query over the events
+        :param user_id: The user to check
+        :param at: The moment
+        :param storage: The database session
+        :return: True when the user is free
+        """
+        return not event_indexes.is_busy(user_id, at, storage)
+
+
+def _blocks(starts: np.ndarray, ends: np.ndarray) -> list[tuple[datetime, datetime]]:
+    return list(zip(starts.tolist(), ends.tolist()))
@@ -0,0 +1,78 @@
+from typing import Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.classes.settings import Settings
+from src.interfaces import PersistentController
+
+
+class SettingsCtrl(PersistentController):
+    @staticmethod
+    def load_for_user(user_id: str, storage: Session) -> Settings | None:
+        return storage.query(Settings).filter(Settings.user_id == user_id).first()
+
+    @staticmethod
+    def get_or_create(user_id: str, storage: Session) -> Settings:
+        """
+        Load the settings of a user, creating them with the defaults if they don't exist yet
+        :param user_id: The owner of the settings
+        :param storage: The database session
+        :return: the user's settings
+        """
+        settings = SettingsCtrl.load_for_user(user_id, storage)
+        if not settings:
+            settings = Settings(user_id=user_id)
+            SettingsCtrl.save(settings, storage)
+        return settings
+
+    @staticmethod
+    def update(user_id: str, values: dict[str, Any], storage: Session) -> Settings:
+        """
+        Apply the given values to the settings of a user, creating them if they don't exist yet
+        :param user_id: The owner of the settings
+        :param values: column name -> new value
+        :param storage: The database session
+        :return: the updated settings
+        """
+        settings = SettingsCtrl.load_for_user(user_id, storage)
+        if not settings:
+            settings = Settings(user_id=user_id, **values)
+        else:
+            for key, value in values.items():
+                setattr(settings, key, value)
+        SettingsCtrl.save(settings, storage)
+        return settings
+
+    @staticmethod
+    async def get_or_create_async(user_id: str, storage: AsyncSession) -> Settings:
+        return await storage.run_sync(lambda session: SettingsCtrl.get_or_create(user_id, session))
+
+    @staticmethod
+    async def update_async(user_id: str, values: dict[str, Any], storage: AsyncSession) -> Settings:
+        return await storage.run_sync(lambda session: SettingsCtrl.update(user_id, values, session))
+
+    @staticmethod
+    def save(record: Settings, storage: Session) -> bool:
+        storage.add(record)
+        storage.commit()
+        storage.refresh(record)
+        return True
+
+    @staticmethod
+    def load(identifier: str, storage: Session) -> Settings | None:
+        return storage.query(Settings).filter(Settings.settings_id == identifier).first()
+
+    @staticmethod
+    def search(criteria: list[Any], storage: Session) -> list[Settings]:
+        return storage.query(Settings).filter(*criteria).all()
+
+    @staticmethod
+    def safe_delete(record: Settings, storage: Session) -> bool:
+        # Settings have no deleted flag, removing them just brings the user back to the defaults
+        return SettingsCtrl.permanent_delete(record, storage)
+
+    @staticmethod
+    def permanent_delete(record: Settings, storage: Session) -> bool:
+        storage.delete(record)
+        storage.commit()
+        return True
@@ -1,11 +1,29 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import Any
 from sqlalchemy.orm import Session
 
 from src.classes.study_session import StudySession
+from src.classes.study_session_member import StudySessionMember
+from src.constants import SLOT_MINUTES
+from src.controllers.schedules import ScheduleCtrl
+from src.core.recurrence import naive_utc
+from src.core.slots import SlotGrid, WorkingHours, rank_slots
 from src.interfaces import PersistentController
 from src.enums import SessionStatus
 
 
+@dataclass(frozen=True)
+class MeetingSlot:
+    """
+    A candidate meeting time, naive UTC, and which members are free for all of it
+    """
+    start: datetime
+    end: datetime
+    available: list[str]
+    unavailable: list[str]
+
+
 class StudySessionCtrl(PersistentController):
     @staticmethod
     def create(db: Session, title: str, owner_id: str, status: SessionStatus = SessionStatus.ACTIVE) -> StudySession:
@@ -15,6 +33,75 @@ class StudySessionCtrl(PersistentController):
         db.refresh(new_session)
         return new_session
 
+    @staticmethod
+    def member_ids(record: StudySession, storage: Session) -> list[str]:
+        """
+        Users taking part in a study session: its owner, then the members that were not removed
+        :param record: The study session
+        :param storage: The database session
+        :return: user ids, owner first
+        """
+        members = storage.query(StudySessionMember.user_id).filter(
+            StudySessionMember.session_id == record.session_id, StudySessionMember.deleted.is_(False)
+        ).order_by(StudySessionMember.user_id).all()
+        return list(dict.fromkeys([record.owner_id, *(user_id for user_id, in members)]))
+
+    @staticmethod
+    def all_member_ids(storage: Session) -> dict[str, list[str]]:
+        """
+        member_ids of every live study session, in two queries
+        :param storage: The database session
+        :return: session_id -> user ids, owner first
+        """
+        groups = {
+            session_id: [owner_id]
+            for session_id, owner_id in storage.query(StudySession.session_id, StudySession.owner_id).filter(
+                StudySession.deleted.is_(False)
+            )
+        }
+        members = storage.query(StudySessionMember.session_id, StudySessionMember.user_id).join(StudySession).filter(
+            StudySession.deleted.is_(False), StudySessionMember.deleted.is_(False)
+        ).order_by(StudySessionMember.user_id)
+        for session_id, user_id in members:
+            groups[session_id].append(user_id)
+        return {session_id: list(dict.fromkeys(user_ids)) for session_id, user_ids in groups.items()}
+
+    @staticmethod
+    def find_slots(record: StudySession, start: datetime, end: datetime, minutes: int, hours: WorkingHours,
+                   limit: int, storage: Session) -> list[MeetingSlot]:
+        """
+        Best times for a meeting of the session: the ones most members are free for, earliest first among
+        equals, without overlapping each other. Busy time comes from ScheduleCtrl.busy_intervals and is laid on a
+        SLOT_MINUTES grid, see src.core.slots
+        :param record: The study session
+        :param start: Beginning of the search window
+        :param end: End of the search window
+        :param minutes: How long the meeting lasts
+        :param hours: When the meeting may take place
+        :param limit: How many slots to return at most
+        :param storage: The database session
+        :return: the slots, best first
+        """
+        # An unknown time zone fails before any calendar is read
+        hours.zone()
+        user_ids = StudySessionCtrl.member_ids(record, storage)
+        members, starts, ends = ScheduleCtrl.busy_intervals(user_ids, start, end, storage)
+        step = timedelta(minutes=SLOT_MINUTES)
+        grid = SlotGrid.over(naive_utc(start), naive_utc(end), step)
+        busy = grid.busy_bits(members, starts, ends, len(user_ids))
+        length = -(-minutes // SLOT_MINUTES)
+
+        slots = []
+        for first, free in rank_slots(busy, grid.allowed(hours), len(user_ids), length, limit):
+            slot_start = grid.slot_start(first)
+            slots.append(MeetingSlot(
+                start=slot_start,
+                end=slot_start + timedelta(minutes=minutes),
+                available=[user_id for user_id, is_free in zip(user_ids, free) if is_free],
+                unavailable=[user_id for user_id, is_free in zip(user_ids, free) if not is_free],
+            ))
+        return slots
+
     @staticmethod
     def save(record: StudySession, storage: Session) -> bool:
         storage.add(record)
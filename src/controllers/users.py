@@ -1,6 +1,7 @@
 from typing import Any
 
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from src.classes.user import User
@@ -47,6 +48,14 @@ class UserCtrl(PersistentController):
     def load(identifier: str, storage: Session) -> User | None:
         return storage.query(User).filter(User.user_id == identifier, User.deleted.is_(False)).first()
 
+    @staticmethod
+    def load_by_email(email: str, storage: Session) -> User | None:
+        return storage.query(User).filter(User.email == email, User.deleted.is_(False)).first()
+
+    @staticmethod
+    async def load_by_email_async(email: str, storage: AsyncSession) -> User | None:
+        return await storage.run_sync(lambda session: UserCtrl.load_by_email(email, session))
+
     @staticmethod
     def search(criteria: list[Any], storage: Session) -> list[type[User]]:
         return storage.query(User).filter(*criteria, User.deleted.is_(False)).all()
@@ -0,0 +1,306 @@
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from src.base_class import default_uuid
+from src.classes.poll import Poll
+from src.classes.poll_option import PollOption
+from src.classes.vote import Vote
+from src.controllers.votes import VoteCtrl
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PollState:
+    poll_id: str
+    is_open: bool
+    single_choice: bool
+    option_ids: set[str]
+    # Users with a live vote on a single choice poll, flushed or still buffered
+    voters: set[str]
+    loaded_at: float
+
+
+@dataclass
+class _PendingVote:
+    row: dict
+    done: Future | None = field(default=None)
+
+
+class VoteBuffer:
+    """
+    Write-behind buffer for votes on hot polls.
+    Votes are validated against a cached copy of the poll (open, option exists, single choice voters) and
+    queued; a background thread writes whatever accumulated every flush_interval seconds, or as soon as
+    max_batch votes are waiting, through VoteCtrl.create_many. The single choice unique index still
+    guards the table, so another process voting at the same time can't sneak in a duplicate.
+
+    durable=False acknowledges a vote as soon as it is queued: fastest, but votes still in memory are lost
+    if the process dies. durable=True blocks submit until the batch holding the vote is committed, which
+    still turns N concurrent votes into one transaction, and needs start() to have been called
+    """
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval: float = 0.05,
+        max_batch: int = 500,
+        durable: bool = False,
+        state_ttl: float = 5.0,
+    ):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.durable = durable
+        self.state_ttl = state_ttl
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pending: list[_PendingVote] = []
+        # The batch being written: out of _pending but maybe not visible to a poll state load yet
+        self._in_flight: list[_PendingVote] = []
+        # Votes committed while a poll state load was running, with the number of the flush that wrote them:
+        # the load may have read the votes table before that commit
+        self._settled: list[tuple[int, _PendingVote]] = []
+        self._flushes = 0
+        # How many flushes had completed when each poll state load in progress started
+        self._loads: Counter[int] = Counter()
+        self._polls: dict[str, _PollState] = {}
+        self._option_polls: dict[str, str] = {}
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="vote-buffer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop the background thread and write everything still buffered
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def invalidate(self, poll_id: str) -> None:
+        """
+        Drop the cached state of a poll, e.g. after it was closed
+        """
+        with self._lock:
+            self._polls.pop(poll_id, None)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, poll_option_id: str, user_id: str) -> str:
+        """
+        Validate and queue a vote
+        :param poll_option_id: The option being voted for
+        :param user_id: The voter
+        :return: the id the vote will be stored under
+        """
+        if not poll_option_id:
+            raise ValueError("A vote must have a selected poll option ID.")
+        if self.durable and self._thread is None:
+            # Nothing would ever flush the vote, submit would wait forever
+            raise RuntimeError("A durable vote buffer has to be started before votes are submitted.")
+
+        while True:
+            poll_id, state = self._state_for_option(poll_option_id)
+            if state is None:
+                raise ValueError("Invalid poll option ID")
+            with self._lock:
+                if self._polls.get(poll_id) is not state:
+                    # Invalidated or reloaded while this thread wasn't holding the lock, look again
+                    continue
+                if not state.is_open or (state.single_choice and user_id in state.voters):
+                    raise PermissionError("User is not allowed to vote on this poll.")
+                if state.single_choice:
+                    state.voters.add(user_id)
+
+                vote = _PendingVote(
+                    row={
+                        "vote_id": default_uuid(),
+                        "poll_option_id": poll_option_id,
+                        "poll_id": poll_id,
+                        "user_id": user_id,
+                        "timestamp": datetime.now(timezone.utc),
+                        "deleted": False,
+                        "single_choice": state.single_choice,
+                    },
+                    done=Future() if self.durable else None,
+                )
+                self._pending.append(vote)
+                if len(self._pending) >= self.max_batch:
+                    self._wakeup.set()
+                break
+
+        if vote.done is not None:
+            # Raises PermissionError if the database turned the vote down after all
+            return vote.done.result()
+        return vote.row["vote_id"]
+
+    def flush(self) -> int:
+        """
+        Write every buffered vote
+        :return: the number of votes inserted
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._in_flight = batch
+            if not batch:
+                return 0
+
+            db = self._session_factory()
+            try:
+                inserted = VoteCtrl.create_many(db, [vote.row for vote in batch])
+            except Exception as exc:
+                db.rollback()
+                logger.exception("Failed to write %d buffered votes", len(batch))
+                with self._lock:
+                    self._in_flight = []
+                self._forget_voters(batch)
+                for vote in batch:
+                    if vote.done is not None:
+                        vote.done.set_exception(exc)
+                return 0
+            finally:
+                db.close()
+
+            with self._lock:
+                self._in_flight = []
+                self._flushes += 1
+                if self._loads:
+                    self._settled += [(self._flushes, vote) for vote in batch if vote.row["vote_id"] in inserted]
+            rejected = [vote for vote in batch if vote.row["vote_id"] not in inserted]
+            if rejected:
+                logger.warning("%d buffered votes were rejected by the database", len(rejected))
+                self._forget_voters(rejected)
+            for vote in batch:
+                if vote.done is not None:
+                    if vote.row["vote_id"] in inserted:
+                        vote.done.set_result(vote.row["vote_id"])
+                    else:
+                        vote.done.set_exception(PermissionError("User is not allowed to vote on this poll."))
+            return len(inserted)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _forget_voters(self, votes: list[_PendingVote]) -> None:
+        # Lets users whose vote never made it to the database vote again
+        with self._lock:
+            for vote in votes:
+                state = self._polls.get(vote.row["poll_id"])
+                if state is not None:
+                    state.voters.discard(vote.row["user_id"])
+
+    def _state_for_option(self, poll_option_id: str) -> tuple[str | None, _PollState | None]:
+        # Hits the database only the first time a poll is seen or once its state is stale, without holding
+        # self._lock so a reload doesn't hold up the voters of every other poll
+        with self._lock:
+            poll_id = self._option_polls.get(poll_option_id)
+            state = self._polls.get(poll_id) if poll_id else None
+            if state is not None and time.monotonic() - state.loaded_at < self.state_ttl:
+                return poll_id, state if poll_option_id in state.option_ids else None
+            mark = self._flushes
+            self._loads[mark] += 1
+
+        try:
+            state = self._load_state(poll_option_id)
+        finally:
+            with self._lock:
+                self._loads[mark] -= 1
+                if not self._loads[mark]:
+                    del self._loads[mark]
+                oldest = min(self._loads, default=None)
+                settled = [(flush, vote) for flush, vote in self._settled if flush > mark]
+                self._settled = [entry for entry in self._settled if oldest is not None and entry[0] > oldest]
+        if state is None:
+            return None, None
+
+        poll_id = state.poll_id
+        with self._lock:
+            if state.single_choice:
+                # Votes the load may have missed: still buffered, being written, or committed after it read the table
+                buffered = [*self._pending, *self._in_flight, *(vote for _, vote in settled)]
+                state.voters |= {v.row["user_id"] for v in buffered if v.row["poll_id"] == poll_id}
+            self._polls[poll_id] = state
+            self._option_polls.update({option_id: poll_id for option_id in state.option_ids})
+        return poll_id, state if poll_option_id in state.option_ids else None
+
+    def _load_state(self, poll_option_id: str) -> _PollState | None:
+        db = self._session_factory()
+        try:
+            loaded_at = time.monotonic()
+            poll = (
+                db.query(Poll)
+                .join(PollOption, PollOption.poll_id == Poll.poll_id)
+                .filter(PollOption.option_id == poll_option_id, PollOption.deleted.is_(False), Poll.deleted.is_(False))
+                .first()
+            )
+            if poll is None:
+                return None
+            option_ids = {
+                option_id for (option_id,) in
+                db.query(PollOption.option_id).filter(PollOption.poll_id == poll.poll_id, PollOption.deleted.is_(False))
+            }
+            voters = set()
+            if not poll.allow_multi_votes:
+                voters = {
+                    user_id for (user_id,) in
+                    db.query(Vote.user_id).filter(Vote.poll_id == poll.poll_id, Vote.deleted.is_(False))
+                }
+            return _PollState(
+                poll_id=poll.poll_id,
+                is_open=not poll.is_closed,
+                single_choice=not poll.allow_multi_votes,
+                option_ids=option_ids,
+                voters=voters,
+                loaded_at=loaded_at,
+            )
+        finally:
+            db.close()
+
+
+_vote_buffer: VoteBuffer | None = None
+
+
+def get_vote_buffer() -> VoteBuffer | None:
+    """
+    The process wide buffer, None unless start_vote_buffer was called (VOTE_BUFFER_ENABLED)
+    """
+    return _vote_buffer
+
+
+def start_vote_buffer(buffer: VoteBuffer) -> None:
+    global _vote_buffer
+    _vote_buffer = buffer
+    buffer.start()
+
+
+def stop_vote_buffer() -> None:
+    global _vote_buffer
+    if _vote_buffer is not None:
+        _vote_buffer.close()
+        _vote_buffer = None
@@ -1,29 +1,179 @@
+from collections import Counter
+from datetime import datetime, timezone
 from typing import Any
+from sqlalchemy import bindparam, column, literal, not_, select, update, values
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
+from src.base_class import default_uuid
+from src.classes.poll import Poll
 from src.classes.vote import Vote
 from src.classes.poll_option import PollOption
-from src.controllers.polls import PollCtrl
+from src.core.broadcast import poll_broadcaster
 from src.interfaces import PersistentController
 
+# Column order of the INSERT ... SELECT statements casting votes
+_VOTE_COLUMNS = ["vote_id", "poll_option_id", "poll_id", "user_id", "timestamp", "deleted", "single_choice"]
+
 
 class VoteCtrl(PersistentController):
     @staticmethod
     def create(db: Session, poll_option_id: str, user_id: str) -> Vote:
-        option = db.query(PollOption).filter(PollOption.option_id == poll_option_id).first()
-        if not option:
-            raise ValueError("Invalid poll option ID")
+        """
+        Cast a vote. The poll rules are enforced by the INSERT itself: the row is only selected into the votes
+        table if the option and its poll are live and the poll is open, and a second live vote on a single choice
+        poll hits the uq_votes_single_choice index and is skipped. No reads happen before the write, and two
+        concurrent requests can't both get a vote in on a single choice poll.
+        Once committed the new tally of the option is published to the poll's live result subscribers.
+        :param db: The database session
+        :param poll_option_id: The option being voted for
+        :param user_id: The voter
+        :return: the new Vote
+        """
+        if not poll_option_id:
+            raise ValueError("A vote must have a selected poll option ID.")
 
-        poll = option.poll
-        if not PollCtrl.can_user_vote(poll, user_id, db):
-            raise PermissionError("User is not allowed to vote on this poll.")
+        candidate = (
+            select(
+                literal(default_uuid()),
+                PollOption.option_id,
+                PollOption.poll_id,
+                literal(user_id),
+                literal(datetime.now(timezone.utc), Vote.timestamp.type),
+                literal(False),
+                not_(Poll.allow_multi_votes),
+            )
+            .join(Poll, Poll.poll_id == PollOption.poll_id)
+            .where(
+                PollOption.option_id == poll_option_id,
+                PollOption.deleted.is_(False),
+                Poll.deleted.is_(False),
+                Poll.is_closed.is_(False),
+            )
+        )
+        statement = (
+            VoteCtrl._insert_for(db)(Vote)
+            .from_select(_VOTE_COLUMNS, candidate)
+            .on_conflict_do_nothing()
+            .returning(Vote)
+        )
+        new_vote = db.scalars(statement).first()
+        if new_vote is None:
+            db.rollback()
+            VoteCtrl._raise_rejection(poll_option_id, db)
 
-        new_vote = Vote(poll_option_id=poll_option_id, user_id=user_id)
-        db.add(new_vote)
+        poll_id = new_vote.poll_id
+        vote_count = VoteCtrl._adjust_vote_count(poll_option_id, 1, db)
         db.commit()
-        db.refresh(new_vote)
+        VoteCtrl._publish_tallies(poll_id, {poll_option_id: vote_count})
         return new_vote
 
+    @staticmethod
+    def create_many(db: Session, votes: list[dict[str, Any]]) -> set[str]:
+        """
+        Insert already validated votes with INSERT ... SELECT statements and bump the counters once per option.
+        Like create, rows whose option or poll was deleted or whose poll was closed in the meantime are filtered
+        out by the SELECT, and rows colliding with the single choice index are skipped, not raised.
+        The new tallies of polls with live result subscribers are read back in one query and published
+        :param db: The database session
+        :param votes: Column name -> value mappings, vote_id, poll_option_id, poll_id, user_id and timestamp
+        :return: the ids of the votes that were inserted
+        """
+        inserted: dict[str, str] = {}
+        option_polls = {vote["poll_option_id"]: vote["poll_id"] for vote in votes}
+        # Stay well under SQLite's bound parameter limit
+        for start in range(0, len(votes), 1000):
+            buffered = values(
+                column("vote_id", Vote.vote_id.type),
+                column("poll_option_id", Vote.poll_option_id.type),
+                column("user_id", Vote.user_id.type),
+                column("timestamp", Vote.timestamp.type),
+                name="buffered",
+            ).data([
+                (vote["vote_id"], vote["poll_option_id"], vote["user_id"], vote["timestamp"])
+                for vote in votes[start:start + 1000]
+            ]).cte("buffered")
+            # Same filter as create: a vote buffered before its poll was closed or deleted never reaches the table
+            candidates = (
+                select(
+                    buffered.c.vote_id,
+                    PollOption.option_id,
+                    PollOption.poll_id,
+                    buffered.c.user_id,
+                    buffered.c.timestamp,
+                    literal(False),
+                    not_(Poll.allow_multi_votes),
+                )
+                .join(PollOption, PollOption.option_id == buffered.c.poll_option_id)
+                .join(Poll, Poll.poll_id == PollOption.poll_id)
+                .where(
+                    PollOption.deleted.is_(False),
+                    Poll.deleted.is_(False),
+                    Poll.is_closed.is_(False),
+                )
+            )
+            statement = (
+                VoteCtrl._insert_for(db)(Vote)
+                .from_select(_VOTE_COLUMNS, candidates)
+                .on_conflict_do_nothing()
+                .returning(Vote.vote_id, Vote.poll_option_id)
+            )
+            inserted.update(db.execute(statement).tuples().all())
+
+        per_option = Counter(inserted.values())
+        if per_option:
+            # Core table on purpose: an ORM update with a parameter list would turn into a bulk update by primary key
+            options = PollOption.__table__
+            db.execute(
+                update(options)
+                .where(options.c.option_id == bindparam("option"))
+                .values(vote_count=options.c.vote_count + bindparam("delta")),
+                [{"option": option_id, "delta": delta} for option_id, delta in per_option.items()],
+            )
+        db.commit()
+
+        watched = [option_id for option_id in per_option if poll_broadcaster.has_subscribers(option_polls[option_id])]
+        if watched:
+            tallies: dict[str, dict[str, int]] = {}
+            rows = db.query(PollOption.poll_id, PollOption.option_id, PollOption.vote_count).filter(
+                PollOption.option_id.in_(watched)
+            )
+            for poll_id, option_id, vote_count in rows:
+                tallies.setdefault(poll_id, {})[option_id] = vote_count
+            for poll_id, counts in tallies.items():
+                VoteCtrl._publish_tallies(poll_id, counts)
+        return set(inserted)
+
+    @staticmethod
+    def _insert_for(db: Session):
+        # ON CONFLICT DO NOTHING is dialect specific, both dialects we care about spell it the same way
+        return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+    @staticmethod
+    def _raise_rejection(poll_option_id: str, db: Session) -> None:
+        # Only runs once the insert was skipped, to tell the caller why
+        option = db.query(PollOption).filter(PollOption.option_id == poll_option_id, PollOption.deleted.is_(False)).first()
+        if not option or option.poll.deleted:
+            raise ValueError("Invalid poll option ID")
+        raise PermissionError("User is not allowed to vote on this poll.")
+
+    @staticmethod
+    def _adjust_vote_count(poll_option_id: str, delta: int, db: Session) -> int | None:
+        # Done in SQL (vote_count = vote_count + delta) so concurrent voters never overwrite each other,
+        # RETURNING hands back the new tally without a second round trip
+        statement = (
+            update(PollOption)
+            .where(PollOption.option_id == poll_option_id)
+            .values(vote_count=PollOption.vote_count + delta)
+            .returning(PollOption.vote_count)
+            .execution_options(synchronize_session=False)
+        )
+        return db.execute(statement).scalar()
+
+    @staticmethod
+    def _publish_tallies(poll_id: str, counts: dict[str, int | None]) -> None:
+        poll_broadcaster.publish(poll_id, "tally", {"poll_id": poll_id, "options": counts})
+
     @staticmethod
     def save(record: Vote, storage: Session) -> bool:
         storage.add(record)
@@ -41,12 +191,25 @@ class VoteCtrl(PersistentController):
 
     @staticmethod
     def safe_delete(record: Vote, storage: Session) -> bool:
+        counts = {}
+        if not record.deleted:
+            counts[record.poll_option_id] = VoteCtrl._adjust_vote_count(record.poll_option_id, -1, storage)
+        poll_id = record.poll_id
         record.deleted = True
         storage.commit()
+        if counts:
+            VoteCtrl._publish_tallies(poll_id, counts)
         return True
 
     @staticmethod
     def permanent_delete(record: Vote, storage: Session) -> bool:
+        # Soft deleted votes were already taken off the counter
+        counts = {}
+        if not record.deleted:
+            counts[record.poll_option_id] = VoteCtrl._adjust_vote_count(record.poll_option_id, -1, storage)
+        poll_id = record.poll_id
         storage.delete(record)
         storage.commit()
+        if counts:
+            VoteCtrl._publish_tallies(poll_id, counts)
         return True
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import threading
+from typing import Any
+
+from src.core.config import POLL_STREAM_MAX_PENDING
+
+"""
+In-process publish/subscribe feeding the Server-Sent Events endpoints.
+A published message is encoded into an SSE frame once, however many subscribers the topic has, and handed to
+each subscriber on the event loop it lives on, so publish can be called from any thread: sync routes running
+in the threadpool, the vote buffer's flush thread or the event loop itself.
+Subscribers only hear about changes committed by this process. With several workers each one broadcasts
+its own writes, clients that need every change have to be pinned to one worker.
+"""
+
+
+class SubscriberLagged(Exception):
+    """The subscriber fell max_pending frames behind and won't receive anything else"""
+
+
+def sse_frame(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """
+    The receiving end of one or more topics, created by Broadcaster.subscribe from inside a running event loop.
+    Frames of every topic arrive on the one queue in the order they were published
+    """
+    def __init__(self, broadcaster: "Broadcaster", topics: tuple[str, ...], max_pending: int):
+        self.topics = topics
+        self.lagged = False
+        self._broadcaster = broadcaster
+        self._max_pending = max_pending
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    def offer(self, frame: str) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, frame)
+        except RuntimeError:
+            # The subscriber's loop is gone, nobody is listening anymore
+            self.close()
+
+    async def next_frame(self, timeout: float | None = None) -> str | None:
+        """
+        Wait for the next frame
+        :param timeout: Seconds to wait, forever if None
+        :return: the frame, None if nothing was published in time
+        """
+        try:
+            frame = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if frame is None:
+            raise SubscriberLagged(*self.topics)
+        return frame
+
+    def close(self) -> None:
+        self._broadcaster.unsubscribe(self)
+
+    def _deliver(self, frame: str) -> None:
+        # Runs on the subscriber's loop. A client too slow to keep up is cut off rather than buffered forever,
+        # it gets a fresh snapshot when it reconnects
+        if self.lagged:
+            return
+        if self._queue.qsize() >= self._max_pending:
+            self.lagged = True
+            self._queue.put_nowait(None)
+            return
+        self._queue.put_nowait(frame)
+
+
+class Broadcaster:
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._topics: dict[str, set[Subscription]] = {}
+
+    def subscribe(self, *topics: str) -> Subscription:
+        """
+        Start receiving the frames published on one or more topics, must be called from the loop that will read them.
+        Subscribing to several topics at once multiplexes them onto one subscription, e.g. one stream for many polls
+        :param topics: What to listen to, e.g. poll ids
+        :return: the subscription, close it when done
+        """
+        subscription = Subscription(self, tuple(dict.fromkeys(topics)), self.max_pending)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        with self._lock:
+            return topic in self._topics
+
+    def subscriber_count(self, topic: str | None = None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._topics.get(topic, ()))
+            return sum(len(subscribers) for subscribers in self._topics.values())
+
+    def publish(self, topic: str, event: str, data: Any) -> int:
+        """
+        Send a message to every subscriber of a topic
+        :param topic: The topic to publish on
+        :param event: The SSE event name
+        :param data: JSON serializable payload
+        :return: the number of subscribers it was handed to
+        """
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return 0
+        frame = sse_frame(event, data)
+        for subscription in subscribers:
+            subscription.offer(frame)
+        return len(subscribers)
+
+
+# Live poll results, one topic per poll id
+poll_broadcaster = Broadcaster(max_pending=POLL_STREAM_MAX_PENDING)
@@ -7,3 +7,79 @@ SECRET_KEY = os.getenv("SECRET_KEY", "a-super-secret-key-that-should-be-changed"
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# Defaults to DATABASE_URL with the aiosqlite driver, only needed for non SQLite databases
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Database engine profile. "tuned" applies the SQLite pragmas and pool settings below on every
+# new connection, "legacy" builds a stock engine (rollback journal, default pool) and is kept
+# around mostly to benchmark against
+DB_ENGINE_PROFILE = os.getenv("DB_ENGINE_PROFILE", "tuned")
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+# Negative values are KiB instead of pages, -65536 is 64MB of page cache per connection
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", -65536))
+DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", 5000))
+DB_TEMP_STORE = os.getenv("DB_TEMP_STORE", "MEMORY")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+# Per-request query budget (0 disables a limit). Outside strict mode going over only logs a warning,
+# in strict mode the offending statement raises so tests fail on N+1 regressions
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", 0))
+DB_QUERY_REPEAT_LIMIT = int(os.getenv("DB_QUERY_REPEAT_LIMIT", 10))
+DB_QUERY_STRICT = os.getenv("DB_QUERY_STRICT", "false").lower() == "true"
+
+# Write-behind buffer for votes on hot polls. Votes are validated against a cached copy of the poll and
+# written in batches every VOTE_BUFFER_FLUSH_MS or once VOTE_BUFFER_MAX_BATCH votes are waiting.
+# With VOTE_BUFFER_DURABLE a vote is only acknowledged once its batch is committed (group commit),
+# otherwise it is acknowledged right away and votes still in memory are lost if the process dies
+VOTE_BUFFER_ENABLED = os.getenv("VOTE_BUFFER_ENABLED", "false").lower() == "true"
+VOTE_BUFFER_FLUSH_MS = int(os.getenv("VOTE_BUFFER_FLUSH_MS", 50))
+VOTE_BUFFER_MAX_BATCH = int(os.getenv("VOTE_BUFFER_MAX_BATCH", 500))
+VOTE_BUFFER_DURABLE = os.getenv("VOTE_BUFFER_DURABLE", "false").lower() == "true"
+VOTE_BUFFER_STATE_TTL = float(os.getenv("VOTE_BUFFER_STATE_TTL", 5))
+
+# Live poll results (GET /polls/{poll_id}/stream): seconds between keep-alive comments on an idle stream,
+# and how many unread updates a client may fall behind before it is disconnected to resync on reconnect
+POLL_STREAM_KEEPALIVE = float(os.getenv("POLL_STREAM_KEEPALIVE", 15))
+POLL_STREAM_MAX_PENDING = int(os.getenv("POLL_STREAM_MAX_PENDING", 100))
+
+# Materialized occurrences of recurring events (event_occurrences). A background job keeps the table filled
+# from OCCURRENCE_RETENTION_DAYS in the past to OCCURRENCE_HORIZON_DAYS ahead, rolling it forward every
+# OCCURRENCE_REFRESH_MINUTES. Windows outside the horizon fall back to expanding the series on the fly.
+# Without the job (or roll_occurrences.py run from cron) the table stays empty and everything is expanded
+OCCURRENCE_JOB_ENABLED = os.getenv("OCCURRENCE_JOB_ENABLED", "false").lower() == "true"
+OCCURRENCE_HORIZON_DAYS = int(os.getenv("OCCURRENCE_HORIZON_DAYS", 90))
+OCCURRENCE_RETENTION_DAYS = int(os.getenv("OCCURRENCE_RETENTION_DAYS", 7))
+OCCURRENCE_REFRESH_MINUTES = float(os.getenv("OCCURRENCE_REFRESH_MINUTES", 60))
+
+# Weekly availability heatmaps of study sessions (precompute_availability.py). Worker processes building the
+# per-user bitmaps and aggregating them, 0 for one per CPU
+AVAILABILITY_WORKERS = int(os.getenv("AVAILABILITY_WORKERS", 0))
+
+# In-process interval indexes of calendars used for conflict checks (src/controllers/event_index.py), at most
+# this many calendars are kept warm
+EVENT_INDEX_MAX_CALENDARS = int(os.getenv("EVENT_INDEX_MAX_CALENDARS", 500))
+
+# Notification dispatcher (src/controllers/notification_dispatcher.py). Every NOTIFICATION_POLL_SECONDS it sweeps:
+# claims up to NOTIFICATION_BATCH_SIZE due notifications at a time, hands them to NOTIFICATION_BACKEND ("log",
+# "memory" or a "module:Class" path) and loads the ones due in the next NOTIFICATION_HORIZON_SECONDS into its timing
+# wheel, which sends them on time without polling in between. A claim lasts NOTIFICATION_CLAIM_SECONDS, after that
+# a worker that died is assumed gone and its notifications are claimed again. dispatch_notifications.py runs it as
+# its own process
+NOTIFICATION_DISPATCHER_ENABLED = os.getenv("NOTIFICATION_DISPATCHER_ENABLED", "false").lower() == "true"
+NOTIFICATION_BACKEND = os.getenv("NOTIFICATION_BACKEND", "log")
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", 500))
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", 60))
+NOTIFICATION_HORIZON_SECONDS = float(os.getenv("NOTIFICATION_HORIZON_SECONDS", 900))
+NOTIFICATION_CLAIM_SECONDS = float(os.getenv("NOTIFICATION_CLAIM_SECONDS", 300))
+# A failed delivery is tried again after NOTIFICATION_RETRY_SECONDS, doubling on every further failure up to
+# NOTIFICATION_RETRY_MAX_SECONDS (with jitter), and dead lettered once NOTIFICATION_MAX_ATTEMPTS attempts failed
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", 5))
+NOTIFICATION_RETRY_SECONDS = float(os.getenv("NOTIFICATION_RETRY_SECONDS", 30))
+NOTIFICATION_RETRY_MAX_SECONDS = float(os.getenv("NOTIFICATION_RETRY_MAX_SECONDS", 3600))
+# A user with a notification due also gets the ones falling due within NOTIFICATION_DIGEST_SECONDS, all in one
+# digest. 0 sends every notification on its own
+NOTIFICATION_DIGEST_SECONDS = float(os.getenv("NOTIFICATION_DIGEST_SECONDS", 300))
@@ -0,0 +1,126 @@
+import importlib
+import logging
+import random
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Protocol
+
+"""
+Where the notification dispatcher hands reminders over. A backend gets a whole batch at once so it can use
+whatever bulk API its provider has, and reports which deliveries failed; the dispatcher records the outcome of
+the batch in bulk. With digests on, one delivery can stand for several notifications of its user (coalesce).
+"log" and "memory" are local stand-ins, anything else is imported from a "module:Class" path.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Delivery:
+    notification_id: str
+    # Owner of the calendar of the event, the one to notify
+    user_id: str
+    event_id: str
+    type: str
+    message: str
+    # When the notification was due, naive UTC
+    due: datetime
+    # 1 on the first try, higher on retries
+    attempt: int = 1
+    # A digest stands for these notifications too, its outcome is theirs
+    coalesced: tuple[str, ...] = ()
+
+    @property
+    def notification_ids(self) -> tuple[str, ...]:
+        return (self.notification_id, *self.coalesced)
+
+
+class NotificationBackend(Protocol):
+    def send(self, deliveries: list[Delivery]) -> set[str]:
+        """
+        Deliver a batch
+        :param deliveries: The notifications to send
+        :return: notification_id of the deliveries that failed, raising fails the whole batch
+        """
+        ...
+
+
+class LogBackend:
+    """
+    Writes every notification to the log, for development
+    """
+    def send(self, deliveries: list[Delivery]) -> set[str]:
+        for delivery in deliveries:
+            logger.info("Notify %s: %s", delivery.user_id, delivery.message)
+        return set()
+
+
+class MemoryBackend:
+    """
+    Keeps what was sent in a list, for tests and benchmarks
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent: list[Delivery] = []
+
+    def send(self, deliveries: list[Delivery]) -> set[str]:
+        with self._lock:
+            self.sent.extend(deliveries)
+        return set()
+
+
+def coalesce(deliveries: list[Delivery]) -> list[Delivery]:
+    """
+    One delivery per user: a user with several notifications gets a single digest listing them, soonest first
+    :param deliveries: Deliveries ordered by due time
+    :return: the digests and the single deliveries, ordered by their first due time
+    """
+    by_user: dict[str, list[Delivery]] = {}
+    for delivery in deliveries:
+        by_user.setdefault(delivery.user_id, []).append(delivery)
+    digests = []
+    for group in by_user.values():
+        first = group[0]
+        if len(group) == 1:
+            digests.append(first)
+            continue
+        digests.append(Delivery(
+            notification_id=first.notification_id,
+            user_id=first.user_id,
+            event_id=first.event_id,
+            type=first.type,
+            message=f"{len(group)} reminders:\n" + "\n".join(f"- {delivery.message}" for delivery in group),
+            due=first.due,
+            attempt=max(delivery.attempt for delivery in group),
+            coalesced=tuple(delivery.notification_id for delivery in group[1:]),
+        ))
+    return digests
+
+
+def retry_delay(attempt: int, base: float, cap: float, rng: random.Random | None = None) -> timedelta:
+    """
+    How long to wait before retrying a delivery that failed
+    :param attempt: The attempt that failed, from 1
+    :param base: Seconds to wait after the first failure, doubled after every further one
+    :param cap: The longest wait in seconds
+    :param rng: Source of the jitter, the random module by default
+    :return: half the backed off wait fixed and half random, so deliveries that failed together (a provider
+    outage) don't all come back at the same moment
+    """
+    delay = min(cap, base * 2 ** min(attempt - 1, 32))
+    return timedelta(seconds=delay / 2 + (rng or random).uniform(0, delay / 2))
+
+
+def backend_from_name(name: str) -> NotificationBackend:
+    """
+    The backend a setting names: "log", "memory" or "package.module:ClassName" (built without arguments)
+    """
+    if name == "log":
+        return LogBackend()
+    if name == "memory":
+        return MemoryBackend()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown notification backend: {name}")
+    return getattr(importlib.import_module(module_name), class_name)()
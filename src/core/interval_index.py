@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+from sortedcontainers import SortedList
+
+from src.constants import INDEX_HORIZON_DAYS, INDEX_MAX_SPAN_DAYS
+from src.core.recurrence import naive_utc, occurrences
+from src.enums import RecurrenceRule
+
+"""
+Overlap queries over the events of one calendar, kept in memory between requests.
+Events sit in a SortedList ordered by start. An event overlapping [start, end) starts after
+start - longest (the longest event ever added), so a query is one bisection plus a scan of the events
+starting in [start - longest, end): O(log n + k). Recurring series never end, so the list holds their
+occurrences over a covered span only: the days queried so far and INDEX_HORIZON_DAYS after them. A query
+reaching past it expands every series over the new days once, O(s * occurrences), and is O(log n + k)
+from then on. When covering a query would stretch the span past INDEX_MAX_SPAN_DAYS, that query expands
+every series over its own window instead: O(log n + k + s). Times are naive UTC.
+"""
+
+
+class IntervalIndex:
+    def __init__(self, version: int = 0):
+        # busy_version of the calendar the index reflects
+        self.version = version
+        self._starts = SortedList()
+        self._one_offs: dict[str, tuple[datetime, datetime]] = {}
+        self._series: dict[str, tuple[datetime, datetime, int]] = {}
+        # Occurrences of each series held in _starts, to take them out again
+        self._expanded: dict[str, list[tuple[datetime, str, datetime]]] = {}
+        # Every occurrence starting in [covered[0], covered[1]) is in _starts
+        self._covered: tuple[datetime, datetime] | None = None
+        # Only grows, a stale bound just widens the scan
+        self._longest = timedelta(0)
+
+    def __len__(self) -> int:
+        return len(self._one_offs) + len(self._series)
+
+    def add(self, event_id: str, start: datetime, end: datetime, rule: int | None = RecurrenceRule.NONE) -> None:
+        """
+        Add an event, replacing any earlier version of it
+        """
+        self.discard(event_id)
+        start, end = naive_utc(start), naive_utc(end)
+        self._longest = max(self._longest, end - start)
+        if rule:
+            self._series[event_id] = (start, end, rule)
+            self._expanded[event_id] = []
+            if self._covered is not None:
+                self._expand(event_id, *self._covered)
+            return
+        self._one_offs[event_id] = (start, end)
+        self._starts.add((start, event_id, end))
+
+    def discard(self, event_id: str) -> None:
+        if self._series.pop(event_id, None) is not None:
+            for occurrence in self._expanded.pop(event_id):
+                self._starts.remove(occurrence)
+        found = self._one_offs.pop(event_id, None)
+        if found is not None:
+            self._starts.remove((found[0], event_id, found[1]))
+
+    def overlapping(self, start: datetime, end: datetime) -> list[tuple[str, datetime, datetime]]:
+        """
+        Events, or occurrences of recurring ones, overlapping [start, end)
+        :return: (event_id, start, end) of each, ordered by start
+        """
+        start, end = naive_utc(start), naive_utc(end)
+        covered = self._cover(start - self._longest, end)
+        scanned = self._starts.irange((start - self._longest,), (end,), inclusive=(True, False))
+        if covered:
+            return [(event_id, event_start, event_end) for event_start, event_id, event_end in scanned if event_end > start]
+        # Outside the covered span the list only answers for one-offs
+        found = [
+            (event_id, event_start, event_end)
+            for event_start, event_id, event_end in scanned
+            if event_end > start and event_id in self._one_offs
+        ]
+        for event_id, (series_start, series_end, rule) in self._series.items():
+            found.extend((event_id, *occurrence) for occurrence in occurrences(series_start, series_end, rule, start, end))
+        return sorted(found, key=lambda item: (item[1], item[0]))
+
+    def is_busy(self, at: datetime) -> bool:
+        """
+        Whether an event covers the given moment
+        """
+        at = naive_utc(at)
+        return bool(self.overlapping(at, at + timedelta(microseconds=1)))
+
+    def _cover(self, start: datetime, end: datetime) -> bool:
+        """
+        Widen the covered span to hold [start, end), expanding the series over the days it gains
+        :return: False, leaving the span as it was, when it would grow past INDEX_MAX_SPAN_DAYS
+        """
+        covered = self._covered
+        if covered is not None and covered[0] <= start and end <= covered[1]:
+            return True
+        low = start if covered is None else min(start, covered[0])
+        high = end + timedelta(days=INDEX_HORIZON_DAYS) if covered is None or end > covered[1] else covered[1]
+        if high - low > timedelta(days=INDEX_MAX_SPAN_DAYS):
+            return False
+        for event_id in self._series:
+            if covered is None:
+                self._expand(event_id, low, high)
+                continue
+            if low < covered[0]:
+                self._expand(event_id, low, covered[0])
+            if high > covered[1]:
+                self._expand(event_id, covered[1], high)
+        self._covered = (low, high)
+        return True
+
+    def _expand(self, event_id: str, low: datetime, high: datetime) -> None:
+        """
+        Put the occurrences of a series starting in [low, high) in the list
+        """
+        series_start, series_end, rule = self._series[event_id]
+        for occurrence_start, occurrence_end in occurrences(series_start, series_end, rule, low, high):
+            # Occurrences started before low overlap the window too, they belong to the days before it
+            if occurrence_start >= low:
+                occurrence = (occurrence_start, event_id, occurrence_end)
+                self._starts.add(occurrence)
+                self._expanded[event_id].append(occurrence)
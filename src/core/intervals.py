@@ -0,0 +1,46 @@
+import numpy as np
+
+"""
+Interval arithmetic over numpy arrays of [start, end) intervals, any orderable dtype (datetime64, int64).
+"""
+
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Union of intervals as disjoint blocks ordered by start, with a sort and a single sweep. Intervals that
+    overlap or touch end up in the same block
+    :param starts: Start of each interval
+    :param ends: End of each interval
+    :return: (block starts, block ends)
+    """
+    if not len(starts):
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    # How far the intervals seen so far reach, a block begins where an interval starts past that
+    reach = np.maximum.accumulate(ends)
+    begins = np.empty(len(starts), dtype=bool)
+    begins[0] = True
+    begins[1:] = starts[1:] > reach[:-1]
+    first = np.flatnonzero(begins)
+    last = np.append(first[1:] - 1, len(starts) - 1)
+    return starts[first], reach[last]
+
+
+def merge_grouped(
+    groups: np.ndarray, starts: np.ndarray, ends: np.ndarray, group_count: int
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    merge_intervals for every group at once
+    :param groups: Group of each interval, 0 to group_count - 1
+    :param starts: Start of each interval
+    :param ends: End of each interval
+    :param group_count: Number of groups
+    :return: (block starts, block ends) of each group, in group order
+    """
+    order = np.argsort(groups, kind="stable")
+    bounds = np.searchsorted(groups[order], np.arange(group_count + 1))
+    return [
+        merge_intervals(starts[order[bounds[g]:bounds[g + 1]]], ends[order[bounds[g]:bounds[g + 1]]])
+        for g in range(group_count)
+    ]
@@ -0,0 +1,41 @@
+import heapq
+from typing import Sequence, TypeVar
+
+"""
+Column layout of overlapping events for day and week views.
+"""
+
+T = TypeVar("T")
+
+
+def assign_lanes(intervals: Sequence[tuple[T, T]]) -> list[tuple[int, int]]:
+    """
+    Place intervals side by side so overlapping ones never share a lane, with a sweep over the intervals in
+    start order: a heap of the lanes in use ordered by when they free up and a heap of the free lanes, lowest
+    first. A cluster is a run of transitively overlapping intervals, all of its intervals get the number of
+    lanes the cluster needed so they can be drawn at the same width. Intervals that only touch don't overlap.
+    O(n log n)
+    :param intervals: (start, end) of each interval, ordered by start
+    :return: (lane, lane count) of each interval, in the same order
+    """
+    placed: list[list[int]] = []
+    busy: list[tuple[T, int]] = []
+    free: list[int] = []
+    cluster_start, lanes = 0, 0
+    for position, (start, end) in enumerate(intervals):
+        while busy and busy[0][0] <= start:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        if not busy:
+            # Nothing is running anymore, the previous cluster is complete
+            for entry in placed[cluster_start:position]:
+                entry[1] = lanes
+            cluster_start, lanes, free = position, 0, []
+        if free:
+            lane = heapq.heappop(free)
+        else:
+            lane, lanes = lanes, lanes + 1
+        heapq.heappush(busy, (end, lane))
+        placed.append([lane, 0])
+    for entry in placed[cluster_start:]:
+        entry[1] = lanes
+    return [(lane, count) for lane, count in placed]
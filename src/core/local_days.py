@@ -0,0 +1,77 @@
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+"""
+Local calendar days of UTC times in a time zone.
+A zone only changes its UTC offset a couple of times a year, so a range of time splits into a few spans of
+constant offset. Inside a span the local day of a UTC time is date(time + offset), which a grouped SQL query
+or a numpy array can compute without any time zone support.
+"""
+
+
+def zone_or_utc(name: str | None) -> ZoneInfo:
+    """
+    The time zone of the given name, UTC when it is missing or unknown
+    """
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+def day_bounds(zone: ZoneInfo, first: date, last: date) -> tuple[datetime, datetime]:
+    """
+    Naive UTC times of the start of the first day and the end of the last day, local days of the zone
+    """
+    start = datetime.combine(first, time(), zone).astimezone(timezone.utc).replace(tzinfo=None)
+    end = datetime.combine(last + timedelta(days=1), time(), zone).astimezone(timezone.utc).replace(tzinfo=None)
+    return start, end
+
+
+def offset_spans(zone: ZoneInfo, start: datetime, end: datetime) -> list[tuple[datetime, datetime, int]]:
+    """
+    Split [start, end) into spans where the zone keeps the same UTC offset
+    :param zone: The time zone
+    :param start: Beginning, naive UTC
+    :param end: End, naive UTC
+    :return: (span start, span end, offset in minutes) of each span, in order
+    """
+    def offset(moment: datetime) -> int:
+        return int(moment.replace(tzinfo=timezone.utc).astimezone(zone).utcoffset() // timedelta(minutes=1))
+
+    spans = []
+    span_start, current = start, offset(start)
+    probe = start
+    while probe < end:
+        step = min(probe + timedelta(days=1), end)
+        last = step - timedelta(microseconds=1)
+        if offset(last) == current:
+            probe = step
+            continue
+        # The offset changed during this day, bisect down to the exact instant
+        low, high = probe, last
+        while high - low > timedelta(microseconds=1):
+            middle = low + (high - low) // 2
+            if offset(middle) == current:
+                low = middle
+            else:
+                high = middle
+        spans.append((span_start, high, current))
+        span_start, current, probe = high, offset(high), high
+    spans.append((span_start, end, current))
+    return spans
+
+
+def local_days(moments: np.ndarray, spans: list[tuple[datetime, datetime, int]]) -> np.ndarray:
+    """
+    Local day of each time
+    :param moments: Naive UTC datetime64 values inside the spans
+    :param spans: From offset_spans
+    :return: datetime64[D] array
+    """
+    bounds = np.array([span_start for span_start, _, _ in spans[1:]], dtype="datetime64[us]")
+    offsets = np.array([offset for _, _, offset in spans], dtype="timedelta64[m]")
+    shifted = moments.astype("datetime64[us]") + offsets[np.searchsorted(bounds, moments, side="right")]
+    return shifted.astype("datetime64[D]")
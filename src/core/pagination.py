@@ -0,0 +1,51 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence, TypeVar
+
+"""
+Opaque cursors for keyset pagination. A cursor holds the sort key of the last row of a page, and the next
+page is the rows sorting after that key: an index seek, where OFFSET would walk every row of the pages before.
+Cursors are base64 encoded so clients treat them as tokens and don't build their own.
+"""
+
+# Listings keep returning a plain JSON array, the cursor of the next page travels in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+
+
+def encode_cursor(*key: Any) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in key]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> tuple:
+    """
+    Turn a cursor back into the sort key it was made from
+    :param cursor: The cursor sent by the client
+    :param parsers: One callable per key column rebuilding its value, e.g. datetime.fromisoformat
+    :return: the key
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid pagination cursor.")
+
+
+def split_page(rows: Sequence[T], limit: int, key: Callable[[T], tuple]) -> tuple[list[T], str | None]:
+    """
+    Cut a page out of rows fetched with LIMIT limit + 1, the extra row only tells whether a next page exists
+    :param rows: The rows, in key order
+    :param limit: The page size
+    :param key: Gives the sort key of a row
+    :return: the page and the cursor of the next one, None on the last page
+    """
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    return page, encode_cursor(*key(page[-1]))
@@ -0,0 +1,174 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.core.config import DB_QUERY_BUDGET, DB_QUERY_REPEAT_LIMIT, DB_QUERY_STRICT
+
+"""
+Per-request SQL instrumentation.
+instrument_engine hooks the cursor events of an engine, and every statement executed while a QueryStats
+is active (see track_queries / QueryStatsMiddleware) is counted, timed and bucketed by statement shape.
+The same shape showing up over and over in one request is the signature of an N+1 query.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """
+    Limits for a single request. None disables a limit. In strict mode going over raises QueryBudgetExceeded
+    from the offending statement, otherwise it is only logged once the request is done
+    """
+    max_queries: int | None = None
+    max_repeats: int | None = None
+    strict: bool = False
+
+
+@dataclass
+class QueryStats:
+    budget: QueryBudget = field(default_factory=QueryBudget)
+    count: int = 0
+    duration: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    @property
+    def repeated(self) -> int:
+        """Number of statements that had the same shape as an earlier one"""
+        return sum(n - 1 for n in self.shapes.values())
+
+    @property
+    def worst_repeat(self) -> tuple[str, int] | None:
+        return self.shapes.most_common(1)[0] if self.shapes else None
+
+    def violations(self) -> list[str]:
+        found = []
+        if self.budget.max_queries is not None and self.count > self.budget.max_queries:
+            found.append(f"{self.count} queries, budget is {self.budget.max_queries}")
+        worst = self.worst_repeat
+        if self.budget.max_repeats is not None and worst and worst[1] > self.budget.max_repeats:
+            found.append(f"statement repeated {worst[1]} times, limit is {self.budget.max_repeats}: {worst[0]}")
+        return found
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        self.shapes[statement_shape(statement)] += 1
+        if self.budget.strict:
+            problems = self.violations()
+            if problems:
+                raise QueryBudgetExceeded("; ".join(problems))
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+
+default_budget = QueryBudget(
+    max_queries=DB_QUERY_BUDGET or None,
+    max_repeats=DB_QUERY_REPEAT_LIMIT or None,
+    strict=DB_QUERY_STRICT,
+)
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement so executions that only differ in their parameters compare equal.
+    Bound values are already placeholders, only expanding IN lists and whitespace need folding
+    """
+    return _IN_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def current_stats() -> QueryStats | None:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(budget: QueryBudget | None = None):
+    """
+    Record every statement executed inside the block, threads started from it included
+    :param budget: Limits to enforce, defaults to the module wide default_budget
+    """
+    stats = QueryStats(budget=budget or default_budget)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        if not stats.budget.strict:
+            for problem in stats.violations():
+                logger.warning("Query budget exceeded: %s", problem)
+
+
+@contextmanager
+def query_budget(max_queries: int | None = None, max_repeats: int | None = None):
+    """
+    Enforce a strict budget on everything tracked while the block runs, meant for tests:
+
+        with query_budget(max_queries=3):
+            client.get("/polls/")
+    """
+    global default_budget
+    previous = default_budget
+    default_budget = QueryBudget(max_queries=max_queries, max_repeats=max_repeats, strict=True)
+    try:
+        yield
+    finally:
+        default_budget = previous
+
+
+def instrument_engine(target: Engine) -> None:
+    """
+    Attach the counting hooks to an engine. For an AsyncEngine pass its sync_engine
+    """
+    @event.listens_for(target, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware tracking the queries of each request, reported back as response headers:
+    Server-Timing (shows up in the browser dev tools), X-DB-Query-Count and X-DB-Repeated-Queries
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode()))
+                    headers.append((b"x-db-query-count", str(stats.count).encode()))
+                    headers.append((b"x-db-repeated-queries", str(stats.repeated).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
@@ -0,0 +1,207 @@
+from calendar import monthrange
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from src.enums import RecurrenceRule
+
+"""
+Expansion of RecurrenceRule series into occurrences.
+Series have no end, so nothing here walks one from its start: the first occurrence able to touch the window
+is computed arithmetically and expansion stops at the end of the window.
+occurrences() is the lazy path, a generator per series. expand_many() does the same for thousands of series
+at once with numpy, no Python loop per occurrence.
+
+Occurrences repeat in UTC, the way times are stored. Monthly, quarterly and yearly series keep the day of
+month of their first occurrence, clamped to the last day of shorter months (Jan 31 -> Feb 28 -> Mar 31).
+WEEKDAYS repeats daily skipping Saturdays and Sundays, the first occurrence always counts. The rules give
+BIWEEKLY and ALT_WEEKLY no distinct meaning, both repeat every second week.
+"""
+
+FIXED_STEPS = {
+    RecurrenceRule.HOURLY: timedelta(hours=1),
+    RecurrenceRule.DAILY: timedelta(days=1),
+    RecurrenceRule.WEEKDAYS: timedelta(days=1),
+    RecurrenceRule.WEEKLY: timedelta(weeks=1),
+    RecurrenceRule.BIWEEKLY: timedelta(weeks=2),
+    RecurrenceRule.ALT_WEEKLY: timedelta(weeks=2),
+}
+
+MONTH_STEPS = {
+    RecurrenceRule.MONTHLY: 1,
+    RecurrenceRule.QUARTERLY: 3,
+    RecurrenceRule.YEARLY: 12,
+}
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def occurrences(
+    start: datetime,
+    end: datetime,
+    rule: int | None,
+    window_start: datetime,
+    window_end: datetime,
+) -> Iterator[tuple[datetime, datetime]]:
+    """
+    Lazily yield the occurrences of a series overlapping [window_start, window_end), in order
+    :param start: Start of the first occurrence
+    :param end: End of the first occurrence
+    :param rule: The RecurrenceRule, None is taken as NONE
+    :param window_start: Beginning of the window
+    :param window_end: End of the window
+    :return: (start, end) of each occurrence
+    """
+    window_start, window_end = _align(window_start, start), _align(window_end, start)
+    rule = RecurrenceRule(rule or RecurrenceRule.NONE)
+    duration = end - start
+
+    if rule == RecurrenceRule.NONE:
+        if start < window_end and end > window_start:
+            yield start, end
+        return
+
+    if rule in FIXED_STEPS:
+        step = FIXED_STEPS[rule]
+        # First k with start + k * step + duration > window_start
+        k = max(0, (window_start - duration - start) // step + 1)
+        while True:
+            occurrence = start + step * k
+            if occurrence >= window_end:
+                return
+            if rule != RecurrenceRule.WEEKDAYS or k == 0 or occurrence.weekday() < 5:
+                yield occurrence, occurrence + duration
+            k += 1
+
+    step = MONTH_STEPS[rule]
+    # Clamping can pull an occurrence a few days early, start one step before the estimate
+    k = max(0, (_month_index(window_start - duration) - _month_index(start)) // step - 1)
+    while True:
+        occurrence = _add_months(start, k * step)
+        if occurrence >= window_end:
+            return
+        if occurrence + duration > window_start:
+            yield occurrence, occurrence + duration
+        k += 1
+
+
+def expand_many(
+    starts: Sequence[datetime],
+    ends: Sequence[datetime],
+    rules: Sequence[int | None],
+    window_start: datetime,
+    window_end: datetime,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized occurrences() over many series. Same occurrences, computed in bulk
+    :param starts: Start of the first occurrence of each series
+    :param ends: End of the first occurrence of each series
+    :param rules: RecurrenceRule of each series, None is taken as NONE
+    :param window_start: Beginning of the window
+    :param window_end: End of the window
+    :return: (series index, occurrence start, occurrence end) arrays ordered by start then series index.
+             Times are naive UTC datetime64[us]
+    """
+    first_starts = to_datetime64(starts)
+    durations = to_datetime64(ends) - first_starts
+    rule_codes = np.array([rule or RecurrenceRule.NONE for rule in rules], dtype=np.int64)
+    window_start64 = to_datetime64([window_start])[0]
+    window_end64 = to_datetime64([window_end])[0]
+
+    found = []
+    single = np.flatnonzero(rule_codes == RecurrenceRule.NONE)
+    keep = (first_starts[single] < window_end64) & (first_starts[single] + durations[single] > window_start64)
+    found.append((single[keep], first_starts[single][keep]))
+
+    for rule, step in FIXED_STEPS.items():
+        series = np.flatnonzero(rule_codes == rule)
+        if not series.size:
+            continue
+        step64 = np.timedelta64(step // timedelta(microseconds=1), "us")
+        first_k = np.maximum(0, (window_start64 - durations[series] - first_starts[series]) // step64 + 1)
+        last_k = (window_end64 - first_starts[series] - np.timedelta64(1, "us")) // step64
+        index, k = _spread(series, first_k, last_k)
+        occurrence = first_starts[index] + k * step64
+        if rule == RecurrenceRule.WEEKDAYS:
+            # 1970-01-01 was a Thursday, Monday is 0
+            weekday = (occurrence.astype("datetime64[D]").astype(np.int64) + 3) % 7
+            keep = (k == 0) | (weekday < 5)
+            index, occurrence = index[keep], occurrence[keep]
+        found.append((index, occurrence))
+
+    for rule, step in MONTH_STEPS.items():
+        series = np.flatnonzero(rule_codes == rule)
+        if not series.size:
+            continue
+        first_month = first_starts[series].astype("datetime64[M]").astype(np.int64)
+        window_start_month = (window_start64 - durations[series]).astype("datetime64[M]").astype(np.int64)
+        first_k = np.maximum(0, (window_start_month - first_month) // step - 1)
+        last_k = (window_end64.astype("datetime64[M]").astype(np.int64) - first_month) // step
+        index, k = _spread(series, first_k, last_k)
+        occurrence = _add_months64(first_starts[index], k * step)
+        keep = (occurrence < window_end64) & (occurrence + durations[index] > window_start64)
+        found.append((index[keep], occurrence[keep]))
+
+    index = np.concatenate([part[0] for part in found])
+    occurrence = np.concatenate([part[1] for part in found]).astype("datetime64[us]")
+    order = np.lexsort((index, occurrence))
+    index, occurrence = index[order], occurrence[order]
+    return index, occurrence, occurrence + durations[index]
+
+
+def to_datetime64(values: Sequence[datetime]) -> np.ndarray:
+    """
+    datetime64[us] array of naive UTC times, numpy has no notion of time zones
+    """
+    # Several times faster than letting numpy convert the datetime objects itself
+    return np.fromiter(
+        ((naive_utc(value) - _EPOCH) // _MICROSECOND for value in values), dtype=np.int64, count=len(values)
+    ).view("datetime64[us]")
+
+
+def _spread(series: np.ndarray, first_k: np.ndarray, last_k: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # One row per (series, k) for k in [first_k, last_k] of each series
+    counts = np.maximum(0, last_k - first_k + 1)
+    index = np.repeat(series, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return index, np.repeat(first_k, counts) + offsets
+
+
+def _add_months64(moments: np.ndarray, months: np.ndarray) -> np.ndarray:
+    days = moments.astype("datetime64[D]")
+    month_start = moments.astype("datetime64[M]")
+    day_of_month = (days - month_start.astype("datetime64[D]")).astype(np.int64)
+    target = month_start + months.astype("timedelta64[M]")
+    days_in_month = ((target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")).astype(np.int64)
+    day = np.minimum(day_of_month, days_in_month - 1)
+    return target.astype("datetime64[D]") + day.astype("timedelta64[D]") + (moments - days)
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    year, month = divmod(moment.month - 1 + months, 12)
+    year += moment.year
+    return moment.replace(year=year, month=month + 1, day=min(moment.day, monthrange(year, month + 1)[1]))
+
+
+def _month_index(moment: datetime) -> int:
+    return moment.year * 12 + moment.month - 1
+
+
+def naive_utc(moment: datetime) -> datetime:
+    """
+    The UTC wall clock of a time, naive values are taken to be UTC already
+    """
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _align(moment: datetime, reference: datetime) -> datetime:
+    # SQLite hands back naive UTC times while request parameters are usually aware, compare like with like
+    if (moment.tzinfo is None) == (reference.tzinfo is None):
+        return moment
+    if reference.tzinfo is None:
+        return naive_utc(moment)
+    return moment.replace(tzinfo=timezone.utc)
@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+"""
+Meeting slot search over an availability grid.
+The window is cut into fixed slots and every member's busy time becomes one bit per slot, packed eight members
+to a byte: a 100 member session is 13 bytes per slot. Whether a member is free for a whole meeting is an OR of
+the bits of the slots it covers, computed for every start at once with a doubling table (log2 of the meeting
+length passes), and attendance is a popcount. Nothing compares members' intervals pairwise.
+"""
+
+
+@dataclass(frozen=True)
+class WorkingHours:
+    """
+    When meetings may take place, as local times of a time zone. A meeting has to fit inside one day's hours
+    """
+    day_start: time = time(9)
+    day_end: time = time(17)
+    weekdays_only: bool = True
+    timezone: str = "UTC"
+
+    def zone(self) -> ZoneInfo:
+        try:
+            return ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone: {self.timezone}")
+
+
+@dataclass(frozen=True)
+class SlotGrid:
+    """
+    Slot i covers [start + i * step, start + (i + 1) * step). Times are naive UTC
+    """
+    start: datetime
+    step: timedelta
+    size: int
+
+    @classmethod
+    def over(cls, start: datetime, end: datetime, step: timedelta) -> "SlotGrid":
+        # Slots begin on multiples of step (on the hour, quarter past...), the first one at or after start
+        offset = (start - datetime(1970, 1, 1)) % step
+        if offset:
+            start += step - offset
+        return cls(start=start, step=step, size=max(0, (end - start) // step))
+
+    def slot_start(self, index: int) -> datetime:
+        return self.start + self.step * index
+
+    def _slot_of(self, moments: np.ndarray, round_up: bool) -> np.ndarray:
+        elapsed = (moments - np.datetime64(self.start, "us")) / np.timedelta64(self.step // timedelta(microseconds=1), "us")
+        slots = np.ceil(elapsed) if round_up else np.floor(elapsed)
+        return np.clip(slots, 0, self.size).astype(np.int64)
+
+    def busy_matrix(self, members: np.ndarray, starts: np.ndarray, ends: np.ndarray, member_count: int) -> np.ndarray:
+        """
+        Which member is busy in which slot, a slot partly covered by an event is busy
+        :param members: Member index of each busy interval
+        :param starts: Start of each interval, naive UTC datetime64
+        :param ends: End of each interval, naive UTC datetime64
+        :param member_count: Number of members
+        :return: (member_count, size) boolean array
+        """
+        # +1 where a busy interval begins and -1 past its end, a running sum counts the overlapping intervals
+        changes = np.zeros((member_count, self.size + 1), dtype=np.int32)
+        np.add.at(changes, (members, self._slot_of(starts, round_up=False)), 1)
+        np.add.at(changes, (members, self._slot_of(ends, round_up=True)), -1)
+        return np.cumsum(changes[:, :-1], axis=1) > 0
+
+    def busy_bits(self, members: np.ndarray, starts: np.ndarray, ends: np.ndarray, member_count: int) -> np.ndarray:
+        """
+        busy_matrix as a bitset per slot
+        :return: (size, ceil(member_count / 8)) uint8, bit m of a row set when member m is busy in that slot
+        """
+        busy = self.busy_matrix(members, starts, ends, member_count)
+        return np.packbits(busy.T, axis=1, bitorder="little")
+
+    def allowed(self, hours: WorkingHours) -> np.ndarray:
+        """
+        Which slots fall inside the working hours, days are walked in the local time zone so DST is respected
+        """
+        allowed = np.zeros(self.size + 1, dtype=np.int32)
+        if not self.size:
+            return allowed[:-1].astype(bool)
+        zone = hours.zone()
+
+        def utc(day, moment: time) -> datetime:
+            return datetime.combine(day, moment, zone).astimezone(timezone.utc).replace(tzinfo=None)
+
+        end = self.slot_start(self.size)
+        day = self.start.replace(tzinfo=timezone.utc).astimezone(zone).date() - timedelta(days=1)
+        while utc(day, hours.day_start) < end:
+            if not hours.weekdays_only or day.weekday() < 5:
+                bounds = np.array([utc(day, hours.day_start), utc(day, hours.day_end)], dtype="datetime64[us]")
+                # Opening rounds up and closing down, a slot straddling either is outside the hours
+                first = self._slot_of(bounds[:1], round_up=True)[0]
+                last = self._slot_of(bounds[1:], round_up=False)[0]
+                if first < last:
+                    allowed[first] += 1
+                    allowed[last] -= 1
+            day += timedelta(days=1)
+        return np.cumsum(allowed[:-1]) > 0
+
+
+def window_or(bits: np.ndarray, length: int) -> np.ndarray:
+    """
+    OR of every run of length consecutive rows
+    :param bits: (n, words) array
+    :param length: Rows per run, at least 1
+    :return: (n - length + 1, words) array, row i is bits[i] | ... | bits[i + length - 1]
+    """
+    runs = len(bits) - length + 1
+    if runs <= 0:
+        return bits[:0]
+    # table[i] covers rows [i, i + span), doubled until the next doubling would pass length
+    table, span = bits, 1
+    while span * 2 <= length:
+        table = table[:-span] | table[span:]
+        span *= 2
+    # Two overlapping runs of span rows cover exactly length rows
+    return table[:runs] | table[length - span:length - span + runs]
+
+
+def rank_slots(busy: np.ndarray, allowed: np.ndarray, member_count: int, length: int, limit: int) -> list[tuple[int, np.ndarray]]:
+    """
+    Best meeting starts: most members free first, earliest first among equals, never overlapping each other
+    :param busy: Busy bitset of every slot, from SlotGrid.busy_bits
+    :param allowed: Which slots fall inside the working hours
+    :param member_count: Number of members
+    :param length: Slots a meeting lasts
+    :param limit: How many starts to return
+    :return: (first slot, boolean array of the members free for the whole meeting) of each start
+    """
+    busy_during = window_or(busy, length)
+    if not len(busy_during):
+        return []
+    # A start is only valid if every slot of the meeting is inside the working hours
+    closed = np.concatenate(([0], np.cumsum(~allowed)))
+    valid = np.flatnonzero(closed[length:length + len(busy_during)] - closed[:len(busy_during)] == 0)
+    if not len(valid):
+        return []
+    attendance = member_count - np.bitwise_count(busy_during[valid]).sum(axis=1, dtype=np.int64)
+    ranked = valid[np.lexsort((valid, -attendance))]
+
+    chosen: list[int] = []
+    taken = np.zeros(len(allowed), dtype=bool)
+    for start in ranked.tolist():
+        if len(chosen) == limit:
+            break
+        if taken[start:start + length].any():
+            continue
+        taken[start:start + length] = True
+        chosen.append(start)
+    free = np.unpackbits(busy_during[chosen], axis=1, count=member_count, bitorder="little") == 0
+    return list(zip(chosen, free))
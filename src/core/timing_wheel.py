@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from src.core.recurrence import naive_utc
+
+"""
+Timers due within the next span seconds, on a ring of one second slots.
+A timer due at second t sits in slot t % span, so scheduling, rescheduling and cancelling are O(1) whatever
+the number of timers, and advancing the clock only visits the seconds that went by. Anything due further out
+doesn't fit on the ring and is left to whoever keeps the full list (for reminders the database, whose due
+index the dispatcher reloads the next span from well before it runs out). Times are naive UTC, a timer never
+fires before its time: one due at 09:00:00.5 fires with the second 09:00:01.
+"""
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _tick(moment: datetime, up: bool) -> int:
+    seconds, rest = divmod(naive_utc(moment) - EPOCH, timedelta(seconds=1))
+    return seconds + 1 if up and rest else seconds
+
+
+class TimingWheel:
+    def __init__(self, span: int, now: datetime):
+        self.span = span
+        self._slots: list[set[str]] = [set() for _ in range(span)]
+        self._ticks: dict[str, int] = {}
+        # The first second that hasn't fired yet
+        self._cursor = _tick(now, up=False) + 1
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ticks
+
+    @property
+    def horizon(self) -> datetime:
+        """
+        Timers due from here on don't fit yet
+        """
+        return EPOCH + timedelta(seconds=self._cursor + self.span)
+
+    def schedule(self, key: str, due: datetime) -> bool:
+        """
+        Set the timer of key, replacing the one it had. One already overdue fires with the next second
+        :return: False when due is beyond the horizon, the timer is not kept then
+        """
+        self.cancel(key)
+        tick = max(_tick(due, up=True), self._cursor)
+        if tick >= self._cursor + self.span:
+            return False
+        self._slots[tick % self.span].add(key)
+        self._ticks[key] = tick
+        return True
+
+    def cancel(self, key: str) -> bool:
+        tick = self._ticks.pop(key, None)
+        if tick is None:
+            return False
+        self._slots[tick % self.span].discard(key)
+        return True
+
+    def advance(self, now: datetime) -> list[str]:
+        """
+        Move the clock to now
+        :return: keys of the timers that fired, soonest first
+        """
+        end = _tick(now, up=False) + 1
+        fired = []
+        for tick in range(self._cursor, min(end, self._cursor + self.span)):
+            slot = self._slots[tick % self.span]
+            if slot:
+                fired.extend(sorted(slot))
+                for key in slot:
+                    del self._ticks[key]
+                slot.clear()
+        self._cursor = max(self._cursor, end)
+        return fired
+
+    def next_due(self) -> datetime | None:
+        """
+        When the soonest timer fires, None without any
+        """
+        if not self._ticks:
+            return None
+        for tick in range(self._cursor, self._cursor + self.span):
+            if self._slots[tick % self.span]:
+                return EPOCH + timedelta(seconds=tick)
+        return None
@@ -1,20 +1,169 @@
-from sqlalchemy import create_engine
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from src.core.config import DATABASE_URL
+from src.core.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_ENGINE_PROFILE,
+    DB_JOURNAL_MODE,
+    DB_SYNCHRONOUS,
+    DB_MMAP_SIZE,
+    DB_CACHE_SIZE,
+    DB_BUSY_TIMEOUT,
+    DB_TEMP_STORE,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+)
+from src.core.query_stats import instrument_engine
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """
+    Connection level settings used to build an engine.
+    Pragmas are only applied to SQLite connections, pool settings are ignored for in-memory databases
+    since those live in a single connection anyway
+    """
+    name: str
+    pragmas: dict[str, Any] = field(default_factory=dict)
+    connect_args: dict[str, Any] = field(default_factory=dict)
+    pool_size: int | None = None
+    max_overflow: int | None = None
+    pool_recycle: int = -1
+
+
+# What we used to run with: rollback journal, default pool, every writer blocks every reader
+LEGACY_PROFILE = EngineProfile(name="legacy")
+
+# busy_timeout goes first so the journal_mode switch can wait on a lock instead of failing
+TUNED_PROFILE = EngineProfile(
+    name="tuned",
+    pragmas={
+        "busy_timeout": DB_BUSY_TIMEOUT,
+        "journal_mode": DB_JOURNAL_MODE,
+        "synchronous": DB_SYNCHRONOUS,
+        "mmap_size": DB_MMAP_SIZE,
+        "cache_size": DB_CACHE_SIZE,
+        "temp_store": DB_TEMP_STORE,
+    },
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+)
+
+PROFILES = {profile.name: profile for profile in (LEGACY_PROFILE, TUNED_PROFILE)}
+
+
+def get_profile(name: str) -> EngineProfile:
+    """
+    Look up an engine profile by name, case and surrounding whitespace are ignored
+    :param name: The profile name, usually DB_ENGINE_PROFILE
+    :return: the matching profile
+    """
+    profile = PROFILES.get(name.strip().lower())
+    if profile is None:
+        raise ValueError(f"Unknown engine profile {name!r}, expected one of: {', '.join(sorted(PROFILES))}")
+    return profile
+
+
+def _is_memory_database(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
 
-"""# Force using in-memory SQLite for now for tests
-DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-"""
-#need to use the db created from the seeding 
-connect_args = {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+def _engine_kwargs(url: str, profile: EngineProfile) -> dict[str, Any]:
+    is_sqlite = _is_sqlite(url)
+    kwargs: dict[str, Any] = {"connect_args": dict(profile.connect_args) if is_sqlite else {}}
+    if not (is_sqlite and _is_memory_database(url)):
+        if profile.pool_size is not None:
+            kwargs["pool_size"] = profile.pool_size
+        if profile.max_overflow is not None:
+            kwargs["max_overflow"] = profile.max_overflow
+        kwargs["pool_recycle"] = profile.pool_recycle
+    return kwargs
+
+
+def to_async_url(url: str) -> str:
+    """
+    Swap the driver of a sync SQLite url for aiosqlite, so both engines point at the same database
+    :param url: The sync database url
+    :return: the equivalent url for the async engine
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        raise ValueError(f"Cannot derive an async url for {parsed.drivername}, set ASYNC_DATABASE_URL instead")
+    return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+
+
+def build_engine(url: str, profile: EngineProfile = TUNED_PROFILE) -> Engine:
+    """
+    Build an engine for the given url using the settings of the given profile
+    :param url: The database url
+    :param profile: The engine profile to apply
+    :return: the configured engine
+    """
+    new_engine = create_engine(url, **_engine_kwargs(url, profile))
+    if _is_sqlite(url) and profile.pragmas:
+        apply_sqlite_pragmas(new_engine, profile.pragmas)
+    instrument_engine(new_engine)
+    return new_engine
+
+
+def build_async_engine(url: str, profile: EngineProfile = TUNED_PROFILE) -> AsyncEngine:
+    """
+    Async counterpart of build_engine, the url needs an async driver (e.g. sqlite+aiosqlite)
+    :param url: The async database url
+    :param profile: The engine profile to apply
+    :return: the configured async engine
+    """
+    new_engine = create_async_engine(url, **_engine_kwargs(url, profile))
+    if _is_sqlite(url) and profile.pragmas:
+        # Pool events live on the sync facade, the adapted aiosqlite connection exposes a sync cursor()
+        apply_sqlite_pragmas(new_engine.sync_engine, profile.pragmas)
+    instrument_engine(new_engine.sync_engine)
+    return new_engine
+
+
+def apply_sqlite_pragmas(target: Engine, pragmas: dict[str, Any]) -> None:
+    """
+    Run the given pragmas on every new DBAPI connection the engine opens
+    :param target: The engine to hook into
+    :param pragmas: pragma name -> value, executed in order
+    """
+    @event.listens_for(target, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+
+#need to use the db created from the seeding
+engine_profile = get_profile(DB_ENGINE_PROFILE)
+engine = build_engine(DATABASE_URL, engine_profile)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the async def routes so their queries do not block the event loop
+async_engine = build_async_engine(ASYNC_DATABASE_URL or to_async_url(DATABASE_URL), engine_profile)
+# Objects outlive the commit in async code, an expired attribute would need an awaited refresh
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
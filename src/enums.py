@@ -3,9 +3,15 @@ from enum import StrEnum, IntFlag, IntEnum
 
 class DeliveryStatus(StrEnum):
     PENDING = 'pending'
+    # Claimed by a dispatcher worker, see Notification.claimed_until
+    SENDING = 'sending'
+    # Failed, sent again at Notification.next_attempt_at
+    RETRYING = 'retrying'
     COMPLETED = 'completed'
     CANCELLED = 'cancelled'
     FAILED = 'failed'
+    # Failed on every attempt, given up on
+    DEAD_LETTER = 'dead_letter'
 
 class TaskStatus(StrEnum):
     CREATED = 'created'
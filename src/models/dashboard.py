@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+from src.models.calendar import Calendar
+from src.models.event import Event
+from src.models.notification import Notification
+from src.models.poll import PollOut
+
+
+class Dashboard(BaseModel):
+    # Window the upcoming events were taken from
+    start: datetime
+    end: datetime
+    calendars: List[Calendar]
+    events: List[Event]
+    polls: List[PollOut]
+    notifications: List[Notification]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import List, Optional
 from src.enums import RecurrenceRule
 
 class EventBase(BaseModel):
@@ -25,4 +25,37 @@ class Event(EventBase):
     event_id: str
     calendar_id: str
     deleted: bool
+    # Set on the occurrences of a recurring event: the start of its first occurrence
+    series_start: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
+
+
+class EventConflict(BaseModel):
+    event_id: str
+    calendar_id: str
+    # Times of the overlapping occurrence for recurring events
+    start_time: datetime
+    end_time: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+
+class EventWithConflicts(Event):
+    # Other events of the owner's calendars overlapping this one when it was written
+    conflicts: List[EventConflict] = []
+
+
+class EventLayout(Event):
+    # Column of the event in a day or week view, and how many columns its group of overlapping events needs
+    lane: int
+    lanes: int
+
+
+class DayCount(BaseModel):
+    day: date
+    count: int
+
+
+class DayCounts(BaseModel):
+    # Time zone whose local days were counted, only days with at least one event are listed
+    timezone: str
+    days: List[DayCount]
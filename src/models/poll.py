@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import List
+
+from src.classes.poll import Poll
+
+
+class PollOptionOut(BaseModel):
+    option_id: str
+    option_text: str
+    votes: int
+
+
+class PollOut(BaseModel):
+    poll_id: str
+    question: str
+    is_closed: bool
+    allow_multi_votes: bool
+    options: List[PollOptionOut]
+
+    @classmethod
+    def from_poll(cls, poll: Poll) -> "PollOut":
+        """
+        The poll with the tallies kept on its options, which should already be loaded
+        """
+        return cls(
+            poll_id=poll.poll_id,
+            question=poll.question,
+            is_closed=poll.is_closed,
+            allow_multi_votes=poll.allow_multi_votes,
+            options=[
+                PollOptionOut(option_id=o.option_id, option_text=o.option_text, votes=o.vote_count)
+                for o in poll.options
+            ],
+        )
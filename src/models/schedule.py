@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, List
+
+
+class BusyBlock(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class FreeBusy(BaseModel):
+    start: datetime
+    end: datetime
+    # user_id -> that user's busy blocks
+    users: Dict[str, List[BusyBlock]]
+    # When anybody is busy
+    combined: List[BusyBlock]
+
+
+class FreeAt(BaseModel):
+    user_id: str
+    at: datetime
+    free: bool
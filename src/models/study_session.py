@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+
+class MeetingSlot(BaseModel):
+    start: datetime
+    end: datetime
+    # How many members are free for the whole meeting
+    attendance: int
+    available: List[str]
+    unavailable: List[str]
+
+
+class AvailabilityHeatmap(BaseModel):
+    # Monday 00:00 UTC
+    week_start: datetime
+    slot_minutes: int
+    member_count: int
+    # How many members are free in each slot of the week
+    free: List[int]
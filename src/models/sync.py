@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from src.models.calendar import Calendar
+from src.models.event import Event
+from src.models.notification import Notification
+
+
+class SyncedEvent(Event):
+    updated_at: Optional[datetime] = None
+
+
+class SyncChanges(BaseModel):
+    # Send it back as token on the next sync
+    token: str
+    # Rows created, changed or soft deleted (deleted is true) since the token that was sent
+    calendars: List[Calendar]
+    events: List[SyncedEvent]
+    notifications: List[Notification]
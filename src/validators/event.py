@@ -2,7 +2,7 @@ from datetime import datetime
 
 from src.classes.event import Event
 from src.interfaces import Validator
-from src.constants import CALENDAR_TITLE, SESSION_LOCATION_LENGTH
+from src.constants import CALENDAR_TITLE, REMINDER_MINUTES, SESSION_LOCATION_LENGTH
 
 
 class EventValidator(Validator):
@@ -23,4 +23,7 @@ class EventValidator(Validator):
         if event.location and len(event.location) > SESSION_LOCATION_LENGTH[1]:
             raise ValueError(f"Location cannot exceed {SESSION_LOCATION_LENGTH[1]} characters.")
 
+        if event.reminder_minutes is not None and not REMINDER_MINUTES[0] <= event.reminder_minutes <= REMINDER_MINUTES[1]:
+            raise ValueError(f"Reminders go out between {REMINDER_MINUTES[0]} and {REMINDER_MINUTES[1]} minutes ahead.")
+
         return True
@@ -8,4 +8,6 @@ class VoteValidator(Validator):
             raise TypeError("Object must be of type Vote")
         if not vote.poll_option_id:
             raise ValueError("A vote must have a selected poll option ID.")
+        if not vote.poll_id:
+            raise ValueError("A vote must belong to a poll.")
         return True
@@ -27,7 +27,12 @@ export default function Calendar() {
           calendars = await calRes.json();
         }
         const calendarId = calendars[0].calendar_id;
-        let res = await fetch(`${base}/calendar/${calendarId}/events`, { headers, credentials: "include" });
+        // Only the month on screen, the backend returns the events overlapping that window
+        const range = new URLSearchParams({
+          start: new Date(year, month, 1).toISOString(),
+          end: new Date(year, month + 1, 1).toISOString(),
+        });
+        let res = await fetch(`${base}/calendar/${calendarId}/events?${range}`, { headers, credentials: "include" });
        
         const events = await res.json();
 
@@ -52,7 +57,7 @@ export default function Calendar() {
     const onUpdated = () => fetchEvents();
     window.addEventListener("events-updated", onUpdated);
     return () => window.removeEventListener("events-updated", onUpdated);
-  }, []);
+  }, [month, year]);
 
   function nextMonth() {
     // use Date arithmetic to avoid year/month edge-case bugs
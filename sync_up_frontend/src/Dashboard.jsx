@@ -4,6 +4,9 @@ import './dashboard.css';
 import './Calendar.css';
 import Calendar from './Calendar.jsx';
 
+// Most polls one live result stream follows, the server's POLL_STREAM_MAX_IDS
+const POLL_STREAM_MAX_IDS = 100;
+
 function injectFontAwesome() {
   if (typeof document === 'undefined') return;
   if (document.getElementById('fa-cdn')) return;
@@ -36,21 +39,59 @@ export default function Dashboard() {
     injectFontAwesome();
   }, []);
 
+  // GET /polls/ returns one page, the cursor of the next one comes back in the X-Next-Cursor header
+  const [pollsCursor, setPollsCursor] = useState(null);
+  const [loadingPolls, setLoadingPolls] = useState(false);
+  const fetchPolls = async (cursor = null) => {
+    setLoadingPolls(true);
+    try {
+      const url = cursor ? `http://127.0.0.1:8000/polls/?cursor=${encodeURIComponent(cursor)}` : 'http://127.0.0.1:8000/polls/';
+      const res = await fetch(url);
+      if (!res.ok) throw new Error('Failed to fetch polls');
+      const data = await res.json();
+      setPolls(prev => cursor ? [...prev, ...data] : data);
+      setPollsCursor(res.headers.get('X-Next-Cursor'));
+    } catch (err) {
+      console.error('Error loading polls', err);
+    } finally {
+      setLoadingPolls(false);
+    }
+  };
+
   useEffect(() => {
-    // fetch polls from backend
-    const fetchPolls = async () => {
-      try {
-        const res = await fetch('http://127.0.0.1:8000/polls/');
-        if (!res.ok) throw new Error('Failed to fetch polls');
-        const data = await res.json();
-        setPolls(data);
-      } catch (err) {
-        console.error('Error loading polls', err);
-      }
-    };
     fetchPolls();
   }, []);
 
+  // Live results over as few streams as possible: a stream per poll would use up the browser's handful of
+  // connections per origin, and one stream for every loaded poll would outgrow the longest URL the server accepts.
+  // Each stream follows up to 100 polls (the server's POLL_STREAM_MAX_IDS), one per page of GET /polls/
+  const pollIds = polls.map(p => p.poll_id).join(',');
+  useEffect(() => {
+    if (!pollIds) return;
+    const applyTallies = (pollId, counts, isClosed) => setPolls(prev => prev.map(p => p.poll_id !== pollId ? p : {
+      ...p,
+      is_closed: isClosed ?? p.is_closed,
+      options: p.options.map(o => o.option_id in counts ? { ...o, votes: counts[o.option_id] } : o),
+    }));
+    const ids = pollIds.split(',');
+    const chunks = [];
+    for (let i = 0; i < ids.length; i += POLL_STREAM_MAX_IDS) chunks.push(ids.slice(i, i + POLL_STREAM_MAX_IDS));
+    const sources = chunks.map(chunk => {
+      const source = new EventSource(`http://127.0.0.1:8000/polls/stream?ids=${chunk.map(encodeURIComponent).join(',')}`);
+      source.addEventListener('snapshot', (e) => {
+        const data = JSON.parse(e.data);
+        applyTallies(data.poll_id, data.options, data.is_closed);
+      });
+      source.addEventListener('tally', (e) => {
+        const data = JSON.parse(e.data);
+        applyTallies(data.poll_id, data.options);
+      });
+      source.addEventListener('closed', (e) => applyTallies(JSON.parse(e.data).poll_id, {}, true));
+      return source;
+    });
+    return () => sources.forEach(source => source.close());
+  }, [pollIds]);
+
   const handleVote = async (pollId, optionId) => {
     // For now the backend requires authentication to vote; this call will
     // fail with 401 if not logged in. We keep this here so when auth is wired
@@ -70,9 +111,7 @@ export default function Dashboard() {
         alert('Vote failed: ' + (err.detail || res.statusText));
         return;
       }
-      // refresh polls after voting
-      const refreshed = await fetch('http://127.0.0.1:8000/polls/');
-      setPolls(await refreshed.json());
+      // The new tally arrives over the poll's result stream, no need to refetch every poll
     } catch (e) {
       console.error(e);
       alert('Voting failed. Check console for details.');
@@ -277,6 +316,11 @@ export default function Dashboard() {
                   </div>
                 </div>
               ))}
+              {pollsCursor && (
+                <button className="btn" disabled={loadingPolls} onClick={() => fetchPolls(pollsCursor)}>
+                  {loadingPolls ? 'Loading...' : 'Load more polls'}
+                </button>
+              )}
             </div>
           </div>
 
@@ -359,9 +403,9 @@ export default function Dashboard() {
                   alert('Create poll failed: ' + (err.detail || res.statusText));
                   return;
                 }
-                // refresh poll list
-                const refreshed = await fetch('http://127.0.0.1:8000/polls/');
-                setPolls(await refreshed.json());
+                // Polls are listed oldest first, a new one belongs at the end once every page is loaded
+                const created = await res.json();
+                if (!pollsCursor) setPolls(prev => [...prev, created]);
                 setShowPollModal(false);
                 setPollForm({ question: '', options: ['',''] });
               } catch (err) {
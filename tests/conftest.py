@@ -1,8 +1,9 @@
 import sys
 import os
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
 # Add the src directory to the Python path
@@ -10,15 +11,37 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.base_class import Base
 from main import app
-from src.database import get_db
+from src.database import get_db, get_async_db, build_engine, apply_sqlite_pragmas, to_async_url, TUNED_PROFILE
+from src.core.query_stats import instrument_engine, query_budget
+
+
+@pytest.fixture(scope="session", autouse=True)
+def strict_query_budget():
+    # Any request repeating the same statement shape this often is an N+1 and fails the test outright
+    with query_budget(max_queries=100, max_repeats=20):
+        yield
+
+
+@pytest.fixture(scope="session")
+def database_url(tmp_path_factory):
+    # The sync session and the async routes need to see the same data, so this has to be a file:
+    # two engines never share an in-memory database
+    return f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
 
 
 @pytest.fixture(scope="session")
-def engine(use_memory:bool=True):
-    # Without check_same_thread sqlite complains and fails the tests because of same thread operations
-    # This should be alright for our purposes, so it is skipped for now
-    __db = "sqlite:///:memory:" if use_memory else "sqlite:///test.db"
-    return create_engine(__db, connect_args={"check_same_thread": False})
+def engine(database_url):
+    return build_engine(database_url, TUNED_PROFILE)
+
+
+@pytest.fixture(scope="session")
+def async_engine(database_url):
+    # Every TestClient runs its own event loop and aiosqlite connections are bound to the loop that
+    # opened them, so connections are not pooled between tests
+    test_async_engine = create_async_engine(to_async_url(database_url), poolclass=NullPool)
+    apply_sqlite_pragmas(test_async_engine.sync_engine, TUNED_PROFILE.pragmas)
+    instrument_engine(test_async_engine.sync_engine)
+    return test_async_engine
 
 
 @pytest.fixture(scope="session")
@@ -31,26 +54,30 @@ def tables(engine):
 @pytest.fixture
 def db_session(engine, tables):
     """Returns an sqlalchemy session, and after the test tears down everything."""
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = sessionmaker(bind=connection)()
+    session = sessionmaker(bind=engine)()
 
     yield session # Give control back to the caller. When control is returned, the remainder of the code will be run
 
     session.close()
-    # roll back the broader transaction, if it's still active
-    if transaction.is_active:
-        transaction.rollback()
-    # put back the connection to the connection pool
-    connection.close()
+    # Commits are real so the async engine can read them, wipe every table to isolate the next test
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
 
 
 @pytest.fixture
-def client(db_session):
+def client(db_session, async_engine):
     """Returns a FastAPI test client with the database dependency overridden."""
+    async_session_factory = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def get_test_async_db():
+        async with async_session_factory() as session:
+            yield session
+
     # This may raise some concerns on the IDE level saying dependency_overrides do not exist in fastAPI
     # If it does, ignore it or hide those errors - it does exist but it seems to be a dynamic field
     app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_async_db] = get_test_async_db
     with TestClient(app) as c:
         yield c # Yield control to the caller until it is done, then remove the overrides for next test
     app.dependency_overrides.clear()
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.classes.availability import AvailabilityHeatmap
+from src.classes.calendar import Calendar
+from src.classes.user import User
+from src.constants import SLOT_MINUTES
+from src.controllers.availability import AvailabilityCtrl, WEEK_SLOTS
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.study_session_members import StudySessionMemberCtrl
+from src.controllers.study_sessions import StudySessionCtrl
+from src.controllers.users import UserCtrl
+from src.enums import RecurrenceRule
+from tests.test_authorization import get_auth_header
+
+MONDAY = datetime(2025, 3, 3, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def test_user_data():
+    return {"name": "Heatmap User", "email": "heatmap@example.com", "password": "password123", "timezone": "UTC"}
+
+
+@pytest.fixture
+def users(db_session: Session, test_user_data: dict) -> list[User]:
+    return [UserCtrl.create(db=db_session, **test_user_data)] + [
+        UserCtrl.create(db=db_session, name=f"Heatmap {i}", email=f"heatmap-{i}@example.com",
+                        password="password123", timezone="UTC")
+        for i in range(2)
+    ]
+
+
+@pytest.fixture
+def calendars(db_session: Session, users: list[User]) -> list[Calendar]:
+    return [
+        CalendarCtrl.create(db=db_session, name=f"{user.name} Calendar", calendar_type="personal",
+                            visibility="private", color="#FFFFFF", shared=False, user_id=user.user_id)
+        for user in users
+    ]
+
+
+def _event(db_session: Session, calendar: Calendar, hours: float, length: float, rule=RecurrenceRule.NONE):
+    start = MONDAY + timedelta(hours=hours)
+    return EventCtrl.create(db_session, "Busy", start, start + timedelta(hours=length), "Room",
+                            calendar.calendar_id, recurrence_rule=rule)
+
+
+def _slot(hours: float) -> int:
+    return int(hours * 60 // SLOT_MINUTES)
+
+
+def test_heatmap_is_cached_until_an_event_changes(db_session: Session, users: list[User], calendars: list[Calendar]):
+    _event(db_session, calendars[0], 9, 2)
+    _event(db_session, calendars[1], 10, 1)
+    user_ids = [user.user_id for user in users]
+
+    heatmap = AvailabilityCtrl.heatmap(user_ids, MONDAY + timedelta(days=2), db_session)
+    assert heatmap.week_start == MONDAY.replace(tzinfo=None)
+    assert len(heatmap.busy) == WEEK_SLOTS
+    assert heatmap.busy[[_slot(8.75), _slot(9), _slot(10), _slot(10.75), _slot(11)]].tolist() == [0, 1, 2, 2, 0]
+    assert np.array_equal(AvailabilityCtrl.heatmap(user_ids, MONDAY, db_session).busy, heatmap.busy)
+    assert db_session.query(AvailabilityHeatmap).count() == 1
+
+    # Renaming doesn't touch the busy time, moving does
+    event = _event(db_session, calendars[2], 12, 1)
+    AvailabilityCtrl.heatmap(user_ids, MONDAY, db_session)
+    event.title = "Renamed"
+    EventCtrl.save(event, db_session)
+    assert db_session.query(AvailabilityHeatmap).count() == 2
+    event.start_time, event.end_time = MONDAY + timedelta(hours=13), MONDAY + timedelta(hours=14)
+    EventCtrl.save(event, db_session)
+    moved = AvailabilityCtrl.heatmap(user_ids, MONDAY, db_session)
+    assert moved.busy[[_slot(12), _slot(13)]].tolist() == [0, 1]
+    assert db_session.query(AvailabilityHeatmap).count() == 3
+
+
+def test_precompute_across_processes(db_session: Session, users: list[User], calendars: list[Calendar]):
+    _event(db_session, calendars[0], 9, 2)
+    _event(db_session, calendars[1], 10, 1)
+    _event(db_session, calendars[2], -7 * 24 + 10.5, 1, RecurrenceRule.WEEKDAYS)
+    user_ids = [user.user_id for user in users]
+    groups = [user_ids, user_ids[:2], user_ids[1:], user_ids[:2]]
+
+    assert AvailabilityCtrl.precompute(groups, MONDAY, db_session, workers=2) == 3
+    assert AvailabilityCtrl.precompute(groups, MONDAY, db_session, workers=2) == 0
+    stored = [AvailabilityCtrl.heatmap(group, MONDAY, db_session) for group in groups]
+    assert db_session.query(AvailabilityHeatmap).count() == 3
+
+    db_session.query(AvailabilityHeatmap).delete()
+    db_session.commit()
+    for group, heatmap in zip(groups, stored):
+        assert np.array_equal(AvailabilityCtrl.heatmap(group, MONDAY, db_session).busy, heatmap.busy)
+    assert stored[0].busy[[_slot(10.5), _slot(24 * 4 + 10.5), _slot(24 * 5 + 10.5)]].tolist() == [3, 1, 0]
+
+
+def test_availability_endpoint(client: TestClient, db_session: Session, test_user_data: dict, users: list[User],
+                               calendars: list[Calendar]):
+    session = StudySessionCtrl.create(db_session, "Heatmap session", users[0].user_id)
+    StudySessionMemberCtrl.create(db_session, session.session_id, users[1].user_id)
+    _event(db_session, calendars[1], 9, 1)
+    headers = get_auth_header(client, test_user_data)
+
+    response = client.get(f"/sessions/{session.session_id}/availability", headers=headers,
+                          params={"week": (MONDAY + timedelta(days=3)).isoformat()})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["member_count"] == 2 and body["slot_minutes"] == SLOT_MINUTES
+    assert body["free"][_slot(8.75):_slot(10) + 1] == [2, 1, 1, 1, 1, 2]
+    assert client.get("/sessions/missing/availability", headers=headers,
+                      params={"week": MONDAY.isoformat()}).status_code == 404
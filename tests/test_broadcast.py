@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.core.broadcast import Broadcaster, SubscriberLagged
+
+
+def test_one_frame_fans_out_to_every_subscriber():
+    broadcaster = Broadcaster()
+
+    async def scenario():
+        first, second = broadcaster.subscribe("poll"), broadcaster.subscribe("poll")
+        other = broadcaster.subscribe("other poll")
+        assert broadcaster.publish("poll", "tally", {"options": {"a": 1}}) == 2
+        frames = [await first.next_frame(timeout=1), await second.next_frame(timeout=1)]
+        assert await other.next_frame(timeout=0.01) is None
+        for subscription in (first, second, other):
+            subscription.close()
+        return frames
+
+    first_frame, second_frame = asyncio.run(scenario())
+    # Encoded once and shared, not once per subscriber
+    assert first_frame is second_frame
+    assert first_frame == 'event: tally\ndata: {"options":{"a":1}}\n\n'
+    assert broadcaster.subscriber_count() == 0
+
+
+def test_publish_from_another_thread():
+    broadcaster = Broadcaster()
+
+    async def scenario():
+        subscription = broadcaster.subscribe("poll")
+        publisher = threading.Thread(target=broadcaster.publish, args=("poll", "tally", {"n": 1}))
+        publisher.start()
+        frame = await subscription.next_frame(timeout=1)
+        publisher.join()
+        subscription.close()
+        return frame
+
+    assert asyncio.run(scenario()) == 'event: tally\ndata: {"n":1}\n\n'
+
+
+def test_slow_subscriber_is_cut_off():
+    broadcaster = Broadcaster(max_pending=2)
+
+    async def scenario():
+        subscription = broadcaster.subscribe("poll")
+        for n in range(3):
+            broadcaster.publish("poll", "tally", {"n": n})
+        await asyncio.sleep(0)
+        assert subscription.lagged
+        await subscription.next_frame(timeout=1)
+        await subscription.next_frame(timeout=1)
+        with pytest.raises(SubscriberLagged):
+            await subscription.next_frame(timeout=1)
+        subscription.close()
+
+    asyncio.run(scenario())
+
+
+def test_publish_without_subscribers_is_a_no_op():
+    broadcaster = Broadcaster()
+    assert broadcaster.publish("poll", "tally", object()) == 0
+
+
+def test_one_subscription_can_follow_several_topics():
+    broadcaster = Broadcaster()
+
+    async def scenario():
+        subscription = broadcaster.subscribe("first poll", "second poll")
+        assert broadcaster.subscriber_count() == 2
+        broadcaster.publish("second poll", "tally", {"n": 2})
+        broadcaster.publish("first poll", "tally", {"n": 1})
+        frames = [await subscription.next_frame(timeout=1), await subscription.next_frame(timeout=1)]
+        subscription.close()
+        return frames
+
+    assert asyncio.run(scenario()) == ['event: tally\ndata: {"n":2}\n\n', 'event: tally\ndata: {"n":1}\n\n']
+    assert broadcaster.subscriber_count() == 0
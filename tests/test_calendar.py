@@ -6,7 +6,7 @@ from src.classes.calendar import Calendar as DBCalendar
 from src.classes.event import Event as DBEvent
 from datetime import datetime, timedelta, timezone
 from tests.test_authorization import get_auth_header
-from src.enums import NotificationTypes
+from src.enums import NotificationTypes, RecurrenceRule
 
 
 @pytest.fixture
@@ -56,6 +56,18 @@ def test_create_event(client: TestClient, auth_headers: dict, test_calendar: DBC
     response = client.post(f"/calendar/{test_calendar.calendar_id}/events", headers=auth_headers, json=event_data)
     assert response.status_code == 200
     assert response.json()["title"] == "New Event"
+    assert response.json()["conflicts"] == []
+
+    overlapping = {**event_data, "title": "Overlapping", "start_time": "2024-01-01T10:30:00Z", "end_time": "2024-01-01T12:00:00Z"}
+    response = client.post(f"/calendar/{test_calendar.calendar_id}/events", headers=auth_headers, json=overlapping)
+    assert response.status_code == 200
+    first = client.get(f"/calendar/{test_calendar.calendar_id}/events", headers=auth_headers).json()[0]
+    assert [conflict["event_id"] for conflict in response.json()["conflicts"]] == [first["event_id"]]
+
+    moved = {"start_time": "2024-01-01T11:00:00Z", "end_time": "2024-01-01T12:00:00Z"}
+    response = client.put(f"/calendar/{test_calendar.calendar_id}/events/{first['event_id']}", headers=auth_headers, json=moved)
+    assert response.status_code == 200
+    assert len(response.json()["conflicts"]) == 1
 
 
 def test_get_event(client: TestClient, auth_headers: dict, test_event: DBEvent):
@@ -84,3 +96,138 @@ def test_add_notification_to_event(client: TestClient, auth_headers: dict, test_
     )
     assert response.status_code == 200
     assert response.json()["message"] == "Test Notification"
+
+
+def test_get_calendar_events_window(client: TestClient, auth_headers: dict, db_session: Session, test_calendar: DBCalendar):
+    for day in (3, 1, 20):
+        start = datetime(2025, 5, day, 9, tzinfo=timezone.utc)
+        db_session.add(DBEvent(title=f"May {day}", start_time=start, end_time=start + timedelta(hours=1),
+                               calendar_id=test_calendar.calendar_id))
+    db_session.commit()
+
+    params = {"start": "2025-05-01T00:00:00Z", "end": "2025-05-08T00:00:00Z"}
+    response = client.get(f"/calendar/{test_calendar.calendar_id}/events", headers=auth_headers, params=params)
+    assert response.status_code == 200
+    assert [e["title"] for e in response.json()] == ["May 1", "May 3"]
+
+    response = client.get("/calendar/events", headers=auth_headers, params=params)
+    assert [e["title"] for e in response.json()] == ["May 1", "May 3"]
+
+    response = client.get(f"/calendar/{test_calendar.calendar_id}/events", headers=auth_headers)
+    assert [e["title"] for e in response.json()] == ["May 1", "May 3", "May 20"]
+
+
+def _walk_pages(client: TestClient, url: str, headers: dict, limit: int) -> list[list[str]]:
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, headers=headers, params=params)
+        assert response.status_code == 200
+        pages.append([e["event_id"] for e in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_user_events_pagination(client: TestClient, auth_headers: dict, db_session: Session, test_calendar: DBCalendar):
+    """Pages over several calendars come back in (start_time, event_id) order, every event exactly once."""
+    other = DBCalendar(user_id=test_calendar.user_id, name="Other Calendar")
+    db_session.add(other)
+    db_session.commit()
+    base = datetime(2025, 6, 2, 9, tzinfo=timezone.utc)
+    events = []
+    for i in range(7):
+        # Pairs of events share a start time across calendars so ties are broken by event_id
+        for calendar_id in (test_calendar.calendar_id, other.calendar_id):
+            events.append(DBEvent(title=f"Event {i}", start_time=base + timedelta(days=i),
+                                  end_time=base + timedelta(days=i, hours=1), calendar_id=calendar_id))
+    db_session.add_all(events)
+    db_session.commit()
+    expected = [e.event_id for e in sorted(events, key=lambda e: (e.start_time, e.event_id))]
+
+    pages = _walk_pages(client, "/calendar/events", auth_headers, limit=4)
+    assert [len(page) for page in pages] == [4, 4, 4, 2]
+    assert [event_id for page in pages for event_id in page] == expected
+
+
+def test_public_events_pagination(client: TestClient, db_session: Session, test_calendar: DBCalendar):
+    test_calendar.visibility = "public"
+    base = datetime(2025, 6, 2, 9, tzinfo=timezone.utc)
+    events = [DBEvent(title=f"Public {i}", start_time=base + timedelta(hours=i), end_time=base + timedelta(hours=i + 1),
+                      calendar_id=test_calendar.calendar_id) for i in range(5)]
+    db_session.add_all(events)
+    db_session.commit()
+
+    pages = _walk_pages(client, "/calendar/events/public", {}, limit=2)
+    assert [event_id for page in pages for event_id in page] == [e.event_id for e in events]
+
+
+def test_invalid_cursor(client: TestClient, auth_headers: dict):
+    response = client.get("/calendar/events", headers=auth_headers, params={"cursor": "not-a-cursor"})
+    assert response.status_code == 422
+
+
+def test_recurring_events_are_expanded(client: TestClient, auth_headers: dict, db_session: Session, test_calendar: DBCalendar):
+    weekly_start = datetime(2025, 1, 6, 10, tzinfo=timezone.utc)  # A Monday, months before the window
+    weekly = DBEvent(title="Lecture", start_time=weekly_start, end_time=weekly_start + timedelta(hours=2),
+                     calendar_id=test_calendar.calendar_id, recurrence_rule=RecurrenceRule.WEEKLY)
+    one_off_start = datetime(2025, 5, 13, 9, tzinfo=timezone.utc)
+    one_off = DBEvent(title="Exam", start_time=one_off_start, end_time=one_off_start + timedelta(hours=1),
+                      calendar_id=test_calendar.calendar_id)
+    db_session.add_all([weekly, one_off])
+    db_session.commit()
+
+    params = {"start": "2025-05-10T00:00:00Z", "end": "2025-05-24T00:00:00Z"}
+    response = client.get(f"/calendar/{test_calendar.calendar_id}/events", headers=auth_headers, params=params)
+    assert response.status_code == 200
+    body = response.json()
+    assert [(e["title"], e["start_time"][:16]) for e in body] == [
+        ("Lecture", "2025-05-12T10:00"), ("Exam", "2025-05-13T09:00"), ("Lecture", "2025-05-19T10:00"),
+    ]
+    assert body[0]["event_id"] == weekly.event_id
+    assert body[0]["series_start"].startswith("2025-01-06T10:00")
+    assert body[1]["series_start"] is None
+
+    pages = []
+    cursor = None
+    while True:
+        response = client.get("/calendar/events", headers=auth_headers,
+                              params={**params, "limit": 2, **({"cursor": cursor} if cursor else {})})
+        pages.append([e["start_time"][:16] for e in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert pages == [["2025-05-12T10:00", "2025-05-13T09:00"], ["2025-05-19T10:00"]]
+
+
+def test_events_layout(client: TestClient, auth_headers: dict, db_session: Session, test_calendar: DBCalendar):
+    monday = datetime(2025, 5, 12, tzinfo=timezone.utc)
+
+    def add(title: str, hours: float, length: float, rule=RecurrenceRule.NONE) -> None:
+        start = monday + timedelta(hours=hours)
+        db_session.add(DBEvent(title=title, start_time=start, end_time=start + timedelta(hours=length),
+                               calendar_id=test_calendar.calendar_id, recurrence_rule=rule))
+
+    add("Standup", 8.75 - 7 * 24, 0.5, RecurrenceRule.DAILY)
+    add("Workshop", 9, 3)
+    add("Call", 10, 1)
+    add("Lunch", 12, 1)
+    db_session.commit()
+
+    params = {"start": monday.isoformat(), "end": (monday + timedelta(days=2)).isoformat()}
+    response = client.get(f"/calendar/{test_calendar.calendar_id}/events/layout", headers=auth_headers, params=params)
+    assert response.status_code == 200
+    assert [(e["title"], e["lane"], e["lanes"]) for e in response.json()] == [
+        ("Standup", 0, 2), ("Workshop", 1, 2), ("Call", 0, 2), ("Lunch", 0, 1), ("Standup", 0, 1),
+    ]
+    response = client.get("/calendar/events/layout", headers=auth_headers, params=params)
+    assert [e["lane"] for e in response.json()] == [0, 1, 0, 0, 0]
+
+    too_long = {**params, "end": (monday + timedelta(days=60)).isoformat()}
+    assert client.get("/calendar/events/layout", headers=auth_headers, params=too_long).status_code == 422
+
+    # Events of a deleted calendar are gone from the views of all calendars
+    test_calendar.deleted = True
+    db_session.commit()
+    assert client.get("/calendar/events/layout", headers=auth_headers, params=params).json() == []
+    assert client.get("/calendar/events", headers=auth_headers, params=params).json() == []
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.classes.user import User
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.dashboard import DashboardCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.notifications import NotificationCtrl
+from src.controllers.polls import PollCtrl
+from src.controllers.users import UserCtrl
+from src.enums import DeliveryStatus, NotificationTypes, RecurrenceRule
+from tests.test_authorization import get_auth_header
+
+START = datetime(2025, 3, 3, 8, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def test_user_data():
+    return {"name": "Dashboard User", "email": "dashboard@example.com", "password": "password123", "timezone": "UTC"}
+
+
+@pytest.fixture
+def test_user(db_session: Session, test_user_data: dict) -> User:
+    return UserCtrl.create(db=db_session, **test_user_data)
+
+
+def _fill(db_session: Session, user: User, first: int, last: int) -> None:
+    for i in range(first, last):
+        calendar = CalendarCtrl.create(db=db_session, name=f"Calendar {i}", calendar_type="personal",
+                                       visibility="private", color="#FFFFFF", shared=False, user_id=user.user_id)
+        start = START + timedelta(hours=i + 1)
+        event = EventCtrl.create(db_session, f"Event {i}", start, start + timedelta(hours=1), "Room", calendar.calendar_id)
+        NotificationCtrl.create(db_session, event.event_id, NotificationTypes.ALERT, f"Reminder {i}", start - timedelta(minutes=10))
+
+
+def test_dashboard(client: TestClient, db_session: Session, test_user_data: dict, test_user: User):
+    headers = get_auth_header(client, test_user_data)
+    params = {"start": START.isoformat(), "days": 2, "limit": 50}
+    _fill(db_session, test_user, 0, 1)
+    PollCtrl.create(db_session, "Where to study?", test_user.user_id, ["Library", "Cafeteria"])
+    few = client.get("/dashboard/", headers=headers, params=params)
+    assert few.status_code == 200
+
+    _fill(db_session, test_user, 1, 10)
+    calendar_id = few.json()["calendars"][0]["calendar_id"]
+    EventCtrl.create(db_session, "Standup", START - timedelta(days=7), START - timedelta(days=7, minutes=-15), "Room",
+                     calendar_id, recurrence_rule=RecurrenceRule.DAILY)
+    sent = NotificationCtrl.create(db_session, few.json()["events"][0]["event_id"], NotificationTypes.ALERT, "Sent", START)
+    sent.set_delivery_status(DeliveryStatus.COMPLETED)
+    NotificationCtrl.save(sent, db_session)
+    PollCtrl.close_poll(PollCtrl.create(db_session, "Closed already?", test_user.user_id, ["Yes, it is"]), db_session)
+
+    many = client.get("/dashboard/", headers=headers, params=params)
+    assert many.status_code == 200
+    # Ten times the calendars, the same statements
+    assert many.headers["x-db-query-count"] == few.headers["x-db-query-count"]
+
+    body = many.json()
+    assert len(body["calendars"]) == 10
+    assert [e["title"] for e in body["events"]] == ["Standup"] + [f"Event {i}" for i in range(10)] + ["Standup"]
+    assert [p["question"] for p in body["polls"]] == ["Where to study?"]
+    assert [o["votes"] for o in body["polls"][0]["options"]] == [0, 0]
+    # Events come with their own reminders, soonest first and only the pending ones
+    messages = [n["message"] for n in body["notifications"]]
+    assert "Sent" not in messages
+    assert [m for m in messages if m.startswith("Reminder ")] == [f"Reminder {i}" for i in range(10)]
+    assert [n["timestamp"] for n in body["notifications"]] == sorted(n["timestamp"] for n in body["notifications"])
+
+    limited = client.get("/dashboard/", headers=headers, params={**params, "limit": 3})
+    assert [len(limited.json()[key]) for key in ("calendars", "events", "notifications")] == [10, 3, 3]
+
+
+def test_dashboard_polls_oldest_first(db_session: Session, test_user: User):
+    created = [PollCtrl.create(db_session, f"Poll {i}", test_user.user_id, ["First option"]) for i in range(4)]
+    for i, poll in enumerate(created):
+        poll.created_at = START + timedelta(minutes=i)
+    db_session.commit()
+
+    found = DashboardCtrl.load_for_user(test_user.user_id, START, START + timedelta(days=1), 3, db_session)
+    assert [poll.question for poll in found.polls] == ["Poll 0", "Poll 1", "Poll 2"]
@@ -1,6 +1,8 @@
+import pytest
 from sqlalchemy.orm import Session
 from src.controllers.users import UserCtrl
 from pydantic import EmailStr, TypeAdapter
+from src.database import build_engine, get_profile, TUNED_PROFILE, LEGACY_PROFILE
 
 EmailAdapter = TypeAdapter(EmailStr)
 
@@ -26,3 +28,29 @@ def test_data_storage_and_retrieval(db_session: Session):
     assert retrieved_user.user_id == user.user_id
     assert retrieved_user.name == user.name
     assert retrieved_user.email == user.email
+
+
+def test_tuned_profile_applies_pragmas(tmp_path):
+    tuned = build_engine(f"sqlite:///{tmp_path / 'tuned.db'}", TUNED_PROFILE)
+    with tuned.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar().lower() == "wal"
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == TUNED_PROFILE.pragmas["busy_timeout"]
+    assert tuned.pool.size() == TUNED_PROFILE.pool_size
+    tuned.dispose()
+
+
+def test_legacy_profile_keeps_rollback_journal(tmp_path):
+    legacy = build_engine(f"sqlite:///{tmp_path / 'legacy.db'}", LEGACY_PROFILE)
+    with legacy.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar().lower() == "delete"
+    legacy.dispose()
+
+
+def test_profile_lookup_ignores_case():
+    assert get_profile(" Tuned ") is TUNED_PROFILE
+    assert get_profile("LEGACY") is LEGACY_PROFILE
+
+
+def test_unknown_profile_lists_valid_names():
+    with pytest.raises(ValueError, match="legacy, tuned"):
+        get_profile("wal")
@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from src.classes.calendar import Calendar
+from src.classes.day_count import EventDayCount
+from src.classes.user import User
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.day_counts import DayCountCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.occurrences import OccurrenceCtrl
+from src.controllers.settings import SettingsCtrl
+from src.controllers.users import UserCtrl
+from src.enums import RecurrenceRule
+from tests.test_authorization import get_auth_header
+
+# New York springs forward at 2025-03-09 07:00 UTC, local midnight is 05:00 UTC before and 04:00 UTC after
+FIRST, LAST = date(2025, 3, 8), date(2025, 3, 10)
+
+
+@pytest.fixture
+def test_user_data():
+    return {"name": "Month User", "email": "month@example.com", "password": "password123",
+            "timezone": "America/New_York"}
+
+
+@pytest.fixture
+def test_user(db_session: Session, test_user_data: dict) -> User:
+    return UserCtrl.create(db=db_session, **test_user_data)
+
+
+@pytest.fixture
+def calendars(db_session: Session, test_user: User) -> list[Calendar]:
+    return [
+        CalendarCtrl.create(db=db_session, name=f"Calendar {i}", calendar_type="personal", visibility="private",
+                            color="#FFFFFF", shared=False, user_id=test_user.user_id)
+        for i in range(2)
+    ]
+
+
+def _event(db_session: Session, calendar: Calendar, start: datetime, rule=RecurrenceRule.NONE):
+    return EventCtrl.create(db_session, "Busy", start, start + timedelta(hours=1), "Room", calendar.calendar_id,
+                            recurrence_rule=rule)
+
+
+def _utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_day_counts_follow_local_days_and_writes(db_session: Session, test_user: User, calendars: list[Calendar]):
+    _event(db_session, calendars[0], _utc(2025, 3, 9, 4, 30))   # 8th, 23:30 EST
+    _event(db_session, calendars[0], _utc(2025, 3, 9, 5, 30))   # 9th, 00:30 EST
+    late = _event(db_session, calendars[1], _utc(2025, 3, 10, 3, 30))   # 9th, 23:30 EDT
+    _event(db_session, calendars[1], _utc(2025, 3, 10, 4, 30))   # 10th, 00:30 EDT
+    _event(db_session, calendars[1], _utc(2025, 3, 1, 17), RecurrenceRule.DAILY)
+
+    assert DayCountCtrl.count(test_user, FIRST, LAST, db_session) == (
+        "America/New_York", {FIRST: 2, date(2025, 3, 9): 3, LAST: 2}
+    )
+    assert db_session.get(Calendar, calendars[1].calendar_id).day_counts_timezone == "America/New_York"
+
+    # Built once, from then on writes adjust the rows in place
+    late.start_time, late.end_time = _utc(2025, 3, 10, 5), _utc(2025, 3, 10, 6)
+    EventCtrl.save(late, db_session)
+    EventCtrl.safe_delete(_event(db_session, calendars[0], _utc(2025, 3, 8, 15)), db_session)
+    _event(db_session, calendars[0], _utc(2025, 3, 8, 16))
+    assert DayCountCtrl.rebuild([c.calendar_id for c in calendars], "America/New_York", db_session) == 0
+    assert DayCountCtrl.count(test_user, FIRST, LAST, db_session)[1] == {FIRST: 3, date(2025, 3, 9): 2, LAST: 3}
+
+    # The materialized occurrences give the same counts as expanding the series
+    OccurrenceCtrl.roll_horizon(db_session, now=_utc(2025, 3, 9))
+    assert DayCountCtrl.count(test_user, FIRST, LAST, db_session)[1] == {FIRST: 3, date(2025, 3, 9): 2, LAST: 3}
+
+    # Another time zone recounts the calendars in it
+    SettingsCtrl.update(test_user.user_id, {"timezone": "UTC"}, db_session)
+    assert DayCountCtrl.count(test_user, FIRST, LAST, db_session) == (
+        "UTC", {FIRST: 2, date(2025, 3, 9): 3, LAST: 3}
+    )
+    assert {row.day for row in DayCountCtrl.search([EventDayCount.calendar_id == calendars[1].calendar_id], db_session)} == {
+        LAST
+    }
+
+
+def test_day_counts_skip_deleted_calendars_and_leave_the_session_alone(db_session: Session, test_user: User,
+                                                                       calendars: list[Calendar]):
+    _event(db_session, calendars[0], _utc(2025, 3, 9, 14))
+    _event(db_session, calendars[1], _utc(2025, 3, 9, 15))
+    CalendarCtrl.safe_delete(calendars[1], db_session)
+
+    # The rebuild commits in a session of its own, what the caller loaded is not expired
+    kept = db_session.get(Calendar, calendars[0].calendar_id)
+    assert DayCountCtrl.count(test_user, FIRST, LAST, db_session)[1] == {date(2025, 3, 9): 1}
+    assert not inspect(kept).expired_attributes
+    assert db_session.get(Calendar, calendars[1].calendar_id).day_counts_timezone is None
+
+
+def test_day_counts_endpoint(client: TestClient, db_session: Session, test_user_data: dict, test_user: User,
+                             calendars: list[Calendar]):
+    headers = get_auth_header(client, test_user_data)
+    _event(db_session, calendars[0], _utc(2025, 3, 9, 4, 30))
+    _event(db_session, calendars[1], _utc(2025, 3, 9, 14), RecurrenceRule.WEEKLY)
+
+    response = client.get("/calendar/events/day-counts", headers=headers, params={"start": "2025-03-01", "end": "2025-03-31"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "timezone": "America/New_York",
+        "days": [{"day": "2025-03-08", "count": 1}, {"day": "2025-03-09", "count": 1},
+                 {"day": "2025-03-16", "count": 1}, {"day": "2025-03-23", "count": 1},
+                 {"day": "2025-03-30", "count": 1}],
+    }
+    too_long = {"start": "2025-01-01", "end": "2026-06-30"}
+    assert client.get("/calendar/events/day-counts", headers=headers, params=too_long).status_code == 422
@@ -1,14 +1,20 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event as sa_event, text
 from sqlalchemy.orm import Session
 import pytest
 from hypothesis import given, strategies as st, settings, HealthCheck
 import uuid
 from pydantic import EmailStr, TypeAdapter
 
-from src.classes.event import Event
+from src.classes.event import Event, bump_busy_version
 from src.classes.calendar import Calendar
 from src.classes.user import User
+from src.controllers.event_index import event_indexes
 from src.controllers.events import EventCtrl
+from src.core.interval_index import IntervalIndex
+from src.core.layout import assign_lanes
 from src.controllers.calendar import CalendarCtrl
 from src.controllers.users import UserCtrl
 from src.enums import RecurrenceRule
@@ -182,3 +188,234 @@ def test_event_soft_delete(db_session: Session, test_calendar: Calendar):
     deleted_event_in_db = db_session.query(Event).filter(Event.event_id == event.event_id).first()
     assert deleted_event_in_db
     assert deleted_event_in_db.deleted
+
+
+def test_event_create_async(async_engine, db_session: Session, test_calendar: Calendar):
+    """The async variants run the same unit of work through an AsyncSession."""
+    start_time = datetime.now(timezone.utc)
+
+    async def create_and_load():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            created = await EventCtrl.create_async(
+                session,
+                title="Async Event",
+                start_time=start_time,
+                end_time=start_time + timedelta(hours=1),
+                location="Test Location",
+                calendar_id=test_calendar.calendar_id,
+            )
+            return created, await EventCtrl.load_owned_async(
+                created.event_id, test_calendar.calendar_id, test_calendar.user_id, session
+            )
+
+    created, loaded = asyncio.run(create_and_load())
+    assert loaded is not None
+    assert loaded.event_id == created.event_id
+    assert EventCtrl.load(created.event_id, db_session).title == "Async Event"
+
+
+def test_list_in_window(db_session: Session, test_calendar: Calendar):
+    """Only events overlapping the window come back, in start order, long events starting before it included."""
+    day = datetime(2025, 3, 10, tzinfo=timezone.utc)
+
+    def make(title, start, hours):
+        return EventCtrl.create(db_session, title, start, start + timedelta(hours=hours), "Room", test_calendar.calendar_id)
+
+    make("Last month", day - timedelta(days=30), 1)
+    conference = make("Conference", day - timedelta(days=3), 24 * 5)
+    late = make("Late", day + timedelta(hours=20), 1)
+    early = make("Early", day + timedelta(hours=9), 1)
+    make("Next day", day + timedelta(days=1), 1)
+    deleted = make("Cancelled", day + timedelta(hours=12), 1)
+    EventCtrl.safe_delete(deleted, db_session)
+
+    db_session.refresh(test_calendar)
+    assert test_calendar.max_event_seconds == 5 * 24 * 3600
+
+    spans = CalendarCtrl.event_spans(test_calendar.user_id, db_session)
+    found = EventCtrl.list_in_window(spans, day, day + timedelta(days=1), db_session)
+    assert [e.event_id for e in found] == [conference.event_id, early.event_id, late.event_id]
+
+    with pytest.raises(ValueError):
+        EventCtrl.list_in_window(spans, day, day, db_session)
+
+
+def test_paged_window_splits_large_unions(db_session: Session, test_user: User, monkeypatch):
+    """Past UNION_MAX_ARMS calendars the per-calendar seeks run in chunks and still come back as one ordered page."""
+    day = datetime(2025, 3, 10, tzinfo=timezone.utc)
+    calendars = [
+        CalendarCtrl.create(db=db_session, name=f"Chunk {i}", calendar_type="personal", visibility="private",
+                            color="#FFFFFF", shared=False, user_id=test_user.user_id)
+        for i in range(5)
+    ]
+    for hour in range(10):
+        calendar = calendars[hour % len(calendars)]
+        start = day + timedelta(hours=hour)
+        EventCtrl.create(db_session, f"Event {hour}", start, start + timedelta(minutes=30), "Room", calendar.calendar_id)
+    spans = CalendarCtrl.event_spans(test_user.user_id, db_session)
+    expected = EventCtrl.list_in_window(spans, day, day + timedelta(days=1), db_session)
+
+    monkeypatch.setattr("src.controllers.events.UNION_MAX_ARMS", 2)
+    first = EventCtrl.list_in_window(spans, day, day + timedelta(days=1), db_session, limit=4)
+    rest = EventCtrl.list_in_window(
+        spans, day, day + timedelta(days=1), db_session, after=(first[-1].start_time, first[-1].event_id), limit=10
+    )
+    assert [e.event_id for e in first + rest] == [e.event_id for e in expected]
+
+
+def test_window_query_uses_index(db_session: Session, test_calendar: Calendar):
+    day = datetime(2025, 3, 10, tzinfo=timezone.utc)
+    query = db_session.query(Event).filter(
+        Event.calendar_id.in_([test_calendar.calendar_id]),
+        Event.deleted.is_(False),
+        Event.start_time < day + timedelta(days=1),
+        Event.end_time > day,
+        Event.start_time >= day - timedelta(hours=1),
+    ).order_by(Event.start_time)
+    compiled = query.statement.compile(db_session.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = " ".join(str(row[-1]) for row in db_session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert "ix_events_calendar_timeline" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_series_lookup_uses_partial_index(db_session: Session, test_calendar: Calendar):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db_session.get_bind()
+    sa_event.listen(engine, "before_cursor_execute", capture)
+    try:
+        EventCtrl.list_series([test_calendar.calendar_id], datetime(2025, 3, 10, tzinfo=timezone.utc), db_session)
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", capture)
+    statement, parameters = statements[-1]
+    plan = " ".join(str(row[-1]) for row in db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+    assert "ix_events_recurring" in plan
+
+
+def test_list_occurrences_batch_and_lazy_paths_agree(db_session: Session, test_calendar: Calendar, monkeypatch):
+    first = datetime(2025, 1, 31, 9, tzinfo=timezone.utc)
+    for rule in (RecurrenceRule.DAILY, RecurrenceRule.WEEKDAYS, RecurrenceRule.BIWEEKLY, RecurrenceRule.MONTHLY):
+        EventCtrl.create(db_session, f"Series {rule.name}", first, first + timedelta(hours=1), "Room",
+                         test_calendar.calendar_id, recurrence_rule=rule)
+    EventCtrl.create(db_session, "One-off", first + timedelta(days=40), first + timedelta(days=40, hours=1), "Room",
+                     test_calendar.calendar_id)
+    db_session.refresh(test_calendar)
+    spans = {test_calendar.calendar_id: test_calendar.max_event_seconds}
+    window = (datetime(2025, 3, 1, tzinfo=timezone.utc), datetime(2025, 4, 1, tzinfo=timezone.utc))
+
+    lazy = EventCtrl.list_occurrences(spans, *window, db_session)
+    monkeypatch.setattr("src.controllers.events.RECURRENCE_BATCH_SIZE", 1)
+    batch = EventCtrl.list_occurrences(spans, *window, db_session)
+
+    def keys(found):
+        return [(e.event_id, e.start_time.replace(tzinfo=None)) for e in found]
+
+    assert keys(batch) == keys(lazy)
+    assert len(lazy) == 31 + 21 + 2 + 1 + 1
+
+
+def test_interval_index():
+    day = datetime(2025, 3, 3)
+    index = IntervalIndex()
+    index.add("long", day, day + timedelta(hours=5))
+    index.add("short", day + timedelta(hours=6), day + timedelta(hours=7))
+    index.add("daily", day - timedelta(days=3, hours=-8), day - timedelta(days=3, hours=-9), RecurrenceRule.DAILY)
+
+    assert [found[0] for found in index.overlapping(day + timedelta(hours=4), day + timedelta(hours=9))] == [
+        "long", "short", "daily"
+    ]
+    assert index.is_busy(day + timedelta(hours=8, minutes=30))
+    assert not index.is_busy(day + timedelta(hours=5))
+    index.add("long", day + timedelta(hours=1), day + timedelta(hours=2))
+    index.discard("daily")
+    assert not index.is_busy(day + timedelta(hours=4))
+    assert not index.is_busy(day + timedelta(hours=8, minutes=30))
+    assert len(index) == 2
+
+
+def test_interval_index_keeps_series_expanded(monkeypatch):
+    from src.core import interval_index
+    from src.core.recurrence import occurrences
+
+    day = datetime(2025, 3, 3)
+    events = [
+        ("daily", day + timedelta(hours=9), day + timedelta(hours=10), RecurrenceRule.DAILY),
+        ("weekdays", day + timedelta(hours=12), day + timedelta(hours=13), RecurrenceRule.WEEKDAYS),
+        ("monthly", day - timedelta(days=40), day - timedelta(days=39), RecurrenceRule.MONTHLY),
+        ("once", day + timedelta(days=2), day + timedelta(days=2, hours=3), RecurrenceRule.NONE),
+    ]
+    expansions = []
+    monkeypatch.setattr(interval_index, "occurrences", lambda *args: expansions.append(args) or occurrences(*args))
+
+    def expected(start, end):
+        found = [
+            (event_id, *occurrence) for event_id, *series in events for occurrence in occurrences(*series, start, end)
+        ]
+        return sorted(found, key=lambda item: (item[1], item[0]))
+
+    index = IntervalIndex()
+    for event_id, start, end, rule in events[:2]:
+        index.add(event_id, start, end, rule)
+    windows = [(day, day + timedelta(days=7))]
+    assert index.overlapping(*windows[0]) == [item for item in expected(*windows[0]) if item[0] in ("daily", "weekdays")]
+    for event_id, start, end, rule in events[2:]:
+        index.add(event_id, start, end, rule)
+
+    # Inside the covered span nothing is expanded again
+    expansions.clear()
+    window = (day + timedelta(days=30), day + timedelta(days=31))
+    assert index.overlapping(*window) == expected(*window)
+    assert index.is_busy(day + timedelta(days=60, hours=9, minutes=30))
+    assert expansions == []
+
+    # Later, earlier and far away windows
+    for start, end in [
+        (day + timedelta(days=120), day + timedelta(days=130)),
+        (day - timedelta(days=20), day - timedelta(days=10)),
+        (day + timedelta(days=3000), day + timedelta(days=3010)),
+    ]:
+        assert index.overlapping(start, end) == expected(start, end)
+    index.discard("daily")
+    events.pop(0)
+    assert index.overlapping(day, day + timedelta(days=200)) == expected(day, day + timedelta(days=200))
+
+
+def test_assign_lanes():
+    intervals = [(1, 5), (2, 3), (3, 6), (6, 7), (8, 9), (8, 10), (8, 11), (9, 12)]
+    # Touching intervals (3 after 2-3, 6 after 5 and 3-6) reuse a lane or open a new group
+    assert assign_lanes(intervals) == [(0, 2), (1, 2), (1, 2), (0, 1), (0, 3), (1, 3), (2, 3), (0, 3)]
+    assert assign_lanes([]) == []
+
+
+def test_conflicts_follow_writes(db_session: Session, test_user: User, test_calendar: Calendar):
+    start = datetime(2025, 3, 3, 9, tzinfo=timezone.utc)
+    existing = EventCtrl.create(db_session, "Existing", start, start + timedelta(hours=2), "Room", test_calendar.calendar_id)
+    weekly = EventCtrl.create(db_session, "Weekly", start - timedelta(days=7, hours=-4), start - timedelta(days=7, hours=-5),
+                              "Room", test_calendar.calendar_id, recurrence_rule=RecurrenceRule.WEEKLY)
+    new = Event(title="New", start_time=start + timedelta(hours=1), end_time=start + timedelta(hours=5),
+                calendar_id=test_calendar.calendar_id, recurrence_rule=RecurrenceRule.NONE)
+    found = EventCtrl.conflicts(new, test_user.user_id, db_session)
+    assert [(c.event_id, c.start_time) for c in found] == [
+        (existing.event_id, start.replace(tzinfo=None)), (weekly.event_id, start.replace(tzinfo=None) + timedelta(hours=4))
+    ]
+
+    # Writes through EventCtrl keep the warm index in step without a rebuild
+    version = event_indexes._indexes[test_calendar.calendar_id].version
+    existing.start_time, existing.end_time = start + timedelta(hours=6), start + timedelta(hours=7)
+    EventCtrl.save(existing, db_session)
+    EventCtrl.safe_delete(weekly, db_session)
+    assert event_indexes._indexes[test_calendar.calendar_id].version == version + 2
+    assert EventCtrl.conflicts(new, test_user.user_id, db_session) == []
+
+    # Another process writing straight to the table bumps the version, the stale index is rebuilt
+    db_session.execute(Event.__table__.insert().values(
+        event_id="elsewhere", title="Elsewhere", start_time=start.replace(tzinfo=None) + timedelta(hours=2),
+        end_time=start.replace(tzinfo=None) + timedelta(hours=3), calendar_id=test_calendar.calendar_id,
+        deleted=False, recurrence_rule=RecurrenceRule.NONE, is_seeded=False,
+    ))
+    bump_busy_version(db_session.connection(), {test_calendar.calendar_id})
+    db_session.commit()
+    assert [c.event_id for c in EventCtrl.conflicts(new, test_user.user_id, db_session)] == ["elsewhere"]
@@ -0,0 +1,308 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.classes.event import Event
+from src.classes.notification import Notification
+from src.classes.user import User
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.notification_dispatcher import (
+    DispatchResult, NotificationDispatcher, start_notification_dispatcher, stop_notification_dispatcher
+)
+from src.controllers.notifications import NotificationCtrl
+from src.controllers.occurrences import OccurrenceCtrl
+from src.controllers.users import UserCtrl
+from src.core.delivery import Delivery, MemoryBackend
+from src.enums import DeliveryStatus, NotificationTypes, RecurrenceRule
+
+NOW = datetime(2025, 3, 3, 9, tzinfo=timezone.utc)
+
+
+class FlakyBackend(MemoryBackend):
+    """
+    Fails every delivery whose message says so, and whole batches once told to
+    """
+    def __init__(self):
+        super().__init__()
+        self.down = False
+
+    def send(self, deliveries: list[Delivery]) -> set[str]:
+        if self.down:
+            raise ConnectionError("provider unavailable")
+        super().send(deliveries)
+        return {d.notification_id for d in deliveries if "fail" in d.message}
+
+
+class ClockedBackend(MemoryBackend):
+    """
+    Remembers when each delivery was handed over
+    """
+    def __init__(self):
+        super().__init__()
+        self.sent_at: dict[str, datetime] = {}
+
+    def send(self, deliveries: list[Delivery]) -> set[str]:
+        at = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.sent_at.update((d.notification_id, at) for d in deliveries)
+        return super().send(deliveries)
+
+
+@pytest.fixture
+def test_user(db_session: Session) -> User:
+    return UserCtrl.create(db=db_session, name="Notified User", email="notified@example.com", password="password123",
+                           timezone="UTC")
+
+
+@pytest.fixture
+def event(db_session: Session, test_user: User) -> Event:
+    calendar = CalendarCtrl.create(db=db_session, name="Reminders", calendar_type="personal", visibility="private",
+                                   color="#FFFFFF", shared=False, user_id=test_user.user_id)
+    # Far enough ahead that its own 15 minute reminder isn't due during the tests
+    return EventCtrl.create(db_session, "Exam", NOW + timedelta(days=1), NOW + timedelta(days=1, hours=2), "Hall",
+                            calendar.calendar_id)
+
+
+def _dispatcher(db_session: Session, backend, worker_id: str, batch_size: int = 500) -> NotificationDispatcher:
+    return NotificationDispatcher(sessionmaker(bind=db_session.get_bind()), backend, batch_size=batch_size,
+                                  claim_seconds=60, worker_id=worker_id)
+
+
+def _notify(db_session: Session, event: Event, message: str, minutes_ago: int) -> Notification:
+    return NotificationCtrl.create(db_session, event.event_id, NotificationTypes.ALERT, message,
+                                   NOW - timedelta(minutes=minutes_ago))
+
+
+def _statuses(db_session: Session) -> dict[str, DeliveryStatus]:
+    db_session.expire_all()
+    return {n.message: n.delivery_status for n in db_session.query(Notification)}
+
+
+def test_dispatch_sends_due_notifications(db_session: Session, test_user: User, event: Event):
+    for i in range(5):
+        _notify(db_session, event, f"Due {i}", 10 - i)
+    _notify(db_session, event, "Later", -10)
+    backend = MemoryBackend()
+
+    # Small batches, the pass keeps claiming until nothing due is left
+    assert _dispatcher(db_session, backend, "worker", batch_size=2).run_once(NOW) == DispatchResult(sent=5)
+    assert [d.message for d in backend.sent] == [f"Due {i}" for i in range(5)]
+    assert {d.user_id for d in backend.sent} == {test_user.user_id}
+    statuses = _statuses(db_session)
+    assert statuses["Later"] == DeliveryStatus.PENDING
+    assert {statuses[f"Due {i}"] for i in range(5)} == {DeliveryStatus.COMPLETED}
+
+    # Sent once and never again
+    assert _dispatcher(db_session, backend, "worker").run_once(NOW) == DispatchResult()
+    assert len(backend.sent) == 5
+
+
+def test_failures_back_off_then_dead_letter(db_session: Session, event: Event):
+    _notify(db_session, event, "Please fail", 5)
+    _notify(db_session, event, "Deliver me", 5)
+    backend = FlakyBackend()
+    dispatcher = NotificationDispatcher(sessionmaker(bind=db_session.get_bind()), backend, worker_id="worker",
+                                        max_attempts=3, retry_seconds=10, retry_max_seconds=15)
+    assert dispatcher.run_once(NOW) == DispatchResult(sent=1, retried=1)
+    failing = db_session.query(Notification).filter(Notification.message == "Please fail").one()
+    assert (failing.delivery_status, failing.attempts) == (DeliveryStatus.RETRYING, 1)
+    # Half the backoff fixed, half jitter
+    assert NOW + timedelta(seconds=5) <= failing.next_attempt_at.replace(tzinfo=timezone.utc) <= NOW + timedelta(seconds=10)
+
+    # Not before its next attempt, then backing off twice as long, capped
+    assert dispatcher.run_once(NOW + timedelta(seconds=4)) == DispatchResult()
+    assert dispatcher.run_once(NOW + timedelta(seconds=10)) == DispatchResult(retried=1)
+    db_session.expire_all()
+    assert NOW + timedelta(seconds=17.5) <= failing.next_attempt_at.replace(tzinfo=timezone.utc) <= NOW + timedelta(seconds=25)
+    assert dispatcher.run_once(NOW + timedelta(seconds=25)) == DispatchResult(dead_lettered=1)
+    assert dispatcher.run_once(NOW + timedelta(hours=1)) == DispatchResult()
+    assert [d.attempt for d in backend.sent if d.message == "Please fail"] == [1, 2, 3]
+
+    # A backend that throws fails the whole batch, the event being gone cancels its reminders instead
+    _notify(db_session, event, "Provider down", 4)
+    backend.down = True
+    assert dispatcher.run_once(NOW) == DispatchResult(retried=1)
+    _notify(db_session, event, "Too late", 3)
+    EventCtrl.safe_delete(db_session.get(Event, event.event_id), db_session)
+    assert dispatcher.run_once(NOW + timedelta(minutes=1)) == DispatchResult(cancelled=2)
+    assert {m: s for m, s in _statuses(db_session).items() if m.startswith(("Please", "Deliver", "Provider", "Too"))} == {
+        "Please fail": DeliveryStatus.DEAD_LETTER,
+        "Deliver me": DeliveryStatus.COMPLETED,
+        "Provider down": DeliveryStatus.CANCELLED,
+        "Too late": DeliveryStatus.CANCELLED,
+    }
+
+
+def test_digest_per_user(db_session: Session, test_user: User, event: Event):
+    other = UserCtrl.create(db=db_session, name="Other User", email="other-notified@example.com",
+                            password="password123", timezone="UTC")
+    calendar = CalendarCtrl.create(db=db_session, name="Theirs", calendar_type="personal", visibility="private",
+                                   color="#FFFFFF", shared=False, user_id=other.user_id)
+    theirs = EventCtrl.create(db_session, "Lab", NOW + timedelta(days=1), NOW + timedelta(days=1, hours=1), "Lab",
+                              calendar.calendar_id)
+    _notify(db_session, event, "Lecture", 5)
+    _notify(db_session, event, "Seminar", -2)
+    _notify(db_session, event, "Office hours", -10)
+    _notify(db_session, theirs, "Lab", 1)
+    _notify(db_session, theirs, "Please fail", -1)
+    backend = FlakyBackend()
+    dispatcher = NotificationDispatcher(sessionmaker(bind=db_session.get_bind()), backend, worker_id="worker",
+                                        digest_seconds=300)
+
+    # Whoever has something due gets what falls due in the next five minutes with it, as one delivery
+    assert dispatcher.run_once(NOW) == DispatchResult(sent=2, retried=2)
+    assert {d.user_id: d.message for d in backend.sent} == {
+        test_user.user_id: "2 reminders:\n- Lecture\n- Seminar",
+        other.user_id: "2 reminders:\n- Lab\n- Please fail",
+    }
+    statuses = _statuses(db_session)
+    assert [statuses[m] for m in ("Lecture", "Seminar", "Office hours", "Lab", "Please fail")] == [
+        DeliveryStatus.COMPLETED, DeliveryStatus.COMPLETED, DeliveryStatus.PENDING,
+        # The failed digest is retried as a whole
+        DeliveryStatus.RETRYING, DeliveryStatus.RETRYING,
+    ]
+
+
+def test_claims_are_exclusive_until_they_expire(db_session: Session, event: Event):
+    for i in range(3):
+        _notify(db_session, event, f"Due {i}", 5)
+    lease = timedelta(seconds=60)
+
+    claimed, _ = NotificationCtrl.claim_due("first", NOW, 10, lease, db_session)
+    assert len(claimed) == 3
+    assert NotificationCtrl.claim_due("second", NOW, 10, lease, db_session) == ([], [])
+
+    # The first worker stalls past its lease, the second takes over and the first can't overwrite that
+    later = NOW + timedelta(minutes=2)
+    taken, _ = NotificationCtrl.claim_due("second", later, 10, lease, db_session)
+    assert sorted(d.notification_id for d in taken) == sorted(d.notification_id for d in claimed)
+    ids = [d.notification_id for d in claimed]
+    assert NotificationCtrl.record_outcomes("first", {DeliveryStatus.FAILED: ids}, later, db_session) == 0
+    assert NotificationCtrl.record_outcomes("second", {DeliveryStatus.COMPLETED: ids}, later, db_session) == 3
+    assert set(_statuses(db_session).values()) == {DeliveryStatus.COMPLETED, DeliveryStatus.PENDING}
+
+
+def test_timing_wheel_sends_on_time_between_sweeps(db_session: Session, test_user: User):
+    now = datetime.now(timezone.utc)
+    calendar = CalendarCtrl.create(db=db_session, name="Soon", calendar_type="personal", visibility="private",
+                                   color="#FFFFFF", shared=False, user_id=test_user.user_id)
+    event, moved = (
+        EventCtrl.create(db_session, title, now + timedelta(hours=2), now + timedelta(hours=3), "Room", calendar.calendar_id)
+        for title in ("Seminar", "Office hours")
+    )
+    NotificationCtrl.create(db_session, event.event_id, NotificationTypes.ALERT, "Loaded", now + timedelta(seconds=1))
+    backend = ClockedBackend()
+    dispatcher = _dispatcher(db_session, backend, "worker")
+    start_notification_dispatcher(dispatcher)
+    try:
+        # The sweep loads what is due soon, later commits in this process reach the wheel directly. Sweeps are a
+        # minute apart, so whatever is sent before that came from the wheel
+        while dispatcher.next_wakeup() is None:
+            time.sleep(0.01)
+        NotificationCtrl.create(db_session, event.event_id, NotificationTypes.ALERT, "Written", now + timedelta(seconds=2))
+        # Moving an event takes its reminder along
+        moved.start_time, moved.end_time = now + timedelta(minutes=15, seconds=2), now + timedelta(hours=1)
+        EventCtrl.save(moved, db_session)
+        deadline = time.monotonic() + 10
+        while len(backend.sent) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop_notification_dispatcher()
+
+    assert sorted(d.message for d in backend.sent) == ["Loaded", "Reminder: Office hours is starting soon.", "Written"]
+    # Never early, and within the second it fell due
+    assert all(d.due <= backend.sent_at[d.notification_id] < d.due + timedelta(seconds=2) for d in backend.sent)
+
+
+@pytest.mark.parametrize("stored_occurrences", [False, True])
+def test_recurring_reminders_are_generated_within_the_horizon(db_session: Session, test_user: User,
+                                                              stored_occurrences: bool):
+    calendar = CalendarCtrl.create(db=db_session, name="Team", calendar_type="personal", visibility="private",
+                                   color="#FFFFFF", shared=False, user_id=test_user.user_id)
+    series = EventCtrl.create(db_session, "Standup", NOW + timedelta(minutes=30), NOW + timedelta(minutes=45), "Room",
+                              calendar.calendar_id, RecurrenceRule.DAILY)
+    if stored_occurrences:
+        OccurrenceCtrl.roll_horizon(db_session, NOW)
+    backend = MemoryBackend()
+    dispatcher = _dispatcher(db_session, backend, "worker")
+
+    def generated() -> list[tuple[datetime, bool]]:
+        db_session.expire_all()
+        # Only the days the test goes through, creating the series may have generated one for the clock's day
+        return sorted(
+            (n.occurrence_start.replace(tzinfo=timezone.utc), n.deleted)
+            for n in db_session.query(Notification).filter(
+                Notification.event_id == series.event_id, Notification.occurrence_start < NOW + timedelta(days=30)
+            )
+        )
+
+    # The rule is stored, the first reminder only once it comes within the horizon, and only once
+    assert dispatcher.run_once(NOW - timedelta(minutes=1)) == DispatchResult()
+    assert generated() == []
+    dispatcher.run_once(NOW)
+    dispatcher.run_once(NOW + timedelta(minutes=5))
+    assert generated() == [(NOW + timedelta(minutes=30), False)]
+
+    # A week goes by, one row for each day that came around
+    for day in range(8):
+        assert dispatcher.run_once(NOW + timedelta(days=day, minutes=15)) == DispatchResult(sent=1)
+    assert [d.message for d in backend.sent] == ["Reminder: Standup is starting soon."] * 8
+    assert [start for start, _ in generated()] == [NOW + timedelta(days=day, minutes=30) for day in range(8)]
+
+    # Moving the series withdraws the pending reminder of the old time, the new time gets its own
+    dispatcher.run_once(NOW + timedelta(days=8, minutes=10))
+    assert generated()[-1] == (NOW + timedelta(days=8, minutes=30), False)
+    series.start_time = NOW + timedelta(hours=1, minutes=30)
+    series.end_time = NOW + timedelta(hours=1, minutes=45)
+    EventCtrl.save(series, db_session)
+    if stored_occurrences:
+        OccurrenceCtrl.roll_horizon(db_session, NOW + timedelta(days=8))
+    assert len(generated()) == 8
+    withdrawn = db_session.query(Notification).filter(
+        Notification.event_id == series.event_id, Notification.delivery_status == DeliveryStatus.PENDING,
+        Notification.timestamp < NOW + timedelta(days=30),
+    ).one()
+    assert withdrawn.deleted and withdrawn.occurrence_start is None
+    assert dispatcher.run_once(NOW + timedelta(days=8, minutes=15)) == DispatchResult()
+    assert dispatcher.run_once(NOW + timedelta(days=8, hours=1, minutes=15)) == DispatchResult(sent=1)
+    assert generated()[-1] == (NOW + timedelta(days=8, hours=1, minutes=30), False)
+
+
+def _pending_reminders(db_session: Session, event: Event) -> list[tuple[datetime, bool]]:
+    # (due, generated for an occurrence) of every reminder of the event still to go out
+    db_session.expire_all()
+    return sorted(
+        (n.timestamp.replace(tzinfo=timezone.utc), n.occurrence_start is not None)
+        for n in db_session.query(Notification).filter(
+            Notification.event_id == event.event_id,
+            Notification.delivery_status == DeliveryStatus.PENDING,
+            Notification.deleted.is_(False),
+        )
+    )
+
+
+def test_recurrence_changes_swap_the_one_off_reminder_for_generated_ones(db_session: Session, test_user: User):
+    calendar = CalendarCtrl.create(db=db_session, name="Switching", calendar_type="personal", visibility="private",
+                                   color="#FFFFFF", shared=False, user_id=test_user.user_id)
+    # Close enough that the first occurrence's reminder is generated right away
+    start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(minutes=20)
+    event = EventCtrl.create(db_session, "Review", start, start + timedelta(hours=1), "Library", calendar.calendar_id)
+    NotificationCtrl.create(db_session, event.event_id, NotificationTypes.ALERT, "Bring notes", start)
+    assert _pending_reminders(db_session, event) == [(start - timedelta(minutes=15), False), (start, False)]
+
+    # One-off to daily: the first occurrence gets one reminder, the generated one, hand made notifications stay
+    event.recurrence_rule = RecurrenceRule.DAILY
+    EventCtrl.save(event, db_session)
+    assert _pending_reminders(db_session, event) == [(start - timedelta(minutes=15), True), (start, False)]
+
+    # Back to one-off: the generated reminder goes and the one-off reminder comes back
+    event.recurrence_rule = RecurrenceRule.NONE
+    EventCtrl.save(event, db_session)
+    assert _pending_reminders(db_session, event) == [(start - timedelta(minutes=15), False), (start, False)]
+
+    # A new lead moves the one-off reminder instead of adding a second one
+    event.reminder_minutes = 5
+    EventCtrl.save(event, db_session)
+    assert _pending_reminders(db_session, event) == [(start - timedelta(minutes=5), False), (start, False)]
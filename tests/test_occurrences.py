@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta, timezone
+import uuid
+
+import pytest
+from pydantic import EmailStr, TypeAdapter
+from sqlalchemy.orm import Session
+
+from src.classes.calendar import Calendar
+from src.classes.occurrence import Occurrence
+from src.classes.user import User
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.occurrences import OccurrenceCtrl
+from src.controllers.users import UserCtrl
+from src.enums import RecurrenceRule
+
+EmailAdapter = TypeAdapter(EmailStr)
+
+NOW = datetime(2025, 3, 1, 10, tzinfo=timezone.utc)
+WEEK = (datetime(2025, 3, 3, tzinfo=timezone.utc), datetime(2025, 3, 10, tzinfo=timezone.utc))
+
+
+@pytest.fixture
+def test_user(db_session: Session) -> User:
+    return UserCtrl.create(
+        db=db_session,
+        name="Test User",
+        email=EmailAdapter.validate_python(f"test-occurrence-{uuid.uuid4()}@example.com"),
+        password="password123",
+        timezone="UTC",
+    )
+
+
+@pytest.fixture
+def test_calendar(db_session: Session, test_user: User) -> Calendar:
+    return CalendarCtrl.create(
+        db=db_session,
+        name="Test Calendar for Occurrences",
+        calendar_type="personal",
+        visibility="private",
+        color="#FFFFFF",
+        shared=False,
+        user_id=test_user.user_id,
+    )
+
+
+def _series(db_session: Session, calendar: Calendar, rule: RecurrenceRule, first: datetime, hours: int = 1):
+    return EventCtrl.create(db_session, f"Series {rule.name}", first, first + timedelta(hours=hours), "Room",
+                            calendar.calendar_id, recurrence_rule=rule)
+
+
+def _spans(db_session: Session, calendar: Calendar) -> dict[str, int]:
+    db_session.refresh(calendar)
+    return {calendar.calendar_id: calendar.max_event_seconds}
+
+
+def _keys(found) -> list[tuple[str, datetime, datetime]]:
+    return [(e.event_id, e.start_time.replace(tzinfo=None), e.end_time.replace(tzinfo=None)) for e in found]
+
+
+def _stored(db_session: Session) -> list[tuple[str, datetime]]:
+    return sorted(db_session.query(Occurrence.event_id, Occurrence.start_time).all())
+
+
+def test_roll_horizon_serves_windows_from_the_table(db_session: Session, test_calendar: Calendar):
+    first = datetime(2025, 1, 31, 9, tzinfo=timezone.utc)
+    for rule in (RecurrenceRule.DAILY, RecurrenceRule.WEEKDAYS, RecurrenceRule.BIWEEKLY, RecurrenceRule.MONTHLY):
+        _series(db_session, test_calendar, rule, first)
+    EventCtrl.create(db_session, "One-off", WEEK[0] + timedelta(hours=12), WEEK[0] + timedelta(hours=13), "Room",
+                     test_calendar.calendar_id)
+    spans = _spans(db_session, test_calendar)
+    assert OccurrenceCtrl.load_horizon(db_session) is None
+    expanded = EventCtrl.list_occurrences(spans, *WEEK, db_session)
+
+    inserted = OccurrenceCtrl.roll_horizon(db_session, now=NOW, horizon_days=30, retention_days=7)
+    horizon = OccurrenceCtrl.load_horizon(db_session)
+    assert horizon.valid_from.replace(tzinfo=None) == datetime(2025, 2, 22)
+    assert horizon.valid_until.replace(tzinfo=None) == datetime(2025, 4, 1)
+    assert inserted == len(_stored(db_session)) > 0
+    assert OccurrenceCtrl.covers(horizon, *WEEK)
+    assert not OccurrenceCtrl.covers(horizon, WEEK[0], datetime(2025, 5, 1, tzinfo=timezone.utc))
+
+    materialized = EventCtrl.list_occurrences(spans, *WEEK, db_session)
+    assert _keys(materialized) == _keys(expanded)
+    # Daily, weekdays and the one-off, the biweekly and monthly series skip this week
+    assert len(materialized) == 7 + 5 + 1
+
+    # Pages walked through the table line up with the full listing
+    walked, after = [], None
+    while True:
+        page = EventCtrl.list_occurrences(spans, *WEEK, db_session, after, 4)
+        walked += page
+        if len(page) < 4:
+            break
+        after = (page[-1].start_time, page[-1].event_id)
+    assert _keys(walked) == _keys(materialized)
+
+
+def test_rolling_forward_matches_a_rebuild(db_session: Session, test_calendar: Calendar):
+    first = datetime(2025, 1, 15, 22, tzinfo=timezone.utc)
+    for rule in (RecurrenceRule.DAILY, RecurrenceRule.WEEKLY, RecurrenceRule.QUARTERLY):
+        _series(db_session, test_calendar, rule, first, hours=4)
+
+    OccurrenceCtrl.roll_horizon(db_session, now=NOW, horizon_days=30, retention_days=7)
+    extended = OccurrenceCtrl.roll_horizon(db_session, now=NOW + timedelta(days=10), horizon_days=30, retention_days=7)
+    rolled = _stored(db_session)
+    assert min(start for _, start in rolled) >= datetime(2025, 3, 4) - timedelta(hours=4)
+
+    db_session.delete(OccurrenceCtrl.load_horizon(db_session))
+    db_session.commit()
+    rebuilt = OccurrenceCtrl.roll_horizon(db_session, now=NOW + timedelta(days=10), horizon_days=30, retention_days=7)
+    assert _stored(db_session) == rolled
+    assert extended < rebuilt
+
+
+def test_event_writes_keep_occurrences_in_sync(db_session: Session, test_calendar: Calendar):
+    OccurrenceCtrl.roll_horizon(db_session, now=NOW, horizon_days=30, retention_days=7)
+    weekly = _series(db_session, test_calendar, RecurrenceRule.WEEKLY, datetime(2025, 3, 4, 9, tzinfo=timezone.utc))
+    _series(db_session, test_calendar, RecurrenceRule.NONE, datetime(2025, 3, 5, 9, tzinfo=timezone.utc))
+    assert [start for _, start in _stored(db_session)] == [datetime(2025, 3, 4, 9) + timedelta(weeks=k) for k in range(4)]
+
+    weekly.start_time = datetime(2025, 3, 6, 9, tzinfo=timezone.utc)
+    weekly.end_time = datetime(2025, 3, 6, 10, tzinfo=timezone.utc)
+    EventCtrl.save(weekly, db_session)
+    spans = _spans(db_session, test_calendar)
+    assert [o.start_time for o in EventCtrl.list_occurrences(spans, *WEEK, db_session) if o.event_id == weekly.event_id] \
+        == [datetime(2025, 3, 6, 9)]
+
+    weekly.recurrence_rule = RecurrenceRule.NONE
+    EventCtrl.save(weekly, db_session)
+    assert _stored(db_session) == []
+
+    weekly.recurrence_rule = RecurrenceRule.DAILY
+    EventCtrl.save(weekly, db_session)
+    assert len(_stored(db_session)) == 26
+
+    EventCtrl.safe_delete(weekly, db_session)
+    assert _stored(db_session) == []
+    assert len(EventCtrl.list_occurrences(spans, *WEEK, db_session)) == 1
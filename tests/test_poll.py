@@ -1,3 +1,6 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import pytest
 from hypothesis import given, strategies as st, settings, HealthCheck
@@ -5,11 +8,16 @@ import uuid
 from pydantic import EmailStr, TypeAdapter
 
 from src.classes.poll import Poll
-from src.constants import POLL_QUESTION_LENGTH
+from src.constants import POLL_QUESTION_LENGTH, POLL_STREAM_MAX_IDS
 from src.controllers.polls import PollCtrl
 from src.controllers.votes import VoteCtrl
 from src.controllers.users import UserCtrl
 from src.classes.user import User
+from src.core.broadcast import poll_broadcaster
+from src.core.query_stats import query_budget
+from src.api.polls import stream_poll_results, stream_polls_results
+from src.database import get_async_db
+from main import app
 
 EmailAdapter = TypeAdapter(EmailStr)
 
@@ -152,3 +160,142 @@ def test_user_can_vote_multiple_times_if_allowed(db_session: Session, test_user:
     VoteCtrl.create(db_session, multi_vote_poll.options[1].option_id, test_user.user_id)
     votes = PollCtrl.get_votes(multi_vote_poll, db_session)
     assert len(votes) == 2
+
+
+def test_list_polls_counts_votes_in_constant_queries(
+    client: TestClient, db_session: Session, test_user: User, another_user: User
+):
+    """Listing polls costs the same handful of queries whether there is one poll or many."""
+    polls = [
+        PollCtrl.create(db=db_session, question=f"Question {i}", owner_id=test_user.user_id, options=["Yes", "No"])
+        for i in range(10)
+    ]
+    VoteCtrl.create(db_session, polls[0].options[0].option_id, test_user.user_id)
+    VoteCtrl.create(db_session, polls[0].options[0].option_id, another_user.user_id)
+    VoteCtrl.create(db_session, polls[3].options[1].option_id, test_user.user_id)
+
+    with query_budget(max_queries=3, max_repeats=1):
+        response = client.get("/polls/")
+    assert response.status_code == 200
+
+    votes = {o["option_id"]: o["votes"] for p in response.json() for o in p["options"]}
+    assert votes[polls[0].options[0].option_id] == 2
+    assert votes[polls[3].options[1].option_id] == 1
+    assert sum(votes.values()) == 3
+
+
+def test_poll_results_stream(async_engine, db_session: Session, test_poll: Poll, test_user: User, another_user: User):
+    """The stream opens with a snapshot, then every committed vote arrives as a tally of the changed option."""
+    poll_id = test_poll.poll_id
+    option_id = test_poll.options[0].option_id
+    test_user_id, another_user_id = test_user.user_id, another_user.user_id
+
+    async def watch():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            response = await stream_poll_results(poll_id, db=session)
+        events = response.body_iterator
+        snapshot = await anext(events)
+        VoteCtrl.create(db_session, option_id, test_user_id)
+        VoteCtrl.create(db_session, option_id, another_user_id)
+        tallies = [await anext(events), await anext(events)]
+        await events.aclose()
+        return snapshot, tallies
+
+    snapshot, tallies = asyncio.run(watch())
+    assert snapshot.startswith("retry: ")
+    assert "event: snapshot" in snapshot and f'"{option_id}":0' in snapshot
+    assert tallies == [
+        f'event: tally\ndata: {{"poll_id":"{poll_id}","options":{{"{option_id}":{n}}}}}\n\n' for n in (1, 2)
+    ]
+    assert poll_broadcaster.subscriber_count(poll_id) == 0
+
+
+def test_polls_results_stream_multiplexes_polls(async_engine, db_session: Session, test_poll: Poll, test_user: User):
+    """One stream carries the snapshot and the tallies of every requested poll, unknown ids are skipped."""
+    other_poll = PollCtrl.create(db_session, "Second poll?", test_user.user_id, ["Yes", "No"])
+    poll_ids = [test_poll.poll_id, other_poll.poll_id]
+    option_id = other_poll.options[1].option_id
+    test_user_id = test_user.user_id
+
+    async def watch():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            response = await stream_polls_results(f"{poll_ids[0]},does-not-exist,{poll_ids[1]}", db=session)
+        events = response.body_iterator
+        snapshots = await anext(events)
+        assert poll_broadcaster.subscriber_count() == 3
+        VoteCtrl.create(db_session, option_id, test_user_id)
+        tally = await anext(events)
+        await events.aclose()
+        return snapshots, tally
+
+    snapshots, tally = asyncio.run(watch())
+    assert snapshots.count("event: snapshot") == 2
+    assert all(f'"poll_id":"{poll_id}"' in snapshots for poll_id in poll_ids)
+    assert tally == f'event: tally\ndata: {{"poll_id":"{poll_ids[1]}","options":{{"{option_id}":1}}}}\n\n'
+    assert poll_broadcaster.subscriber_count() == 0
+
+
+def test_poll_results_stream_releases_its_session(async_engine, db_session: Session, test_poll: Poll):
+    """The database session is closed before the first event is sent, an open stream holds no connection."""
+    open_sessions = []
+
+    async def counted_async_db():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            open_sessions.append(session)
+            yield session
+            open_sessions.remove(session)
+
+    async def watch():
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                sent.append(len(open_sessions))
+                disconnect.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": f"/polls/{test_poll.poll_id}/stream", "raw_path": b"", "query_string": b"", "headers": [],
+            "client": ("test", 1), "server": ("test", 80), "root_path": "",
+        }
+        await app(scope, receive, send)
+        return sent
+
+    app.dependency_overrides[get_async_db] = counted_async_db
+    try:
+        sent = asyncio.run(watch())
+    finally:
+        app.dependency_overrides.clear()
+    assert sent and sent[0] == 0
+    assert poll_broadcaster.subscriber_count() == 0
+
+
+def test_poll_results_stream_unknown_poll(client: TestClient):
+    response = client.get("/polls/does-not-exist/stream")
+    assert response.status_code == 404
+    assert poll_broadcaster.subscriber_count() == 0
+
+
+def test_list_polls_pagination(client: TestClient, db_session: Session, test_user: User):
+    """Pages follow creation order, not the order of the random poll ids."""
+    created = [PollCtrl.create(db_session, f"Question {i}", test_user.user_id, ["Yes", "No"]) for i in range(5)]
+    expected = [p.poll_id for p in created]
+
+    first = client.get("/polls/", params={"limit": 3})
+    assert [p["poll_id"] for p in first.json()] == expected[:3]
+    second = client.get("/polls/", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]})
+    assert [p["poll_id"] for p in second.json()] == expected[3:]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_polls_results_stream_needs_ids(client: TestClient):
+    assert client.get("/polls/stream", params={"ids": ","}).status_code == 400
+    too_many = ",".join(str(uuid.uuid4()) for _ in range(POLL_STREAM_MAX_IDS + 1))
+    assert client.get("/polls/stream", params={"ids": too_many}).status_code == 400
+    assert client.get("/polls/stream", params={"ids": "does-not-exist"}).status_code == 404
+    assert poll_broadcaster.subscriber_count() == 0
@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.classes.user import User
+from src.controllers.users import UserCtrl
+from src.core.query_stats import QueryBudget, QueryBudgetExceeded, track_queries, statement_shape
+from tests.test_authorization import get_auth_header
+
+
+@pytest.fixture
+def test_user_data():
+    return {"name": "Stats User", "email": "stats@example.com", "password": "password123", "timezone": "UTC"}
+
+
+@pytest.fixture
+def created_user(db_session: Session, test_user_data: dict):
+    return UserCtrl.create(db=db_session, **test_user_data)
+
+
+def test_statement_shape_folds_in_lists():
+    assert statement_shape("SELECT * FROM votes WHERE id IN (?, ?, ?)") == statement_shape(
+        "SELECT *\n  FROM votes WHERE id IN (?)"
+    )
+
+
+def test_track_queries_counts_and_detects_repeats(db_session: Session, created_user):
+    with track_queries(QueryBudget()) as stats:
+        for _ in range(3):
+            UserCtrl.load(created_user.user_id, db_session)
+    assert stats.count == 3
+    assert stats.repeated == 2
+    assert stats.duration > 0
+
+
+def test_strict_budget_raises_on_repeated_shape(db_session: Session, created_user):
+    with pytest.raises(QueryBudgetExceeded, match="repeated 3 times"):
+        with track_queries(QueryBudget(max_repeats=2, strict=True)):
+            for _ in range(3):
+                db_session.query(User).filter(User.user_id == created_user.user_id).first()
+
+
+def test_strict_budget_raises_on_query_count(db_session: Session, created_user):
+    with pytest.raises(QueryBudgetExceeded, match="budget is 1"):
+        with track_queries(QueryBudget(max_queries=1, strict=True)):
+            UserCtrl.load(created_user.user_id, db_session)
+            UserCtrl.load_by_email(created_user.email, db_session)
+
+
+def test_response_reports_query_stats(client: TestClient, created_user, test_user_data):
+    headers = get_auth_header(client, test_user_data)
+    response = client.get("/calendar/", headers=headers)
+    assert response.status_code == 200
+    assert int(response.headers["x-db-query-count"]) >= 2
+    assert response.headers["server-timing"].startswith("db;dur=")
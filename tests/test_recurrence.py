@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+from hypothesis import given, settings, strategies as st
+
+from src.core.recurrence import expand_many, occurrences
+from src.enums import RecurrenceRule
+
+WINDOW_START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+WINDOW_END = datetime(2025, 4, 1, tzinfo=timezone.utc)
+
+
+def _starts(start, end, rule, window_start=WINDOW_START, window_end=WINDOW_END):
+    return [occurrence_start for occurrence_start, _ in occurrences(start, end, rule, window_start, window_end)]
+
+
+def test_weekly_series_from_years_ago():
+    start = datetime(2019, 9, 2, 10, tzinfo=timezone.utc)  # A Monday
+    found = _starts(start, start + timedelta(hours=1), RecurrenceRule.WEEKLY)
+    assert found == [datetime(2025, 3, day, 10, tzinfo=timezone.utc) for day in (3, 10, 17, 24, 31)]
+
+
+def test_occurrence_overlapping_window_start_is_included():
+    start = datetime(2025, 2, 27, 22, tzinfo=timezone.utc)
+    found = list(occurrences(start, start + timedelta(hours=3), RecurrenceRule.DAILY, WINDOW_START, WINDOW_START + timedelta(days=1)))
+    assert found[0] == (datetime(2025, 2, 28, 22, tzinfo=timezone.utc), datetime(2025, 3, 1, 1, tzinfo=timezone.utc))
+    assert len(found) == 2
+
+
+def test_weekdays_skip_weekends():
+    start = datetime(2025, 3, 1, 9)  # A Saturday, the first occurrence still counts
+    found = _starts(start, start + timedelta(hours=1), RecurrenceRule.WEEKDAYS, WINDOW_START, datetime(2025, 3, 10))
+    assert [d.day for d in found] == [1, 3, 4, 5, 6, 7]
+
+
+def test_monthly_clamps_to_month_end():
+    start = datetime(2025, 1, 31, 12)
+    found = _starts(start, start + timedelta(hours=1), RecurrenceRule.MONTHLY, datetime(2025, 1, 1), datetime(2025, 6, 1))
+    assert [(d.month, d.day) for d in found] == [(1, 31), (2, 28), (3, 31), (4, 30), (5, 31)]
+
+
+def test_none_is_a_single_occurrence():
+    start = datetime(2025, 3, 5, 9, tzinfo=timezone.utc)
+    assert _starts(start, start + timedelta(hours=1), None) == [start]
+    assert _starts(start, start + timedelta(hours=1), RecurrenceRule.NONE, WINDOW_END, WINDOW_END + timedelta(days=1)) == []
+
+
+series_strategy = st.lists(
+    st.tuples(
+        st.datetimes(min_value=datetime(2023, 1, 1), max_value=datetime(2025, 5, 1)),
+        st.timedeltas(min_value=timedelta(minutes=1), max_value=timedelta(days=3)),
+        st.sampled_from(RecurrenceRule),
+    ),
+    min_size=1,
+    max_size=30,
+)
+
+
+@settings(deadline=None)
+@given(series=series_strategy)
+def test_expand_many_matches_occurrences(series):
+    """The vectorized path yields exactly what the generators yield."""
+    starts = [start for start, _, _ in series]
+    ends = [start + duration for start, duration, _ in series]
+    rules = [rule for _, _, rule in series]
+
+    expected = sorted(
+        (occurrence_start, i, occurrence_end)
+        for i, (start, end, rule) in enumerate(zip(starts, ends, rules))
+        for occurrence_start, occurrence_end in occurrences(start, end, rule, WINDOW_START, WINDOW_END)
+    )
+    index, occurrence_starts, occurrence_ends = expand_many(starts, ends, rules, WINDOW_START, WINDOW_END)
+    assert list(zip(occurrence_starts.tolist(), index.tolist(), occurrence_ends.tolist())) == expected
@@ -1 +1,126 @@
-# TBD
\ No newline at end of file
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.classes.calendar import Calendar
+from src.classes.user import User
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.friends import FriendsCtrl
+from src.controllers.schedules import ScheduleCtrl
+from src.controllers.users import UserCtrl
+from src.core.intervals import merge_intervals
+from src.enums import FriendStatus, RecurrenceRule
+from tests.test_authorization import get_auth_header
+
+MONDAY = datetime(2025, 3, 3, tzinfo=timezone.utc)
+WEEK = (MONDAY, MONDAY + timedelta(days=7))
+
+
+@pytest.fixture
+def test_user_data():
+    return {"name": "Schedule User", "email": "schedule@example.com", "password": "password123", "timezone": "UTC"}
+
+
+@pytest.fixture
+def created_user(db_session: Session, test_user_data: dict) -> User:
+    return UserCtrl.create(db=db_session, **test_user_data)
+
+
+@pytest.fixture
+def other_user(db_session: Session) -> User:
+    return UserCtrl.create(db=db_session, name="Other User", email="schedule-other@example.com",
+                           password="password123", timezone="UTC")
+
+
+@pytest.fixture
+def auth_headers(client: TestClient, created_user: User, test_user_data: dict):
+    return get_auth_header(client, test_user_data)
+
+
+def _calendar(db_session: Session, user: User) -> Calendar:
+    return CalendarCtrl.create(db=db_session, name=f"{user.name} Calendar", calendar_type="personal",
+                               visibility="private", color="#FFFFFF", shared=False, user_id=user.user_id)
+
+
+def _event(db_session: Session, calendar: Calendar, start: datetime, hours: float, rule=RecurrenceRule.NONE):
+    return EventCtrl.create(db_session, "Busy", start, start + timedelta(hours=hours), "Room",
+                            calendar.calendar_id, recurrence_rule=rule)
+
+
+def _naive(hours: float) -> datetime:
+    return (MONDAY + timedelta(hours=hours)).replace(tzinfo=None)
+
+
+def test_merge_intervals():
+    starts = np.array([5, 1, 2, 10, 8, 12])
+    ends = np.array([6, 3, 4, 11, 10, 13])
+    block_starts, block_ends = merge_intervals(starts, ends)
+    # Overlapping and touching intervals merge, gaps split
+    assert list(zip(block_starts.tolist(), block_ends.tolist())) == [(1, 4), (5, 6), (8, 11), (12, 13)]
+    assert merge_intervals(np.array([]), np.array([]))[0].size == 0
+
+
+def test_free_busy_merges_users_and_series(db_session: Session, created_user: User, other_user: User):
+    mine, theirs = _calendar(db_session, created_user), _calendar(db_session, other_user)
+    _event(db_session, mine, MONDAY + timedelta(hours=9), 2)
+    _event(db_session, mine, MONDAY + timedelta(hours=10), 2)
+    # Started the week before and runs past the window start
+    _event(db_session, mine, MONDAY - timedelta(hours=1), 3)
+    _event(db_session, theirs, MONDAY - timedelta(days=14, hours=-11, minutes=30), 1, RecurrenceRule.WEEKDAYS)
+    _event(db_session, theirs, MONDAY + timedelta(days=30), 1)
+    users = [created_user.user_id, other_user.user_id]
+
+    found = ScheduleCtrl.free_busy(users, *WEEK, db_session)
+    assert found.users[created_user.user_id] == [(_naive(0), _naive(2)), (_naive(9), _naive(12))]
+    assert found.users[other_user.user_id] == [
+        (_naive(24 * day + 10.5), _naive(24 * day + 11.5)) for day in range(5)
+    ]
+    assert found.combined[:3] == [(_naive(0), _naive(2)), (_naive(9), _naive(12)), (_naive(34.5), _naive(35.5))]
+
+
+def test_free_busy_endpoint(client: TestClient, auth_headers: dict, db_session: Session,
+                            created_user: User, other_user: User):
+    _event(db_session, _calendar(db_session, created_user), MONDAY + timedelta(hours=9), 1)
+    _event(db_session, _calendar(db_session, other_user), MONDAY + timedelta(hours=9, minutes=30), 1)
+    params = {"start": WEEK[0].isoformat(), "end": WEEK[1].isoformat()}
+
+    response = client.get("/schedules/free-busy", headers=auth_headers, params=params)
+    assert response.status_code == 200
+    assert list(response.json()["users"]) == [created_user.user_id]
+
+    both = {**params, "user_ids": [created_user.user_id, other_user.user_id]}
+    response = client.get("/schedules/free-busy", headers=auth_headers, params=both)
+    assert response.status_code == 403
+
+    FriendsCtrl.create(db_session, other_user.user_id, created_user.user_id, FriendStatus.ACTIVE, "Other")
+    response = client.get("/schedules/free-busy", headers=auth_headers, params=both)
+    assert response.status_code == 200
+    assert response.json()["combined"] == [
+        {"start": _naive(9).isoformat(), "end": _naive(10.5).isoformat()}
+    ]
+
+    too_long = {"start": WEEK[0].isoformat(), "end": (WEEK[0] + timedelta(days=200)).isoformat()}
+    assert client.get("/schedules/free-busy", headers=auth_headers, params=too_long).status_code == 422
+
+
+def test_free_at_endpoint(client: TestClient, auth_headers: dict, db_session: Session, created_user: User,
+                          other_user: User):
+    _event(db_session, _calendar(db_session, created_user), MONDAY + timedelta(hours=9), 1)
+    _event(db_session, _calendar(db_session, other_user), MONDAY - timedelta(days=7, hours=-9), 1, RecurrenceRule.WEEKLY)
+
+    def free(hours: float, **params) -> bool:
+        response = client.get("/schedules/free-at", headers=auth_headers,
+                              params={"at": (MONDAY + timedelta(hours=hours)).isoformat(), **params})
+        assert response.status_code == 200
+        return response.json()["free"]
+
+    assert not free(9.5) and free(10)
+    assert client.get("/schedules/free-at", headers=auth_headers,
+                      params={"at": MONDAY.isoformat(), "user_id": other_user.user_id}).status_code == 403
+    FriendsCtrl.create(db_session, other_user.user_id, created_user.user_id, FriendStatus.ACTIVE, "Other")
+    assert not free(9.5, user_id=other_user.user_id) and free(8.5, user_id=other_user.user_id)
+
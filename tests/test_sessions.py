@@ -1 +1,115 @@
-# TBD
\ No newline at end of file
+from datetime import datetime, time, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.classes.calendar import Calendar
+from src.classes.study_session import StudySession
+from src.classes.user import User
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.study_session_members import StudySessionMemberCtrl
+from src.controllers.study_sessions import StudySessionCtrl
+from src.controllers.users import UserCtrl
+from src.core.slots import WorkingHours, window_or
+from tests.test_authorization import get_auth_header
+
+MONDAY = datetime(2025, 3, 3, tzinfo=timezone.utc)
+DAY = (MONDAY, MONDAY + timedelta(days=1))
+
+
+@pytest.fixture
+def test_user_data():
+    return {"name": "Session Owner", "email": "session-owner@example.com", "password": "password123",
+            "timezone": "UTC"}
+
+
+@pytest.fixture
+def created_user(db_session: Session, test_user_data: dict) -> User:
+    return UserCtrl.create(db=db_session, **test_user_data)
+
+
+@pytest.fixture
+def members(db_session: Session) -> list[User]:
+    return [
+        UserCtrl.create(db=db_session, name=f"Member {i}", email=f"session-member-{i}@example.com",
+                        password="password123", timezone="UTC")
+        for i in range(2)
+    ]
+
+
+@pytest.fixture
+def study_session(db_session: Session, created_user: User, members: list[User]) -> StudySession:
+    session = StudySessionCtrl.create(db_session, "Exam prep", created_user.user_id)
+    for member in members:
+        StudySessionMemberCtrl.create(db_session, session.session_id, member.user_id)
+    return session
+
+
+def _calendar(db_session: Session, user: User) -> Calendar:
+    return CalendarCtrl.create(db=db_session, name=f"{user.name} Calendar", calendar_type="personal",
+                               visibility="private", color="#FFFFFF", shared=False, user_id=user.user_id)
+
+
+def _busy(db_session: Session, user: User, from_hour: float, to_hour: float):
+    EventCtrl.create(db_session, "Busy", MONDAY + timedelta(hours=from_hour), MONDAY + timedelta(hours=to_hour),
+                     "Room", _calendar(db_session, user).calendar_id)
+
+
+def _naive(hours: float) -> datetime:
+    return (MONDAY + timedelta(hours=hours)).replace(tzinfo=None)
+
+
+def test_window_or():
+    rng = np.random.default_rng(3)
+    bits = rng.integers(0, 256, size=(50, 4), dtype=np.uint8)
+    for length in (1, 2, 3, 7, 8, 13, 50):
+        expected = [np.bitwise_or.reduce(bits[i:i + length]) for i in range(len(bits) - length + 1)]
+        assert np.array_equal(window_or(bits, length), np.array(expected).reshape(-1, 4))
+    assert len(window_or(bits, 51)) == 0
+
+
+def test_find_slots_ranks_by_attendance(db_session: Session, created_user: User, members: list[User],
+                                        study_session: StudySession):
+    _busy(db_session, created_user, 9, 10)
+    _busy(db_session, members[0], 9, 12)
+    _busy(db_session, members[1], 9, 15)
+
+    slots = StudySessionCtrl.find_slots(study_session, *DAY, 60, WorkingHours(), 3, db_session)
+    assert [(slot.start, slot.end) for slot in slots] == [
+        (_naive(15), _naive(16)), (_naive(16), _naive(17)), (_naive(12), _naive(13))
+    ]
+    assert slots[0].unavailable == []
+    assert slots[2].unavailable == [members[1].user_id]
+
+    # 9:00 to 17:00 in New York is 14:00 to 22:00 UTC in March, before the switch to daylight saving
+    new_york = WorkingHours(day_start=time(9), day_end=time(17), timezone="America/New_York")
+    assert StudySessionCtrl.find_slots(study_session, *DAY, 45, new_york, 1, db_session)[0].start == _naive(15)
+    weekend = (MONDAY - timedelta(days=2), MONDAY)
+    assert StudySessionCtrl.find_slots(study_session, *weekend, 30, WorkingHours(), 5, db_session) == []
+    with pytest.raises(ValueError):
+        StudySessionCtrl.find_slots(study_session, *DAY, 30, WorkingHours(timezone="Mars/Olympus"), 5, db_session)
+
+
+def test_find_slots_endpoint(client: TestClient, db_session: Session, test_user_data: dict, created_user: User,
+                             members: list[User], study_session: StudySession):
+    _busy(db_session, members[0], 9, 10)
+    params = {"start": DAY[0].isoformat(), "end": DAY[1].isoformat(), "duration": 90, "limit": 2}
+    headers = get_auth_header(client, test_user_data)
+
+    response = client.get(f"/sessions/{study_session.session_id}/slots", headers=headers, params=params)
+    assert response.status_code == 200
+    assert [slot["start"] for slot in response.json()] == [_naive(10).isoformat(), _naive(11.5).isoformat()]
+    assert response.json()[0]["attendance"] == 3
+
+    outsider = {"name": "Outsider", "email": "session-outsider@example.com", "password": "password123",
+                "timezone": "UTC"}
+    UserCtrl.create(db=db_session, **outsider)
+    response = client.get(f"/sessions/{study_session.session_id}/slots", headers=get_auth_header(client, outsider),
+                          params=params)
+    assert response.status_code == 404
+    response = client.get(f"/sessions/{study_session.session_id}/slots", headers=headers,
+                          params={**params, "duration": 5})
+    assert response.status_code == 422
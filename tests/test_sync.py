@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from src.classes.calendar import Calendar
+from src.classes.event import Event
+from src.classes.sync_clock import next_sync_version
+from src.classes.user import User
+from src.controllers.calendar import CalendarCtrl
+from src.controllers.events import EventCtrl
+from src.controllers.users import UserCtrl
+from tests.test_authorization import get_auth_header
+
+
+@pytest.fixture
+def test_user_data():
+    return {"name": "Sync User", "email": "sync@example.com", "password": "password123", "timezone": "UTC"}
+
+
+@pytest.fixture
+def test_user(db_session: Session, test_user_data: dict) -> User:
+    return UserCtrl.create(db=db_session, **test_user_data)
+
+
+def _calendar(db_session: Session, user_id: str, name: str = "Synced") -> Calendar:
+    return CalendarCtrl.create(db=db_session, name=name, calendar_type="personal", visibility="private",
+                               color="#FFFFFF", shared=False, user_id=user_id)
+
+
+def test_transaction_takes_one_version(db_session: Session, test_user: User):
+    first = _calendar(db_session, test_user.user_id, "First")
+    db_session.add_all([Calendar(name="Second", user_id=test_user.user_id), Calendar(name="Third", user_id=test_user.user_id)])
+    db_session.flush()
+    version = next_sync_version(db_session.connection())
+    db_session.commit()
+    versions = {c.name: c.sync_version for c in db_session.query(Calendar)}
+    assert versions == {"First": version - 1, "Second": version, "Third": version}
+    assert first.updated_at is not None
+
+    # Flushing an object without a net change leaves its version alone
+    first.name = "First"
+    db_session.commit()
+    assert first.sync_version == version - 1
+
+
+def test_sync_endpoint(client: TestClient, db_session: Session, test_user_data: dict, test_user: User):
+    headers = get_auth_header(client, test_user_data)
+    calendar = _calendar(db_session, test_user.user_id)
+    other = UserCtrl.create(db=db_session, name="Other", email="other-sync@example.com", password="password123",
+                            timezone="UTC")
+    other_calendar = _calendar(db_session, other.user_id)
+    event = client.post(f"/calendar/{calendar.calendar_id}/events", headers=headers, json={
+        "title": "Lecture", "start_time": "2025-03-03T09:00:00Z", "end_time": "2025-03-03T10:00:00Z",
+    }).json()
+
+    full = client.get("/calendar/sync", headers=headers).json()
+    assert [c["calendar_id"] for c in full["calendars"]] == [calendar.calendar_id]
+    assert [e["event_id"] for e in full["events"]] == [event["event_id"]]
+    assert client.get("/calendar/sync", headers=headers, params={"token": full["token"]}).json()["events"] == []
+
+    # Only what changed comes back, soft deletes included
+    client.put(f"/calendar/{calendar.calendar_id}/events/{event['event_id']}", headers=headers, json={"title": "Lab"})
+    EventCtrl.create(db_session, "Not mine", datetime.fromisoformat(event["start_time"]),
+                     datetime.fromisoformat(event["end_time"]), "Room", other_calendar.calendar_id)
+    delta = client.get("/calendar/sync", headers=headers, params={"token": full["token"]}).json()
+    assert delta["calendars"] == []
+    assert [(e["title"], e["deleted"]) for e in delta["events"]] == [("Lab", False)]
+
+    response = client.post(f"/calendar/{calendar.calendar_id}/events/{event['event_id']}/notifications", headers=headers,
+                           json={"type": "info", "message": "Bring a laptop", "timestamp": "2025-03-03T08:00:00Z"})
+    assert response.status_code == 200
+    EventCtrl.safe_delete(db_session.get(Event, event["event_id"]), db_session)
+    delta = client.get("/calendar/sync", headers=headers, params={"token": delta["token"]}).json()
+    assert [(e["title"], e["deleted"]) for e in delta["events"]] == [("Lab", True)]
+    assert [n["message"] for n in delta["notifications"]] == ["Bring a laptop"]
+
+    assert client.get("/calendar/sync", headers=headers, params={"token": "nonsense"}).status_code == 422
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from src.core.timing_wheel import TimingWheel
+
+NOW = datetime(2025, 3, 3, 9)
+
+
+def test_timers_fire_on_their_second():
+    wheel = TimingWheel(60, NOW)
+    wheel.schedule("b", NOW + timedelta(seconds=2))
+    wheel.schedule("a", NOW + timedelta(seconds=1, milliseconds=500))
+    wheel.schedule("c", NOW + timedelta(seconds=30))
+    assert wheel.next_due() == NOW + timedelta(seconds=2)
+
+    # Never early, half past fires with the next second
+    assert wheel.advance(NOW + timedelta(seconds=1, milliseconds=999)) == []
+    assert wheel.advance(NOW + timedelta(seconds=2)) == ["a", "b"]
+    assert wheel.next_due() == NOW + timedelta(seconds=30)
+    assert len(wheel) == 1
+
+
+def test_reschedule_cancel_and_horizon():
+    wheel = TimingWheel(60, NOW)
+    assert wheel.schedule("moved", NOW + timedelta(seconds=5))
+    assert wheel.schedule("moved", NOW + timedelta(seconds=40))
+    assert wheel.schedule("gone", NOW + timedelta(seconds=5))
+    assert wheel.cancel("gone") and not wheel.cancel("gone")
+    assert wheel.advance(NOW + timedelta(seconds=10)) == []
+
+    # Overdue fires right away, past the horizon doesn't fit
+    assert wheel.schedule("late", NOW - timedelta(minutes=5))
+    assert not wheel.schedule("far", wheel.horizon)
+    assert "far" not in wheel
+    assert wheel.advance(NOW + timedelta(seconds=11)) == ["late"]
+
+    # Jumping further than the whole ring fires everything once
+    assert wheel.schedule("wrapped", NOW + timedelta(seconds=65))
+    assert wheel.advance(NOW + timedelta(hours=1)) == ["moved", "wrapped"]
+    assert wheel.next_due() is None and len(wheel) == 0
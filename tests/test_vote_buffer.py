@@ -0,0 +1,197 @@
+import asyncio
+import json
+import threading
+import uuid
+import pytest
+from pydantic import EmailStr, TypeAdapter
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.classes.poll import Poll
+from src.classes.user import User
+from src.controllers.polls import PollCtrl
+from src.controllers.users import UserCtrl
+from src.controllers.vote_buffer import VoteBuffer, start_vote_buffer, stop_vote_buffer
+from src.controllers.votes import VoteCtrl
+from src.core.broadcast import poll_broadcaster
+
+EmailAdapter = TypeAdapter(EmailStr)
+
+
+@pytest.fixture
+def users(db_session: Session) -> list[User]:
+    return [
+        UserCtrl.create(
+            db=db_session,
+            name=f"Buffered Voter {i}",
+            email=EmailAdapter.validate_python(f"buffer-test-{uuid.uuid4()}@example.com"),
+            password="password123",
+            timezone="UTC",
+        )
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def test_poll(db_session: Session, users: list[User]) -> Poll:
+    return PollCtrl.create(db=db_session, question="Buffered?", owner_id=users[0].user_id, options=["Yes", "No"])
+
+
+@pytest.fixture
+def buffer(engine):
+    vote_buffer = VoteBuffer(sessionmaker(bind=engine), flush_interval=60, max_batch=100)
+    yield vote_buffer
+    vote_buffer.close()
+
+
+def test_votes_are_written_on_flush(db_session: Session, buffer: VoteBuffer, test_poll: Poll, users: list[User]):
+    """Votes are acknowledged right away and only hit the database once flushed."""
+    yes, no = [o.option_id for o in test_poll.options]
+    vote_ids = [buffer.submit(yes, users[0].user_id), buffer.submit(yes, users[1].user_id), buffer.submit(no, users[2].user_id)]
+    assert buffer.pending == 3
+    assert PollCtrl.get_votes(test_poll, db_session) == []
+
+    assert buffer.flush() == 3
+    db_session.expire_all()
+    assert {v.vote_id for v in PollCtrl.get_votes(test_poll, db_session)} == set(vote_ids)
+    assert [o.vote_count for o in test_poll.options] == [2, 1]
+
+
+def test_buffer_enforces_poll_rules(db_session: Session, buffer: VoteBuffer, test_poll: Poll, users: list[User]):
+    """Single choice, unknown options and closed polls are rejected from the cached poll state."""
+    yes, no = [o.option_id for o in test_poll.options]
+    buffer.submit(yes, users[0].user_id)
+    with pytest.raises(PermissionError):
+        buffer.submit(no, users[0].user_id)  # Still buffered, caught by the cache
+    VoteCtrl.create(db_session, no, users[1].user_id)
+    buffer.invalidate(test_poll.poll_id)
+    with pytest.raises(PermissionError):
+        buffer.submit(yes, users[1].user_id)  # Already in the table
+    with pytest.raises(ValueError, match="Invalid poll option ID"):
+        buffer.submit(str(uuid.uuid4()), users[2].user_id)
+
+    PollCtrl.close_poll(test_poll, db_session)
+    buffer.invalidate(test_poll.poll_id)
+    with pytest.raises(PermissionError):
+        buffer.submit(yes, users[2].user_id)
+
+
+def test_closing_or_deleting_a_poll_drops_its_cached_state(buffer: VoteBuffer, db_session: Session, users: list[User]):
+    """close_poll and poll deletion invalidate the running buffer, so the next vote sees the new state."""
+    start_vote_buffer(buffer)
+    try:
+        closing = PollCtrl.create(db=db_session, question="Closing?", owner_id=users[0].user_id, options=["Yes"])
+        deleting = PollCtrl.create(db=db_session, question="Deleting?", owner_id=users[0].user_id, options=["Yes"])
+        buffer.submit(closing.options[0].option_id, users[0].user_id)
+        buffer.submit(deleting.options[0].option_id, users[0].user_id)
+
+        PollCtrl.close_poll(closing, db_session)
+        with pytest.raises(PermissionError):
+            buffer.submit(closing.options[0].option_id, users[1].user_id)
+        PollCtrl.safe_delete(deleting, db_session)
+        with pytest.raises(ValueError, match="Invalid poll option ID"):
+            buffer.submit(deleting.options[0].option_id, users[1].user_id)
+    finally:
+        stop_vote_buffer()
+
+
+def test_flush_skips_votes_on_polls_closed_since(db_session: Session, buffer: VoteBuffer, test_poll: Poll, users: list[User]):
+    """A vote still buffered when its poll is closed is filtered out by the INSERT ... SELECT."""
+    yes = test_poll.options[0].option_id
+    buffer.submit(yes, users[0].user_id)
+    test_poll.is_closed = True
+    db_session.commit()
+
+    assert buffer.flush() == 0
+    db_session.expire_all()
+    assert PollCtrl.get_votes(test_poll, db_session) == []
+    assert test_poll.options[0].vote_count == 0
+
+
+def test_durable_mode_acknowledges_after_commit(engine, db_session: Session, test_poll: Poll, users: list[User]):
+    """In durable mode submit returns once the vote is committed."""
+    vote_buffer = VoteBuffer(sessionmaker(bind=engine), flush_interval=0.01, durable=True)
+    vote_buffer.start()
+    try:
+        vote_id = vote_buffer.submit(test_poll.options[0].option_id, users[0].user_id)
+        assert VoteCtrl.load(vote_id, db_session) is not None
+    finally:
+        vote_buffer.close()
+
+
+def test_close_flushes_pending_votes(db_session: Session, buffer: VoteBuffer, test_poll: Poll, users: list[User]):
+    """Shutting down writes whatever is still buffered."""
+    buffer.start()
+    vote_id = buffer.submit(test_poll.options[1].option_id, users[2].user_id)
+    buffer.close()
+    assert buffer.pending == 0
+    assert VoteCtrl.load(vote_id, db_session) is not None
+
+
+def test_flush_publishes_tallies(buffer: VoteBuffer, test_poll: Poll, users: list[User]):
+    """A flushed batch reaches live result subscribers as one tally per poll."""
+    poll_id = test_poll.poll_id
+    yes, no = [o.option_id for o in test_poll.options]
+    user_ids = [u.user_id for u in users]
+
+    async def watch():
+        subscription = poll_broadcaster.subscribe(poll_id)
+        buffer.submit(yes, user_ids[0])
+        buffer.submit(yes, user_ids[1])
+        buffer.submit(no, user_ids[2])
+        buffer.flush()
+        frame = await subscription.next_frame(timeout=1)
+        subscription.close()
+        return frame
+
+    frame = asyncio.run(watch())
+    assert json.loads(frame.split("data: ")[1]) == {"poll_id": poll_id, "options": {yes: 2, no: 1}}
+
+
+def test_reload_sees_votes_being_flushed(buffer: VoteBuffer, test_poll: Poll, users: list[User], monkeypatch):
+    """A poll state reloaded while a batch is being written still knows who voted in that batch."""
+    buffer.state_ttl = 0  # Every submit reloads the poll
+    yes, no = [o.option_id for o in test_poll.options]
+    buffer.submit(yes, users[0].user_id)
+    create_many = VoteCtrl.create_many
+    second_vote = []
+
+    def write_while_voting(db, rows):
+        # The batch is out of the buffer and not committed yet
+        with pytest.raises(PermissionError):
+            buffer.submit(no, users[0].user_id)
+        second_vote.append(True)
+        return create_many(db, rows)
+
+    monkeypatch.setattr(VoteCtrl, "create_many", staticmethod(write_while_voting))
+    assert buffer.flush() == 1
+    assert second_vote == [True]
+    assert buffer.pending == 0
+
+
+def test_reload_does_not_block_other_voters(engine, test_poll: Poll, users: list[User]):
+    """The database is read without holding the buffer's lock."""
+    loading, release = threading.Event(), threading.Event()
+    factory = sessionmaker(bind=engine)
+
+    def slow_factory():
+        loading.set()
+        release.wait(5)
+        return factory()
+
+    vote_buffer = VoteBuffer(slow_factory, flush_interval=60)
+    voter = threading.Thread(target=vote_buffer.submit, args=(test_poll.options[0].option_id, users[0].user_id))
+    voter.start()
+    try:
+        assert loading.wait(5)
+        # Takes the lock, would hang if the load held it
+        assert vote_buffer.pending == 0
+    finally:
+        release.set()
+        voter.join()
+        vote_buffer.close()
+
+
+def test_durable_buffer_must_be_started(engine, test_poll: Poll, users: list[User]):
+    vote_buffer = VoteBuffer(sessionmaker(bind=engine), durable=True)
+    with pytest.raises(RuntimeError):
+        vote_buffer.submit(test_poll.options[0].option_id, users[0].user_id)
@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Session
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session, sessionmaker
 import pytest
 import uuid
 from hypothesis import given, strategies as st, settings, HealthCheck
@@ -9,6 +11,7 @@ from src.controllers.polls import PollCtrl
 from src.controllers.votes import VoteCtrl
 from src.controllers.users import UserCtrl
 from src.classes.user import User
+from src.core.query_stats import QueryBudget, track_queries
 
 EmailAdapter = TypeAdapter(EmailStr)
 
@@ -101,3 +104,71 @@ def test_vote_creation_invalid_option(db_session: Session, test_user: User):
     invalid_option_id = str(uuid.uuid4())
     with pytest.raises(ValueError, match="Invalid poll option ID"):
         VoteCtrl.create(db=db_session, poll_option_id=invalid_option_id, user_id=test_user.user_id)
+
+
+def test_vote_counter_follows_votes(db_session: Session, test_poll: Poll, test_user: User, another_user: User):
+    """Creating and deleting votes keeps the denormalized counter in step."""
+    option = test_poll.options[0]
+    first = VoteCtrl.create(db_session, option.option_id, test_user.user_id)
+    second = VoteCtrl.create(db_session, option.option_id, another_user.user_id)
+    db_session.refresh(option)
+    assert option.vote_count == 2
+
+    VoteCtrl.safe_delete(first, db_session)
+    VoteCtrl.safe_delete(first, db_session)  # Deleting twice must not decrement twice
+    db_session.refresh(option)
+    assert option.vote_count == 1
+
+    VoteCtrl.permanent_delete(first, db_session)  # Already off the counter
+    VoteCtrl.permanent_delete(second, db_session)
+    db_session.refresh(option)
+    assert option.vote_count == 0
+
+
+def test_reconcile_vote_counts(db_session: Session, test_poll: Poll, test_user: User):
+    """Reconciling rebuilds drifted counters from the votes table."""
+    option = test_poll.options[1]
+    VoteCtrl.create(db_session, option.option_id, test_user.user_id)
+    option.vote_count = 42
+    test_poll.options[2].vote_count = 3
+    db_session.commit()
+
+    assert PollCtrl.reconcile_vote_counts(db_session, [test_poll.poll_id]) == 2
+    assert [o.vote_count for o in test_poll.options] == [0, 1, 0]
+    assert PollCtrl.reconcile_vote_counts(db_session) == 0
+
+
+def test_concurrent_double_votes_are_rejected(engine, db_session: Session, test_poll: Poll, test_user: User):
+    """Stress test: many simultaneous votes from one user on a single choice poll, only one may land."""
+    voters = 16
+    option_ids = [o.option_id for o in test_poll.options]
+    barrier = threading.Barrier(voters)
+    outcomes = []
+
+    def vote(worker: int):
+        session = sessionmaker(bind=engine)()
+        try:
+            barrier.wait()
+            VoteCtrl.create(session, option_ids[worker % len(option_ids)], test_user.user_id)
+            outcomes.append("voted")
+        except PermissionError:
+            outcomes.append("rejected")
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=voters) as pool:
+        list(pool.map(vote, range(voters)))
+
+    assert outcomes.count("voted") == 1
+    assert outcomes.count("rejected") == voters - 1
+    db_session.expire_all()
+    assert len(PollCtrl.get_votes(test_poll, db_session)) == 1
+    assert sum(o.vote_count for o in test_poll.options) == 1
+
+
+def test_vote_is_a_single_statement(db_session: Session, test_poll: Poll, test_user: User):
+    """Casting a vote does no reads, just the conditional insert and the counter bump."""
+    option_id, user_id = test_poll.options[0].option_id, test_user.user_id
+    with track_queries(QueryBudget()) as stats:
+        VoteCtrl.create(db_session, option_id, user_id)
+    assert stats.count == 2